@@ -15,6 +15,8 @@ load_dotenv()
 # Security configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
 SESSION_EXPIRE_MINUTES = int(os.getenv("SESSION_EXPIRE_MINUTES", "30"))
+# Comma-separated emails of users allowed to call admin endpoints
+ADMIN_EMAILS = {email.strip().lower() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()}
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -100,6 +102,11 @@ def get_current_active_user(current_user: User = Depends(get_current_user)) -> U
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user 
 
+def get_current_admin_user(current_user: User = Depends(get_current_active_user)) -> User:
+    if current_user.email.lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Admin privileges required")
+    return current_user
+
 def invalidate_session(token: str, db: Session) -> bool:
     """Invalidate a session by setting is_active to False"""
     session = db.query(UserSession).filter(
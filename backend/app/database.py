@@ -4,6 +4,7 @@ from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 import os
 from dotenv import load_dotenv
+from app.services.metrics import registry
 
 load_dotenv()
 
@@ -21,6 +22,16 @@ engine = create_engine(
     echo=False  # Set to True for SQL query logging
 )
 
+db_pool_connections = registry.gauge("db_pool_connections", "Database pool connections", ["state"])
+
+@registry.collector
+def _collect_pool_metrics():
+    pool = engine.pool
+    if hasattr(pool, "checkedout"):
+        db_pool_connections.set(pool.checkedout(), state="checked_out")
+        db_pool_connections.set(pool.checkedin(), state="idle")
+        db_pool_connections.set(max(pool.overflow(), 0), state="overflow")
+
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -0,0 +1,158 @@
+"""Idempotent schema upgrades for databases created by an older release.
+
+``Base.metadata.create_all`` creates missing tables but never alters
+existing ones, so columns and indexes added to an existing table are
+listed here as steps. Each step checks the live schema and only applies
+what is missing, so running the upgrade on every startup, or on a fresh
+database, is a no-op. Tables derived from existing rows (such as the
+pomodoro rollups) are listed too, so they are filled when first created.
+"""
+
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+from sqlalchemy import func, inspect, literal, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import Column, CreateIndex, Index
+from app.database import Base, engine
+from app.models import LONG_EVENT_THRESHOLD, CalendarEvent
+from app.services.notify import recount_unread
+from app.services.pomodoro_stats import rebuild_rollups
+from app.services.task_durations import rebuild_task_durations
+
+@dataclass
+class Step:
+    """Tables, columns and indexes one model change added to existing databases"""
+    tables: Tuple[str, ...] = ()  # tables filled from existing rows
+    columns: Tuple[Tuple[str, str], ...] = ()  # (table, column)
+    indexes: Tuple[str, ...] = ()  # index names declared on the models
+    # Fills the new tables or columns from existing rows; runs only when
+    # one of them was added to a database that already had tables
+    backfill: Optional[Callable[[Connection], None]] = None
+
+def _backfill_long_events(connection: Connection):
+    events = CalendarEvent.__table__
+    if connection.dialect.name == "postgresql":
+        is_long = events.c.end - events.c.start > LONG_EVENT_THRESHOLD
+    else:
+        seconds = (func.julianday(events.c.end) - func.julianday(events.c.start)) * 86400
+        is_long = seconds > LONG_EVENT_THRESHOLD.total_seconds()
+    # Keep updated_at: the flag is derived, the events did not change
+    connection.execute(update(events).values(is_long=is_long, updated_at=events.c.updated_at))
+
+STEPS: List[Step] = [
+    Step(indexes=("ix_pomodoro_sessions_user_start",)),
+    Step(
+        columns=(("pomodoro_sessions", "abandoned"),),
+        indexes=("ix_pomodoro_sessions_open",)
+    ),
+    Step(
+        columns=(("tasks", "pomodoro_count"),),
+        backfill=rebuild_task_durations
+    ),
+    Step(
+        tables=("pomodoro_daily_rollups",),
+        backfill=rebuild_rollups
+    ),
+    Step(
+        columns=(("calendar_events", "is_long"),),
+        indexes=("ix_calendar_events_user_start", "ix_calendar_events_user_long"),
+        backfill=_backfill_long_events
+    ),
+    Step(
+        columns=(
+            ("calendar_events", "rrule"),
+            ("calendar_events", "exdates"),
+            ("calendar_events", "timezone"),
+            ("calendar_events", "recurrence_end"),
+        ),
+        indexes=("ix_calendar_events_user_recurring",)
+    ),
+    Step(
+        columns=(("users", "calendar_feed_token"),),
+        indexes=("ix_users_calendar_feed_token",)
+    ),
+    Step(
+        columns=(("calendar_events", "ical_uid"),),
+        indexes=("ix_calendar_events_user_ical_uid",)
+    ),
+    Step(indexes=("ix_tasks_due_status",)),
+    Step(
+        columns=(("users", "unread_notifications"),),
+        indexes=("ix_notifications_user_read",),
+        backfill=recount_unread
+    ),
+    Step(indexes=("ix_notifications_read_created",)),
+    Step(
+        columns=(("users", "timezone"),),
+        indexes=("ix_users_timezone", "ix_tasks_user_due")
+    ),
+]
+
+def _model_index(name: str) -> Index:
+    for table in Base.metadata.tables.values():
+        for index in table.indexes:
+            if index.name == name:
+                return index
+    raise KeyError(f"No index named {name} on the models")
+
+def _column_default(column: Column, connection: Connection) -> Optional[str]:
+    """SQL DEFAULT clause for a column added to a table that already has rows"""
+    if column.server_default is not None:
+        default = column.server_default.arg
+        return default if isinstance(default, str) else str(default.compile(dialect=connection.dialect))
+    if column.default is not None and column.default.is_scalar:
+        return str(literal(column.default.arg, column.type).compile(
+            dialect=connection.dialect, compile_kwargs={"literal_binds": True}
+        ))
+    return None
+
+def _add_column(connection: Connection, column: Column):
+    preparer = connection.dialect.identifier_preparer
+    ddl = "ALTER TABLE {} ADD COLUMN {}{} {}".format(
+        preparer.format_table(column.table),
+        "IF NOT EXISTS " if connection.dialect.name == "postgresql" else "",
+        preparer.format_column(column),
+        column.type.compile(dialect=connection.dialect)
+    )
+    default = _column_default(column, connection)
+    if default is not None:
+        ddl += f" DEFAULT {default}"
+    if not column.nullable and default is not None:
+        ddl += " NOT NULL"
+    connection.exec_driver_sql(ddl)
+
+def migrate_schema(bind: Engine = engine) -> List[str]:
+    """Create missing tables, then apply missing columns, backfills and indexes.
+
+    Returns what was done to a database that already had tables.
+    """
+    applied = []
+    with bind.begin() as connection:
+        existing = set(inspect(connection).get_table_names())
+        Base.metadata.create_all(bind=connection)
+        for step in STEPS:
+            inspector = inspect(connection)
+            tables = set(inspector.get_table_names())
+            added = False
+            for table_name in step.tables:
+                if existing and table_name not in existing:
+                    applied.append(f"created table {table_name}")
+                    added = True
+            for table_name, column_name in step.columns:
+                if table_name not in tables:
+                    continue
+                if column_name not in {column["name"] for column in inspector.get_columns(table_name)}:
+                    _add_column(connection, Base.metadata.tables[table_name].c[column_name])
+                    applied.append(f"added column {table_name}.{column_name}")
+                    added = True
+            if added and step.backfill is not None:
+                step.backfill(connection)
+                applied.append(f"backfilled {', '.join(step.tables + tuple(f'{t}.{c}' for t, c in step.columns))}")
+            for index_name in step.indexes:
+                index = _model_index(index_name)
+                if index.table.name not in tables:
+                    continue
+                if index_name not in {existing["name"] for existing in inspector.get_indexes(index.table.name)}:
+                    connection.execute(CreateIndex(index, if_not_exists=True))
+                    applied.append(f"created index {index_name}")
+    return applied
@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Date, DateTime, Boolean, Text, ForeignKey, Enum, Index, UniqueConstraint, event
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from app.database import Base
+from datetime import datetime, timedelta
 import enum
 import uuid
 
@@ -26,6 +27,12 @@ class NotificationType(str, enum.Enum):
     warning = "warning"
     error = "error"
 
+class EmailStatus(str, enum.Enum):
+    pending = "pending"
+    sending = "sending"
+    sent = "sent"
+    dead = "dead"
+
 class User(Base):
     __tablename__ = "users"
 
@@ -34,6 +41,9 @@ class User(Base):
     name = Column(String, nullable=False)
     hashed_password = Column(String, nullable=False)
     avatar = Column(String, nullable=True)
+    calendar_feed_token = Column(String, unique=True, index=True, nullable=True)  # secret in the ICS feed URL
+    unread_notifications = Column(Integer, default=0, server_default="0", nullable=False)  # kept by app.services.notify
+    timezone = Column(String, nullable=True, index=True)  # IANA zone for daily digests, UTC if unset
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -71,12 +81,20 @@ class Task(Base):
     due_date = Column(DateTime(timezone=True), nullable=True)
     estimated_duration = Column(Integer, nullable=True)  # in minutes
     actual_duration = Column(Integer, nullable=True)  # in minutes
+    pomodoro_count = Column(Integer, default=0, server_default="0", nullable=False)  # ended work sessions
     ai_generated = Column(Boolean, default=False)
     tags = Column(Text, nullable=True)  # JSON string
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    __table_args__ = (
+        # Reminder engine range scans upcoming deadlines of open tasks
+        Index("ix_tasks_due_status", "due_date", "status"),
+        # Daily digest reads each batch of users' deadlines
+        Index("ix_tasks_user_due", "user_id", "due_date"),
+    )
+
     # Relationships
     user = relationship("User", back_populates="tasks")
     pomodoro_sessions = relationship("PomodoroSession", back_populates="task")
@@ -93,12 +111,57 @@ class PomodoroSession(Base):
     duration = Column(Integer, nullable=False)  # in minutes
     type = Column(Enum(PomodoroType), default=PomodoroType.work)
     completed = Column(Boolean, default=False)
+    abandoned = Column(Boolean, default=False, nullable=False)  # closed by the sweeper, never ended
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+        Index("ix_pomodoro_sessions_user_start", "user_id", "start_time"),
+        # Partial index so the abandoned-session sweeper only scans open sessions
+        Index(
+            "ix_pomodoro_sessions_open", "start_time",
+            postgresql_where=text("end_time IS NULL"),
+            sqlite_where=text("end_time IS NULL")
+        ),
+    )
+
     # Relationships
     task = relationship("Task", back_populates="pomodoro_sessions")
     user = relationship("User", back_populates="pomodoro_sessions")
 
+class PomodoroDailyRollup(Base):
+    __tablename__ = "pomodoro_daily_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    day = Column(Date, nullable=False)  # UTC date of the session start
+    task_id = Column(Integer, nullable=False, default=0)  # 0 = all sessions that day
+    sessions = Column(Integer, nullable=False, default=0)
+    completed = Column(Integer, nullable=False, default=0)
+    work_minutes = Column(Integer, nullable=False, default=0)
+    break_minutes = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "day", "task_id", name="uq_pomodoro_daily_rollups_user_day_task"),
+    )
+
+class PomodoroTimer(Base):
+    __tablename__ = "pomodoro_timers"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), unique=True, nullable=False)
+    status = Column(String, nullable=False, default="idle")  # idle, running, paused
+    phase = Column(String, nullable=False, default="work")  # work, short_break, long_break
+    cycle = Column(Integer, nullable=False, default=0)
+    remaining_seconds = Column(Integer, nullable=False, default=0)
+    ends_at = Column(DateTime(timezone=True), nullable=True)
+    work_minutes = Column(Integer, nullable=False, default=25)
+    break_minutes = Column(Integer, nullable=False, default=5)
+    long_break_minutes = Column(Integer, nullable=False, default=15)
+    cycles_before_long_break = Column(Integer, nullable=False, default=4)
+    task_id = Column(Integer, ForeignKey("tasks.id"), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
 class CalendarEvent(Base):
     __tablename__ = "calendar_events"
 
@@ -111,13 +174,102 @@ class CalendarEvent(Base):
     task_id = Column(Integer, ForeignKey("tasks.id"), nullable=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     google_calendar_id = Column(String, nullable=True)
+    ical_uid = Column(String, nullable=True)  # UID of the event in an imported .ics file
+    is_long = Column(Boolean, default=False, nullable=False)  # lasts longer than LONG_EVENT_THRESHOLD
+    rrule = Column(Text, nullable=True)  # RFC 5545 RRULE; start/end are the first occurrence
+    exdates = Column(Text, nullable=True)  # JSON list of excluded occurrence starts (UTC)
+    timezone = Column(String, nullable=True)  # IANA zone the recurrence is expanded in
+    recurrence_end = Column(DateTime(timezone=True), nullable=True)  # end of the last occurrence, NULL if unbounded
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    __table_args__ = (
+        Index("ix_calendar_events_user_start", "user_id", "start"),
+        Index("ix_calendar_events_user_ical_uid", "user_id", "ical_uid", unique=True),
+        # Events longer than the threshold are few; range queries read them separately
+        Index(
+            "ix_calendar_events_user_long", "user_id", "start",
+            postgresql_where=is_long == True,
+            sqlite_where=is_long == True
+        ),
+        Index(
+            "ix_calendar_events_user_recurring", "user_id", "start",
+            postgresql_where=rrule.isnot(None),
+            sqlite_where=rrule.isnot(None)
+        ),
+    )
+
     # Relationships
     task = relationship("Task", back_populates="calendar_events")
     user = relationship("User", back_populates="calendar_events")
 
+# Range queries scan at most this far before the window for short events
+LONG_EVENT_THRESHOLD = timedelta(days=1)
+
+def is_long_event(start: datetime, end: datetime) -> bool:
+    return end - start > LONG_EVENT_THRESHOLD
+
+# is_long is kept by these ORM hooks only. Writers that bypass the unit of
+# work (Core insert/update, bulk_insert_mappings, raw SQL) must set it with
+# is_long_event() themselves, or range queries will miss their long events.
+@event.listens_for(CalendarEvent, "before_insert")
+@event.listens_for(CalendarEvent, "before_update")
+def _set_is_long(mapper, connection, target):
+    target.is_long = is_long_event(target.start, target.end)
+
+class GoogleSyncState(Base):
+    """What was last pushed to Google Calendar for one local event or task"""
+    __tablename__ = "google_sync_state"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    calendar_id = Column(String, nullable=False)
+    kind = Column(String, nullable=False)  # event, task
+    local_id = Column(Integer, nullable=False)
+    google_event_id = Column(String, nullable=False)
+    content_hash = Column(String, nullable=False)
+    synced_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "calendar_id", "kind", "local_id", name="uq_google_sync_state_local"),
+    )
+
+class TaskReminder(Base):
+    """A deadline reminder that was sent; the unique key makes delivery exactly-once"""
+    __tablename__ = "task_reminders"
+
+    id = Column(Integer, primary_key=True, index=True)
+    task_id = Column(Integer, ForeignKey("tasks.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    due_date = Column(DateTime(timezone=True), nullable=False)  # deadline the reminder was for
+    lead_minutes = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("task_id", "due_date", "lead_minutes", name="uq_task_reminders_task_due_lead"),
+    )
+
+class DailyDigest(Base):
+    """A user's daily summary; the unique key makes each day's digest run once"""
+    __tablename__ = "daily_digests"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    digest_date = Column(Date, nullable=False)  # local date in the user's timezone
+    timezone = Column(String, nullable=False)
+    tasks_due_today = Column(Integer, nullable=False, default=0)
+    tasks_overdue = Column(Integer, nullable=False, default=0)
+    pomodoro_sessions = Column(Integer, nullable=False, default=0)  # yesterday's ended work sessions
+    pomodoro_completed = Column(Integer, nullable=False, default=0)
+    focus_minutes = Column(Integer, nullable=False, default=0)
+    unread_notifications = Column(Integer, nullable=False, default=0)
+    notified = Column(Boolean, nullable=False, default=False)  # false for empty digests
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "digest_date", name="uq_daily_digests_user_date"),
+    )
+
 class Notification(Base):
     __tablename__ = "notifications"
 
@@ -130,5 +282,37 @@ class Notification(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+        Index("ix_notifications_user_read", "user_id", "read"),
+        # Retention purge range scans old read notifications
+        Index("ix_notifications_read_created", "read", "created_at"),
+    )
+
     # Relationships
-    user = relationship("User", back_populates="notifications") 
\ No newline at end of file
+    user = relationship("User", back_populates="notifications") 
+
+class EmailOutbox(Base):
+    """An email queued in the sender's transaction and delivered by the outbox worker"""
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    notification_id = Column(Integer, ForeignKey("notifications.id", ondelete="SET NULL"), nullable=True, index=True)
+    kind = Column(String, nullable=False, default="notification")  # notification, digest
+    to_email = Column(String, nullable=True)  # the user's address at send time if unset
+    subject = Column(String, nullable=False)
+    body = Column(Text, nullable=False)
+    status = Column(Enum(EmailStatus), nullable=False, default=EmailStatus.pending)
+    attempts = Column(Integer, nullable=False, default=0)
+    # Next retry while pending; lease expiry while sending (a crashed worker's claim lapses)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False, default=datetime.utcnow)
+    last_error = Column(Text, nullable=True)
+    provider_message_id = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+
+    notification = relationship("Notification")
+
+    __table_args__ = (
+        Index("ix_email_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
@@ -1,21 +1,71 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List
+from datetime import datetime, timedelta
 from app.database import get_db
-from app.models import User
-from app.schemas import AICommand, AIResponse, AISuggestRequest, AIOptimizeRequest, TaskCreate, Task
+from app.models import User, CalendarEvent, Task as TaskModel, TaskStatus
+from app.schemas import is_known_timezone, AICommand, AIResponse, AISuggestRequest, AIOptimizeRequest, AIBatchRequest, AIBatchJob, ScheduleProposal, ScheduledTask, TaskCreate, Task
 from app.auth import get_current_active_user
-import openai
+from app.services.calendar_queries import busy_intervals
+from app.services.jobs import job_store
+from app.services.ai_batch import pack_commands, make_batch_worker, parse_response_content, parse_suggestions, build_batch_prompt, AI_BATCH_TOKENS_PER_COMMAND
+from app.services.llm import LLMResult, get_llm_provider, estimate_tokens
+from app.services.metrics import registry
+from app.services.rate_limit import ai_limiter, RateLimited
+from app.services.scheduler import SchedulableTask, WorkingHours, schedule_tasks
+from app.services.task_index import task_index_service, text_similarity
+from starlette.concurrency import run_in_threadpool
+import math
+import time
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# Configure OpenAI
-openai.api_key = os.getenv("OPENAI_API_KEY")
+# Batch parsing limits
+AI_BATCH_MAX_COMMANDS = int(os.getenv("AI_BATCH_MAX_COMMANDS", "2000"))
+# Batches are admitted into debt up front, so cap how far one batch can overdraw the buckets
+AI_BATCH_MAX_TOKENS = int(os.getenv("AI_BATCH_MAX_TOKENS", "40000"))
+
+# Suggestion grounding
+AI_SUGGEST_CONTEXT_TASKS = int(os.getenv("AI_SUGGEST_CONTEXT_TASKS", "10"))
+AI_SUGGEST_DUPLICATE_THRESHOLD = float(os.getenv("AI_SUGGEST_DUPLICATE_THRESHOLD", "0.8"))
+AI_SUGGEST_DUPLICATE_CANDIDATES = int(os.getenv("AI_SUGGEST_DUPLICATE_CANDIDATES", "5"))
 
 router = APIRouter()
 
+ai_completion_seconds = registry.histogram(
+    "ai_completion_duration_seconds", "LLM completion latency", ["provider", "outcome"],
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 60)
+)
+
+def _cost(prompt: str, max_tokens: int) -> int:
+    """Worst-case token cost of a completion, charged before the call"""
+    return estimate_tokens(prompt) + max_tokens
+
+async def _admit(user_id: int, cost: int, allow_debt: bool = False):
+    try:
+        await ai_limiter.admit(user_id, cost, allow_debt=allow_debt)
+    except RateLimited as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"AI rate limit exceeded ({e.reason}). Try again later",
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))}
+        )
+
+def _complete(user_id: int, prompt: str, max_tokens: int) -> LLMResult:
+    provider = get_llm_provider()
+    started = time.perf_counter()
+    try:
+        result = provider.complete(prompt, max_tokens=max_tokens, temperature=0.7)
+    except Exception:
+        ai_completion_seconds.observe(time.perf_counter() - started, provider=provider.name, outcome="error")
+        ai_limiter.refund(user_id, _cost(prompt, max_tokens))
+        raise
+    ai_completion_seconds.observe(time.perf_counter() - started, provider=provider.name, outcome="ok")
+    ai_limiter.record_usage(user_id, result.prompt_tokens, result.completion_tokens, charged=_cost(prompt, max_tokens))
+    return result
+
 @router.post("/parse", response_model=AIResponse)
 async def parse_command(
     command: AICommand,
@@ -39,93 +89,196 @@ async def parse_command(
         Estimated duration should be in minutes.
         """
         
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=500,
-            temperature=0.7
-        )
+        await _admit(current_user.id, _cost(prompt, 500))
+        result = await run_in_threadpool(_complete, current_user.id, prompt, 500)
         
-        # Parse the response (this is a simplified version)
-        # In a real implementation, you'd want more robust parsing
-        content = response.choices[0].message.content
-        
-        # For now, return a basic response
-        # In production, you'd parse the AI response properly
-        return AIResponse(
-            tasks=[
-                TaskCreate(
-                    title=f"Task from: {command.command}",
-                    description="AI-generated task",
-                    priority="medium"
-                )
-            ],
-            message=f"Parsed command: {command.command}",
-            confidence=0.8
-        )
+        return parse_response_content(result.content, command.command)
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"AI processing failed: {str(e)}"
         )
 
+@router.post("/parse/batch", response_model=AIBatchJob, status_code=status.HTTP_202_ACCEPTED)
+async def parse_batch(
+    request: AIBatchRequest,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Queue many commands for parsing; poll the returned job for results"""
+    commands = [command.strip() for command in request.commands if command.strip()]
+    if not commands:
+        raise HTTPException(status_code=400, detail="No commands provided")
+    if len(commands) > AI_BATCH_MAX_COMMANDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many commands. Maximum is {AI_BATCH_MAX_COMMANDS}"
+        )
+    
+    chunks = pack_commands(commands)
+    cost = sum(
+        _cost(build_batch_prompt(commands, indexes), AI_BATCH_TOKENS_PER_COMMAND * len(indexes))
+        for indexes in chunks
+    )
+    if cost > AI_BATCH_MAX_TOKENS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch too large ({cost} estimated tokens). Maximum is {AI_BATCH_MAX_TOKENS}, split it into smaller batches"
+        )
+    await _admit(current_user.id, cost, allow_debt=True)
+    
+    job = job_store.create("ai_parse", current_user.id, len(commands))
+    user_id = current_user.id
+    job_store.submit(job, chunks, make_batch_worker(
+        commands, lambda prompt, max_tokens: _complete(user_id, prompt, max_tokens)
+    ))
+    
+    return AIBatchJob(**job.snapshot())
+
+@router.get("/parse/batch/{job_id}", response_model=AIBatchJob)
+async def get_parse_batch(
+    job_id: str,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get status and partial results of a batch parsing job"""
+    job = job_store.get(job_id, current_user.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return AIBatchJob(**job.snapshot())
+
 @router.post("/suggest", response_model=List[TaskCreate])
 async def suggest_tasks(
     request: AISuggestRequest,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """Suggest tasks based on context"""
+    """Suggest tasks based on context, grounded in the user's existing tasks"""
     try:
+        related = task_index_service.search(db, current_user.id, request.context, AI_SUGGEST_CONTEXT_TASKS)
+        existing = []
+        if related:
+            tasks = db.query(TaskModel.id, TaskModel.title, TaskModel.status).filter(
+                TaskModel.user_id == current_user.id,
+                TaskModel.id.in_([task_id for task_id, _ in related])
+            ).all()
+            by_id = {task.id: task for task in tasks}
+            existing = [by_id[task_id] for task_id, _ in related if task_id in by_id]
+        
+        existing_lines = "\n".join(f"        - {task.title} ({task.status.value})" for task in existing)
         prompt = f"""
         Based on this context: "{request.context}"
         
-        Suggest 3-5 relevant tasks that would be helpful.
+        The user already has these related tasks:
+{existing_lines or "        - (none)"}
+        
+        Suggest 3-5 relevant tasks that would be helpful and do not repeat the existing ones.
         Return as JSON array of task objects with title, description, priority.
         """
         
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=400,
-            temperature=0.7
-        )
+        await _admit(current_user.id, _cost(prompt, 400))
+        result = await run_in_threadpool(_complete, current_user.id, prompt, 400)
         
-        # Simplified response for now
-        return [
-            TaskCreate(
-                title="Suggested task 1",
-                description="AI-suggested task based on context",
-                priority="medium"
-            ),
-            TaskCreate(
-                title="Suggested task 2", 
-                description="Another AI-suggested task",
-                priority="low"
-            )
-        ]
+        # The index scores title and description together, so it only picks
+        # candidates; duplicates are decided on the existing tasks' titles
+        parsed = parse_suggestions(result.content)
+        candidates = {
+            suggestion.title: [
+                task_id for task_id, _ in task_index_service.search(db, current_user.id, suggestion.title, AI_SUGGEST_DUPLICATE_CANDIDATES)
+            ]
+            for suggestion in parsed
+        }
+        candidate_ids = {task_id for task_ids in candidates.values() for task_id in task_ids}
+        existing_titles = dict(
+            db.query(TaskModel.id, TaskModel.title).filter(
+                TaskModel.user_id == current_user.id,
+                TaskModel.id.in_(candidate_ids)
+            ).all()
+        ) if candidate_ids else {}
+        
+        suggestions = []
+        for suggestion in parsed:
+            titles = [existing_titles[task_id] for task_id in candidates[suggestion.title] if task_id in existing_titles]
+            titles += [kept.title for kept in suggestions]
+            if any(text_similarity(suggestion.title, title) >= AI_SUGGEST_DUPLICATE_THRESHOLD for title in titles):
+                continue
+            suggestions.append(suggestion)
+        
+        return suggestions
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"AI suggestion failed: {str(e)}"
         )
 
-@router.post("/optimize", response_model=List[Task])
+@router.get("/metrics")
+async def get_ai_metrics(current_user: User = Depends(get_current_active_user)):
+    """Get AI admission control counters and the caller's token usage"""
+    return {
+        "data": {
+            "global": ai_limiter.stats(),
+            "user": ai_limiter.user_stats(current_user.id),
+            "counters": registry.snapshot(prefix="ai_")
+        },
+        "message": "AI metrics retrieved successfully",
+        "success": True
+    }
+
+@router.post("/optimize", response_model=ScheduleProposal)
 async def optimize_schedule(
     request: AIOptimizeRequest,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """Optimize task schedule using AI"""
+    """Propose start/end times for tasks around existing calendar events"""
+    if not 0 <= request.work_start_hour < request.work_end_hour <= 24:
+        raise HTTPException(status_code=400, detail="Invalid working hours")
+    if request.horizon_days < 1:
+        raise HTTPException(status_code=400, detail="horizon_days must be at least 1")
+    if not is_known_timezone(request.timezone):
+        raise HTTPException(status_code=400, detail="Unknown timezone")
+    
+    start = request.start or datetime.utcnow().replace(second=0, microsecond=0) + timedelta(minutes=1)
+    end = start + timedelta(days=request.horizon_days)
+    
     try:
-        # This would implement AI-powered schedule optimization
-        # For now, return the tasks as-is
-        return request.tasks
+        hours = WorkingHours(
+            start_hour=request.work_start_hour,
+            end_hour=request.work_end_hour,
+            days=tuple(request.work_days),
+            timezone=request.timezone
+        )
+        
+        busy = busy_intervals(db, current_user.id, start, end)
+        
+        tasks = [
+            SchedulableTask(
+                id=task.id,
+                priority=task.priority,
+                due_date=task.due_date,
+                estimated_duration=task.estimated_duration
+            )
+            for task in request.tasks
+            if task.status not in (TaskStatus.completed, TaskStatus.cancelled)
+        ]
+        
+        result = schedule_tasks(tasks, busy, start, end, hours)
+        
+        return ScheduleProposal(
+            scheduled=[
+                ScheduledTask(task_id=p.task_id, start=p.start, end=p.end, late=p.late)
+                for p in result.scheduled
+            ],
+            unscheduled=result.unscheduled
+        )
         
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Schedule optimization failed: {str(e)}"
-        ) 
\ No newline at end of file
+        )
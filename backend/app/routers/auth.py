@@ -1,10 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
-from fastapi.security import OAuth2PasswordRequestForm
+from fastapi.security import OAuth2PasswordRequestForm, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from datetime import timedelta
 from app.database import get_db
 from app.models import User
-from app.schemas import UserCreate, User as UserSchema
+from app.schemas import is_known_timezone, UserCreate, UserUpdate, User as UserSchema
 from app.auth import (
     verify_password, 
     get_password_hash, 
@@ -97,6 +97,37 @@ async def get_current_user_info(current_user: User = Depends(get_current_active_
         "success": True
     }
 
+@router.put("/me")
+async def update_current_user(
+    user_update: UserUpdate,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    update_data = user_update.dict(exclude_unset=True)
+    if "name" in update_data and not update_data["name"]:
+        raise HTTPException(status_code=400, detail="Name cannot be empty")
+    if update_data.get("timezone") and not is_known_timezone(update_data["timezone"]):
+        raise HTTPException(status_code=400, detail="Unknown timezone")
+    
+    for field, value in update_data.items():
+        setattr(current_user, field, value)
+    
+    try:
+        db.commit()
+        db.refresh(current_user)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to update user"
+        )
+    
+    return {
+        "data": UserSchema.from_orm(current_user),
+        "message": "User updated successfully",
+        "success": True
+    }
+
 @router.post("/logout")
 async def logout(
     current_user: User = Depends(get_current_active_user),
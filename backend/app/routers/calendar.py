@@ -1,14 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Body, Depends, HTTPException, status, Query, Header, Request, Response, UploadFile, File
 from sqlalchemy.orm import Session
-from typing import List
-from datetime import datetime
+from typing import List, Optional
+from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
+import secrets
 from app.database import get_db
 from app.models import User, CalendarEvent, Task
-from app.schemas import CalendarEventCreate, CalendarEventUpdate, CalendarEvent as CalendarEventSchema
+from app.schemas import is_known_timezone, CalendarEventCreate, CalendarEventUpdate, CalendarEvent as CalendarEventSchema, CalendarEventWithConflicts, EventConflict, CalendarConflict, FreeBusy, TimeRange, GoogleSyncJob, CalendarFeedToken, CalendarImportSummary
 from app.auth import get_current_active_user
+from app.services.calendar_queries import Slot, conflicting_pairs, event_intervals, events_overlapping, find_conflicts
+from app.services.freebusy import freebusy_service
+from app.services.google_sync import start_sync
+from app.services.ics_feed import feed_cache
+from app.services.ics_import import ICSError, ImportSummary, import_events
+from app.services.jobs import job_store
+from app.services.pomodoro_stats import utc_naive
+from app.services.recurrence import InvalidRecurrence, apply_recurrence, dump_exdates, expand_recurring, occurrence_cache, parse_exdates
+from app.services.scheduler import WorkingHours, from_minutes, working_windows
+from starlette.concurrency import run_in_threadpool
 
 router = APIRouter()
 
+def _conflict(slot: Slot) -> EventConflict:
+    event, start, end = slot
+    return EventConflict(event_id=event.id, title=event.title, start=start, end=end, recurring=bool(event.rrule))
+
+def _with_conflicts(db: Session, event: CalendarEvent) -> CalendarEventWithConflicts:
+    result = CalendarEventWithConflicts.from_orm(event)
+    result.conflicts = [
+        _conflict(slot) for slot in find_conflicts(db, event.user_id, event_intervals(event), exclude_id=event.id)
+    ]
+    return result
+
 @router.get("/events", response_model=List[CalendarEventSchema])
 async def get_events(
     start: datetime,
@@ -16,22 +39,28 @@ async def get_events(
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """Get calendar events for a date range"""
-    events = db.query(CalendarEvent).filter(
-        CalendarEvent.user_id == current_user.id,
-        CalendarEvent.start >= start,
-        CalendarEvent.end <= end
-    ).all()
+    """Get calendar events overlapping a date range"""
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    
+    events = [CalendarEventSchema.from_orm(event) for event in events_overlapping(db, current_user.id, start, end)]
+    
+    # Recurring events are expanded only within the requested window
+    for event, occurrence_start, occurrence_end in expand_recurring(db, current_user.id, start, end):
+        occurrence = CalendarEventSchema.from_orm(event)
+        occurrence.start, occurrence.end = occurrence_start, occurrence_end
+        events.append(occurrence)
     
-    return [CalendarEventSchema.from_orm(event) for event in events]
+    events.sort(key=lambda event: utc_naive(event.start))
+    return events
 
-@router.post("/events", response_model=CalendarEventSchema)
+@router.post("/events", response_model=CalendarEventWithConflicts)
 async def create_event(
     event_data: CalendarEventCreate,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """Create a new calendar event"""
+    """Create a new calendar event, reporting existing events it overlaps"""
     db_event = CalendarEvent(
         title=event_data.title,
         description=event_data.description,
@@ -39,13 +68,23 @@ async def create_event(
         end=event_data.end,
         all_day=event_data.all_day,
         task_id=event_data.task_id,
+        rrule=event_data.rrule,
+        exdates=dump_exdates(event_data.exdates),
+        timezone=event_data.timezone,
         user_id=current_user.id
     )
     
+    try:
+        apply_recurrence(db_event)
+    except InvalidRecurrence as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     try:
         db.add(db_event)
         db.commit()
         db.refresh(db_event)
+        freebusy_service.invalidate(current_user.id)
+        feed_cache.invalidate(current_user.id)
     except Exception as e:
         db.rollback()
         raise HTTPException(
@@ -53,16 +92,16 @@ async def create_event(
             detail="Failed to create event"
         )
     
-    return CalendarEventSchema.from_orm(db_event)
+    return _with_conflicts(db, db_event)
 
-@router.put("/events/{event_id}", response_model=CalendarEventSchema)
+@router.put("/events/{event_id}", response_model=CalendarEventWithConflicts)
 async def update_event(
     event_id: int,
     event_update: CalendarEventUpdate,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """Update a calendar event"""
+    """Update a calendar event, reporting existing events it overlaps"""
     event = db.query(CalendarEvent).filter(
         CalendarEvent.id == event_id,
         CalendarEvent.user_id == current_user.id
@@ -72,12 +111,23 @@ async def update_event(
         raise HTTPException(status_code=404, detail="Event not found")
     
     update_data = event_update.dict(exclude_unset=True)
+    if "exdates" in update_data:
+        update_data["exdates"] = dump_exdates(update_data["exdates"])
     for field, value in update_data.items():
         setattr(event, field, value)
     
+    try:
+        apply_recurrence(event)
+    except InvalidRecurrence as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    
     try:
         db.commit()
         db.refresh(event)
+        occurrence_cache.invalidate(event.id)
+        freebusy_service.invalidate(current_user.id)
+        feed_cache.invalidate(current_user.id)
     except Exception as e:
         db.rollback()
         raise HTTPException(
@@ -85,7 +135,7 @@ async def update_event(
             detail="Failed to update event"
         )
     
-    return CalendarEventSchema.from_orm(event)
+    return _with_conflicts(db, event)
 
 @router.delete("/events/{event_id}")
 async def delete_event(
@@ -105,6 +155,9 @@ async def delete_event(
     try:
         db.delete(event)
         db.commit()
+        occurrence_cache.invalidate(event_id)
+        freebusy_service.invalidate(current_user.id)
+        feed_cache.invalidate(current_user.id)
     except Exception as e:
         db.rollback()
         raise HTTPException(
@@ -114,13 +167,281 @@ async def delete_event(
     
     return {"message": "Event deleted successfully"}
 
-@router.post("/sync")
+@router.delete("/events/{event_id}/occurrence", response_model=CalendarEventSchema)
+async def delete_occurrence(
+    event_id: int,
+    start: datetime,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Remove one occurrence of a recurring event by adding it to the exceptions"""
+    event = db.query(CalendarEvent).filter(
+        CalendarEvent.id == event_id,
+        CalendarEvent.user_id == current_user.id
+    ).first()
+    
+    if not event:
+        raise HTTPException(status_code=404, detail="Event not found")
+    if not event.rrule:
+        raise HTTPException(status_code=400, detail="Event is not recurring")
+    
+    event.exdates = dump_exdates(parse_exdates(event.exdates) + [start])
+    
+    try:
+        apply_recurrence(event)
+        db.commit()
+        db.refresh(event)
+        occurrence_cache.invalidate(event_id)
+        freebusy_service.invalidate(current_user.id)
+        feed_cache.invalidate(current_user.id)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to delete occurrence"
+        )
+    
+    return CalendarEventSchema.from_orm(event)
+
+@router.post("/import", response_model=CalendarImportSummary)
+async def import_calendar(
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Import events from an .ics file, updating events already imported with the same UID"""
+    summary = ImportSummary()
+    try:
+        # Parsing and the batched writes are blocking, keep them off the event loop
+        await run_in_threadpool(import_events, db, current_user.id, file.file, summary=summary)
+    except ICSError as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=400,
+            detail=f"{e} (imported {summary.created + summary.updated} events before the error)"
+        )
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to import calendar"
+        )
+    finally:
+        # Batches committed before a failure are kept, so caches are always dropped
+        for event_id in summary.event_ids:
+            occurrence_cache.invalidate(event_id)
+        freebusy_service.invalidate(current_user.id)
+        feed_cache.invalidate(current_user.id)
+    
+    return CalendarImportSummary(**summary.to_dict())
+
+@router.get("/conflicts", response_model=List[CalendarConflict])
+async def get_conflicts(
+    start: datetime,
+    end: datetime,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Get pairs of overlapping events (and recurring occurrences) in a date range"""
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    
+    return [
+        CalendarConflict(
+            first=_conflict(first),
+            second=_conflict(second),
+            start=max(first[1], second[1]),
+            end=min(first[2], second[2])
+        )
+        for first, second in conflicting_pairs(db, current_user.id, start, end)
+    ]
+
+@router.get("/freebusy", response_model=FreeBusy)
+async def get_freebusy(
+    start: datetime,
+    end: datetime,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Get merged busy and free time for a date range"""
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    
+    busy = freebusy_service.busy(db, current_user.id, start, end)
+    free = freebusy_service.free(db, current_user.id, start, end)
+    
+    return FreeBusy(
+        start=start,
+        end=end,
+        busy=[TimeRange(start=s, end=e) for s, e in busy],
+        free=[TimeRange(start=s, end=e) for s, e in free]
+    )
+
+@router.get("/find-slot", response_model=TimeRange)
+async def find_slot(
+    duration: int = Query(..., ge=1, le=24 * 60),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    work_start_hour: Optional[int] = Query(None, ge=0, le=23),
+    work_end_hour: Optional[int] = Query(None, ge=1, le=24),
+    timezone: str = "UTC",
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Find the earliest free slot of the given duration (in minutes)"""
+    start = start or datetime.utcnow()
+    end = end or start + timedelta(days=7)
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    if not is_known_timezone(timezone):
+        raise HTTPException(status_code=400, detail="Unknown timezone")
+    
+    windows = [(start, end)]
+    if work_start_hour is not None or work_end_hour is not None:
+        hours = WorkingHours(
+            start_hour=work_start_hour if work_start_hour is not None else 0,
+            end_hour=work_end_hour if work_end_hour is not None else 24,
+            days=tuple(range(7)),
+            timezone=timezone
+        )
+        if hours.start_hour >= hours.end_hour:
+            raise HTTPException(status_code=400, detail="Invalid working hours")
+        windows = [(from_minutes(s), from_minutes(e)) for s, e in working_windows(start, end, hours)]
+    
+    slot = freebusy_service.find_slot(db, current_user.id, duration, windows)
+    if not slot:
+        raise HTTPException(status_code=404, detail="No free slot found")
+    
+    return TimeRange(start=slot[0], end=slot[1])
+
+@router.post("/sync", response_model=GoogleSyncJob)
 async def sync_to_google_calendar(
-    task_ids: List[int],
+    task_ids: Optional[List[int]] = Body(None),
+    calendar_id: str = "primary",
+    include_events: Optional[bool] = None,
+    google_access_token: Optional[str] = Header(None, alias="X-Google-Access-Token"),
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """Sync tasks to Google Calendar"""
-    # This would implement Google Calendar API integration
-    # For now, return a placeholder response
-    return {"message": f"Synced {len(task_ids)} tasks to Google Calendar"} 
\ No newline at end of file
+    """Sync tasks to Google Calendar in the background.
+
+    The body is the list of task ids to sync (all tasks with a due date if
+    omitted). Events are synced too unless task ids are given, or as set by
+    ``include_events``. The user's Google OAuth token (calendar.events
+    scope) goes in the X-Google-Access-Token header.
+    """
+    if not google_access_token:
+        raise HTTPException(status_code=400, detail="Google access token required in the X-Google-Access-Token header")
+    if include_events is None:
+        include_events = task_ids is None
+    
+    try:
+        job = start_sync(
+            db,
+            current_user.id,
+            google_access_token,
+            calendar_id=calendar_id,
+            task_ids=task_ids,
+            include_events=include_events
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to start sync"
+        )
+    
+    return GoogleSyncJob(
+        **job.snapshot(),
+        message=f"Syncing {job.total} changes to Google Calendar"
+    )
+
+@router.get("/sync/{job_id}", response_model=GoogleSyncJob)
+async def get_sync_status(
+    job_id: str,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get the progress of a Google Calendar sync"""
+    job = job_store.get(job_id, current_user.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Sync job not found")
+    return GoogleSyncJob(**job.snapshot())
+
+def _feed_url(request: Request, token: str) -> str:
+    return f"{request.url_for('get_calendar_feed')}?token={token}"
+
+@router.post("/feed-token", response_model=CalendarFeedToken)
+async def rotate_feed_token(
+    request: Request,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Create (or replace) the secret token for the user's ICS feed URL"""
+    current_user.calendar_feed_token = secrets.token_urlsafe(32)
+    
+    try:
+        db.commit()
+        feed_cache.invalidate(current_user.id)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to create feed token"
+        )
+    
+    token = current_user.calendar_feed_token
+    return CalendarFeedToken(token=token, url=_feed_url(request, token))
+
+@router.delete("/feed-token")
+async def revoke_feed_token(
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Disable the user's ICS feed URL"""
+    current_user.calendar_feed_token = None
+    
+    try:
+        db.commit()
+        feed_cache.invalidate(current_user.id)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to revoke feed token"
+        )
+    
+    return {"message": "Feed token revoked"}
+
+@router.get("/feed.ics")
+async def get_calendar_feed(
+    token: str,
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """iCalendar feed of the user's events and dated tasks, for calendar subscriptions.
+
+    Authenticated by the token in the URL. Repeated polls are served from
+    the rendered-feed cache and answered with 304 when unchanged.
+    """
+    feed = feed_cache.get(token)
+    if feed is None:
+        user = db.query(User).filter(User.calendar_feed_token == token).first()
+        if not user:
+            raise HTTPException(status_code=404, detail="Feed not found")
+        feed = feed_cache.render(db, user, token)
+    
+    modified_since = None
+    if if_modified_since:
+        try:
+            modified_since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            pass
+    
+    headers = {
+        "ETag": feed.etag,
+        "Last-Modified": feed.last_modified_header,
+        "Cache-Control": "private, max-age=300",
+    }
+    if feed.not_modified(if_none_match, modified_since):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=feed.body, media_type="text/calendar; charset=utf-8", headers=headers)
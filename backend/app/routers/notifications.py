@@ -1,10 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Header, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Union
 from app.database import get_db
 from app.models import User, Notification
-from app.schemas import NotificationCreate, Notification as NotificationSchema, PaginatedResponse
-from app.auth import get_current_active_user
+from app.schemas import NotificationCreate, Notification as NotificationSchema, PaginatedResponse, UnreadCount, NotificationSelection, NotificationBulkResult, NotificationFanOut, NotificationFanOutResult, NotificationFanOutJob
+from app.auth import get_current_active_user, get_current_admin_user
+from app.services.notify import create_notification as add_notification, delete_notifications, fan_out_notifications, make_fan_out_worker, mark_notifications_read, notification_filters, notification_message, notification_payload, notification_topic
+from app.services.jobs import job_store
+from app.services.pubsub import event_stream, pubsub
+from starlette.concurrency import run_in_threadpool
+
+# Notifications replayed to a reconnecting stream at most
+STREAM_BACKLOG_LIMIT = 100
 
 router = APIRouter()
 
@@ -34,6 +42,42 @@ async def get_notifications(
         has_prev=skip > 0
     )
 
+@router.get("/unread-count", response_model=UnreadCount)
+async def get_unread_count(current_user: User = Depends(get_current_active_user)):
+    """Unread notification count for the badge.
+
+    The counter lives on the user row authentication already loaded, so
+    this runs no query of its own.
+    """
+    return UnreadCount(unread=max(current_user.unread_notifications or 0, 0))
+
+@router.get("/stream")
+async def stream_notifications(
+    last_event_id: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Server-sent events with each new notification as it is created.
+
+    Browsers reconnect with a Last-Event-ID header; notifications created
+    since that id are replayed first.
+    """
+    # Subscribe before reading the backlog so nothing falls in between
+    subscription = pubsub.subscribe(notification_topic(current_user.id))
+    backlog = []
+    if last_event_id and last_event_id.isdigit():
+        missed = db.query(Notification).filter(
+            Notification.user_id == current_user.id,
+            Notification.id > int(last_event_id)
+        ).order_by(Notification.id).limit(STREAM_BACKLOG_LIMIT).all()
+        backlog = [notification_message(notification_payload(notification)) for notification in missed]
+    
+    return StreamingResponse(
+        event_stream(subscription, backlog=backlog),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.post("/", response_model=NotificationSchema)
 async def create_notification(
     notification_data: NotificationCreate,
@@ -41,16 +85,15 @@ async def create_notification(
     db: Session = Depends(get_db)
 ):
     """Create a new notification"""
-    db_notification = Notification(
-        title=notification_data.title,
-        message=notification_data.message,
-        type=notification_data.type,
-        task_id=notification_data.task_id,
-        user_id=current_user.id
-    )
-    
     try:
-        db.add(db_notification)
+        db_notification = add_notification(
+            db,
+            current_user.id,
+            notification_data.title,
+            notification_data.message,
+            type=notification_data.type,
+            task_id=notification_data.task_id
+        )
         db.commit()
         db.refresh(db_notification)
     except Exception as e:
@@ -62,6 +105,101 @@ async def create_notification(
     
     return NotificationSchema.from_orm(db_notification)
 
+@router.post("/fan-out", response_model=Union[NotificationFanOutResult, NotificationFanOutJob])
+async def fan_out(
+    fan_out_data: NotificationFanOut,
+    response: Response,
+    admin: User = Depends(get_current_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Send one notification to many users, or everyone (admin only).
+
+    Listed users are notified before this returns. Notifying everyone runs
+    as a background job: the response is 202 with the job to poll.
+    """
+    if fan_out_data.user_ids is None:
+        job = job_store.create("notification_fan_out", admin.id, 1)
+        job_store.submit(job, [[0]], make_fan_out_worker(
+            None,
+            fan_out_data.title,
+            fan_out_data.message,
+            type=fan_out_data.type,
+            email=fan_out_data.email
+        ))
+        response.status_code = status.HTTP_202_ACCEPTED
+        return NotificationFanOutJob(**job.snapshot())
+    
+    try:
+        recipients = await run_in_threadpool(
+            fan_out_notifications,
+            db,
+            fan_out_data.user_ids,
+            fan_out_data.title,
+            fan_out_data.message,
+            type=fan_out_data.type,
+            email=fan_out_data.email
+        )
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to send notifications"
+        )
+    
+    return NotificationFanOutResult(recipients=recipients)
+
+@router.get("/fan-out/{job_id}", response_model=NotificationFanOutJob)
+async def get_fan_out_status(
+    job_id: str,
+    admin: User = Depends(get_current_admin_user)
+):
+    """Get the progress of a fan-out to every user"""
+    job = job_store.get(job_id, admin.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return NotificationFanOutJob(**job.snapshot())
+
+@router.put("/bulk/read", response_model=NotificationBulkResult)
+async def bulk_mark_as_read(
+    selection: NotificationSelection,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Mark notifications read by id list and/or filter"""
+    try:
+        marked = mark_notifications_read(db, current_user.id, notification_filters(current_user.id, **selection.dict()))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to mark notifications as read"
+        )
+    
+    return NotificationBulkResult(affected=marked)
+
+@router.post("/bulk/delete", response_model=NotificationBulkResult)
+async def bulk_delete(
+    selection: NotificationSelection,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Delete notifications by id list and/or filter"""
+    if all(value is None for value in selection.dict().values()):
+        raise HTTPException(status_code=400, detail="Select notifications by ids or a filter")
+    
+    try:
+        deleted = delete_notifications(db, current_user.id, notification_filters(current_user.id, **selection.dict()))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to delete notifications"
+        )
+    
+    return NotificationBulkResult(affected=deleted)
+
 @router.put("/{notification_id}/read", response_model=NotificationSchema)
 async def mark_as_read(
     notification_id: int,
@@ -98,10 +236,7 @@ async def mark_all_as_read(
 ):
     """Mark all notifications as read"""
     try:
-        db.query(Notification).filter(
-            Notification.user_id == current_user.id,
-            Notification.read == False
-        ).update({"read": True})
+        mark_notifications_read(db, current_user.id, notification_filters(current_user.id))
         db.commit()
     except Exception as e:
         db.rollback()
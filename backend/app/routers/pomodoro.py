@@ -1,11 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime, timedelta
 from app.database import get_db
 from app.models import User, PomodoroSession, Task
-from app.schemas import PomodoroSessionCreate, PomodoroSession as PomodoroSessionSchema, PomodoroStats
+from app.schemas import PomodoroSessionCreate, PomodoroSessionUpdate, PomodoroSession as PomodoroSessionSchema, PomodoroStats, PomodoroTimeseries, PomodoroTimeseriesPoint, PomodoroHeatmap, TimerStartRequest, TimerState
 from app.auth import get_current_active_user
+from app.services.freebusy import freebusy_service
+from app.services.task_durations import apply_task_deltas, merge_deltas, task_deltas
+from app.services.pomodoro_timer import InvalidTransition, timer_service, timer_topic
+from app.services.pubsub import event_stream, pubsub
+from app.services.pomodoro_stats import BUCKETS, apply_rollup_deltas, focus_heatmap, range_stats, rollup_deltas, timeseries
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 router = APIRouter()
 
@@ -16,6 +23,11 @@ async def start_session(
     db: Session = Depends(get_db)
 ):
     """Start a new Pomodoro session"""
+    if session_data.task_id is not None:
+        task = db.query(Task.id).filter(Task.id == session_data.task_id, Task.user_id == current_user.id).first()
+        if not task:
+            raise HTTPException(status_code=404, detail="Task not found")
+    
     db_session = PomodoroSession(
         task_id=session_data.task_id,
         user_id=current_user.id,
@@ -28,6 +40,7 @@ async def start_session(
         db.add(db_session)
         db.commit()
         db.refresh(db_session)
+        freebusy_service.invalidate(current_user.id)
     except Exception as e:
         db.rollback()
         raise HTTPException(
@@ -59,8 +72,11 @@ async def end_session(
     session.completed = True
     
     try:
+        apply_rollup_deltas(db, rollup_deltas([session]))
+        apply_task_deltas(db, current_user.id, task_deltas([session]))
         db.commit()
         db.refresh(session)
+        freebusy_service.invalidate(current_user.id)
     except Exception as e:
         db.rollback()
         raise HTTPException(
@@ -70,6 +86,81 @@ async def end_session(
     
     return PomodoroSessionSchema.from_orm(session)
 
+@router.put("/{session_id}", response_model=PomodoroSessionSchema)
+async def update_session(
+    session_id: int,
+    session_data: PomodoroSessionUpdate,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Update a Pomodoro session's task, duration or type"""
+    session = db.query(PomodoroSession).filter(
+        PomodoroSession.id == session_id,
+        PomodoroSession.user_id == current_user.id
+    ).first()
+    
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    update_data = session_data.dict(exclude_unset=True)
+    if update_data.get("task_id") is not None:
+        task = db.query(Task.id).filter(Task.id == update_data["task_id"], Task.user_id == current_user.id).first()
+        if not task:
+            raise HTTPException(status_code=404, detail="Task not found")
+    
+    # Move the session's contribution from its old to its new values
+    old_rollups = rollup_deltas([session], sign=-1) if session.end_time else {}
+    old_tasks = task_deltas([session], sign=-1)
+    for field, value in update_data.items():
+        setattr(session, field, value)
+    new_rollups = rollup_deltas([session]) if session.end_time else {}
+    
+    try:
+        apply_rollup_deltas(db, merge_deltas(old_rollups, new_rollups))
+        apply_task_deltas(db, current_user.id, merge_deltas(old_tasks, task_deltas([session])))
+        db.commit()
+        db.refresh(session)
+        freebusy_service.invalidate(current_user.id)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to update session"
+        )
+    
+    return PomodoroSessionSchema.from_orm(session)
+
+@router.delete("/{session_id}")
+async def delete_session(
+    session_id: int,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Delete a Pomodoro session"""
+    session = db.query(PomodoroSession).filter(
+        PomodoroSession.id == session_id,
+        PomodoroSession.user_id == current_user.id
+    ).first()
+    
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    try:
+        if session.end_time:
+            apply_rollup_deltas(db, rollup_deltas([session], sign=-1))
+        apply_task_deltas(db, current_user.id, task_deltas([session], sign=-1))
+        db.delete(session)
+        db.commit()
+        freebusy_service.invalidate(current_user.id)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to delete session"
+        )
+    
+    return {"message": "Session deleted successfully"}
+
 @router.get("/sessions", response_model=List[PomodoroSessionSchema])
 async def get_sessions(
     skip: int = Query(0, ge=0),
@@ -98,40 +189,152 @@ async def get_sessions(
 @router.get("/stats", response_model=PomodoroStats)
 async def get_stats(
     period: Optional[str] = "week",  # week, month, year
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """Get Pomodoro statistics"""
+    """Get Pomodoro statistics for a period or an explicit start/end range"""
     now = datetime.utcnow()
     
-    if period == "week":
-        start_date = now - timedelta(days=7)
-    elif period == "month":
-        start_date = now - timedelta(days=30)
-    elif period == "year":
-        start_date = now - timedelta(days=365)
-    else:
-        start_date = now - timedelta(days=7)
-    
-    sessions = db.query(PomodoroSession).filter(
-        PomodoroSession.user_id == current_user.id,
-        PomodoroSession.start_time >= start_date
-    ).all()
-    
-    total_sessions = len(sessions)
-    completed_sessions = len([s for s in sessions if s.completed])
-    incomplete_sessions = total_sessions - completed_sessions
-    
-    total_work_time = sum(s.duration for s in sessions if s.type == "work")
-    total_break_time = sum(s.duration for s in sessions if s.type == "break")
-    
-    average_session_length = total_sessions > 0 and (total_work_time + total_break_time) / total_sessions or 0
-    
-    return PomodoroStats(
-        total_sessions=total_sessions,
-        total_work_time=total_work_time,
-        total_break_time=total_break_time,
-        average_session_length=average_session_length,
-        completed_sessions=completed_sessions,
-        incomplete_sessions=incomplete_sessions
-    ) 
\ No newline at end of file
+    if start is None:
+        if period == "week":
+            start = now - timedelta(days=7)
+        elif period == "month":
+            start = now - timedelta(days=30)
+        elif period == "year":
+            start = now - timedelta(days=365)
+        else:
+            start = now - timedelta(days=7)
+    end = end or now
+    
+    if end < start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    
+    return range_stats(db, current_user.id, start, end).to_stats()
+
+# Maximum number of buckets a single timeseries request may return
+MAX_TIMESERIES_POINTS = 10000
+
+def _analytics_range(start: Optional[datetime], end: Optional[datetime], timezone: str):
+    try:
+        ZoneInfo(timezone)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise HTTPException(status_code=400, detail="Unknown timezone")
+    
+    end = end or datetime.utcnow()
+    start = start or end - timedelta(days=365)
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    return start, end
+
+@router.get("/timeseries", response_model=PomodoroTimeseries)
+async def get_timeseries(
+    bucket: str = "day",  # hour, day, week, month
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    timezone: str = "UTC",
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Get Pomodoro totals bucketed by local hour, day, week or month"""
+    if bucket not in BUCKETS:
+        raise HTTPException(status_code=400, detail=f"bucket must be one of: {', '.join(BUCKETS)}")
+    start, end = _analytics_range(start, end, timezone)
+    if bucket == "hour" and end - start > timedelta(hours=MAX_TIMESERIES_POINTS):
+        raise HTTPException(status_code=400, detail="Range too large for hourly buckets")
+    
+    points = timeseries(db, current_user.id, start, end, bucket, timezone)
+    
+    return PomodoroTimeseries(
+        bucket=bucket,
+        timezone=timezone,
+        points=[PomodoroTimeseriesPoint(**point) for point in points]
+    )
+
+@router.get("/heatmap", response_model=PomodoroHeatmap)
+async def get_heatmap(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    timezone: str = "UTC",
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Get focus (work) minutes by local weekday and hour of day"""
+    start, end = _analytics_range(start, end, timezone)
+    
+    return PomodoroHeatmap(
+        timezone=timezone,
+        work_minutes=focus_heatmap(db, current_user.id, start, end, timezone)
+    )
+
+def _timer_response(state) -> TimerState:
+    return TimerState(**state.to_dict(timer_service.now()))
+
+def _timer_transition(db: Session, user_id: int, action: str, **params) -> TimerState:
+    try:
+        state = timer_service.transition(db, user_id, action, **params)
+    except InvalidTransition as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to update timer"
+        )
+    return _timer_response(state)
+
+@router.get("/timer", response_model=TimerState)
+async def get_timer(
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Get the current server-side timer state"""
+    return _timer_response(timer_service.get(db, current_user.id))
+
+@router.post("/timer/start", response_model=TimerState)
+async def start_timer(
+    timer_data: TimerStartRequest,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Start a work/break cycle; every connected device is notified"""
+    if timer_data.task_id is not None:
+        task = db.query(Task.id).filter(Task.id == timer_data.task_id, Task.user_id == current_user.id).first()
+        if not task:
+            raise HTTPException(status_code=404, detail="Task not found")
+    return _timer_transition(
+        db, current_user.id, "start",
+        task_id=timer_data.task_id,
+        work=timer_data.work_minutes,
+        rest=timer_data.break_minutes,
+        long_rest=timer_data.long_break_minutes,
+        cycles=timer_data.cycles_before_long_break
+    )
+
+@router.post("/timer/{action}", response_model=TimerState)
+async def update_timer(
+    action: str,  # pause, resume, skip, reset
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Pause, resume, skip the current phase of, or reset the timer"""
+    if action not in ("pause", "resume", "skip", "reset"):
+        raise HTTPException(status_code=404, detail="Unknown timer action")
+    return _timer_transition(db, current_user.id, action)
+
+@router.get("/timer/stream")
+async def stream_timer(
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Server-sent events with the timer state on every change"""
+    subscription = pubsub.subscribe(timer_topic(current_user.id))
+    state = timer_service.get(db, current_user.id)
+    initial = {"event": "timer", "data": state.to_dict(timer_service.now())}
+    
+    return StreamingResponse(
+        event_stream(subscription, initial=initial),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
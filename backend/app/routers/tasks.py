@@ -3,8 +3,12 @@ from sqlalchemy.orm import Session
 from typing import List, Optional
 from app.database import get_db
 from app.models import User, Task
-from app.schemas import TaskCreate, TaskUpdate, Task as TaskSchema, PaginatedResponse
+from app.schemas import TaskCreate, TaskUpdate, Task as TaskSchema, PaginatedResponse, EstimateAccuracy
 from app.auth import get_current_active_user
+from app.services.ics_feed import feed_cache
+from app.services.reminders import reminder_service
+from app.services.task_index import task_index_service
+from app.services.task_durations import estimate_accuracy
 import json
 
 router = APIRouter()
@@ -37,6 +41,14 @@ async def get_tasks(
         has_prev=skip > 0
     )
 
+@router.get("/estimate-accuracy", response_model=EstimateAccuracy)
+async def get_estimate_accuracy(
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Compare estimated durations with time tracked in Pomodoro sessions"""
+    return EstimateAccuracy(**estimate_accuracy(db, current_user.id))
+
 @router.get("/{task_id}", response_model=TaskSchema)
 async def get_task(
     task_id: int,
@@ -73,6 +85,9 @@ async def create_task(
         db.add(db_task)
         db.commit()
         db.refresh(db_task)
+        task_index_service.upsert(current_user.id, db_task.id, db_task.title, db_task.description)
+        feed_cache.invalidate(current_user.id)
+        reminder_service.schedule(db_task)
     except Exception as e:
         db.rollback()
         raise HTTPException(
@@ -106,6 +121,9 @@ async def update_task(
     try:
         db.commit()
         db.refresh(task)
+        task_index_service.upsert(current_user.id, task.id, task.title, task.description)
+        feed_cache.invalidate(current_user.id)
+        reminder_service.schedule(task)
     except Exception as e:
         db.rollback()
         raise HTTPException(
@@ -128,6 +146,8 @@ async def delete_task(
     try:
         db.delete(task)
         db.commit()
+        task_index_service.remove(current_user.id, task_id)
+        feed_cache.invalidate(current_user.id)
     except Exception as e:
         db.rollback()
         raise HTTPException(
@@ -166,6 +186,9 @@ async def bulk_update_tasks(
         db.commit()
         for task in updated_tasks:
             db.refresh(task)
+            task_index_service.upsert(current_user.id, task.id, task.title, task.description)
+            reminder_service.schedule(task)
+        feed_cache.invalidate(current_user.id)
     except Exception as e:
         db.rollback()
         raise HTTPException(
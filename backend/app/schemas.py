@@ -1,6 +1,8 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field, field_validator
 from typing import Optional, List
 from datetime import datetime
+import json
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 from app.models import TaskPriority, TaskStatus, PomodoroType, NotificationType
 
 # Base schemas
@@ -11,9 +13,15 @@ class UserBase(BaseModel):
 class UserCreate(UserBase):
     password: str
 
+class UserUpdate(BaseModel):
+    name: Optional[str] = None
+    avatar: Optional[str] = None
+    timezone: Optional[str] = None  # IANA zone, e.g. "Europe/Berlin"
+
 class User(UserBase):
     id: int
     avatar: Optional[str] = None
+    timezone: Optional[str] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
 
@@ -76,6 +84,7 @@ class Task(TaskBase):
     id: int
     status: TaskStatus
     actual_duration: Optional[int] = None
+    pomodoro_count: int = 0
     ai_generated: bool
     user_id: int
     created_at: datetime
@@ -90,7 +99,20 @@ class PomodoroSessionBase(BaseModel):
     type: PomodoroType = PomodoroType.work
 
 class PomodoroSessionCreate(PomodoroSessionBase):
-    pass
+    duration: int = Field(..., ge=1)
+
+class PomodoroSessionUpdate(BaseModel):
+    task_id: Optional[int] = None  # null unlinks the session from its task
+    duration: Optional[int] = Field(None, ge=1)
+    type: Optional[PomodoroType] = None
+
+    @field_validator("duration", "type")
+    @classmethod
+    def reject_null(cls, value, info):
+        # Only runs for values sent in the request; omitted fields stay unset
+        if value is None:
+            raise ValueError(f"{info.field_name} cannot be null")
+        return value
 
 class PomodoroSession(PomodoroSessionBase):
     id: int
@@ -98,6 +120,7 @@ class PomodoroSession(PomodoroSessionBase):
     start_time: datetime
     end_time: Optional[datetime] = None
     completed: bool
+    abandoned: bool = False
     created_at: datetime
 
     class Config:
@@ -110,6 +133,15 @@ class CalendarEventBase(BaseModel):
     end: datetime
     all_day: bool = False
     task_id: Optional[int] = None
+    rrule: Optional[str] = None  # e.g. "FREQ=WEEKLY;BYDAY=MO,WE"
+    exdates: Optional[List[datetime]] = None  # excluded occurrence starts
+    timezone: Optional[str] = None  # IANA zone the rule repeats in, UTC if unset
+
+    @field_validator("exdates", mode="before")
+    @classmethod
+    def load_exdates(cls, value):
+        # Stored as a JSON string on the model
+        return json.loads(value) if isinstance(value, str) else value
 
 class CalendarEventCreate(CalendarEventBase):
     pass
@@ -121,17 +153,71 @@ class CalendarEventUpdate(BaseModel):
     end: Optional[datetime] = None
     all_day: Optional[bool] = None
     task_id: Optional[int] = None
+    rrule: Optional[str] = None
+    exdates: Optional[List[datetime]] = None
+    timezone: Optional[str] = None
 
 class CalendarEvent(CalendarEventBase):
     id: int
     user_id: int
     google_calendar_id: Optional[str] = None
+    ical_uid: Optional[str] = None
+    recurrence_end: Optional[datetime] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
 
+class EventConflict(BaseModel):
+    event_id: int
+    title: str
+    start: datetime  # of the conflicting occurrence for recurring events
+    end: datetime
+    recurring: bool = False
+
+class CalendarEventWithConflicts(CalendarEvent):
+    conflicts: List[EventConflict] = []
+
+class CalendarConflict(BaseModel):
+    first: EventConflict
+    second: EventConflict
+    start: datetime  # overlap
+    end: datetime
+
+class GoogleSyncJob(BaseModel):
+    job_id: str
+    status: str
+    total: int
+    completed: int
+    failed: int
+    results: List[Optional[dict]]
+    errors: List[str]
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    message: Optional[str] = None
+
+class CalendarImportSummary(BaseModel):
+    created: int
+    updated: int
+    unchanged: int
+    skipped: int
+    errors: List[str]  # first few reasons events were skipped
+
+class CalendarFeedToken(BaseModel):
+    token: str
+    url: str
+
+class TimeRange(BaseModel):
+    start: datetime
+    end: datetime
+
+class FreeBusy(BaseModel):
+    start: datetime
+    end: datetime
+    busy: List[TimeRange]
+    free: List[TimeRange]
+
 class NotificationBase(BaseModel):
     title: str
     message: str
@@ -150,6 +236,39 @@ class Notification(NotificationBase):
     class Config:
         from_attributes = True
 
+class UnreadCount(BaseModel):
+    unread: int
+
+class NotificationSelection(BaseModel):
+    ids: Optional[List[int]] = Field(None, max_length=1000)
+    read: Optional[bool] = None
+    type: Optional[NotificationType] = None
+    before: Optional[datetime] = None  # created before
+
+class NotificationBulkResult(BaseModel):
+    affected: int
+
+class NotificationFanOut(BaseModel):
+    title: str
+    message: str
+    type: NotificationType = NotificationType.info
+    user_ids: Optional[List[int]] = None  # every user if omitted
+    email: Optional[bool] = None  # EMAIL_NOTIFICATION_TYPES decide if omitted
+
+class NotificationFanOutResult(BaseModel):
+    recipients: int
+
+class NotificationFanOutJob(BaseModel):
+    job_id: str
+    status: str  # queued, running, completed, failed
+    total: int
+    completed: int
+    failed: int
+    results: List[Optional[NotificationFanOutResult]]
+    errors: List[str] = []
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
 # Authentication schemas
 class Token(BaseModel):
     access_token: str
@@ -171,8 +290,46 @@ class AIResponse(BaseModel):
 class AISuggestRequest(BaseModel):
     context: str
 
+def is_known_timezone(name: str) -> bool:
+    """True if ``name`` is an IANA zone ZoneInfo can load"""
+    try:
+        ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return False
+    return True
+
 class AIOptimizeRequest(BaseModel):
     tasks: List[Task]
+    start: Optional[datetime] = None
+    horizon_days: int = 14
+    work_start_hour: int = 9
+    work_end_hour: int = 17
+    work_days: List[int] = [0, 1, 2, 3, 4]  # Monday=0
+    timezone: str = "UTC"
+
+class ScheduledTask(BaseModel):
+    task_id: int
+    start: datetime
+    end: datetime
+    late: bool
+
+class ScheduleProposal(BaseModel):
+    scheduled: List[ScheduledTask]
+    unscheduled: List[int]
+
+class AIBatchRequest(BaseModel):
+    commands: List[str]
+
+class AIBatchJob(BaseModel):
+    job_id: str
+    status: str  # queued, running, completed, failed
+    total: int
+    completed: int
+    failed: int
+    results: List[Optional[AIResponse]]
+    errors: List[str] = []
+    created_at: datetime
+    finished_at: Optional[datetime] = None
 
 # API Response schemas
 class ApiResponse(BaseModel):
@@ -189,10 +346,57 @@ class PaginatedResponse(BaseModel):
     has_prev: bool
 
 # Stats schemas
+class EstimateAccuracy(BaseModel):
+    tasks: int
+    total_estimated_minutes: int
+    total_actual_minutes: int
+    actual_to_estimate_ratio: Optional[float] = None
+    mean_absolute_error_minutes: Optional[float] = None
+    mean_relative_error: Optional[float] = None
+    underestimated_tasks: int
+    within_20_percent: int
+
 class PomodoroStats(BaseModel):
     total_sessions: int
     total_work_time: int  # in minutes
     total_break_time: int  # in minutes
     average_session_length: float
     completed_sessions: int
-    incomplete_sessions: int 
\ No newline at end of file
+    incomplete_sessions: int 
+
+class PomodoroTimeseriesPoint(BaseModel):
+    start: datetime
+    sessions: int
+    completed: int
+    work_minutes: int
+    break_minutes: int
+
+class PomodoroTimeseries(BaseModel):
+    bucket: str  # hour, day, week, month
+    timezone: str
+    points: List[PomodoroTimeseriesPoint]
+
+class PomodoroHeatmap(BaseModel):
+    timezone: str
+    work_minutes: List[List[int]]  # [weekday (Monday=0)][hour]
+
+# Pomodoro timer schemas
+class TimerStartRequest(BaseModel):
+    task_id: Optional[int] = None
+    work_minutes: int = Field(25, ge=1, le=180)
+    break_minutes: int = Field(5, ge=1, le=60)
+    long_break_minutes: int = Field(15, ge=1, le=120)
+    cycles_before_long_break: int = Field(4, ge=1, le=12)
+
+class TimerState(BaseModel):
+    status: str  # idle, running, paused
+    phase: str  # work, short_break, long_break
+    cycle: int
+    remaining_seconds: int
+    ends_at: Optional[datetime] = None
+    work_minutes: int
+    break_minutes: int
+    long_break_minutes: int
+    cycles_before_long_break: int
+    task_id: Optional[int] = None
+    version: int
@@ -0,0 +1,148 @@
+from typing import Callable, Dict, List, Optional
+import json
+import os
+from dotenv import load_dotenv
+from app.schemas import AIResponse, TaskCreate
+from app.services.jobs import Job
+from app.services.llm import LLMResult, estimate_tokens
+
+load_dotenv()
+
+# Batch packing configuration
+AI_CONTEXT_TOKENS = int(os.getenv("AI_CONTEXT_TOKENS", "4096"))
+AI_BATCH_TOKENS_PER_COMMAND = int(os.getenv("AI_BATCH_TOKENS_PER_COMMAND", "150"))
+AI_BATCH_MAX_COMMANDS_PER_CALL = int(os.getenv("AI_BATCH_MAX_COMMANDS_PER_CALL", "25"))
+
+BATCH_PROMPT_HEADER = """
+Parse each of the numbered commands below and extract tasks.
+
+Return a JSON object of the form {"results": [...]} with one entry per command:
+- index: the command number
+- tasks: array of task objects with title, description, priority, due_date, estimated_duration
+- message: explanation of what was understood
+- confidence: confidence score (0-1)
+
+Priority should be 'low', 'medium', or 'high'.
+Due dates should be in ISO format if mentioned.
+Estimated duration should be in minutes.
+
+Commands:
+"""
+
+def format_command(index: int, command: str) -> str:
+    return f"{index}. {json.dumps(command)}\n"
+
+def pack_commands(
+    commands: List[str],
+    context_tokens: int = AI_CONTEXT_TOKENS,
+    tokens_per_command: int = AI_BATCH_TOKENS_PER_COMMAND,
+    max_per_call: int = AI_BATCH_MAX_COMMANDS_PER_CALL,
+) -> List[List[int]]:
+    """Greedily pack command indexes into as few prompts as the context window allows.
+
+    Each packed call must fit its prompt plus the completion budget reserved
+    for every command in it. A command too large for an empty call still gets
+    a call of its own so that it is reported rather than dropped.
+    """
+    header_tokens = estimate_tokens(BATCH_PROMPT_HEADER)
+    chunks: List[List[int]] = []
+    current: List[int] = []
+    used = header_tokens
+
+    for index, command in enumerate(commands):
+        cost = estimate_tokens(format_command(index, command)) + tokens_per_command
+        if current and (used + cost > context_tokens or len(current) >= max_per_call):
+            chunks.append(current)
+            current = []
+            used = header_tokens
+        current.append(index)
+        used += cost
+
+    if current:
+        chunks.append(current)
+    return chunks
+
+def build_batch_prompt(commands: List[str], indexes: List[int]) -> str:
+    return BATCH_PROMPT_HEADER + "".join(format_command(i, commands[i]) for i in indexes)
+
+def fallback_response(command: str) -> AIResponse:
+    """Response used when the model output for a command cannot be parsed"""
+    return AIResponse(
+        tasks=[
+            TaskCreate(
+                title=f"Task from: {command}",
+                description="AI-generated task",
+                priority="medium"
+            )
+        ],
+        message=f"Parsed command: {command}",
+        confidence=0.5
+    )
+
+def _extract_json(content: str) -> dict:
+    start = content.index("{")
+    end = content.rindex("}") + 1
+    return json.loads(content[start:end])
+
+def _to_response(entry: dict) -> AIResponse:
+    return AIResponse(
+        tasks=[TaskCreate(**task) for task in entry.get("tasks", [])],
+        message=entry.get("message", ""),
+        confidence=float(entry.get("confidence", 0.0))
+    )
+
+def parse_response_content(content: str, command: str) -> AIResponse:
+    """Parse a single-command model output, falling back when it is malformed"""
+    try:
+        return _to_response(_extract_json(content))
+    except Exception:
+        return fallback_response(command)
+
+def parse_suggestions(content: str) -> List[TaskCreate]:
+    """Parse suggested tasks from a JSON array (or {"tasks": [...]}) in the model output"""
+    try:
+        start = min(i for i in (content.find("["), content.find("{")) if i != -1)
+        payload = json.loads(content[start:max(content.rfind("]"), content.rfind("}")) + 1])
+    except ValueError:
+        return []
+
+    if isinstance(payload, dict):
+        payload = payload.get("tasks", [])
+    suggestions = []
+    for task in payload if isinstance(payload, list) else []:
+        try:
+            suggestions.append(TaskCreate(**task))
+        except Exception:
+            continue
+    return suggestions
+
+def parse_batch_content(content: str) -> Dict[int, AIResponse]:
+    """Extract per-command responses from the model output, skipping malformed entries"""
+    try:
+        payload = _extract_json(content)
+    except ValueError:
+        return {}
+
+    parsed: Dict[int, AIResponse] = {}
+    for entry in payload.get("results", []):
+        try:
+            parsed[int(entry["index"])] = _to_response(entry)
+        except Exception:
+            continue
+    return parsed
+
+def make_batch_worker(
+    commands: List[str],
+    complete: Callable[[str, int], LLMResult],
+    tokens_per_command: int = AI_BATCH_TOKENS_PER_COMMAND,
+) -> Callable[[Job, List[int]], None]:
+    """Build a job worker that parses one packed chunk of commands per LLM call"""
+
+    def worker(job: Job, indexes: List[int]):
+        prompt = build_batch_prompt(commands, indexes)
+        result = complete(prompt, tokens_per_command * len(indexes))
+        parsed = parse_batch_content(result.content)
+        for index in indexes:
+            job.set_result(index, parsed.get(index) or fallback_response(commands[index]))
+
+    return worker
@@ -0,0 +1,137 @@
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+import heapq
+import os
+from dotenv import load_dotenv
+from sqlalchemy import select, union_all
+from sqlalchemy.orm import Query, Session
+from app.models import LONG_EVENT_THRESHOLD, CalendarEvent
+from app.services.pomodoro_stats import utc_naive
+from app.services.recurrence import InvalidRecurrence, expand_recurring, recurrence_for
+
+load_dotenv()
+
+# Recurring events being written are checked for conflicts this far ahead
+CONFLICT_HORIZON_DAYS = int(os.getenv("CONFLICT_HORIZON_DAYS", "90"))
+MAX_CONFLICTS = int(os.getenv("MAX_CONFLICTS", "200"))
+
+# An event (or one occurrence of a recurring event) and its time span
+Slot = Tuple[CalendarEvent, datetime, datetime]
+
+def events_overlapping(db: Session, user_id: int, start: datetime, end: datetime, *columns) -> Query:
+    """Events intersecting the half-open window [start, end), ordered by start.
+
+    ``start < end AND end > start`` alone cannot be answered from one b-tree
+    range, so short events are found by the bounded-duration trick: an event
+    no longer than LONG_EVENT_THRESHOLD that overlaps the window must start
+    in [start - threshold, end), a tight range of the (user_id, start) index.
+    The few long events are read separately through their partial index.
+    Recurring events are excluded; see ``busy_intervals`` and
+    ``app.services.recurrence.expand_recurring`` for their occurrences.
+    Pass ``columns`` to select specific columns instead of whole events.
+    """
+    short = select(CalendarEvent.id).where(
+        CalendarEvent.user_id == user_id,
+        CalendarEvent.start >= start - LONG_EVENT_THRESHOLD,
+        CalendarEvent.start < end,
+        CalendarEvent.end > start,
+        CalendarEvent.is_long == False,
+        CalendarEvent.rrule.is_(None)
+    )
+    long = select(CalendarEvent.id).where(
+        CalendarEvent.user_id == user_id,
+        CalendarEvent.is_long == True,
+        CalendarEvent.start < end,
+        CalendarEvent.end > start,
+        CalendarEvent.rrule.is_(None)
+    )
+    return db.query(*(columns or (CalendarEvent,))).filter(
+        CalendarEvent.id.in_(union_all(short, long))
+    ).order_by(CalendarEvent.start)
+
+def busy_intervals(db: Session, user_id: int, start: datetime, end: datetime) -> List[Tuple[datetime, datetime]]:
+    """(start, end) of every event occurrence overlapping [start, end), recurring ones included"""
+    busy = [tuple(row) for row in events_overlapping(db, user_id, start, end, CalendarEvent.start, CalendarEvent.end)]
+    busy.extend((occurrence_start, occurrence_end) for _, occurrence_start, occurrence_end in expand_recurring(db, user_id, start, end))
+    return busy
+
+def event_slots(db: Session, user_id: int, start: datetime, end: datetime) -> List[Slot]:
+    """Timed events and recurring occurrences overlapping [start, end), ordered by start.
+
+    All-day events mark days rather than busy time and never conflict.
+    """
+    slots = [
+        (event, utc_naive(event.start), utc_naive(event.end))
+        for event in events_overlapping(db, user_id, start, end)
+        if not event.all_day
+    ]
+    slots.extend(
+        (event, occurrence_start, occurrence_end)
+        for event, occurrence_start, occurrence_end in expand_recurring(db, user_id, start, end)
+        if not event.all_day
+    )
+    slots.sort(key=lambda slot: slot[1])
+    return slots
+
+def event_intervals(event: CalendarEvent, now: Optional[datetime] = None) -> List[Tuple[datetime, datetime]]:
+    """Time spans an event occupies; upcoming occurrences within the horizon for a series"""
+    if event.all_day:
+        return []
+    start, end = utc_naive(event.start), utc_naive(event.end)
+    if not event.rrule:
+        return [(start, end)]
+    window_start = max(start, now or datetime.utcnow())
+    try:
+        return recurrence_for(event).between(window_start, window_start + timedelta(days=CONFLICT_HORIZON_DAYS))
+    except InvalidRecurrence:
+        return [(start, end)]
+
+def find_conflicts(
+    db: Session,
+    user_id: int,
+    intervals: List[Tuple[datetime, datetime]],
+    exclude_id: Optional[int] = None,
+    limit: int = MAX_CONFLICTS,
+) -> List[Slot]:
+    """Slots overlapping any of ``intervals`` (sorted, equal-length occurrences of one event).
+
+    Candidates come from one indexed range query over the intervals' hull,
+    so checking a single event costs O(log n + k).
+    """
+    if not intervals:
+        return []
+    starts = [start for start, _ in intervals]
+    ends = [end for _, end in intervals]
+    conflicts = []
+    for slot in event_slots(db, user_id, starts[0], ends[-1]):
+        event, slot_start, slot_end = slot
+        if event.id == exclude_id:
+            continue
+        i = bisect_right(ends, slot_start)
+        if i < len(intervals) and starts[i] < slot_end:
+            conflicts.append(slot)
+            if len(conflicts) >= limit:
+                break
+    return conflicts
+
+def conflicting_pairs(db: Session, user_id: int, start: datetime, end: datetime, limit: int = MAX_CONFLICTS) -> List[Tuple[Slot, Slot]]:
+    """Every pair of overlapping slots in [start, end), found with a sweep line.
+
+    Slots are visited by start time while a heap keeps the ones still in
+    progress, so the cost is O(n log n + k) for n slots and k conflicts.
+    """
+    pairs = []
+    active: List[Tuple[datetime, int, Slot]] = []  # (end, tiebreak, slot)
+    for index, slot in enumerate(event_slots(db, user_id, start, end)):
+        _, slot_start, slot_end = slot
+        while active and active[0][0] <= slot_start:
+            heapq.heappop(active)
+        for _, _, other in active:
+            if other[0].id == slot[0].id:
+                continue  # occurrences of one series overlapping each other
+            pairs.append((other, slot))
+            if len(pairs) >= limit:
+                return pairs
+        heapq.heappush(active, (slot_end, index, slot))
+    return pairs
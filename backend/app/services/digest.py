@@ -0,0 +1,296 @@
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import asyncio
+import logging
+import time
+import os
+from dotenv import load_dotenv
+from sqlalchemy import case, exists, func, insert, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models import DailyDigest, PomodoroSession, PomodoroType, Task, User
+from app.services.mail import EMAIL_PROVIDER
+from app.services.metrics import registry
+from app.services.notify import bulk_create_notifications
+from app.services.reminders import OPEN_STATUSES
+
+load_dotenv()
+
+# Daily digest configuration
+DIGEST_HOUR = int(os.getenv("DIGEST_HOUR", "7"))  # local hour from which a day's digest is due
+DIGEST_BATCH_SIZE = int(os.getenv("DIGEST_BATCH_SIZE", "1000"))
+DIGEST_SKIP_EMPTY = os.getenv("DIGEST_SKIP_EMPTY", "true").lower() == "true"
+DIGEST_EMAIL = os.getenv("DIGEST_EMAIL", "true").lower() == "true"
+DIGEST_POLL_SECONDS = float(os.getenv("DIGEST_POLL_SECONDS", "900"))
+
+logger = logging.getLogger(__name__)
+
+digests_created = registry.counter("daily_digests_total", "Daily digests recorded", ["result"])
+digest_last_seconds = registry.gauge("daily_digest_last_duration_seconds", "Duration of the last digest run")
+digest_last_users = registry.gauge("daily_digest_last_users", "Users given a digest by the last run")
+
+class DigestWindow(NamedTuple):
+    """One timezone's digest day and its bounds as naive UTC"""
+    day: date
+    yesterday_start: datetime
+    today_start: datetime
+    today_end: datetime
+    local_hour: int
+
+def digest_window(tz_name: str, now: datetime) -> DigestWindow:
+    zone = ZoneInfo(tz_name)
+    local_now = now.replace(tzinfo=timezone.utc).astimezone(zone)
+    day = local_now.date()
+
+    def midnight(value: date) -> datetime:
+        local = datetime.combine(value, datetime.min.time(), tzinfo=zone)
+        return local.astimezone(timezone.utc).replace(tzinfo=None)
+
+    return DigestWindow(day, midnight(day - timedelta(days=1)), midnight(day), midnight(day + timedelta(days=1)), local_now.hour)
+
+def _in_bucket(tz_name: str):
+    # Users without a timezone get UTC digests
+    if tz_name == "UTC":
+        return or_(User.timezone == "UTC", User.timezone.is_(None))
+    return User.timezone == tz_name
+
+def due_timezones(db: Session, now: datetime, hour: int = DIGEST_HOUR) -> Dict[str, DigestWindow]:
+    """Timezone buckets whose local time has reached the digest hour"""
+    due = {}
+    names = db.execute(select(func.coalesce(User.timezone, "UTC")).distinct()).scalars().all()
+    for name in names:
+        try:
+            window = digest_window(name, now)
+        except (ZoneInfoNotFoundError, ValueError):
+            logger.warning("Skipping daily digests for unknown timezone %r", name)
+            continue
+        if window.local_hour >= hour:
+            due[name] = window
+    return due
+
+def _user_batches(db: Session, tz_name: str, day: date, batch_size: int) -> Iterator[list]:
+    """(id, unread count) of users in a bucket still without ``day``'s digest, in id order"""
+    last = 0
+    while True:
+        batch = db.execute(
+            select(User.id, User.unread_notifications).where(
+                _in_bucket(tz_name),
+                User.id > last,
+                ~exists().where(DailyDigest.user_id == User.id, DailyDigest.digest_date == day)
+            ).order_by(User.id).limit(batch_size)
+        ).all()
+        if not batch:
+            return
+        yield batch
+        last = batch[-1].id
+
+def build_digests(db: Session, users: list, tz_name: str, window: DigestWindow) -> List[dict]:
+    """Digest rows for a batch of users, from one grouped query per table"""
+    ids = [user.id for user in users]
+    tasks = {
+        row.user_id: row
+        for row in db.execute(
+            select(
+                Task.user_id,
+                func.sum(case((Task.due_date >= window.today_start, 1), else_=0)).label("due_today"),
+                func.sum(case((Task.due_date < window.today_start, 1), else_=0)).label("overdue"),
+            ).where(
+                Task.user_id.in_(ids),
+                Task.due_date < window.today_end,
+                Task.status.in_(OPEN_STATUSES)
+            ).group_by(Task.user_id)
+        )
+    }
+    sessions = {
+        row.user_id: row
+        for row in db.execute(
+            select(
+                PomodoroSession.user_id,
+                func.count(PomodoroSession.id).label("sessions"),
+                func.sum(case((PomodoroSession.completed == True, 1), else_=0)).label("completed"),
+                func.sum(case((PomodoroSession.completed == True, PomodoroSession.duration), else_=0)).label("minutes"),
+            ).where(
+                PomodoroSession.user_id.in_(ids),
+                PomodoroSession.start_time >= window.yesterday_start,
+                PomodoroSession.start_time < window.today_start,
+                PomodoroSession.type == PomodoroType.work,
+                PomodoroSession.end_time.isnot(None)
+            ).group_by(PomodoroSession.user_id)
+        )
+    }
+
+    digests = []
+    for user in users:
+        task_row = tasks.get(user.id)
+        session_row = sessions.get(user.id)
+        digests.append({
+            "user_id": user.id,
+            "digest_date": window.day,
+            "timezone": tz_name,
+            "tasks_due_today": int(task_row.due_today) if task_row else 0,
+            "tasks_overdue": int(task_row.overdue) if task_row else 0,
+            "pomodoro_sessions": int(session_row.sessions) if session_row else 0,
+            "pomodoro_completed": int(session_row.completed) if session_row else 0,
+            "focus_minutes": int(session_row.minutes) if session_row else 0,
+            "unread_notifications": max(user.unread_notifications or 0, 0),
+        })
+    return digests
+
+def _plural(count: int, noun: str) -> str:
+    return f"{count} {noun}{'' if count == 1 else 's'}"
+
+def digest_message(digest: dict) -> Optional[str]:
+    """Summary text for a digest, or None when there is nothing to report"""
+    parts = []
+    if digest["tasks_due_today"] or digest["tasks_overdue"]:
+        due = [_plural(digest["tasks_due_today"], "task") + " due today"] if digest["tasks_due_today"] else []
+        if digest["tasks_overdue"]:
+            due.append(f"{digest['tasks_overdue']} overdue")
+        parts.append(", ".join(due) + ".")
+    if digest["pomodoro_sessions"]:
+        parts.append(
+            f"Yesterday: {_plural(digest['pomodoro_completed'], 'completed pomodoro')} "
+            f"({digest['focus_minutes']} focus minutes) of {digest['pomodoro_sessions']}."
+        )
+    if digest["unread_notifications"]:
+        parts.append(_plural(digest["unread_notifications"], "unread notification") + ".")
+    return " ".join(parts) or None
+
+def _claim(db: Session, rows: List[dict]) -> Set[int]:
+    """Insert digest rows, returning the users whose digest for the day was not recorded before"""
+    if not rows:
+        return set()
+    bind = db.get_bind()
+    dialect = bind.dialect.name
+    if dialect in ("postgresql", "sqlite") and bind.dialect.insert_executemany_returning:
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        # executemany keeps the statement cacheable; rows lost to a conflict return nothing
+        statement = upsert(DailyDigest.__table__).on_conflict_do_nothing(
+            index_elements=["user_id", "digest_date"]
+        ).returning(DailyDigest.user_id)
+        return set(db.execute(statement, rows).scalars())
+
+    claimed = set()
+    for row in rows:
+        try:
+            with db.begin_nested():
+                db.execute(insert(DailyDigest).values(**row))
+            claimed.add(row["user_id"])
+        except IntegrityError:
+            pass
+    return claimed
+
+def write_digests(db: Session, digests: List[dict], email: bool, skip_empty: bool = DIGEST_SKIP_EMPTY) -> int:
+    """Record a batch of digests and notify their users in one transaction.
+
+    Returns the number of notifications created. Users whose digest another
+    run already recorded are left alone, so each user gets one per day.
+    """
+    messages = {}
+    for digest in digests:
+        message = digest_message(digest)
+        if message is None and not skip_empty:
+            message = "Nothing due today and no focus sessions yesterday."
+        digest["notified"] = message is not None
+        messages[digest["user_id"]] = message
+
+    try:
+        claimed = _claim(db, digests)
+        rows = [
+            {
+                "user_id": digest["user_id"],
+                "title": f"Daily summary for {digest['digest_date']:%A %d %B}",
+                "message": messages[digest["user_id"]],
+            }
+            for digest in digests
+            if digest["user_id"] in claimed and digest["notified"]
+        ]
+        notified = bulk_create_notifications(db, rows, email=email, kind="digest")
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    digests_created.inc(notified, result="notified")
+    digests_created.inc(len(claimed) - notified, result="empty")
+    return notified
+
+def run_daily_digest(
+    db: Session,
+    now: Optional[datetime] = None,
+    timezones: Optional[Iterable[str]] = None,
+    batch_size: int = DIGEST_BATCH_SIZE,
+    hour: int = DIGEST_HOUR,
+    email: Optional[bool] = None,
+) -> dict:
+    """Create today's digests for every timezone bucket past ``hour``.
+
+    Users are read in id-ordered batches per bucket; each batch costs one
+    grouped query per table and one write transaction, so memory stays
+    bounded by ``batch_size``. Safe to rerun: finished users are skipped.
+    """
+    now = now or datetime.utcnow()
+    if email is None:
+        email = DIGEST_EMAIL and EMAIL_PROVIDER != "none"
+    started = time.perf_counter()
+    windows = due_timezones(db, now, hour)
+    if timezones is not None:
+        wanted = set(timezones)
+        windows = {name: window for name, window in windows.items() if name in wanted}
+
+    users = notified = 0
+    for tz_name, window in sorted(windows.items()):
+        for batch in _user_batches(db, tz_name, window.day, batch_size):
+            digests = build_digests(db, batch, tz_name, window)
+            notified += write_digests(db, digests, email)
+            users += len(batch)
+
+    elapsed = time.perf_counter() - started
+    digest_last_seconds.set(elapsed)
+    digest_last_users.set(users)
+    return {"timezones": len(windows), "users": users, "notified": notified, "seconds": elapsed}
+
+class DigestScheduler:
+    """Background task running ``run_daily_digest`` every poll interval"""
+
+    def __init__(self, interval: float = DIGEST_POLL_SECONDS):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @staticmethod
+    def _run_once() -> dict:
+        db = SessionLocal()
+        try:
+            return run_daily_digest(db)
+        finally:
+            db.close()
+
+    async def _run(self):
+        while True:
+            try:
+                summary = await asyncio.to_thread(self._run_once)
+                if summary["users"]:
+                    logger.info("Created daily digests for %d users in %.1fs", summary["users"], summary["seconds"])
+            except Exception:
+                logger.exception("Daily digest run failed")
+            await asyncio.sleep(self.interval)
+
+# Shared digest scheduler started with the application
+digest_scheduler = DigestScheduler()
@@ -0,0 +1,273 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+import asyncio
+import logging
+import random
+import time
+import os
+from dotenv import load_dotenv
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models import EmailOutbox, EmailStatus, User
+from app.services.mail import EmailError, EmailProvider, OutgoingEmail, get_email_provider
+from app.services.metrics import registry
+
+load_dotenv()
+
+# Outbox worker configuration
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", "100"))
+EMAIL_SEND_CONCURRENCY = int(os.getenv("EMAIL_SEND_CONCURRENCY", "8"))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "6"))
+EMAIL_RETRY_BASE_SECONDS = float(os.getenv("EMAIL_RETRY_BASE_SECONDS", "60"))
+EMAIL_RETRY_MAX_SECONDS = float(os.getenv("EMAIL_RETRY_MAX_SECONDS", "3600"))
+EMAIL_LEASE_SECONDS = float(os.getenv("EMAIL_LEASE_SECONDS", "300"))
+EMAIL_POLL_SECONDS = float(os.getenv("EMAIL_POLL_SECONDS", "10"))
+
+# Session.info flag set when a flush queued email, so the commit can wake the worker
+ENQUEUED_KEY = "email_enqueued"
+
+logger = logging.getLogger(__name__)
+
+emails_sent = registry.counter("emails_sent_total", "Emails accepted by the provider", ["kind"])
+email_failures = registry.counter("email_failures_total", "Failed email send attempts", ["outcome"])
+email_batch_seconds = registry.counter("email_batch_seconds_total", "Time spent delivering outbox batches")
+email_last_batch = registry.gauge("email_outbox_last_batch", "Emails claimed by the last outbox batch")
+
+# (outbox id, user id, kind, recipient, subject, body, attempts after this one)
+Claimed = Tuple[int, int, str, Optional[str], str, str, int]
+
+def enqueue_email(
+    db: Session,
+    user_id: int,
+    subject: str,
+    body: str,
+    kind: str = "notification",
+    to_email: Optional[str] = None,
+    notification=None,
+) -> EmailOutbox:
+    """Queue an email in the caller's transaction (does not commit).
+
+    Nothing is sent here: the outbox worker delivers committed rows, so a
+    rolled-back transaction never emails and request handlers never wait
+    on the provider.
+    """
+    email = EmailOutbox(
+        user_id=user_id,
+        kind=kind,
+        to_email=to_email,
+        subject=subject,
+        body=body,
+        notification=notification
+    )
+    db.add(email)
+    return email
+
+def mark_enqueued(db: Session):
+    """Wake the worker when ``db`` commits, for email inserted with Core statements"""
+    db.info[ENQUEUED_KEY] = True
+
+def retry_delay(attempts: int, base: float = EMAIL_RETRY_BASE_SECONDS, cap: float = EMAIL_RETRY_MAX_SECONDS) -> float:
+    """Exponential backoff with full jitter after ``attempts`` failed sends"""
+    return random.uniform(0, min(base * 2 ** (attempts - 1), cap))
+
+def claim_batch(db: Session, now: datetime, batch_size: int = EMAIL_BATCH_SIZE, lease_seconds: float = EMAIL_LEASE_SECONDS) -> List[Claimed]:
+    """Lease up to ``batch_size`` due emails to this worker and commit the claim.
+
+    Due means pending with its retry time reached, or sending with an
+    expired lease (the worker that claimed it died). Claimed rows are
+    pushed past the lease, so other workers skip them until it runs out.
+    """
+    candidates = select(EmailOutbox.id).where(
+        EmailOutbox.status.in_((EmailStatus.pending, EmailStatus.sending)),
+        EmailOutbox.next_attempt_at <= now
+    ).order_by(EmailOutbox.next_attempt_at).limit(batch_size)
+    if db.get_bind().dialect.name == "postgresql":
+        candidates = candidates.with_for_update(skip_locked=True)
+
+    ids = db.execute(candidates).scalars().all()
+    if not ids:
+        db.rollback()
+        return []
+    statement = update(EmailOutbox).where(
+        EmailOutbox.id.in_(ids),
+        EmailOutbox.status.in_((EmailStatus.pending, EmailStatus.sending)),
+        EmailOutbox.next_attempt_at <= now
+    ).values(
+        status=EmailStatus.sending,
+        attempts=EmailOutbox.attempts + 1,
+        next_attempt_at=now + timedelta(seconds=lease_seconds)
+    ).execution_options(synchronize_session=False)
+    if db.get_bind().dialect.update_returning:
+        # The repeated WHERE makes a concurrent claim of the same rows lose
+        claimed = set(db.execute(statement.returning(EmailOutbox.id)).scalars())
+    else:
+        db.execute(statement)
+        claimed = set(ids)
+
+    rows = db.execute(
+        select(
+            EmailOutbox.id, EmailOutbox.user_id, EmailOutbox.kind, EmailOutbox.to_email,
+            EmailOutbox.subject, EmailOutbox.body, EmailOutbox.attempts
+        ).where(EmailOutbox.id.in_(claimed))
+    ).all()
+    missing = {row.user_id for row in rows if not row.to_email}
+    addresses = dict(db.query(User.id, User.email).filter(User.id.in_(missing)).all()) if missing else {}
+    db.commit()
+    return [
+        (row.id, row.user_id, row.kind, row.to_email or addresses.get(row.user_id), row.subject, row.body, row.attempts)
+        for row in rows
+    ]
+
+def deliver_batch(
+    db: Session,
+    provider: EmailProvider,
+    now: Optional[datetime] = None,
+    batch_size: int = EMAIL_BATCH_SIZE,
+    concurrency: int = EMAIL_SEND_CONCURRENCY,
+    max_attempts: int = EMAIL_MAX_ATTEMPTS,
+    executor: Optional[ThreadPoolExecutor] = None,
+) -> int:
+    """Claim one batch, send it with at most ``concurrency`` calls in flight
+    and record every outcome in one transaction. Returns the number claimed.
+
+    Transient failures are retried with backoff until ``max_attempts``;
+    permanent ones (and exhausted retries) are dead-lettered with their error.
+    """
+    now = now or datetime.utcnow()
+    claimed = claim_batch(db, now, batch_size)
+    email_last_batch.set(len(claimed))
+    if not claimed:
+        return 0
+    started = time.perf_counter()
+
+    def send(row: Claimed) -> Tuple[Optional[str], Optional[EmailError]]:
+        if not row[3]:
+            return None, EmailError("No recipient address", retryable=False)
+        try:
+            return provider.send(OutgoingEmail(to=row[3], subject=row[4], body=row[5])), None
+        except EmailError as e:
+            return None, e
+        except Exception as e:
+            logger.exception("Email provider %s raised unexpectedly", provider.name)
+            return None, EmailError(str(e))
+
+    if executor is not None:
+        results = list(executor.map(send, claimed))
+    elif concurrency > 1 and len(claimed) > 1:
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(claimed)), thread_name_prefix="email") as pool:
+            results = list(pool.map(send, claimed))
+    else:
+        results = [send(row) for row in claimed]
+
+    finished = datetime.utcnow()
+    mappings = []
+    for row, (message_id, error) in zip(claimed, results):
+        if error is None:
+            emails_sent.inc(kind=row[2])
+            mappings.append({
+                "id": row[0], "status": EmailStatus.sent, "sent_at": finished,
+                "provider_message_id": message_id, "last_error": None
+            })
+        elif error.retryable and row[6] < max_attempts:
+            email_failures.inc(outcome="retry")
+            mappings.append({
+                "id": row[0], "status": EmailStatus.pending, "last_error": str(error)[:1000],
+                "next_attempt_at": finished + timedelta(seconds=retry_delay(row[6]))
+            })
+        else:
+            email_failures.inc(outcome="dead")
+            logger.warning("Dead-lettered email %d after %d attempts: %s", row[0], row[6], error)
+            mappings.append({"id": row[0], "status": EmailStatus.dead, "last_error": str(error)[:1000]})
+    try:
+        db.bulk_update_mappings(EmailOutbox, mappings)
+        db.commit()
+    except Exception:
+        # The claims lapse after the lease, so these emails are sent again then
+        db.rollback()
+        raise
+    finally:
+        email_batch_seconds.inc(time.perf_counter() - started)
+    return len(claimed)
+
+class EmailOutboxWorker:
+    """Background task draining the email outbox.
+
+    Batches run in a thread while the outbox has due rows; otherwise the
+    worker sleeps for the poll interval or until a commit that queued
+    email wakes it. Several workers (or processes) can run at once:
+    claims are leased, so each email goes to one of them.
+    """
+
+    def __init__(self, poll_seconds: float = EMAIL_POLL_SECONDS, concurrency: int = EMAIL_SEND_CONCURRENCY):
+        self.poll_seconds = poll_seconds
+        self.concurrency = concurrency
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def start(self):
+        provider = get_email_provider()
+        if self._task is None and provider is not None and self.poll_seconds > 0:
+            self._loop = asyncio.get_running_loop()
+            self._wake = asyncio.Event()
+            self._executor = ThreadPoolExecutor(max_workers=max(self.concurrency, 1), thread_name_prefix="email")
+            self._task = self._loop.create_task(self._run(provider))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def wake(self):
+        """Called after a commit that queued email; safe from any thread"""
+        if self._task is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def _deliver_once(self, provider: EmailProvider) -> int:
+        db = SessionLocal()
+        try:
+            return deliver_batch(db, provider, executor=self._executor)
+        finally:
+            db.close()
+
+    async def _run(self, provider: EmailProvider):
+        while True:
+            self._wake.clear()
+            try:
+                claimed = await asyncio.to_thread(self._deliver_once, provider)
+                if claimed == EMAIL_BATCH_SIZE:
+                    continue  # more may be due right away
+            except Exception:
+                logger.exception("Email outbox batch failed")
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+@event.listens_for(Session, "after_flush")
+def _note_enqueued(session, flush_context):
+    if not session.info.get(ENQUEUED_KEY) and any(isinstance(obj, EmailOutbox) for obj in session.new):
+        session.info[ENQUEUED_KEY] = True
+
+@event.listens_for(Session, "after_commit")
+def _wake_worker(session):
+    if session.info.pop(ENQUEUED_KEY, False):
+        email_worker.wake()
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_enqueued(session, previous_transaction):
+    if previous_transaction.parent is None:
+        session.info.pop(ENQUEUED_KEY, None)
+
+# Shared outbox worker started with the application
+email_worker = EmailOutboxWorker()
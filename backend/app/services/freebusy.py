@@ -0,0 +1,182 @@
+from bisect import bisect_right
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+import threading
+import os
+from dotenv import load_dotenv
+from sqlalchemy.orm import Session
+from app.models import CalendarEvent, PomodoroSession
+from app.services.recurrence import InvalidRecurrence, recurrence_for, recurring_events
+from app.services.intervals import Interval, MaxTree, merge_intervals
+from app.services.metrics import registry
+from app.services.scheduler import from_minutes, to_minutes
+
+load_dotenv()
+
+# Number of per-user indexes kept in memory
+FREEBUSY_CACHE_USERS = int(os.getenv("FREEBUSY_CACHE_USERS", "1000"))
+# Recurring events are expanded into the index this many days either side of now
+FREEBUSY_RECURRENCE_DAYS = int(os.getenv("FREEBUSY_RECURRENCE_DAYS", "365"))
+
+UNBOUNDED = 1 << 62
+
+freebusy_lookups = registry.counter("freebusy_cache_lookups_total", "Free/busy index cache lookups", ["result"])
+
+class BusyIndex:
+    """Merged busy intervals for one user, in epoch minutes.
+
+    ``gaps[i]`` is the free time between interval ``i`` and ``i + 1``
+    (unbounded after the last one), indexed by a max segment tree so the
+    first gap of a given length is found in O(log n).
+    """
+
+    def __init__(self, busy: Iterable[Interval]):
+        merged = merge_intervals(list(busy))
+        self.starts = [start for start, _ in merged]
+        self.ends = [end for _, end in merged]
+        gaps = [self.starts[i + 1] - self.ends[i] for i in range(len(merged) - 1)]
+        if merged:
+            gaps.append(UNBOUNDED)
+        self.gaps = MaxTree(gaps)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def busy_between(self, lo: int, hi: int) -> List[Interval]:
+        """Busy intervals overlapping [lo, hi), clipped to the window"""
+        busy = []
+        i = bisect_right(self.ends, lo)
+        while i < len(self.starts) and self.starts[i] < hi:
+            busy.append((max(self.starts[i], lo), min(self.ends[i], hi)))
+            i += 1
+        return busy
+
+    def free_between(self, lo: int, hi: int) -> List[Interval]:
+        free = []
+        cursor = lo
+        for start, end in self.busy_between(lo, hi):
+            if start > cursor:
+                free.append((cursor, start))
+            cursor = end
+        if cursor < hi:
+            free.append((cursor, hi))
+        return free
+
+    def find_slot(self, duration: int, lo: int, hi: int) -> Optional[int]:
+        """Earliest start of a free slot of ``duration`` minutes inside [lo, hi)"""
+        if lo + duration > hi:
+            return None
+        i = bisect_right(self.ends, lo)
+        if i == len(self.starts) or self.starts[i] - lo >= duration:
+            return lo
+        j = self.gaps.find_first(duration, i)
+        if j == -1:
+            return None
+        start = self.ends[j]
+        return start if start + duration <= hi else None
+
+class FreeBusyService:
+    """Per-user busy indexes built from calendar events and pomodoro sessions.
+
+    Indexes are built lazily and cached; routers must call ``invalidate``
+    after any write that changes a user's events or sessions.
+    """
+
+    def __init__(self, max_users: int = FREEBUSY_CACHE_USERS):
+        self._indexes: "OrderedDict[int, BusyIndex]" = OrderedDict()
+        # Per-user invalidation count and number of builds in flight; an index
+        # whose user was invalidated while it was being built is not cached
+        self._generations: Dict[int, int] = {}
+        self._building: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._max_users = max_users
+
+    def get_index(self, db: Session, user_id: int) -> BusyIndex:
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is not None:
+                self._indexes.move_to_end(user_id)
+                freebusy_lookups.inc(result="hit")
+                return index
+            generation = self._generations.get(user_id, 0)
+            self._building[user_id] = self._building.get(user_id, 0) + 1
+        freebusy_lookups.inc(result="miss")
+
+        try:
+            index = BusyIndex(self._load_busy(db, user_id))
+        finally:
+            with self._lock:
+                stale = self._generations.get(user_id, 0) != generation
+                self._building[user_id] -= 1
+                if not self._building[user_id]:
+                    del self._building[user_id]
+                    self._generations.pop(user_id, None)
+
+        if stale:
+            return index
+        with self._lock:
+            self._indexes[user_id] = index
+            self._indexes.move_to_end(user_id)
+            while len(self._indexes) > self._max_users:
+                self._indexes.popitem(last=False)
+        return index
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._indexes.pop(user_id, None)
+            if user_id in self._building:
+                self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+    def _load_busy(self, db: Session, user_id: int) -> List[Interval]:
+        busy = [
+            (to_minutes(start), to_minutes(end))
+            for start, end in db.query(CalendarEvent.start, CalendarEvent.end).filter(
+                CalendarEvent.user_id == user_id,
+                CalendarEvent.rrule.is_(None)
+            )
+        ]
+
+        now = datetime.utcnow()
+        horizon = timedelta(days=FREEBUSY_RECURRENCE_DAYS)
+        for event in recurring_events(db, user_id, now - horizon, now + horizon):
+            try:
+                occurrences = recurrence_for(event).between(now - horizon, now + horizon, limit=UNBOUNDED)
+            except InvalidRecurrence:
+                occurrences = [(event.start, event.end)]
+            busy.extend((to_minutes(start), to_minutes(end)) for start, end in occurrences)
+
+        sessions = db.query(
+            PomodoroSession.start_time, PomodoroSession.end_time, PomodoroSession.duration
+        ).filter(PomodoroSession.user_id == user_id)
+        for start_time, end_time, duration in sessions:
+            start = to_minutes(start_time)
+            end = to_minutes(end_time) if end_time else start + duration
+            busy.append((start, end))
+        return busy
+
+    def busy(self, db: Session, user_id: int, start: datetime, end: datetime) -> List[Tuple[datetime, datetime]]:
+        index = self.get_index(db, user_id)
+        return [(from_minutes(s), from_minutes(e)) for s, e in index.busy_between(to_minutes(start), to_minutes(end))]
+
+    def free(self, db: Session, user_id: int, start: datetime, end: datetime) -> List[Tuple[datetime, datetime]]:
+        index = self.get_index(db, user_id)
+        return [(from_minutes(s), from_minutes(e)) for s, e in index.free_between(to_minutes(start), to_minutes(end))]
+
+    def find_slot(
+        self,
+        db: Session,
+        user_id: int,
+        duration: int,
+        windows: List[Tuple[datetime, datetime]],
+    ) -> Optional[Tuple[datetime, datetime]]:
+        """First free slot of ``duration`` minutes inside any of the ordered ``windows``"""
+        index = self.get_index(db, user_id)
+        for window_start, window_end in windows:
+            slot = index.find_slot(duration, to_minutes(window_start), to_minutes(window_end))
+            if slot is not None:
+                return from_minutes(slot), from_minutes(slot) + timedelta(minutes=duration)
+        return None
+
+# Shared free/busy service used by routers
+freebusy_service = FreeBusyService()
@@ -0,0 +1,160 @@
+from email.parser import BytesParser
+from email.policy import HTTP
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+import json
+import threading
+import time
+import uuid
+import os
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Google Calendar API configuration (point GOOGLE_CALENDAR_API_URL at fake_google_calendar.py in tests)
+GOOGLE_CALENDAR_API_URL = os.getenv("GOOGLE_CALENDAR_API_URL", "https://www.googleapis.com").rstrip("/")
+GOOGLE_API_TIMEOUT_SECONDS = float(os.getenv("GOOGLE_API_TIMEOUT_SECONDS", "30"))
+GOOGLE_API_MAX_ATTEMPTS = int(os.getenv("GOOGLE_API_MAX_ATTEMPTS", "4"))
+
+# Google accepts at most 50 calls per batch request
+MAX_BATCH_SIZE = 50
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+class GoogleCalendarError(Exception):
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+Request = Tuple[str, str, Optional[dict]]  # method, path, JSON body
+Response = Tuple[int, Optional[dict]]  # status, JSON body
+
+def encode_http_message(start_line: str, body: Optional[dict] = None, headers: Optional[Dict[str, str]] = None) -> str:
+    lines = [start_line]
+    for name, value in (headers or {}).items():
+        lines.append(f"{name}: {value}")
+    payload = ""
+    if body is not None:
+        lines.append("Content-Type: application/json")
+        payload = json.dumps(body)
+    return "\r\n".join(lines) + "\r\n\r\n" + payload
+
+def parse_http_message(payload: bytes) -> Tuple[str, Dict[str, str], bytes]:
+    """Split an embedded HTTP request or response into start line, headers and body"""
+    head, _, body = payload.replace(b"\r\n", b"\n").partition(b"\n\n")
+    lines = head.decode().strip().split("\n")
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return lines[0].strip(), headers, body.strip()
+
+def encode_batch(parts: List[Tuple[str, str]], boundary: str) -> bytes:
+    """multipart/mixed body from (content id, embedded HTTP message) pairs"""
+    chunks = []
+    for content_id, message in parts:
+        chunks.append(
+            f"--{boundary}\r\nContent-Type: application/http\r\n"
+            f"Content-ID: <{content_id}>\r\n\r\n{message}\r\n"
+        )
+    chunks.append(f"--{boundary}--\r\n")
+    return "".join(chunks).encode()
+
+def decode_batch(content: bytes, content_type: str) -> List[Tuple[str, bytes]]:
+    """(content id, embedded HTTP message) pairs of a multipart/mixed body"""
+    message = BytesParser(policy=HTTP).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode() + content
+    )
+    if not message.is_multipart():
+        raise GoogleCalendarError("Batch body is not multipart")
+    parts = []
+    for part in message.iter_parts():
+        content_id = (part.get("Content-ID") or "").strip("<> ")
+        parts.append((content_id, part.get_payload(decode=True) or b""))
+    return parts
+
+_http_client: Optional[httpx.Client] = None
+_http_lock = threading.Lock()
+
+def get_http_client() -> httpx.Client:
+    """Process-wide HTTP client so batch calls reuse pooled connections"""
+    global _http_client
+    with _http_lock:
+        if _http_client is None:
+            _http_client = httpx.Client(timeout=GOOGLE_API_TIMEOUT_SECONDS)
+        return _http_client
+
+class GoogleCalendarClient:
+    """Minimal Calendar v3 client that sends event calls as batch requests"""
+
+    def __init__(
+        self,
+        access_token: str,
+        base_url: str = GOOGLE_CALENDAR_API_URL,
+        http: Optional[httpx.Client] = None,
+        max_attempts: int = GOOGLE_API_MAX_ATTEMPTS,
+    ):
+        self.access_token = access_token
+        self.base_url = base_url.rstrip("/")
+        self.http = http or get_http_client()
+        self.max_attempts = max_attempts
+
+    @staticmethod
+    def events_path(calendar_id: str, event_id: Optional[str] = None) -> str:
+        # Calendar ids are often email addresses and may contain "#" or "/"
+        path = f"/calendar/v3/calendars/{quote(calendar_id, safe='')}/events"
+        return f"{path}/{quote(event_id, safe='')}" if event_id else path
+
+    def _send_batch(self, requests: List[Request]) -> List[Response]:
+        boundary = f"batch_{uuid.uuid4().hex}"
+        parts = [
+            (f"item{i}", encode_http_message(f"{method} {path} HTTP/1.1", body))
+            for i, (method, path, body) in enumerate(requests)
+        ]
+        try:
+            response = self.http.post(
+                f"{self.base_url}/batch/calendar/v3",
+                content=encode_batch(parts, boundary),
+                headers={
+                    "Authorization": f"Bearer {self.access_token}",
+                    "Content-Type": f"multipart/mixed; boundary={boundary}",
+                },
+            )
+        except httpx.HTTPError as e:
+            raise GoogleCalendarError(f"Batch request failed: {e}", status=503)
+        if response.status_code != 200:
+            raise GoogleCalendarError(f"Batch request failed with {response.status_code}", status=response.status_code)
+
+        results: List[Response] = [(503, None)] * len(requests)
+        for content_id, payload in decode_batch(response.content, response.headers["content-type"]):
+            index = int(content_id.rsplit("item", 1)[-1])
+            status_line, _, body = parse_http_message(payload)
+            status = int(status_line.split()[1])
+            results[index] = (status, json.loads(body) if body else None)
+        return results
+
+    def batch(self, requests: List[Request]) -> List[Response]:
+        """Send calls in batches of 50, retrying throttled or failed calls with backoff"""
+        results: List[Optional[Response]] = [None] * len(requests)
+        pending = list(range(len(requests)))
+        for attempt in range(self.max_attempts):
+            if attempt:
+                time.sleep(min(0.5 * 2 ** (attempt - 1), 8.0))
+            retry = []
+            for offset in range(0, len(pending), MAX_BATCH_SIZE):
+                chunk = pending[offset:offset + MAX_BATCH_SIZE]
+                try:
+                    responses = self._send_batch([requests[i] for i in chunk])
+                except GoogleCalendarError as e:
+                    if e.status not in RETRYABLE_STATUSES:
+                        raise
+                    responses = [(e.status, None)] * len(chunk)
+                for index, response in zip(chunk, responses):
+                    results[index] = response
+                    if response[0] in RETRYABLE_STATUSES:
+                        retry.append(index)
+            pending = retry
+            if not pending:
+                break
+        return results
@@ -0,0 +1,298 @@
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+import hashlib
+import json
+import os
+from dotenv import load_dotenv
+from sqlalchemy import and_, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models import CalendarEvent, GoogleSyncState, Task, TaskStatus
+from app.services.google_calendar import MAX_BATCH_SIZE, GoogleCalendarClient
+from app.services.jobs import Job, job_store
+from app.services.pomodoro_stats import utc_naive
+from app.services.recurrence import parse_exdates
+
+load_dotenv()
+
+# Calendar operations sent per batch request (and per job chunk)
+GOOGLE_SYNC_BATCH_SIZE = min(int(os.getenv("GOOGLE_SYNC_BATCH_SIZE", "50")), MAX_BATCH_SIZE)
+# Rows written this long before a plan read them are checked again by the next
+# plan, covering transactions that commit late and coarse timestamp resolution
+GOOGLE_SYNC_RECHECK_SECONDS = int(os.getenv("GOOGLE_SYNC_RECHECK_SECONDS", "60"))
+
+KIND_EVENT, KIND_TASK = "event", "task"
+INSERT, UPDATE, DELETE = "insert", "update", "delete"
+
+DEFAULT_TASK_MINUTES = 30
+
+class SyncOperation:
+    __slots__ = ("action", "kind", "local_id", "google_id", "body", "content_hash", "synced_at")
+
+    def __init__(
+        self,
+        action: str,
+        kind: str,
+        local_id: int,
+        google_id: str,
+        body: Optional[dict] = None,
+        content_hash: str = "",
+        synced_at: Optional[datetime] = None,
+    ):
+        self.action = action
+        self.kind = kind
+        self.local_id = local_id
+        self.google_id = google_id
+        self.body = body
+        self.content_hash = content_hash
+        # When the pushed content was read; later writes are picked up by the next plan
+        self.synced_at = synced_at
+
+    def result(self) -> dict:
+        return {"action": self.action, "kind": self.kind, "local_id": self.local_id, "google_event_id": self.google_id}
+
+def _time(value: datetime, all_day: bool = False) -> dict:
+    value = utc_naive(value)
+    if all_day:
+        return {"date": value.date().isoformat()}
+    return {"dateTime": value.isoformat(timespec="seconds") + "Z", "timeZone": "UTC"}
+
+def event_body(event: CalendarEvent) -> dict:
+    body = {
+        "summary": event.title,
+        "description": event.description or "",
+        "start": _time(event.start, event.all_day),
+        "end": _time(event.end, event.all_day),
+        "extendedProperties": {"private": {"localKind": KIND_EVENT, "localId": str(event.id)}},
+    }
+    if event.rrule:
+        # Recurring events are pushed as one series, expanded by Google
+        zone = event.timezone or "UTC"
+        body["start"]["timeZone"] = body["end"]["timeZone"] = zone
+        body["recurrence"] = [f"RRULE:{event.rrule}"] + [
+            f"EXDATE:{exdate.strftime('%Y%m%dT%H%M%SZ')}" for exdate in parse_exdates(event.exdates)
+        ]
+    return body
+
+def task_body(task: Task) -> dict:
+    start = utc_naive(task.due_date)
+    end = start + timedelta(minutes=task.estimated_duration or DEFAULT_TASK_MINUTES)
+    done = task.status == TaskStatus.completed
+    return {
+        "summary": f"✓ {task.title}" if done else task.title,
+        "description": task.description or "",
+        "start": _time(start),
+        "end": _time(end),
+        "transparency": "transparent" if done else "opaque",
+        "extendedProperties": {"private": {"localKind": KIND_TASK, "localId": str(task.id)}},
+    }
+
+def content_hash(body: dict) -> str:
+    return hashlib.sha256(json.dumps(body, sort_keys=True).encode()).hexdigest()
+
+def google_event_id(user_id: int, kind: str, local_id: int, created_at: Optional[datetime]) -> str:
+    """Deterministic Google event id (base32hex alphabet: 0-9, a-v).
+
+    Re-sending an insert after a lost response hits the same id, so retries
+    cannot create duplicates. The creation time keeps ids unique if the
+    database ever reuses a deleted row's primary key.
+    """
+    created = int(utc_naive(created_at).replace(tzinfo=timezone.utc).timestamp()) if created_at else 0
+    return f"as{kind[0]}{user_id}v{local_id}v{created}"
+
+def _task_filters(task_ids: Optional[List[int]]) -> list:
+    """Conditions for a task to be on the calendar"""
+    filters = [Task.due_date.isnot(None), Task.status != TaskStatus.cancelled]
+    if task_ids is not None:
+        filters.append(Task.id.in_(task_ids))
+    return filters
+
+def sync_clock(db: Session) -> datetime:
+    """Database time a plan's reads are taken at, minus GOOGLE_SYNC_RECHECK_SECONDS"""
+    return db.execute(select(func.now())).scalar() - timedelta(seconds=GOOGLE_SYNC_RECHECK_SECONDS)
+
+def _changed(db: Session, model, kind: str, user_id: int, calendar_id: str, *filters):
+    """(row, state) for rows never pushed or written since their last push"""
+    changed_at = func.coalesce(model.updated_at, model.created_at)
+    return db.query(model, GoogleSyncState).outerjoin(GoogleSyncState, and_(
+        GoogleSyncState.user_id == user_id,
+        GoogleSyncState.calendar_id == calendar_id,
+        GoogleSyncState.kind == kind,
+        GoogleSyncState.local_id == model.id
+    )).filter(
+        model.user_id == user_id,
+        *filters
+    ).filter(
+        GoogleSyncState.id.is_(None) | (changed_at >= GoogleSyncState.synced_at)
+    )
+
+def _gone(db: Session, model, kind: str, user_id: int, calendar_id: str, *filters):
+    """Pushed states whose row was deleted or no longer matches ``filters``"""
+    current = db.query(model.id).filter(
+        model.id == GoogleSyncState.local_id,
+        model.user_id == user_id,
+        *filters
+    ).exists()
+    return db.query(GoogleSyncState).filter(
+        GoogleSyncState.user_id == user_id,
+        GoogleSyncState.calendar_id == calendar_id,
+        GoogleSyncState.kind == kind,
+        ~current
+    )
+
+def plan_sync(
+    db: Session,
+    user_id: int,
+    calendar_id: str,
+    task_ids: Optional[List[int]] = None,
+    include_events: bool = True,
+) -> List[SyncOperation]:
+    """Diff local events and tasks against the last pushed state.
+
+    Only rows written since they were last pushed are loaded, and of those
+    only the ones whose content hash changed become operations; rows that
+    were pushed before but have since been deleted (or no longer qualify)
+    become deletes. With ``task_ids`` only those tasks are considered.
+    """
+    synced_at = sync_clock(db)
+    sources = [(KIND_TASK, Task, _task_filters(task_ids), task_body)]
+    if include_events:
+        sources.insert(0, (KIND_EVENT, CalendarEvent, [], event_body))
+
+    operations = []
+    for kind, model, filters, make_body in sources:
+        for row, state in _changed(db, model, kind, user_id, calendar_id, *filters):
+            body = make_body(row)
+            digest = content_hash(body)
+            if state is None:
+                google_id = google_event_id(user_id, kind, row.id, row.created_at)
+                operations.append(SyncOperation(INSERT, kind, row.id, google_id, dict(body, id=google_id), digest, synced_at))
+            elif state.content_hash != digest:
+                operations.append(SyncOperation(UPDATE, kind, row.id, state.google_event_id, body, digest, synced_at))
+
+        gone = _gone(db, model, kind, user_id, calendar_id, *filters)
+        if kind == KIND_TASK and task_ids is not None:
+            gone = gone.filter(GoogleSyncState.local_id.in_(task_ids))
+        operations.extend(SyncOperation(DELETE, kind, state.local_id, state.google_event_id) for state in gone)
+    return operations
+
+def _request(operation: SyncOperation, calendar_id: str) -> Tuple[str, str, Optional[dict]]:
+    if operation.action == INSERT:
+        return "POST", GoogleCalendarClient.events_path(calendar_id), operation.body
+    if operation.action == UPDATE:
+        return "PUT", GoogleCalendarClient.events_path(calendar_id, operation.google_id), operation.body
+    return "DELETE", GoogleCalendarClient.events_path(calendar_id, operation.google_id), None
+
+def execute_operations(client: GoogleCalendarClient, calendar_id: str, operations: List[SyncOperation]) -> List[Optional[str]]:
+    """Send operations as batch calls. Returns an error message (or None) per operation.
+
+    Outcomes that mean the remote already matches are treated as success:
+    an insert whose id exists is retried as an update, an update of a
+    missing event as an insert, and deleting a missing event is a no-op.
+    """
+    errors: List[Optional[str]] = [None] * len(operations)
+    pending = list(range(len(operations)))
+    for _ in range(2):
+        responses = client.batch([_request(operations[i], calendar_id) for i in pending])
+        redo = []
+        for index, (status, body) in zip(pending, responses):
+            operation = operations[index]
+            if 200 <= status < 300 or (operation.action == DELETE and status in (404, 410)):
+                errors[index] = None
+            elif operation.action == INSERT and status == 409:
+                operation.action = UPDATE
+                operation.body = {k: v for k, v in operation.body.items() if k != "id"}
+                errors[index] = f"insert {operation.kind} {operation.local_id} conflicted"
+                redo.append(index)
+            elif operation.action == UPDATE and status == 404:
+                operation.action = INSERT
+                operation.body = dict(operation.body, id=operation.google_id)
+                errors[index] = f"update {operation.kind} {operation.local_id} found no event"
+                redo.append(index)
+            else:
+                message = (body or {}).get("error", {}).get("message") if isinstance(body, dict) else None
+                errors[index] = f"{operation.action} {operation.kind} {operation.local_id} failed with {status}" + (f": {message}" if message else "")
+        pending = redo
+        if not pending:
+            break
+    return errors
+
+def record_synced(db: Session, user_id: int, calendar_id: str, operations: List[SyncOperation]):
+    """Persist what was pushed so the next sync only sends changes"""
+    if not operations:
+        return
+    keys = {(op.kind, op.local_id) for op in operations}
+    existing = {
+        (state.kind, state.local_id): state
+        for state in db.query(GoogleSyncState).filter(
+            GoogleSyncState.user_id == user_id,
+            GoogleSyncState.calendar_id == calendar_id,
+            GoogleSyncState.local_id.in_({local_id for _, local_id in keys})
+        )
+        if (state.kind, state.local_id) in keys
+    }
+    for op in operations:
+        state = existing.get((op.kind, op.local_id))
+        if op.action == DELETE:
+            if state is not None:
+                db.delete(state)
+            continue
+        if state is None:
+            state = GoogleSyncState(user_id=user_id, calendar_id=calendar_id, kind=op.kind, local_id=op.local_id)
+            db.add(state)
+            existing[(op.kind, op.local_id)] = state
+        state.google_event_id = op.google_id
+        state.content_hash = op.content_hash
+        state.synced_at = op.synced_at
+
+    event_ids = {op.local_id: op.google_id for op in operations if op.kind == KIND_EVENT and op.action != DELETE}
+    for event_id, google_id in event_ids.items():
+        # Keep updated_at so recording the push does not mark the event changed
+        db.execute(
+            update(CalendarEvent).where(CalendarEvent.id == event_id)
+            .values(google_calendar_id=google_id, updated_at=CalendarEvent.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+    db.commit()
+
+def make_sync_worker(user_id: int, calendar_id: str, client: GoogleCalendarClient, operations: List[SyncOperation]):
+    def worker(job: Job, indexes: List[int]):
+        chunk = [operations[i] for i in indexes]
+        errors = execute_operations(client, calendar_id, chunk)
+        succeeded = [op for op, error in zip(chunk, errors) if error is None]
+
+        db = SessionLocal()
+        try:
+            try:
+                record_synced(db, user_id, calendar_id, succeeded)
+            except IntegrityError:
+                # A concurrent sync recorded the same rows first; merge over them
+                db.rollback()
+                record_synced(db, user_id, calendar_id, succeeded)
+        finally:
+            db.close()
+
+        for index, op, error in zip(indexes, chunk, errors):
+            if error is None:
+                job.set_result(index, op.result())
+            else:
+                job.set_error(index, error)
+    return worker
+
+def start_sync(
+    db: Session,
+    user_id: int,
+    access_token: str,
+    calendar_id: str = "primary",
+    task_ids: Optional[List[int]] = None,
+    include_events: bool = True,
+    client: Optional[GoogleCalendarClient] = None,
+) -> Job:
+    """Plan a sync and run it as a background job, one batch call per chunk"""
+    operations = plan_sync(db, user_id, calendar_id, task_ids, include_events)
+    job = job_store.create("google_sync", user_id, len(operations))
+    chunks = [list(range(i, min(i + GOOGLE_SYNC_BATCH_SIZE, len(operations)))) for i in range(0, len(operations), GOOGLE_SYNC_BATCH_SIZE)]
+    worker = make_sync_worker(user_id, calendar_id, client or GoogleCalendarClient(access_token), operations)
+    job_store.submit(job, chunks, worker)
+    return job
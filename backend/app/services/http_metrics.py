@@ -0,0 +1,71 @@
+import time
+import os
+from dotenv import load_dotenv
+from app.services.metrics import DEFAULT_BUCKETS, registry
+
+load_dotenv()
+
+# Bearer token required by GET /metrics (unset leaves it open, e.g. behind a private network)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+HTTP_LATENCY_BUCKETS = tuple(
+    float(value) for value in os.getenv("HTTP_LATENCY_BUCKETS", ",".join(str(bound) for bound in DEFAULT_BUCKETS)).split(",")
+    if value.strip()
+)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Anything else is reported as "other" so odd clients can't add label values
+KNOWN_METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+http_requests = registry.counter("http_requests_total", "HTTP requests handled", ["method", "route", "status"])
+http_request_seconds = registry.histogram(
+    "http_request_duration_seconds", "Time until the HTTP response finished", ["method", "route"], buckets=HTTP_LATENCY_BUCKETS
+)
+http_in_flight = registry.gauge("http_requests_in_flight", "HTTP requests being handled", ["method"])
+
+class MetricsMiddleware:
+    """ASGI middleware recording request counts, status codes, latency
+    histograms and in-flight requests per route.
+
+    Requests are labelled with the matched route template (``/api/v1/tasks/{task_id}``)
+    rather than the raw path, so series stay bounded; unmatched paths share
+    one label. Streaming responses (SSE) are timed until the stream ends.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"] if scope["method"] in KNOWN_METHODS else "other"
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_in_flight.inc(method=method)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_in_flight.dec(method=method)
+            route = self._route(scope)
+            http_request_seconds.observe(elapsed, method=method, route=route)
+            http_requests.inc(method=method, route=route, status=status)
+
+    @staticmethod
+    def _route(scope) -> str:
+        path = getattr(scope.get("route"), "path", None)
+        if path is None:
+            return "unmatched"
+        # FastAPI versions that include routers lazily match the router's own
+        # route, without its include prefix; the prefix is kept beside it
+        included = scope.get("fastapi", {}).get("included_router")
+        return getattr(getattr(included, "include_context", None), "prefix", "") + path
@@ -0,0 +1,247 @@
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Iterator, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import hashlib
+import threading
+import time
+import os
+from dotenv import load_dotenv
+from sqlalchemy.orm import Session
+from app.models import CalendarEvent, Task, TaskPriority, TaskStatus, User
+from app.services.pomodoro_stats import utc_naive
+from app.services.recurrence import parse_exdates
+
+load_dotenv()
+
+# Rendered feeds kept in memory, and how long one may be served before it is
+# re-rendered (bounds staleness from writes handled by other workers)
+FEED_CACHE_USERS = int(os.getenv("FEED_CACHE_USERS", "1000"))
+FEED_CACHE_SECONDS = int(os.getenv("FEED_CACHE_SECONDS", "300"))
+
+# Rows fetched per round trip while rendering
+FEED_FETCH_SIZE = 500
+
+PRODID = "-//AI Scheduler//Calendar Feed//EN"
+UID_DOMAIN = "ai-scheduler"
+
+TODO_STATUS = {
+    TaskStatus.pending: "NEEDS-ACTION",
+    TaskStatus.in_progress: "IN-PROCESS",
+    TaskStatus.completed: "COMPLETED",
+}
+TODO_PRIORITY = {TaskPriority.high: 1, TaskPriority.medium: 5, TaskPriority.low: 9}
+
+def escape_text(value: str) -> str:
+    """RFC 5545 TEXT escaping"""
+    return (
+        value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+        .replace("\r\n", "\\n").replace("\n", "\\n").replace("\r", "\\n")
+    )
+
+def fold_line(line: str) -> str:
+    """Fold a content line to 75 octets per physical line, ending in CRLF"""
+    data = line.encode()
+    if len(data) <= 75:
+        return line + "\r\n"
+    parts = []
+    start, limit = 0, 75
+    while start < len(data):
+        end = min(start + limit, len(data))
+        # Never split a multi-byte UTF-8 sequence
+        while end < len(data) and data[end] & 0xC0 == 0x80:
+            end -= 1
+        parts.append(data[start:end].decode())
+        start, limit = end, 74  # continuation lines start with a space
+    return "\r\n ".join(parts) + "\r\n"
+
+def format_utc(value: datetime) -> str:
+    return utc_naive(value).strftime("%Y%m%dT%H%M%SZ")
+
+def _stamp(row) -> datetime:
+    return utc_naive(row.updated_at or row.created_at or datetime.utcnow())
+
+def _component(name: str, properties: List[Tuple[str, str]]) -> str:
+    lines = [f"BEGIN:{name}"] + [f"{key}:{value}" for key, value in properties] + [f"END:{name}"]
+    return "".join(fold_line(line) for line in lines)
+
+def _zone(name: Optional[str]) -> Optional[ZoneInfo]:
+    if not name or name == "UTC":
+        return None
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+def _format_local(value: datetime, zone: ZoneInfo) -> str:
+    return utc_naive(value).replace(tzinfo=timezone.utc).astimezone(zone).strftime("%Y%m%dT%H%M%S")
+
+def event_component(event: CalendarEvent) -> str:
+    uid = event.ical_uid or f"event-{event.id}@{UID_DOMAIN}"
+    properties = [("UID", uid), ("DTSTAMP", format_utc(_stamp(event)))]
+    # Recurring series are anchored in their zone so clients expand them across DST
+    zone = _zone(event.timezone) if event.rrule else None
+    zoned = zone is not None and not event.all_day
+    if event.all_day:
+        properties.append(("DTSTART;VALUE=DATE", utc_naive(event.start).strftime("%Y%m%d")))
+        properties.append(("DTEND;VALUE=DATE", utc_naive(event.end).strftime("%Y%m%d")))
+    elif zoned:
+        local_start = _format_local(event.start, zone)
+        local_end = _format_local(event.end, zone)
+        properties.append((f"DTSTART;TZID={event.timezone}", local_start))
+        properties.append((f"DTEND;TZID={event.timezone}", local_end))
+    else:
+        properties.append(("DTSTART", format_utc(event.start)))
+        properties.append(("DTEND", format_utc(event.end)))
+    properties.append(("SUMMARY", escape_text(event.title)))
+    if event.description:
+        properties.append(("DESCRIPTION", escape_text(event.description)))
+    if event.rrule:
+        properties.append(("RRULE", event.rrule))
+        exdates = parse_exdates(event.exdates)
+        if exdates:
+            if zoned:
+                properties.append((f"EXDATE;TZID={event.timezone}", ",".join(_format_local(value, zone) for value in exdates)))
+            else:
+                properties.append(("EXDATE", ",".join(format_utc(value) for value in exdates)))
+    if event.updated_at:
+        properties.append(("LAST-MODIFIED", format_utc(event.updated_at)))
+    return _component("VEVENT", properties)
+
+def task_component(task: Task) -> str:
+    properties = [
+        ("UID", f"task-{task.id}@{UID_DOMAIN}"),
+        ("DTSTAMP", format_utc(_stamp(task))),
+        ("DUE", format_utc(task.due_date)),
+        ("SUMMARY", escape_text(task.title)),
+    ]
+    if task.description:
+        properties.append(("DESCRIPTION", escape_text(task.description)))
+    properties.append(("STATUS", TODO_STATUS.get(task.status, "NEEDS-ACTION")))
+    if task.priority in TODO_PRIORITY:
+        properties.append(("PRIORITY", str(TODO_PRIORITY[task.priority])))
+    if task.status == TaskStatus.completed:
+        properties.append(("PERCENT-COMPLETE", "100"))
+        properties.append(("COMPLETED", format_utc(_stamp(task))))
+    if task.estimated_duration:
+        properties.append(("X-ESTIMATED-DURATION", f"PT{task.estimated_duration}M"))
+    if task.updated_at:
+        properties.append(("LAST-MODIFIED", format_utc(task.updated_at)))
+    return _component("VTODO", properties)
+
+def render_feed(db: Session, user: User) -> Iterator[str]:
+    """Yield the user's feed one component at a time.
+
+    Rows are read in ``FEED_FETCH_SIZE`` batches so rendering a large
+    calendar never holds every ORM object in memory at once.
+    """
+    yield "".join(fold_line(line) for line in (
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{PRODID}",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{escape_text(user.name)}",
+    ))
+    events = db.query(CalendarEvent).filter(
+        CalendarEvent.user_id == user.id
+    ).order_by(CalendarEvent.id).yield_per(FEED_FETCH_SIZE)
+    for event in events:
+        yield event_component(event)
+    tasks = db.query(Task).filter(
+        Task.user_id == user.id,
+        Task.due_date.isnot(None),
+        Task.status != TaskStatus.cancelled
+    ).order_by(Task.id).yield_per(FEED_FETCH_SIZE)
+    for task in tasks:
+        yield task_component(task)
+    yield fold_line("END:VCALENDAR")
+
+class RenderedFeed:
+    __slots__ = ("user_id", "body", "etag", "last_modified", "rendered_at")
+
+    def __init__(self, user_id: int, body: bytes, etag: str, last_modified: datetime):
+        self.user_id = user_id
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.rendered_at = time.monotonic()
+
+    @property
+    def last_modified_header(self) -> str:
+        return format_datetime(self.last_modified.replace(tzinfo=timezone.utc), usegmt=True)
+
+    def not_modified(self, if_none_match: Optional[str], if_modified_since: Optional[datetime]) -> bool:
+        """Conditional request check; If-None-Match takes precedence (RFC 9110)"""
+        if if_none_match is not None:
+            tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            return "*" in tags or self.etag in tags
+        if if_modified_since is not None:
+            return self.last_modified <= utc_naive(if_modified_since)
+        return False
+
+class FeedCache:
+    """Rendered ICS feeds keyed by feed token.
+
+    A hit costs no database work. Routers must call ``invalidate`` after any
+    write to a user's events or tasks; entries also expire after
+    ``FEED_CACHE_SECONDS``. Last-Modified only moves forward when the
+    rendered content actually changes, so a re-render after expiry still
+    answers conditional polls with 304.
+    """
+
+    def __init__(self, max_users: int = FEED_CACHE_USERS, ttl: int = FEED_CACHE_SECONDS):
+        self._feeds: "OrderedDict[str, RenderedFeed]" = OrderedDict()
+        self._tokens: dict = {}  # user id -> feed token
+        self._previous: "OrderedDict[int, Tuple[str, datetime]]" = OrderedDict()  # user id -> last rendered etag
+        self._lock = threading.Lock()
+        self._max_users = max_users
+        self._ttl = ttl
+
+    def get(self, token: str) -> Optional[RenderedFeed]:
+        with self._lock:
+            feed = self._feeds.get(token)
+            if feed is None:
+                return None
+            if time.monotonic() - feed.rendered_at > self._ttl:
+                self._drop(token)
+                return None
+            self._feeds.move_to_end(token)
+            return feed
+
+    def render(self, db: Session, user: User, token: str) -> RenderedFeed:
+        body = "".join(render_feed(db, user)).encode()
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+        with self._lock:
+            previous = self._previous.get(user.id)
+            last_modified = previous[1] if previous and previous[0] == etag else datetime.utcnow().replace(microsecond=0)
+            feed = RenderedFeed(user.id, body, etag, last_modified)
+            old_token = self._tokens.get(user.id)
+            if old_token is not None and old_token != token:
+                self._drop(old_token)
+            self._feeds[token] = feed
+            self._tokens[user.id] = token
+            self._previous[user.id] = (etag, last_modified)
+            self._previous.move_to_end(user.id)
+            self._feeds.move_to_end(token)
+            while len(self._feeds) > self._max_users:
+                self._drop(next(iter(self._feeds)))
+            while len(self._previous) > self._max_users:
+                self._previous.popitem(last=False)
+        return feed
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            token = self._tokens.get(user_id)
+            if token is not None:
+                self._drop(token)
+
+    def _drop(self, token: str):
+        feed = self._feeds.pop(token, None)
+        if feed is not None and self._tokens.get(feed.user_id) == token:
+            del self._tokens[feed.user_id]
+
+# Shared feed cache used by routers
+feed_cache = FeedCache()
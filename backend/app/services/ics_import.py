@@ -0,0 +1,407 @@
+from datetime import datetime, timedelta, timezone
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import hashlib
+import re
+import os
+from dotenv import load_dotenv
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from app.models import CalendarEvent, is_long_event
+from app.services.pomodoro_stats import utc_naive
+from app.services.recurrence import InvalidRecurrence, apply_recurrence, dump_exdates, parse_exdates
+
+load_dotenv()
+
+# Events upserted per transaction
+ICS_IMPORT_BATCH_SIZE = int(os.getenv("ICS_IMPORT_BATCH_SIZE", "500"))
+# Longest unfolded content line accepted (guards memory against malformed files)
+ICS_MAX_LINE_BYTES = int(os.getenv("ICS_MAX_LINE_BYTES", str(1 << 20)))
+
+READ_CHUNK_BYTES = 64 * 1024
+# Error messages kept in the import summary
+MAX_REPORTED_ERRORS = 20
+
+DURATION_PATTERN = re.compile(
+    r"^([+-])?P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$"
+)
+
+class ICSError(ValueError):
+    pass
+
+Property = Tuple[Dict[str, str], str]  # parameters, value
+
+def iter_lines(stream: BinaryIO, chunk_size: int = READ_CHUNK_BYTES) -> Iterator[str]:
+    """Unfolded content lines of an iCalendar stream, read ``chunk_size`` bytes at a time"""
+    pending = b""
+    current: Optional[bytes] = None
+    while True:
+        chunk = stream.read(chunk_size)
+        if chunk:
+            pending += chunk
+            *lines, pending = pending.split(b"\n")
+        else:
+            lines, pending = ([pending] if pending else []), b""
+        for raw in lines:
+            raw = raw.rstrip(b"\r")
+            if raw[:1] in (b" ", b"\t") and current is not None:
+                current += raw[1:]
+            else:
+                if current:
+                    yield current.decode("utf-8", errors="replace")
+                current = raw
+            if current is not None and len(current) > ICS_MAX_LINE_BYTES:
+                raise ICSError(f"Content line longer than {ICS_MAX_LINE_BYTES} bytes")
+        if not chunk:
+            break
+        if len(pending) > ICS_MAX_LINE_BYTES:
+            raise ICSError(f"Content line longer than {ICS_MAX_LINE_BYTES} bytes")
+    if current:
+        yield current.decode("utf-8", errors="replace")
+
+def _split_unquoted(text: str, separator: str, maxsplit: int = -1) -> List[str]:
+    parts, start, in_quotes = [], 0, False
+    for i, char in enumerate(text):
+        if char == '"':
+            in_quotes = not in_quotes
+        elif char == separator and not in_quotes and maxsplit != 0:
+            parts.append(text[start:i])
+            start = i + 1
+            maxsplit -= 1
+    parts.append(text[start:])
+    return parts
+
+def parse_content_line(line: str) -> Tuple[str, Dict[str, str], str]:
+    """Split ``NAME;PARAM=value:VALUE`` respecting quoted parameter values"""
+    name, colon, value = line.partition(":")
+    if colon and '"' not in name:
+        # Fast path: no quoted parameters before the value
+        name, *raw_params = name.split(";")
+        params = {}
+        for param in raw_params:
+            key, _, param_value = param.partition("=")
+            params[key.strip().upper()] = param_value
+        return name.strip().upper(), params, value
+    head = _split_unquoted(line, ":", maxsplit=1)
+    if len(head) != 2:
+        raise ICSError(f"Malformed content line: {line[:80]}")
+    name, *raw_params = _split_unquoted(head[0], ";")
+    params = {}
+    for param in raw_params:
+        key, _, value = param.partition("=")
+        params[key.strip().upper()] = value.strip('"')
+    return name.strip().upper(), params, head[1]
+
+def iter_vevents(lines: Iterator[str]) -> Iterator[Dict[str, List[Property]]]:
+    """Property map of every top-level VEVENT (nested components such as VALARM are ignored)"""
+    stack: List[str] = []
+    event: Optional[Dict[str, List[Property]]] = None
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            name, params, value = parse_content_line(line)
+        except ICSError:
+            if not stack:
+                raise ICSError("Not an iCalendar file")
+            continue  # tolerate stray lines inside a calendar
+        if not stack and (name, value.upper()) != ("BEGIN", "VCALENDAR"):
+            raise ICSError("Not an iCalendar file")
+        if name == "BEGIN":
+            stack.append(value.upper())
+            if stack[-1] == "VEVENT" and len(stack) == 2:
+                event = {}
+        elif name == "END":
+            if stack and stack[-1] == "VEVENT" and event is not None:
+                yield event
+                event = None
+            if stack:
+                stack.pop()
+        elif event is not None and stack and stack[-1] == "VEVENT":
+            event.setdefault(name, []).append((params, value))
+
+def unescape_text(value: str) -> str:
+    return re.sub(r"\\([\\;,nN])", lambda m: "\n" if m.group(1) in "nN" else m.group(1), value)
+
+def _zone(tzid: Optional[str]) -> Optional[ZoneInfo]:
+    if not tzid:
+        return None
+    try:
+        return ZoneInfo(tzid.strip("/"))
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+def parse_time(params: Dict[str, str], value: str) -> Tuple[datetime, bool]:
+    """(naive UTC datetime, is a DATE value) for a DATE or DATE-TIME property.
+
+    Floating times and unknown TZIDs are taken as UTC.
+    """
+    value = value.strip()
+    utc = value.endswith("Z")
+    text = value[:-1] if utc else value
+    try:
+        if params.get("VALUE") == "DATE" or len(text) == 8:
+            return datetime(int(text[0:4]), int(text[4:6]), int(text[6:8])), True
+        if len(text) != 15 or text[8] != "T":
+            raise ValueError(text)
+        local = datetime(
+            int(text[0:4]), int(text[4:6]), int(text[6:8]),
+            int(text[9:11]), int(text[11:13]), int(text[13:15])
+        )
+    except ValueError:
+        raise ICSError(f"Invalid date-time: {value}")
+    if utc:
+        return local, False
+    zone = _zone(params.get("TZID"))
+    if zone is None:
+        return local, False
+    return local.replace(tzinfo=zone).astimezone(timezone.utc).replace(tzinfo=None), False
+
+def parse_duration(value: str) -> timedelta:
+    match = DURATION_PATTERN.match(value.strip().upper())
+    if not match or value.strip().upper() in ("P", "PT"):
+        raise ICSError(f"Invalid duration: {value}")
+    sign, weeks, days, hours, minutes, seconds = match.groups()
+    duration = timedelta(
+        weeks=int(weeks or 0), days=int(days or 0),
+        hours=int(hours or 0), minutes=int(minutes or 0), seconds=int(seconds or 0)
+    )
+    return -duration if sign == "-" else duration
+
+def _first(props: Dict[str, List[Property]], name: str) -> Optional[Property]:
+    values = props.get(name)
+    return values[0] if values else None
+
+def parse_event(props: Dict[str, List[Property]]) -> Dict:
+    """Column values for one VEVENT, plus ``ical_uid`` and ``recurrence_id``"""
+    dtstart = _first(props, "DTSTART")
+    if dtstart is None:
+        raise ICSError("VEVENT has no DTSTART")
+    start, all_day = parse_time(*dtstart)
+
+    dtend = _first(props, "DTEND")
+    duration = _first(props, "DURATION")
+    if dtend is not None:
+        end, _ = parse_time(*dtend)
+    elif duration is not None:
+        end = start + parse_duration(duration[1])
+    else:
+        end = start + (timedelta(days=1) if all_day else timedelta(0))
+    if end < start:
+        raise ICSError("VEVENT ends before it starts")
+
+    summary = _first(props, "SUMMARY")
+    description = _first(props, "DESCRIPTION")
+    title = unescape_text(summary[1]).strip() if summary else ""
+
+    uid = _first(props, "UID")
+    if uid and uid[1].strip():
+        ical_uid = uid[1].strip()
+    else:
+        # Stable fallback so re-importing the same file still deduplicates
+        ical_uid = hashlib.sha1(f"{start.isoformat()}|{title}".encode()).hexdigest() + "@import"
+
+    rrule = _first(props, "RRULE")
+    exdates: List[datetime] = []
+    for params, value in props.get("EXDATE", []):
+        exdates.extend(parse_time(params, item)[0] for item in value.split(",") if item.strip())
+
+    recurrence_id = _first(props, "RECURRENCE-ID")
+    zone = _zone(dtstart[0].get("TZID"))
+    return {
+        "ical_uid": ical_uid,
+        "recurrence_id": parse_time(*recurrence_id)[0] if recurrence_id else None,
+        "title": title or "(no title)",
+        "description": unescape_text(description[1]) if description else None,
+        "start": start,
+        "end": end,
+        "all_day": all_day,
+        "rrule": rrule[1].strip() if rrule and not recurrence_id else None,
+        "exdates": exdates,
+        "timezone": zone.key if zone is not None else None,
+        "cancelled": (_first(props, "STATUS") or ({}, ""))[1].strip().upper() == "CANCELLED",
+    }
+
+class ImportSummary:
+    __slots__ = ("created", "updated", "unchanged", "skipped", "errors", "event_ids")
+
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.skipped = 0
+        self.errors: List[str] = []
+        self.event_ids: List[int] = []  # updated rows, for cache invalidation
+
+    def skip(self, message: str):
+        self.skipped += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(message)
+
+    def to_dict(self) -> dict:
+        return {
+            "created": self.created,
+            "updated": self.updated,
+            "unchanged": self.unchanged,
+            "skipped": self.skipped,
+            "errors": self.errors,
+        }
+
+COMPARED_COLUMNS = ("title", "description", "start", "end", "all_day", "rrule", "exdates", "timezone")
+
+def _row(user_id: int, parsed: Dict) -> Dict:
+    """Column values with the derived fields ORM listeners would normally set"""
+    row = {
+        "ical_uid": parsed["ical_uid"],
+        "user_id": user_id,
+        "title": parsed["title"],
+        "description": parsed["description"],
+        "start": parsed["start"],
+        "end": parsed["end"],
+        "all_day": parsed["all_day"],
+        "rrule": None,
+        "exdates": None,
+        "timezone": None,
+        "recurrence_end": None,
+        "is_long": is_long_event(parsed["start"], parsed["end"]),
+    }
+    if parsed["rrule"]:
+        event = CalendarEvent(
+            start=parsed["start"],
+            end=parsed["end"],
+            rrule=parsed["rrule"],
+            exdates=dump_exdates(parsed["exdates"]),
+            timezone=parsed["timezone"]
+        )
+        apply_recurrence(event)
+        row.update(rrule=event.rrule, exdates=event.exdates, timezone=event.timezone, recurrence_end=event.recurrence_end)
+    return row
+
+def _same(existing: CalendarEvent, row: Dict) -> bool:
+    def normal(value):
+        return utc_naive(value) if isinstance(value, datetime) else value
+    return all(normal(getattr(existing, column)) == normal(row[column]) for column in COMPARED_COLUMNS)
+
+def upsert_batch(db: Session, user_id: int, rows: Dict[str, Dict], summary: ImportSummary):
+    """Insert or update one batch of rows keyed by UID, in a single transaction"""
+    existing = {
+        event.ical_uid: event
+        for event in db.query(CalendarEvent).filter(
+            CalendarEvent.user_id == user_id,
+            CalendarEvent.ical_uid.in_(list(rows))
+        )
+    }
+    inserts, updates = [], []
+    for uid, row in rows.items():
+        event = existing.get(uid)
+        if event is None:
+            inserts.append(row)
+        elif _same(event, row):
+            summary.unchanged += 1
+        else:
+            updates.append(dict(row, id=event.id))
+            summary.event_ids.append(event.id)
+    if inserts:
+        db.execute(insert(CalendarEvent), inserts)
+    if updates:
+        db.bulk_update_mappings(CalendarEvent, updates)
+    db.commit()
+    summary.created += len(inserts)
+    summary.updated += len(updates)
+
+def merge_overrides(db: Session, user_id: int, overrides: Dict[str, List[datetime]], summary: ImportSummary):
+    """Exclude the occurrences that modified instances replace from their series"""
+    uids = list(overrides)
+    for offset in range(0, len(uids), ICS_IMPORT_BATCH_SIZE):
+        chunk = uids[offset:offset + ICS_IMPORT_BATCH_SIZE]
+        masters = db.query(CalendarEvent).filter(
+            CalendarEvent.user_id == user_id,
+            CalendarEvent.ical_uid.in_(chunk),
+            CalendarEvent.rrule.isnot(None)
+        )
+        for master in masters:
+            current = parse_exdates(master.exdates)
+            merged = dump_exdates(current + overrides[master.ical_uid])
+            if merged != master.exdates:
+                master.exdates = merged
+                apply_recurrence(master)
+                summary.event_ids.append(master.id)
+        db.commit()
+
+def collect_overrides(stream: BinaryIO) -> Dict[str, List[datetime]]:
+    """RECURRENCE-ID values per UID, from a scan that only parses those two properties"""
+    overrides: Dict[str, List[datetime]] = {}
+    uid = recurrence_id = None
+    for line in iter_lines(stream):
+        upper = line[:14].upper()
+        if upper.startswith("BEGIN:VEVENT"):
+            uid = recurrence_id = None
+        elif upper.startswith("UID") and line[3:4] in (":", ";"):
+            uid = line.partition(":")[2].strip()
+        elif upper.startswith("RECURRENCE-ID"):
+            recurrence_id = line
+        elif upper.startswith("END:VEVENT") and uid and recurrence_id:
+            try:
+                _, params, value = parse_content_line(recurrence_id)
+                overrides.setdefault(uid, []).append(parse_time(params, value)[0])
+            except ICSError:
+                pass
+    return overrides
+
+def import_events(
+    db: Session,
+    user_id: int,
+    stream: BinaryIO,
+    batch_size: int = ICS_IMPORT_BATCH_SIZE,
+    summary: Optional[ImportSummary] = None,
+) -> ImportSummary:
+    """Stream VEVENTs from ``stream`` and upsert them by UID in batches.
+
+    Memory is bounded by the batch size: the file is read in chunks and
+    each batch is committed before the next is parsed, so a failure part
+    way through leaves earlier batches imported (re-importing is safe).
+    Modified instances of a recurring series (RECURRENCE-ID) are imported
+    as single events and excluded from their series; for seekable streams
+    they are found in a cheap first pass, otherwise the series are patched
+    after the main pass.
+    """
+    summary = summary if summary is not None else ImportSummary()
+    batch: Dict[str, Dict] = {}
+    overrides: Dict[str, List[datetime]] = {}
+    if stream.seekable():
+        # A first pass finds modified instances so series are written complete
+        overrides = collect_overrides(stream)
+        stream.seek(0)
+
+    for props in iter_vevents(iter_lines(stream)):
+        try:
+            parsed = parse_event(props)
+            if parsed["cancelled"]:
+                summary.skip(f"{parsed['ical_uid']}: cancelled")
+                continue
+            uid = parsed["ical_uid"]
+            if parsed["recurrence_id"] is not None:
+                instances = overrides.setdefault(uid, [])
+                if parsed["recurrence_id"] not in instances:
+                    instances.append(parsed["recurrence_id"])
+                uid = parsed["ical_uid"] = f"{uid}#{parsed['recurrence_id'].strftime('%Y%m%dT%H%M%SZ')}"
+            elif parsed["rrule"] and uid in overrides:
+                parsed["exdates"] = parsed["exdates"] + overrides[uid]
+            row = _row(user_id, parsed)
+        except (ICSError, InvalidRecurrence) as e:
+            uid = _first(props, "UID")
+            summary.skip(f"{uid[1].strip() if uid else 'VEVENT without UID'}: {e}")
+            continue
+        if uid in batch:
+            # Later duplicates of a UID in the same file win
+            summary.skip(f"{uid}: duplicate UID")
+        batch[uid] = row
+        if len(batch) >= batch_size:
+            upsert_batch(db, user_id, batch, summary)
+            batch = {}
+
+    if batch:
+        upsert_batch(db, user_id, batch, summary)
+    if overrides:
+        merge_overrides(db, user_id, overrides, summary)
+    return summary
@@ -0,0 +1,100 @@
+from typing import List, Tuple
+
+Interval = Tuple[int, int]
+
+def merge_intervals(intervals: List[Interval]) -> List[Interval]:
+    """Sort and merge overlapping or touching half-open intervals"""
+    merged: List[Interval] = []
+    for start, end in sorted(intervals):
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+def subtract_intervals(windows: List[Interval], busy: List[Interval]) -> List[Interval]:
+    """Remove merged, sorted ``busy`` intervals from sorted, disjoint ``windows``"""
+    free: List[Interval] = []
+    j = 0
+    for start, end in windows:
+        while j < len(busy) and busy[j][1] <= start:
+            j += 1
+        cursor = start
+        k = j
+        while k < len(busy) and busy[k][0] < end:
+            if busy[k][0] > cursor:
+                free.append((cursor, busy[k][0]))
+            cursor = max(cursor, busy[k][1])
+            k += 1
+        if cursor < end:
+            free.append((cursor, end))
+    return free
+
+class MaxTree:
+    """Segment tree over a fixed array supporting point updates and
+    "leftmost index at or after ``lo`` whose value is >= ``x``" queries,
+    both in O(log n).
+    """
+
+    def __init__(self, values: List[int]):
+        self.n = len(values)
+        size = 1
+        while size < max(self.n, 1):
+            size *= 2
+        self.size = size
+        self.tree = [-1] * (2 * size)
+        self.tree[size:size + self.n] = values
+        for i in range(size - 1, 0, -1):
+            self.tree[i] = max(self.tree[2 * i], self.tree[2 * i + 1])
+
+    def __getitem__(self, index: int) -> int:
+        return self.tree[self.size + index]
+
+    def update(self, index: int, value: int):
+        i = self.size + index
+        self.tree[i] = value
+        i //= 2
+        while i:
+            self.tree[i] = max(self.tree[2 * i], self.tree[2 * i + 1])
+            i //= 2
+
+    def find_first(self, x: int, lo: int = 0) -> int:
+        """Return the leftmost index >= ``lo`` with value >= ``x``, or -1"""
+        if lo >= self.n or self.tree[1] < x:
+            return -1
+        return self._find(1, 0, self.size, x, lo)
+
+    def _find(self, node: int, left: int, right: int, x: int, lo: int) -> int:
+        if right <= lo or self.tree[node] < x:
+            return -1
+        if right - left == 1:
+            return left if left < self.n else -1
+        mid = (left + right) // 2
+        found = self._find(2 * node, left, mid, x, lo)
+        if found != -1:
+            return found
+        return self._find(2 * node + 1, mid, right, x, lo)
+
+class FreeIntervalIndex:
+    """Sorted, disjoint free intervals with O(log n) first-fit allocation"""
+
+    def __init__(self, free: List[Interval]):
+        self.starts = [start for start, _ in free]
+        self.ends = [end for _, end in free]
+        self.lengths = MaxTree([end - start for start, end in free])
+
+    def allocate(self, length: int) -> int:
+        """Reserve ``length`` units at the earliest fitting position.
+
+        Returns the start of the reserved slot, or -1 if nothing fits.
+        """
+        index = self.lengths.find_first(length)
+        if index == -1:
+            return -1
+        start = self.starts[index]
+        self.starts[index] = start + length
+        self.lengths.update(index, self.ends[index] - self.starts[index])
+        return start
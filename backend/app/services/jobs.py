@@ -0,0 +1,134 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+import threading
+import uuid
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Background job configuration
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_RETENTION_MINUTES = int(os.getenv("JOB_RETENTION_MINUTES", "60"))
+
+class Job:
+    """A unit of background work with per-item progress.
+
+    Results are stored positionally so callers can poll and read partial
+    results while the remaining items are still being processed.
+    """
+
+    def __init__(self, kind: str, user_id: int, total: int):
+        self.id = str(uuid.uuid4())
+        self.kind = kind
+        self.user_id = user_id
+        self.total = total
+        self.completed = 0
+        self.failed = 0
+        self.status = "queued"
+        self.results: List[Any] = [None] * total
+        self.errors: List[str] = []
+        self.created_at = datetime.utcnow()
+        self.finished_at: Optional[datetime] = None
+        self._pending_chunks = 0
+        self._lock = threading.Lock()
+
+    def set_result(self, index: int, result: Any):
+        with self._lock:
+            self.results[index] = result
+            self.completed += 1
+
+    def set_error(self, index: int, error: str):
+        with self._lock:
+            self.failed += 1
+            self.errors.append(f"item {index}: {error}")
+
+    def fail_unfinished(self, indexes: List[int], error: str):
+        """Record ``error`` for the items in ``indexes`` that have no result yet"""
+        with self._lock:
+            for index in indexes:
+                if self.results[index] is None:
+                    self.failed += 1
+                    self.errors.append(f"item {index}: {error}")
+
+    def _chunk_done(self):
+        with self._lock:
+            self._pending_chunks -= 1
+            if self._pending_chunks == 0:
+                self.status = "failed" if self.failed == self.total and self.total else "completed"
+                self.finished_at = datetime.utcnow()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "kind": self.kind,
+                "status": self.status,
+                "total": self.total,
+                "completed": self.completed,
+                "failed": self.failed,
+                "results": list(self.results),
+                "errors": list(self.errors),
+                "created_at": self.created_at,
+                "finished_at": self.finished_at,
+            }
+
+class JobStore:
+    """In-process job registry backed by a bounded worker pool."""
+
+    def __init__(self, max_workers: int = JOB_WORKERS, retention_minutes: int = JOB_RETENTION_MINUTES):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._retention = timedelta(minutes=retention_minutes)
+
+    def create(self, kind: str, user_id: int, total: int) -> Job:
+        job = Job(kind, user_id, total)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str, user_id: int) -> Optional[Job]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None or job.user_id != user_id:
+            return None
+        return job
+
+    def submit(self, job: Job, chunks: List[List[int]], worker: Callable[[Job, List[int]], None]):
+        """Run ``worker(job, indexes)`` for every chunk on the shared pool."""
+        if not chunks:
+            job._pending_chunks = 1
+            job._chunk_done()
+            return
+
+        with job._lock:
+            job._pending_chunks = len(chunks)
+            job.status = "running"
+        for indexes in chunks:
+            self._executor.submit(self._run_chunk, job, indexes, worker)
+
+    def _run_chunk(self, job: Job, indexes: List[int], worker: Callable[[Job, List[int]], None]):
+        try:
+            worker(job, indexes)
+        except Exception as e:
+            job.fail_unfinished(indexes, str(e))
+        finally:
+            job._chunk_done()
+
+    def _prune(self):
+        cutoff = datetime.utcnow() - self._retention
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+# Shared job store used by routers
+job_store = JobStore()
@@ -0,0 +1,216 @@
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from typing import Callable, Optional
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# LLM provider configuration
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openai")  # openai, stub, record, replay
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")  # e.g. the local stub server
+LLM_STUB_LATENCY = os.getenv("LLM_STUB_LATENCY", "none")
+LLM_STUB_SEED = os.getenv("LLM_STUB_SEED")
+LLM_FIXTURES_DIR = os.getenv("LLM_FIXTURES_DIR", "fixtures/llm")
+LLM_REPLAY_LATENCY = os.getenv("LLM_REPLAY_LATENCY", "recorded")  # recorded, or a stub latency spec
+
+class LLMError(Exception):
+    pass
+
+@dataclass
+class LLMResult:
+    content: str
+    prompt_tokens: int
+    completion_tokens: int
+    model: str
+    latency: float = 0.0
+
+class LLMProvider(ABC):
+    """Interface for chat-completion backends used by the AI routers"""
+
+    name = "base"
+
+    @abstractmethod
+    def complete(self, prompt: str, max_tokens: int, temperature: float = 0.7) -> LLMResult:
+        ...
+
+class OpenAIProvider(LLMProvider):
+    name = "openai"
+
+    def __init__(self, api_key: Optional[str] = None, model: str = OPENAI_MODEL, base_url: Optional[str] = OPENAI_BASE_URL):
+        from openai import OpenAI
+
+        self.model = model
+        self.client = OpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"), base_url=base_url)
+
+    def complete(self, prompt: str, max_tokens: int, temperature: float = 0.7) -> LLMResult:
+        started = time.perf_counter()
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=max_tokens,
+            temperature=temperature
+        )
+        usage = response.usage
+        return LLMResult(
+            content=response.choices[0].message.content or "",
+            prompt_tokens=usage.prompt_tokens if usage else 0,
+            completion_tokens=usage.completion_tokens if usage else 0,
+            model=response.model,
+            latency=time.perf_counter() - started
+        )
+
+def parse_latency(spec: str, rng: random.Random) -> Callable[[], float]:
+    """Build a latency sampler (seconds) from a spec string.
+
+    Supported specs: ``none``, ``fixed:S``, ``uniform:LO,HI``,
+    ``normal:MEAN,STDDEV`` and ``lognormal:MU,SIGMA``.
+    """
+    kind, _, args = spec.partition(":")
+    params = [float(arg) for arg in args.split(",") if arg]
+    if kind == "none":
+        return lambda: 0.0
+    if kind == "fixed":
+        return lambda: params[0]
+    if kind == "uniform":
+        return lambda: rng.uniform(params[0], params[1])
+    if kind == "normal":
+        return lambda: max(0.0, rng.gauss(params[0], params[1]))
+    if kind == "lognormal":
+        return lambda: rng.lognormvariate(params[0], params[1])
+    raise LLMError(f"Unknown latency spec: {spec}")
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)"""
+    return len(text) // 4 + 1
+
+class StubProvider(LLMProvider):
+    """Offline provider returning well-formed canned JSON after a sampled delay"""
+
+    name = "stub"
+    command_pattern = re.compile(r'^(\d+)\. (".*")$', re.MULTILINE)
+
+    def __init__(
+        self,
+        latency: str = LLM_STUB_LATENCY,
+        seed: Optional[str] = LLM_STUB_SEED,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self._rng = random.Random(seed)
+        self._sleep = sleep
+        self._rng_lock = threading.Lock()
+        self._sample = parse_latency(latency, self._rng)
+
+    def sample_latency(self) -> float:
+        with self._rng_lock:
+            return self._sample()
+
+    def complete(self, prompt: str, max_tokens: int, temperature: float = 0.7) -> LLMResult:
+        delay = self.sample_latency()
+        self._sleep(delay)
+        result = self.render(prompt, max_tokens)
+        result.latency = delay
+        return result
+
+    def render(self, prompt: str, max_tokens: int) -> LLMResult:
+        """Build the canned response for a prompt without any delay"""
+        commands = self.command_pattern.findall(prompt)
+        if commands:
+            content = json.dumps({"results": [
+                self._response(json.loads(command), index=int(index)) for index, command in commands
+            ]})
+        else:
+            quoted = re.search(r'"(.+?)"', prompt)
+            content = json.dumps(self._response(quoted.group(1) if quoted else "stub"))
+
+        return LLMResult(
+            content=content,
+            prompt_tokens=estimate_tokens(prompt),
+            completion_tokens=min(estimate_tokens(content), max_tokens),
+            model="stub"
+        )
+
+    @staticmethod
+    def _response(command: str, index: Optional[int] = None) -> dict:
+        response = {
+            "tasks": [{"title": command[:100], "description": "Stub task", "priority": "medium"}],
+            "message": f"Parsed command: {command}",
+            "confidence": 1.0,
+        }
+        if index is not None:
+            response["index"] = index
+        return response
+
+class RecordReplayProvider(LLMProvider):
+    """Records responses of an inner provider to fixtures, or replays them offline.
+
+    Fixtures are keyed by a hash of the prompt and completion parameters so
+    repeated load-test runs hit the same recordings.
+    """
+
+    def __init__(
+        self,
+        mode: str,
+        fixtures_dir: str = LLM_FIXTURES_DIR,
+        inner: Optional[LLMProvider] = None,
+        replay_latency: str = LLM_REPLAY_LATENCY,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        if mode not in ("record", "replay"):
+            raise LLMError(f"Unknown record/replay mode: {mode}")
+        if mode == "record" and inner is None:
+            raise LLMError("Record mode requires an inner provider")
+        self.name = mode
+        self.mode = mode
+        self.fixtures_dir = fixtures_dir
+        self.inner = inner
+        self._sleep = sleep
+        self._sample = None if replay_latency == "recorded" else parse_latency(replay_latency, random.Random())
+        os.makedirs(fixtures_dir, exist_ok=True)
+
+    def fixture_path(self, prompt: str, max_tokens: int, temperature: float) -> str:
+        key = json.dumps([prompt, max_tokens, temperature])
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.fixtures_dir, f"{digest}.json")
+
+    def complete(self, prompt: str, max_tokens: int, temperature: float = 0.7) -> LLMResult:
+        path = self.fixture_path(prompt, max_tokens, temperature)
+
+        if self.mode == "record":
+            result = self.inner.complete(prompt, max_tokens, temperature)
+            with open(path, "w") as fixture:
+                json.dump({"prompt": prompt, "result": asdict(result)}, fixture, indent=2)
+            return result
+
+        try:
+            with open(path) as fixture:
+                result = LLMResult(**json.load(fixture)["result"])
+        except FileNotFoundError:
+            raise LLMError(f"No recorded response for prompt (fixture {os.path.basename(path)})")
+
+        self._sleep(self._sample() if self._sample else result.latency)
+        return result
+
+def create_llm_provider(name: str = LLM_PROVIDER) -> LLMProvider:
+    if name == "openai":
+        return OpenAIProvider()
+    if name == "stub":
+        return StubProvider()
+    if name == "record":
+        return RecordReplayProvider("record", inner=OpenAIProvider())
+    if name == "replay":
+        return RecordReplayProvider("replay")
+    raise LLMError(f"Unknown LLM provider: {name}")
+
+@lru_cache()
+def get_llm_provider() -> LLMProvider:
+    """Process-wide provider selected by LLM_PROVIDER"""
+    return create_llm_provider()
@@ -0,0 +1,186 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from email.message import EmailMessage
+from functools import lru_cache
+from typing import List, Optional
+import random
+import smtplib
+import threading
+import time
+import uuid
+import os
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Email provider: none, sendgrid, smtp or fake (in memory)
+EMAIL_PROVIDER = os.getenv("EMAIL_PROVIDER", "none")
+FROM_EMAIL = os.getenv("FROM_EMAIL", "noreply@localhost")
+EMAIL_TIMEOUT_SECONDS = float(os.getenv("EMAIL_TIMEOUT_SECONDS", "10"))
+# Point SENDGRID_API_URL at fake_sendgrid.py in tests
+SENDGRID_API_URL = os.getenv("SENDGRID_API_URL", "https://api.sendgrid.com").rstrip("/")
+SMTP_HOST = os.getenv("SMTP_HOST", "localhost")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_USERNAME = os.getenv("SMTP_USERNAME")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() == "true"
+FAKE_EMAIL_LATENCY = float(os.getenv("FAKE_EMAIL_LATENCY", "0"))
+FAKE_EMAIL_FAILURE_RATE = float(os.getenv("FAKE_EMAIL_FAILURE_RATE", "0"))
+
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+class EmailError(Exception):
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+@dataclass
+class OutgoingEmail:
+    to: str
+    subject: str
+    body: str
+    from_email: str = FROM_EMAIL
+
+class EmailProvider(ABC):
+    """Interface for email backends used by the outbox worker.
+
+    ``send`` is called from worker threads, several at a time, and returns
+    the provider's message id. Failures raise EmailError; ``retryable``
+    says whether the same message may succeed later.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def send(self, email: OutgoingEmail) -> str:
+        ...
+
+class SendGridProvider(EmailProvider):
+    """SendGrid v3 mail/send over a pooled HTTP client"""
+
+    name = "sendgrid"
+
+    def __init__(self, api_key: Optional[str] = None, base_url: str = SENDGRID_API_URL, http: Optional[httpx.Client] = None):
+        self.api_key = api_key or os.getenv("SENDGRID_API_KEY")
+        self.base_url = base_url.rstrip("/")
+        self.http = http or httpx.Client(timeout=EMAIL_TIMEOUT_SECONDS)
+
+    def send(self, email: OutgoingEmail) -> str:
+        try:
+            response = self.http.post(
+                f"{self.base_url}/v3/mail/send",
+                json={
+                    "personalizations": [{"to": [{"email": email.to}]}],
+                    "from": {"email": email.from_email},
+                    "subject": email.subject,
+                    "content": [{"type": "text/plain", "value": email.body}],
+                },
+                headers={"Authorization": f"Bearer {self.api_key}"},
+            )
+        except httpx.HTTPError as e:
+            raise EmailError(f"SendGrid request failed: {e}")
+        if response.status_code >= 300:
+            raise EmailError(
+                f"SendGrid returned {response.status_code}: {response.text[:200]}",
+                retryable=response.status_code in RETRYABLE_STATUSES
+            )
+        return response.headers.get("x-message-id", "")
+
+class SMTPProvider(EmailProvider):
+    """Plain SMTP, keeping one connection open per worker thread"""
+
+    name = "smtp"
+
+    def __init__(
+        self,
+        host: str = SMTP_HOST,
+        port: int = SMTP_PORT,
+        username: Optional[str] = SMTP_USERNAME,
+        password: Optional[str] = SMTP_PASSWORD,
+        starttls: bool = SMTP_STARTTLS,
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self._local = threading.local()
+
+    def _connection(self) -> smtplib.SMTP:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = smtplib.SMTP(self.host, self.port, timeout=EMAIL_TIMEOUT_SECONDS)
+            if self.starttls:
+                connection.starttls()
+            if self.username:
+                connection.login(self.username, self.password or "")
+            self._local.connection = connection
+        return connection
+
+    def _reset(self):
+        connection = getattr(self._local, "connection", None)
+        self._local.connection = None
+        if connection is not None:
+            try:
+                connection.close()
+            except OSError:
+                pass
+
+    def send(self, email: OutgoingEmail) -> str:
+        message = EmailMessage()
+        message_id = f"<{uuid.uuid4().hex}@{email.from_email.rpartition('@')[2] or 'localhost'}>"
+        message["From"] = email.from_email
+        message["To"] = email.to
+        message["Subject"] = email.subject
+        message["Message-ID"] = message_id
+        message.set_content(email.body)
+        try:
+            self._connection().send_message(message)
+        except smtplib.SMTPRecipientsRefused as e:
+            raise EmailError(f"Recipient refused: {e}", retryable=False)
+        except smtplib.SMTPResponseException as e:
+            self._reset()
+            # 4xx replies are transient, 5xx are permanent
+            raise EmailError(f"SMTP error {e.smtp_code}: {e.smtp_error!r}", retryable=e.smtp_code < 500)
+        except (smtplib.SMTPException, OSError) as e:
+            self._reset()
+            raise EmailError(f"SMTP delivery failed: {e}")
+        return message_id
+
+class FakeEmailProvider(EmailProvider):
+    """Keeps sent emails in memory, with optional latency and failures, for tests and benchmarks"""
+
+    name = "fake"
+
+    def __init__(self, latency: float = FAKE_EMAIL_LATENCY, failure_rate: float = FAKE_EMAIL_FAILURE_RATE, seed: Optional[int] = None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.sent: List[OutgoingEmail] = []
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def send(self, email: OutgoingEmail) -> str:
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            if self.failure_rate and self._rng.random() < self.failure_rate:
+                raise EmailError("Fake provider failure")
+            self.sent.append(email)
+            return f"fake-{len(self.sent)}"
+
+def create_email_provider(name: str = EMAIL_PROVIDER) -> Optional[EmailProvider]:
+    if name == "none":
+        return None
+    if name == "sendgrid":
+        return SendGridProvider()
+    if name == "smtp":
+        return SMTPProvider()
+    if name == "fake":
+        return FakeEmailProvider()
+    raise EmailError(f"Unknown email provider: {name}", retryable=False)
+
+@lru_cache()
+def get_email_provider() -> Optional[EmailProvider]:
+    """Process-wide provider selected by EMAIL_PROVIDER; None disables email"""
+    return create_email_provider()
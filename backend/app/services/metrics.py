@@ -0,0 +1,199 @@
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import logging
+import math
+import threading
+
+LabelValues = Tuple[str, ...]
+
+# Latency buckets in seconds, upper bounds inclusive
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+logger = logging.getLogger(__name__)
+
+class Metric:
+    """Base class for labelled metrics kept in process memory"""
+
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple([str(labels.get(label, "")) for label in self.labels])
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[Tuple[Dict[str, str], float]]:
+        with self._lock:
+            items = list(self._values.items())
+        return [(dict(zip(self.labels, key)), value) for key, value in items]
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+class Histogram(Metric):
+    """Observations counted into fixed buckets, plus their count and sum"""
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(float(bound) for bound in buckets if bound != math.inf))
+        # label values -> [count per bucket..., count above the last bucket, sum]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 2)
+            counts[index] += 1
+            counts[-1] += value
+
+    def get(self, **labels) -> float:
+        """Number of observations"""
+        counts = self._values.get(self._key(labels))
+        return sum(counts[:-1]) if counts else 0
+
+    def samples(self) -> List[Tuple[Dict[str, str], dict]]:
+        with self._lock:
+            items = [(key, list(counts)) for key, counts in self._values.items()]
+        samples = []
+        for key, counts in items:
+            cumulative = 0
+            buckets = {}
+            for bound, count in zip(self.buckets + (math.inf,), counts[:-1]):
+                cumulative += count
+                buckets[_format_value(bound)] = cumulative
+            samples.append((dict(zip(self.labels, key)), {"count": cumulative, "sum": counts[-1], "buckets": buckets}))
+        return samples
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if value != value:
+        return "NaN"
+    if float(value).is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for name, value in labels.items()
+    )
+    return "{" + pairs + "}"
+
+class MetricsRegistry:
+    """Named collection of metrics shared by routers and background services"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name: str, help: str, labels: Iterable[str], **options) -> Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, help, labels, **options)
+                self._metrics[name] = metric
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} already registered as {metric.type}")
+            return metric
+
+    def counter(self, name: str, help: str, labels: Iterable[str] = ()) -> Counter:
+        return self._register(Counter, name, help, labels)
+
+    def gauge(self, name: str, help: str, labels: Iterable[str] = ()) -> Gauge:
+        return self._register(Gauge, name, help, labels)
+
+    def histogram(self, name: str, help: str, labels: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, help, labels, buckets=buckets)
+
+    def collector(self, func: Callable[[], None]) -> Callable[[], None]:
+        """Register ``func`` to refresh gauges (pool sizes, cache sizes, ...)
+        right before every scrape; usable as a decorator.
+        """
+        with self._lock:
+            self._collectors.append(func)
+        return func
+
+    def collect(self):
+        with self._lock:
+            collectors = list(self._collectors)
+        for func in collectors:
+            try:
+                func()
+            except Exception:
+                logger.exception("Metrics collector %s failed", getattr(func, "__name__", func))
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self._metrics.get(name)
+
+    def metrics(self) -> List[Metric]:
+        with self._lock:
+            return list(self._metrics.values())
+
+    def snapshot(self, prefix: str = "") -> Dict[str, List[dict]]:
+        """JSON-friendly view of all metrics whose name starts with ``prefix``"""
+        self.collect()
+        return {
+            metric.name: [{"labels": labels, "value": value} for labels, value in metric.samples()]
+            for metric in self.metrics()
+            if metric.name.startswith(prefix)
+        }
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+        self.collect()
+        lines = []
+        for metric in sorted(self.metrics(), key=lambda metric: metric.name):
+            help = metric.help.replace("\\", "\\\\").replace("\n", "\\n")
+            lines.append(f"# HELP {metric.name} {help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for labels, value in metric.samples():
+                if isinstance(metric, Histogram):
+                    for bound, count in value["buckets"].items():
+                        bucket_labels = dict(labels, le=bound)
+                        lines.append(f"{metric.name}_bucket{_format_labels(bucket_labels)} {count}")
+                    lines.append(f"{metric.name}_sum{_format_labels(labels)} {_format_value(value['sum'])}")
+                    lines.append(f"{metric.name}_count{_format_labels(labels)} {value['count']}")
+                else:
+                    lines.append(f"{metric.name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+# Process-wide registry
+registry = MetricsRegistry()
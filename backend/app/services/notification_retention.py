@@ -0,0 +1,119 @@
+from datetime import datetime, timedelta
+from typing import Optional
+import asyncio
+import logging
+import time
+import os
+from dotenv import load_dotenv
+from sqlalchemy import delete, select, true
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models import Notification
+from app.services.metrics import registry
+
+load_dotenv()
+
+# Read notifications older than this many days are purged (0 keeps them forever)
+NOTIFICATION_RETENTION_DAYS = int(os.getenv("NOTIFICATION_RETENTION_DAYS", "90"))
+NOTIFICATION_PURGE_BATCH_SIZE = int(os.getenv("NOTIFICATION_PURGE_BATCH_SIZE", "1000"))
+NOTIFICATION_PURGE_INTERVAL_SECONDS = float(os.getenv("NOTIFICATION_PURGE_INTERVAL_SECONDS", "3600"))
+# Pause between batches so a large backlog doesn't monopolise the database
+NOTIFICATION_PURGE_PAUSE_SECONDS = float(os.getenv("NOTIFICATION_PURGE_PAUSE_SECONDS", "0.1"))
+
+logger = logging.getLogger(__name__)
+
+purge_runs = registry.counter("notification_purge_runs_total", "Notification retention purges run", ["result"])
+purged_rows = registry.counter("notifications_purged_total", "Read notifications deleted by retention")
+purge_last_rows = registry.gauge("notification_purge_last_rows", "Notifications deleted by the last purge")
+
+def purge_batch(db: Session, cutoff: datetime, batch_size: int) -> int:
+    """Delete up to ``batch_size`` read notifications created before ``cutoff``
+    in one transaction. Returns the number deleted.
+
+    Only read notifications are purged, so unread counters never change.
+    """
+    candidates = select(Notification.id).where(
+        Notification.read == true(),
+        Notification.created_at < cutoff
+    ).order_by(Notification.created_at).limit(batch_size)
+    if db.get_bind().dialect.name == "postgresql":
+        candidates = candidates.with_for_update(skip_locked=True)
+
+    deleted = db.execute(
+        delete(Notification).where(Notification.id.in_(candidates.scalar_subquery())),
+        execution_options={"synchronize_session": False}
+    ).rowcount
+    db.commit()
+    return deleted
+
+def purge_read_notifications(
+    db: Session,
+    now: Optional[datetime] = None,
+    retention_days: int = NOTIFICATION_RETENTION_DAYS,
+    batch_size: int = NOTIFICATION_PURGE_BATCH_SIZE,
+    pause_seconds: float = 0,
+) -> int:
+    """Purge read notifications past retention, one bounded batch at a time"""
+    if retention_days <= 0:
+        return 0
+    cutoff = (now or datetime.utcnow()) - timedelta(days=retention_days)
+    total = 0
+    try:
+        while True:
+            deleted = purge_batch(db, cutoff, batch_size)
+            total += deleted
+            if deleted < batch_size:
+                break
+            if pause_seconds:
+                time.sleep(pause_seconds)
+    except Exception:
+        db.rollback()
+        purge_runs.inc(result="error")
+        raise
+    finally:
+        purged_rows.inc(total)
+        purge_last_rows.set(total)
+
+    purge_runs.inc(result="ok")
+    return total
+
+class NotificationPurger:
+    """Background task running ``purge_read_notifications`` every interval"""
+
+    def __init__(self, interval: float = NOTIFICATION_PURGE_INTERVAL_SECONDS, retention_days: int = NOTIFICATION_RETENTION_DAYS):
+        self.interval = interval
+        self.retention_days = retention_days
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None and self.interval > 0 and self.retention_days > 0:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _purge_once(self) -> int:
+        db = SessionLocal()
+        try:
+            return purge_read_notifications(db, retention_days=self.retention_days, pause_seconds=NOTIFICATION_PURGE_PAUSE_SECONDS)
+        finally:
+            db.close()
+
+    async def _run(self):
+        while True:
+            try:
+                deleted = await asyncio.to_thread(self._purge_once)
+                if deleted:
+                    logger.info("Purged %d old read notifications", deleted)
+            except Exception:
+                logger.exception("Notification retention purge failed")
+            await asyncio.sleep(self.interval)
+
+# Shared purger started with the application
+notification_purger = NotificationPurger()
@@ -0,0 +1,315 @@
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional
+import os
+from dotenv import load_dotenv
+from sqlalchemy import delete, event, false, func, insert, select, update
+from sqlalchemy.orm import Session, attributes
+from app.database import SessionLocal
+from app.models import EmailOutbox, EmailStatus, Notification, NotificationType, User
+from app.services.email_outbox import enqueue_email, mark_enqueued
+from app.services.mail import EMAIL_PROVIDER
+from app.services.pubsub import pubsub
+
+load_dotenv()
+
+# Notification types that are also emailed when an email provider is configured
+EMAIL_NOTIFICATION_TYPES = {value.strip() for value in os.getenv("EMAIL_NOTIFICATION_TYPES", "warning,error").split(",") if value.strip()}
+# Recipients per multi-row INSERT (and transaction) when fanning out
+NOTIFICATION_FANOUT_BATCH_SIZE = int(os.getenv("NOTIFICATION_FANOUT_BATCH_SIZE", "1000"))
+
+# Session.info key holding notifications flushed in the current transaction
+PENDING_KEY = "pending_notifications"
+
+def notification_topic(user_id: int) -> str:
+    return f"user:{user_id}:notifications"
+
+def notification_payload(notification: Notification) -> dict:
+    """Notification fields for the push channel, read without touching the database"""
+    values = notification.__dict__
+    type = values.get("type") or NotificationType.info
+    return {
+        "id": values.get("id"),
+        "title": values.get("title"),
+        "message": values.get("message"),
+        "type": type.value if isinstance(type, NotificationType) else type,
+        "task_id": values.get("task_id"),
+        "user_id": values.get("user_id"),
+        "read": bool(values.get("read")),
+        # server default, not loaded back after the insert
+        "created_at": values.get("created_at") or datetime.utcnow(),
+    }
+
+def notification_message(payload: dict) -> dict:
+    return {"event": "notification", "id": payload["id"], "data": payload}
+
+def publish_notification(payload: dict):
+    pubsub.publish(notification_topic(payload["user_id"]), notification_message(payload))
+
+def create_notification(
+    db: Session,
+    user_id: int,
+    title: str,
+    message: str,
+    type: NotificationType = NotificationType.info,
+    task_id: Optional[int] = None,
+    email: Optional[bool] = None,
+) -> Notification:
+    """Add a notification in the caller's transaction (does not commit).
+
+    Every notification the backend creates goes through here, so delivery
+    side effects have one place to hook in. Notifications added through
+    the ORM are pushed to the user's stream once their transaction commits.
+    ``email`` queues an email copy in the same transaction; by default
+    that happens for EMAIL_NOTIFICATION_TYPES when email is configured.
+    """
+    notification = Notification(
+        title=title,
+        message=message,
+        type=type,
+        task_id=task_id,
+        user_id=user_id
+    )
+    db.add(notification)
+    if email is None:
+        email = emails_by_default(type)
+    if email:
+        enqueue_email(db, user_id, title, message, notification=notification)
+    return notification
+
+def emails_by_default(type: NotificationType) -> bool:
+    return EMAIL_PROVIDER != "none" and NotificationType(type).value in EMAIL_NOTIFICATION_TYPES
+
+def _recipient_batches(db: Session, user_ids: Optional[Iterable[int]], batch_size: int) -> Iterator[List[int]]:
+    """Existing user ids in ascending batches; every user when ``user_ids`` is None"""
+    if user_ids is None:
+        last = 0
+        while True:
+            batch = db.execute(
+                select(User.id).where(User.id > last).order_by(User.id).limit(batch_size)
+            ).scalars().all()
+            if not batch:
+                return
+            yield batch
+            last = batch[-1]
+    else:
+        wanted = sorted(set(user_ids))
+        for offset in range(0, len(wanted), batch_size):
+            chunk = wanted[offset:offset + batch_size]
+            batch = db.execute(select(User.id).where(User.id.in_(chunk)).order_by(User.id)).scalars().all()
+            if batch:
+                yield batch
+
+def bulk_create_notifications(db: Session, rows: List[dict], email: bool = False, kind: str = "notification") -> int:
+    """Insert many notifications with one multi-row INSERT (does not commit).
+
+    ``rows`` hold user_id, title and message, and optionally type and
+    task_id. Core inserts skip the ORM flush hooks, so this does their
+    work: unread counters, outbox emails (when ``email``) and queueing the
+    push that runs once the caller commits. Returns the number inserted.
+    """
+    if not rows:
+        return 0
+    now = datetime.utcnow()
+    values = [
+        {
+            "user_id": row["user_id"], "title": row["title"], "message": row["message"],
+            "type": NotificationType(row.get("type") or NotificationType.info),
+            "task_id": row.get("task_id"), "read": False, "created_at": now,
+        }
+        for row in rows
+    ]
+    columns = (Notification.id, Notification.user_id, Notification.title, Notification.message, Notification.type, Notification.task_id)
+    if db.get_bind().dialect.insert_executemany_returning:
+        inserted = [dict(row._mapping) for row in db.execute(insert(Notification).returning(*columns), values)]
+    else:
+        db.execute(insert(Notification), values)
+        inserted = [dict(value, id=None) for value in values]
+
+    if email:
+        db.execute(insert(EmailOutbox), [
+            {
+                "user_id": row["user_id"], "notification_id": row["id"], "kind": kind,
+                "subject": row["title"], "body": row["message"], "status": EmailStatus.pending,
+                "attempts": 0, "next_attempt_at": now
+            }
+            for row in inserted
+        ])
+        mark_enqueued(db)
+    unread = defaultdict(int)
+    for row in inserted:
+        unread[row["user_id"]] += 1
+    adjust_unread(db, unread)
+
+    pending = db.info.setdefault(PENDING_KEY, [])
+    for row in inserted:
+        pending.append({
+            "id": row["id"], "title": row["title"], "message": row["message"],
+            "type": NotificationType(row["type"]).value, "task_id": row["task_id"],
+            "user_id": row["user_id"], "read": False, "created_at": now,
+        })
+    return len(inserted)
+
+def fan_out_notifications(
+    db: Session,
+    user_ids: Optional[Iterable[int]],
+    title: str,
+    message: str,
+    type: NotificationType = NotificationType.info,
+    email: Optional[bool] = None,
+    batch_size: int = NOTIFICATION_FANOUT_BATCH_SIZE,
+) -> int:
+    """Create the same notification for many users (all users if ``user_ids`` is None).
+
+    Each batch of recipients is one transaction with a multi-row INSERT of
+    notifications, one of their outbox emails and one counter UPDATE.
+    Batches already committed stay if a later one fails. Unknown user ids
+    are skipped; returns the number of notifications created.
+    """
+    if email is None:
+        email = emails_by_default(type)
+    created = 0
+    for batch in _recipient_batches(db, user_ids, batch_size):
+        created += bulk_create_notifications(
+            db, [{"user_id": user_id, "title": title, "message": message, "type": type} for user_id in batch], email=email
+        )
+        db.commit()
+    return created
+
+def make_fan_out_worker(
+    user_ids: Optional[List[int]],
+    title: str,
+    message: str,
+    type: NotificationType = NotificationType.info,
+    email: Optional[bool] = None,
+):
+    """Job worker running fan_out_notifications in its own session; the job has one item"""
+    def worker(job, indexes: List[int]):
+        db = SessionLocal()
+        try:
+            recipients = fan_out_notifications(db, user_ids, title, message, type=type, email=email)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        job.set_result(indexes[0], {"recipients": recipients})
+    return worker
+
+def notification_filters(
+    user_id: int,
+    ids: Optional[List[int]] = None,
+    read: Optional[bool] = None,
+    type: Optional[NotificationType] = None,
+    before: Optional[datetime] = None,
+) -> list:
+    """WHERE clauses selecting one user's notifications for a bulk action"""
+    filters = [Notification.user_id == user_id]
+    if ids is not None:
+        filters.append(Notification.id.in_(ids))
+    if read is not None:
+        filters.append(Notification.read == read)
+    if type is not None:
+        filters.append(Notification.type == type)
+    if before is not None:
+        filters.append(Notification.created_at < before)
+    return filters
+
+def mark_notifications_read(db: Session, user_id: int, filters: list) -> int:
+    """Mark matching unread notifications read with one UPDATE (does not commit)"""
+    marked = db.query(Notification).filter(*filters, Notification.read == false()).update({"read": True})
+    # Bulk statements bypass the flush hook that keeps the counter
+    adjust_unread(db, {user_id: -marked})
+    return marked
+
+def delete_notifications(db: Session, user_id: int, filters: list) -> int:
+    """Delete matching notifications with one DELETE (does not commit)"""
+    statement = delete(Notification).where(*filters)
+    if db.get_bind().dialect.delete_returning:
+        deleted = db.execute(statement.returning(Notification.read)).scalars().all()
+        adjust_unread(db, {user_id: -sum(1 for read in deleted if not read)})
+        return len(deleted)
+    deleted = db.execute(statement).rowcount
+    recount_unread(db, [user_id])
+    return deleted
+
+def unread_count_query():
+    """Correlated COUNT of a user's unread notifications, for recounting"""
+    return select(func.count(Notification.id)).where(
+        Notification.user_id == User.id,
+        Notification.read == false()
+    ).scalar_subquery()
+
+def recount_unread(db, user_ids: Optional[Iterable[int]] = None) -> int:
+    """Reset users' unread_notifications from the notifications table.
+
+    Runs in the caller's transaction (``db`` may be a Session or a
+    Connection); returns the number of users updated.
+    """
+    statement = update(User).values(unread_notifications=unread_count_query())
+    if user_ids is not None:
+        statement = statement.where(User.id.in_(list(user_ids)))
+    return db.execute(statement.execution_options(synchronize_session=False)).rowcount
+
+def adjust_unread(db, deltas: Dict[int, int]):
+    """Apply per-user changes to unread_notifications, one UPDATE per distinct delta"""
+    by_delta = defaultdict(list)
+    for user_id, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(user_id)
+    for delta, user_ids in by_delta.items():
+        db.execute(
+            update(User).where(User.id.in_(user_ids)).values(
+                unread_notifications=User.unread_notifications + delta
+            ).execution_options(synchronize_session=False)
+        )
+
+def _unread_changes(session):
+    """Unread-count deltas of the notifications in a flush, plus users to recount"""
+    deltas = defaultdict(int)
+    recount = set()
+    for obj in session.new:
+        if isinstance(obj, Notification) and not obj.__dict__.get("read"):
+            deltas[obj.user_id] += 1
+    for obj in session.dirty:
+        if isinstance(obj, Notification):
+            history = attributes.get_history(obj, "read", passive=attributes.PASSIVE_NO_INITIALIZE)
+            if not history.added:
+                continue
+            if not history.deleted:
+                recount.add(obj.user_id)  # previous value was never loaded
+            elif bool(history.deleted[0]) != bool(history.added[0]):
+                deltas[obj.user_id] += -1 if history.added[0] else 1
+    for obj in session.deleted:
+        if isinstance(obj, Notification) and "user_id" in obj.__dict__:
+            if "read" not in obj.__dict__:
+                recount.add(obj.user_id)
+            elif not obj.__dict__["read"]:
+                deltas[obj.user_id] -= 1
+    return deltas, recount
+
+@event.listens_for(Session, "after_flush")
+def _collect_notifications(session, flush_context):
+    # Payloads are captured here, while ids are known and nothing is expired yet
+    for obj in session.new:
+        if isinstance(obj, Notification):
+            session.info.setdefault(PENDING_KEY, []).append(notification_payload(obj))
+
+    # Keep users.unread_notifications in step with ORM changes, in the same
+    # transaction; bulk UPDATE/DELETE statements must adjust it themselves
+    deltas, recount = _unread_changes(session)
+    if deltas or recount:
+        connection = session.connection()
+        adjust_unread(connection, {user_id: delta for user_id, delta in deltas.items() if user_id not in recount})
+        if recount:
+            recount_unread(connection, recount)
+
+@event.listens_for(Session, "after_commit")
+def _publish_notifications(session):
+    for payload in session.info.pop(PENDING_KEY, ()):
+        publish_notification(payload)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_notifications(session, previous_transaction):
+    if previous_transaction.parent is None:
+        session.info.pop(PENDING_KEY, None)
@@ -0,0 +1,349 @@
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import Integer, case, cast, delete, func, insert, literal, select
+from sqlalchemy.orm import Session
+from app.models import PomodoroDailyRollup, PomodoroSession, PomodoroType
+from app.schemas import PomodoroStats
+
+ALL_TASKS = 0  # rollup task_id holding the day's totals across all sessions
+
+RollupKey = Tuple[int, date, int]
+
+class StatsTotals:
+    """Additive pomodoro counters that can be combined across sources"""
+
+    __slots__ = ("sessions", "completed", "work_minutes", "break_minutes")
+
+    def __init__(self, sessions: int = 0, completed: int = 0, work_minutes: int = 0, break_minutes: int = 0):
+        self.sessions = sessions
+        self.completed = completed
+        self.work_minutes = work_minutes
+        self.break_minutes = break_minutes
+
+    def __iadd__(self, other: "StatsTotals") -> "StatsTotals":
+        self.sessions += other.sessions
+        self.completed += other.completed
+        self.work_minutes += other.work_minutes
+        self.break_minutes += other.break_minutes
+        return self
+
+    def to_stats(self) -> PomodoroStats:
+        total_time = self.work_minutes + self.break_minutes
+        return PomodoroStats(
+            total_sessions=self.sessions,
+            total_work_time=self.work_minutes,
+            total_break_time=self.break_minutes,
+            average_session_length=total_time / self.sessions if self.sessions else 0,
+            completed_sessions=self.completed,
+            incomplete_sessions=self.sessions - self.completed
+        )
+
+def aggregate_sessions(db: Session, user_id: int, start: datetime, end: datetime) -> StatsTotals:
+    """Totals for ended sessions started in [start, end) from one grouped query.
+
+    Sessions still running or abandoned are left out, matching the daily
+    rollups, which only count a session once it ends.
+    """
+    rows = db.query(
+        PomodoroSession.type,
+        func.count(PomodoroSession.id),
+        func.coalesce(func.sum(PomodoroSession.duration), 0),
+        func.coalesce(func.sum(case((PomodoroSession.completed == True, 1), else_=0)), 0)
+    ).filter(
+        PomodoroSession.user_id == user_id,
+        PomodoroSession.start_time >= start,
+        PomodoroSession.start_time < end,
+        PomodoroSession.end_time.isnot(None),
+        PomodoroSession.abandoned == False
+    ).group_by(PomodoroSession.type).all()
+
+    totals = StatsTotals()
+    for session_type, count, minutes, completed in rows:
+        totals.sessions += count
+        totals.completed += completed
+        if session_type == PomodoroType.work:
+            totals.work_minutes += minutes
+        elif session_type == PomodoroType.break_session:
+            totals.break_minutes += minutes
+    return totals
+
+def utc_naive(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def _delta(session: PomodoroSession, sign: int = 1) -> Tuple[int, int, int, int]:
+    if getattr(session, "abandoned", False):
+        return (0, 0, 0, 0)
+    work = session.duration if session.type == PomodoroType.work else 0
+    rest = session.duration if session.type == PomodoroType.break_session else 0
+    return (sign, sign * int(bool(session.completed)), sign * work, sign * rest)
+
+def rollup_deltas(sessions: Iterable[PomodoroSession], sign: int = 1) -> Dict[RollupKey, Tuple[int, int, int, int]]:
+    """Per (user, day, task) rollup increments for a batch of ended sessions.
+
+    Every session counts towards its day's ALL_TASKS row, and also towards
+    a per-task row when it is linked to a task. Abandoned sessions count
+    towards neither.
+    """
+    deltas: Dict[RollupKey, list] = defaultdict(lambda: [0, 0, 0, 0])
+    for session in sessions:
+        day = utc_naive(session.start_time).date()
+        keys = [(session.user_id, day, ALL_TASKS)]
+        if session.task_id:
+            keys.append((session.user_id, day, session.task_id))
+        for key in keys:
+            totals = deltas[key]
+            for i, value in enumerate(_delta(session, sign)):
+                totals[i] += value
+    return {key: tuple(values) for key, values in deltas.items() if any(values)}
+
+def apply_rollup_deltas(db: Session, deltas: Dict[RollupKey, Tuple[int, int, int, int]]):
+    """Upsert rollup increments in the caller's transaction (does not commit)"""
+    if not deltas:
+        return
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as upsert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as upsert
+    else:
+        upsert = None
+
+    table = PomodoroDailyRollup.__table__
+    for (user_id, day, task_id), (sessions, completed, work, rest) in deltas.items():
+        values = dict(
+            user_id=user_id, day=day, task_id=task_id, sessions=sessions,
+            completed=completed, work_minutes=work, break_minutes=rest
+        )
+        if upsert is None:
+            updated = db.execute(
+                table.update().where(
+                    table.c.user_id == user_id, table.c.day == day, table.c.task_id == task_id
+                ).values(
+                    sessions=table.c.sessions + sessions,
+                    completed=table.c.completed + completed,
+                    work_minutes=table.c.work_minutes + work,
+                    break_minutes=table.c.break_minutes + rest
+                )
+            )
+            if not updated.rowcount:
+                db.execute(insert(table).values(**values))
+            continue
+
+        statement = upsert(table).values(**values)
+        db.execute(statement.on_conflict_do_update(
+            index_elements=["user_id", "day", "task_id"],
+            set_=dict(
+                sessions=table.c.sessions + statement.excluded.sessions,
+                completed=table.c.completed + statement.excluded.completed,
+                work_minutes=table.c.work_minutes + statement.excluded.work_minutes,
+                break_minutes=table.c.break_minutes + statement.excluded.break_minutes,
+                updated_at=func.now()
+            )
+        ))
+
+def aggregate_rollups(db: Session, user_id: int, first_day: date, end_day: date) -> StatsTotals:
+    """Totals for whole days in [first_day, end_day) from the daily rollup"""
+    row = db.query(
+        func.coalesce(func.sum(PomodoroDailyRollup.sessions), 0),
+        func.coalesce(func.sum(PomodoroDailyRollup.completed), 0),
+        func.coalesce(func.sum(PomodoroDailyRollup.work_minutes), 0),
+        func.coalesce(func.sum(PomodoroDailyRollup.break_minutes), 0)
+    ).filter(
+        PomodoroDailyRollup.user_id == user_id,
+        PomodoroDailyRollup.task_id == ALL_TASKS,
+        PomodoroDailyRollup.day >= first_day,
+        PomodoroDailyRollup.day < end_day
+    ).one()
+    return StatsTotals(*row)
+
+def _midnight(value: datetime) -> datetime:
+    return datetime.combine(value.date(), time(0))
+
+def range_stats(db: Session, user_id: int, start: datetime, end: datetime, now: Optional[datetime] = None) -> StatsTotals:
+    """Totals for ended sessions started in [start, end).
+
+    Whole past days are read from the daily rollup (one row per day); the
+    partial days at either edge and the current day come from raw sessions.
+    """
+    start, end = utc_naive(start), utc_naive(end)
+    first = _midnight(start)
+    if first < start:
+        first += timedelta(days=1)
+    last = min(_midnight(end), _midnight(now or datetime.utcnow()))
+
+    if first >= last:
+        return aggregate_sessions(db, user_id, start, end)
+
+    totals = aggregate_rollups(db, user_id, first.date(), last.date())
+    if start < first:
+        totals += aggregate_sessions(db, user_id, start, first)
+    if last < end:
+        totals += aggregate_sessions(db, user_id, last, end)
+    return totals
+
+def _day_expression(dialect_name: str, column):
+    if dialect_name == "postgresql":
+        return func.date(func.timezone("UTC", column))
+    return func.date(column)
+
+def rebuild_rollups(db, user_id: Optional[int] = None) -> int:
+    """Recompute rollups from ended, non-abandoned sessions with set-based SQL.
+
+    Runs in the caller's transaction (``db`` may be a Session or a
+    Connection); returns the number of rows written.
+    """
+    dialect = db.get_bind().dialect if isinstance(db, Session) else db.dialect
+    rollup = PomodoroDailyRollup.__table__
+    sessions = PomodoroSession.__table__
+
+    clear = delete(rollup)
+    if user_id is not None:
+        clear = clear.where(rollup.c.user_id == user_id)
+    db.execute(clear)
+
+    day = _day_expression(dialect.name, sessions.c.start_time)
+    work = func.sum(case((sessions.c.type == PomodoroType.work, sessions.c.duration), else_=0))
+    rest = func.sum(case((sessions.c.type == PomodoroType.break_session, sessions.c.duration), else_=0))
+    completed = func.sum(case((sessions.c.completed == True, 1), else_=0))
+    columns = ["user_id", "day", "task_id", "sessions", "completed", "work_minutes", "break_minutes"]
+
+    written = 0
+    for per_task in (False, True):
+        task_column = sessions.c.task_id if per_task else literal(ALL_TASKS)
+        query = select(
+            sessions.c.user_id, day, task_column, func.count(), completed, work, rest
+        ).where(sessions.c.end_time.isnot(None), sessions.c.abandoned == False)
+        if per_task:
+            query = query.where(sessions.c.task_id.isnot(None))
+        if user_id is not None:
+            query = query.where(sessions.c.user_id == user_id)
+        query = query.group_by(sessions.c.user_id, day, task_column) if per_task else query.group_by(sessions.c.user_id, day)
+        written += db.execute(insert(rollup).from_select(columns, query)).rowcount
+    return written
+
+BUCKETS = ("hour", "day", "week", "month")
+
+# SQLite has no time zone database, so sessions are grouped into UTC slots
+# of this many minutes and each slot is converted to local time in Python;
+# every zone's UTC offset is a multiple of 15 minutes
+SLOT_MINUTES = 15
+
+def _is_postgresql(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+def _local_expression(column, tz: ZoneInfo):
+    """Session start as local wall-clock time inside PostgreSQL"""
+    return func.timezone(tz.key, column)
+
+def _slot_expression(column):
+    """UTC slot number of a session start inside SQLite"""
+    return cast(func.strftime("%s", column), Integer) / (SLOT_MINUTES * 60)
+
+def _slot_to_local(slot: int, tz: ZoneInfo) -> datetime:
+    return datetime.fromtimestamp(int(slot) * SLOT_MINUTES * 60, tz).replace(tzinfo=None)
+
+def _truncate(value: datetime, bucket: str) -> datetime:
+    value = value.replace(minute=0, second=0, microsecond=0)
+    if bucket == "hour":
+        return value
+    value = value.replace(hour=0)
+    if bucket == "week":
+        return value - timedelta(days=value.weekday())
+    if bucket == "month":
+        return value.replace(day=1)
+    return value
+
+def _step(bucket: str) -> relativedelta:
+    return {
+        "hour": relativedelta(hours=1),
+        "day": relativedelta(days=1),
+        "week": relativedelta(weeks=1),
+        "month": relativedelta(months=1),
+    }[bucket]
+
+def _as_datetime(value) -> datetime:
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    return datetime.combine(value, time(0))
+
+def timeseries(db: Session, user_id: int, start: datetime, end: datetime, bucket: str, tz_name: str = "UTC") -> List[dict]:
+    """Per-bucket session totals in local time, grouped in SQL, with empty buckets filled"""
+    tz = ZoneInfo(tz_name)
+    start, end = utc_naive(start), utc_naive(end)
+    postgresql = _is_postgresql(db)
+    if postgresql:
+        key = func.date_trunc(bucket, _local_expression(PomodoroSession.start_time, tz))
+    else:
+        key = _slot_expression(PomodoroSession.start_time)
+
+    rows = db.query(
+        key,
+        func.count(PomodoroSession.id),
+        func.coalesce(func.sum(case((PomodoroSession.completed == True, 1), else_=0)), 0),
+        func.coalesce(func.sum(case((PomodoroSession.type == PomodoroType.work, PomodoroSession.duration), else_=0)), 0),
+        func.coalesce(func.sum(case((PomodoroSession.type == PomodoroType.break_session, PomodoroSession.duration), else_=0)), 0)
+    ).filter(
+        PomodoroSession.user_id == user_id,
+        PomodoroSession.start_time >= start,
+        PomodoroSession.start_time < end,
+        PomodoroSession.abandoned == False
+    ).group_by(key).all()
+
+    by_bucket = defaultdict(lambda: [0, 0, 0, 0])
+    for row in rows:
+        local_bucket = _as_datetime(row[0]) if postgresql else _truncate(_slot_to_local(row[0], tz), bucket)
+        totals = by_bucket[local_bucket]
+        for i, value in enumerate(row[1:]):
+            totals[i] += value
+
+    def to_local(value: datetime) -> datetime:
+        return value.replace(tzinfo=timezone.utc).astimezone(tz).replace(tzinfo=None)
+
+    points = []
+    cursor, last = _truncate(to_local(start), bucket), to_local(end)
+    step = _step(bucket)
+    while cursor < last:
+        sessions, completed, work, rest = by_bucket.get(cursor, (0, 0, 0, 0))
+        points.append({
+            "start": cursor.replace(tzinfo=tz),
+            "sessions": sessions,
+            "completed": completed,
+            "work_minutes": work,
+            "break_minutes": rest,
+        })
+        cursor += step
+    return points
+
+def focus_heatmap(db: Session, user_id: int, start: datetime, end: datetime, tz_name: str = "UTC") -> List[List[int]]:
+    """Work minutes by local weekday (Monday first) and hour, as a 7x24 grid"""
+    tz = ZoneInfo(tz_name)
+    start, end = utc_naive(start), utc_naive(end)
+    if _is_postgresql(db):
+        local = _local_expression(PomodoroSession.start_time, tz)
+        keys = (func.extract("isodow", local) - 1, func.extract("hour", local))
+    else:
+        keys = (_slot_expression(PomodoroSession.start_time),)
+
+    rows = db.query(*keys, func.sum(PomodoroSession.duration)).filter(
+        PomodoroSession.user_id == user_id,
+        PomodoroSession.type == PomodoroType.work,
+        PomodoroSession.start_time >= start,
+        PomodoroSession.start_time < end,
+        PomodoroSession.abandoned == False
+    ).group_by(*keys).all()
+
+    grid = [[0] * 24 for _ in range(7)]
+    for *key, minutes in rows:
+        if len(key) == 1:
+            local_start = _slot_to_local(key[0], tz)
+            key = (local_start.weekday(), local_start.hour)
+        grid[int(key[0])][int(key[1])] += int(minutes or 0)
+    return grid
@@ -0,0 +1,146 @@
+from datetime import datetime, timedelta
+from typing import Optional
+import asyncio
+import logging
+import time
+import os
+from dotenv import load_dotenv
+from sqlalchemy import func, literal_column, select, update
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models import PomodoroSession
+from app.services.freebusy import freebusy_service
+from app.services.metrics import registry
+
+load_dotenv()
+
+# Abandoned session sweeper configuration
+POMODORO_ABANDON_GRACE_MINUTES = int(os.getenv("POMODORO_ABANDON_GRACE_MINUTES", "60"))
+POMODORO_SWEEP_INTERVAL_SECONDS = float(os.getenv("POMODORO_SWEEP_INTERVAL_SECONDS", "300"))
+POMODORO_SWEEP_BATCH_SIZE = int(os.getenv("POMODORO_SWEEP_BATCH_SIZE", "1000"))
+
+logger = logging.getLogger(__name__)
+
+sweep_runs = registry.counter("pomodoro_sweep_runs_total", "Abandoned session sweeps run", ["result"])
+sweep_rows = registry.counter("pomodoro_sessions_abandoned_total", "Sessions closed as abandoned")
+sweep_seconds = registry.counter("pomodoro_sweep_seconds_total", "Time spent sweeping abandoned sessions")
+sweep_last_seconds = registry.gauge("pomodoro_sweep_last_duration_seconds", "Duration of the last sweep")
+sweep_last_rows = registry.gauge("pomodoro_sweep_last_rows", "Sessions closed by the last sweep")
+
+def planned_end(db: Session):
+    """SQL expression for start_time + duration minutes"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return PomodoroSession.start_time + func.make_interval(0, 0, 0, 0, 0, PomodoroSession.duration)
+    if dialect == "sqlite":
+        return func.datetime(PomodoroSession.start_time, func.printf("+%d minutes", PomodoroSession.duration))
+    return func.timestampadd(literal_column("MINUTE"), PomodoroSession.duration, PomodoroSession.start_time)
+
+def sweep_batch(db: Session, cutoff: datetime, batch_size: int) -> int:
+    """Close up to ``batch_size`` open sessions whose planned end is before
+    ``cutoff`` with one UPDATE. Abandoned sessions count towards neither the
+    daily rollups nor task totals, so nothing else changes. Returns the
+    number of sessions closed.
+    """
+    end = planned_end(db)
+    candidates = select(PomodoroSession.id).where(
+        PomodoroSession.end_time.is_(None),
+        PomodoroSession.start_time < cutoff,
+        end < cutoff
+    ).order_by(PomodoroSession.start_time).limit(batch_size)
+    if db.get_bind().dialect.name == "postgresql":
+        # Let concurrent sweepers in other workers take disjoint batches
+        candidates = candidates.with_for_update(skip_locked=True)
+
+    statement = update(PomodoroSession).where(
+        PomodoroSession.id.in_(candidates.scalar_subquery()),
+        PomodoroSession.end_time.is_(None)
+    ).values(end_time=end, completed=False, abandoned=True)
+
+    if db.get_bind().dialect.update_returning:
+        closed = db.execute(statement.returning(PomodoroSession.user_id).execution_options(synchronize_session=False)).scalars().all()
+    else:
+        ids = db.execute(candidates).scalars().all()
+        closed = db.execute(select(PomodoroSession.user_id).where(PomodoroSession.id.in_(ids))).scalars().all()
+        db.execute(
+            update(PomodoroSession).where(PomodoroSession.id.in_(ids)).values(end_time=end, completed=False, abandoned=True),
+            execution_options={"synchronize_session": False}
+        )
+
+    db.commit()
+    for user_id in set(closed):
+        freebusy_service.invalidate(user_id)
+    return len(closed)
+
+def sweep_abandoned(
+    db: Session,
+    now: Optional[datetime] = None,
+    grace_minutes: int = POMODORO_ABANDON_GRACE_MINUTES,
+    batch_size: int = POMODORO_SWEEP_BATCH_SIZE,
+) -> int:
+    """Close every session whose planned end is more than ``grace_minutes``
+    in the past, one bounded batch (and transaction) at a time.
+    """
+    cutoff = (now or datetime.utcnow()) - timedelta(minutes=grace_minutes)
+    started = time.perf_counter()
+    total = 0
+    try:
+        while True:
+            closed = sweep_batch(db, cutoff, batch_size)
+            total += closed
+            if closed < batch_size:
+                break
+    except Exception:
+        db.rollback()
+        sweep_runs.inc(result="error")
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        sweep_seconds.inc(elapsed)
+        sweep_last_seconds.set(elapsed)
+        sweep_last_rows.set(total)
+        sweep_rows.inc(total)
+
+    sweep_runs.inc(result="ok")
+    return total
+
+class PomodoroSweeper:
+    """Background task running ``sweep_abandoned`` every interval"""
+
+    def __init__(self, interval: float = POMODORO_SWEEP_INTERVAL_SECONDS):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @staticmethod
+    def _sweep_once() -> int:
+        db = SessionLocal()
+        try:
+            return sweep_abandoned(db)
+        finally:
+            db.close()
+
+    async def _run(self):
+        while True:
+            try:
+                closed = await asyncio.to_thread(self._sweep_once)
+                if closed:
+                    logger.info("Closed %d abandoned pomodoro sessions", closed)
+            except Exception:
+                logger.exception("Abandoned pomodoro session sweep failed")
+            await asyncio.sleep(self.interval)
+
+# Shared sweeper started with the application
+pomodoro_sweeper = PomodoroSweeper()
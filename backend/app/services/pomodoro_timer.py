@@ -0,0 +1,303 @@
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Callable, List, Optional, Tuple
+import asyncio
+import heapq
+import time
+import os
+from dotenv import load_dotenv
+from sqlalchemy.orm import Session
+from app.models import PomodoroTimer
+from app.services.pubsub import pubsub
+
+load_dotenv()
+
+# Idle and paused timers kept in memory; running timers are never evicted
+POMODORO_TIMER_CACHE_USERS = int(os.getenv("POMODORO_TIMER_CACHE_USERS", "10000"))
+
+IDLE, RUNNING, PAUSED = "idle", "running", "paused"
+WORK, SHORT_BREAK, LONG_BREAK = "work", "short_break", "long_break"
+
+class InvalidTransition(Exception):
+    pass
+
+class TimerState:
+    """One user's timer. Kept deliberately small (``__slots__``, no task or
+    callback per timer) so a worker can hold tens of thousands of them.
+
+    While running only ``ends_at`` is stored; remaining time and phase
+    roll-overs are derived from the clock, so a state reloaded after a
+    restart catches up on its own.
+    """
+
+    __slots__ = (
+        "user_id", "status", "phase", "cycle", "remaining", "ends_at",
+        "work_minutes", "break_minutes", "long_break_minutes",
+        "cycles_before_long_break", "task_id", "version",
+    )
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self.status = IDLE
+        self.phase = WORK
+        self.cycle = 0
+        self.remaining = 0.0
+        self.ends_at: Optional[float] = None
+        self.work_minutes = 25
+        self.break_minutes = 5
+        self.long_break_minutes = 15
+        self.cycles_before_long_break = 4
+        self.task_id: Optional[int] = None
+        self.version = 0
+
+    def phase_seconds(self, phase: str) -> float:
+        minutes = {
+            WORK: self.work_minutes,
+            SHORT_BREAK: self.break_minutes,
+            LONG_BREAK: self.long_break_minutes,
+        }[phase]
+        return minutes * 60.0
+
+    def _next_phase(self):
+        if self.phase == WORK:
+            self.cycle += 1
+            long_break = self.cycle % self.cycles_before_long_break == 0
+            self.phase = LONG_BREAK if long_break else SHORT_BREAK
+        else:
+            self.phase = WORK
+
+    def advance(self, now: float) -> bool:
+        """Roll over every phase that has finished by ``now``. Returns True if any did."""
+        changed = False
+        while self.status == RUNNING and self.ends_at is not None and self.ends_at <= now:
+            self._next_phase()
+            self.ends_at += self.phase_seconds(self.phase)
+            changed = True
+        if changed:
+            self.version += 1
+        return changed
+
+    def remaining_seconds(self, now: float) -> float:
+        if self.status == RUNNING:
+            return max(0.0, self.ends_at - now)
+        return self.remaining
+
+    def start(self, now: float, task_id: Optional[int], work: int, rest: int, long_rest: int, cycles: int):
+        if self.status != IDLE:
+            raise InvalidTransition("Timer is already active")
+        self.work_minutes, self.break_minutes = work, rest
+        self.long_break_minutes, self.cycles_before_long_break = long_rest, cycles
+        self.task_id = task_id
+        self.phase, self.cycle = WORK, 0
+        self.status = RUNNING
+        self.ends_at = now + self.phase_seconds(WORK)
+        self.version += 1
+
+    def pause(self, now: float):
+        if self.status != RUNNING:
+            raise InvalidTransition("Timer is not running")
+        self.remaining = self.remaining_seconds(now)
+        self.status, self.ends_at = PAUSED, None
+        self.version += 1
+
+    def resume(self, now: float):
+        if self.status != PAUSED:
+            raise InvalidTransition("Timer is not paused")
+        self.status = RUNNING
+        self.ends_at = now + self.remaining
+        self.version += 1
+
+    def skip(self, now: float):
+        if self.status == IDLE:
+            raise InvalidTransition("Timer is not active")
+        self._next_phase()
+        if self.status == RUNNING:
+            self.ends_at = now + self.phase_seconds(self.phase)
+        else:
+            self.remaining = self.phase_seconds(self.phase)
+        self.version += 1
+
+    def reset(self):
+        self.status, self.phase, self.cycle = IDLE, WORK, 0
+        self.remaining, self.ends_at, self.task_id = 0.0, None, None
+        self.version += 1
+
+    def to_dict(self, now: float) -> dict:
+        return {
+            "status": self.status,
+            "phase": self.phase,
+            "cycle": self.cycle,
+            "remaining_seconds": round(self.remaining_seconds(now)),
+            "ends_at": datetime.utcfromtimestamp(self.ends_at) if self.ends_at else None,
+            "work_minutes": self.work_minutes,
+            "break_minutes": self.break_minutes,
+            "long_break_minutes": self.long_break_minutes,
+            "cycles_before_long_break": self.cycles_before_long_break,
+            "task_id": self.task_id,
+            "version": self.version,
+        }
+
+def timer_topic(user_id: int) -> str:
+    return f"user:{user_id}:timer"
+
+class TimerService:
+    """Per-user timers in memory with a single deadline heap for phase ends.
+
+    One background task sleeps until the earliest deadline, rolls the
+    affected timers over and pushes their new state to subscribers. Explicit
+    transitions are persisted to ``pomodoro_timers`` so timers survive
+    restarts; automatic roll-overs need no write because they can be
+    recomputed from the stored deadline. Timers that are not running are
+    reloaded from that table on demand, so only the least recently used
+    ``max_users`` of them stay in memory. ``clock`` returns the current
+    Unix time.
+    """
+
+    def __init__(self, max_users: int = POMODORO_TIMER_CACHE_USERS, clock: Callable[[], float] = time.time):
+        self._clock = clock
+        self._timers: "OrderedDict[int, TimerState]" = OrderedDict()
+        self._max_users = max_users
+        self._deadlines: List[Tuple[float, int, int]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._timers)
+
+    def now(self) -> float:
+        return self._clock()
+
+    def start(self):
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get(self, db: Session, user_id: int) -> TimerState:
+        state = self._timers.get(user_id)
+        if state is None:
+            state = self._load(db, user_id)
+            self._timers[user_id] = state
+            self._schedule(state)
+            self._evict()
+        else:
+            self._timers.move_to_end(user_id)
+        if state.advance(self._clock()):
+            self._schedule(state)
+        return state
+
+    def _evict(self):
+        """Drop least recently used timers that are not running"""
+        skipped = 0
+        while len(self._timers) > self._max_users and skipped < len(self._timers):
+            user_id, state = next(iter(self._timers.items()))
+            if state.status == RUNNING:
+                # Running timers own deadlines in the heap and must stay
+                self._timers.move_to_end(user_id)
+                skipped += 1
+            else:
+                del self._timers[user_id]
+
+    def _load(self, db: Session, user_id: int) -> TimerState:
+        state = TimerState(user_id)
+        row = db.query(PomodoroTimer).filter(PomodoroTimer.user_id == user_id).first()
+        if row is not None:
+            state.status, state.phase, state.cycle = row.status, row.phase, row.cycle
+            state.remaining = float(row.remaining_seconds)
+            state.ends_at = _to_timestamp(row.ends_at)
+            state.work_minutes, state.break_minutes = row.work_minutes, row.break_minutes
+            state.long_break_minutes = row.long_break_minutes
+            state.cycles_before_long_break = row.cycles_before_long_break
+            state.task_id = row.task_id
+        return state
+
+    def transition(self, db: Session, user_id: int, action: str, **params) -> TimerState:
+        """Apply ``action`` (start, pause, resume, skip, reset), persist and publish"""
+        state = self.get(db, user_id)
+        now = self._clock()
+        if action == "start":
+            state.start(now, **params)
+        elif action == "pause":
+            state.pause(now)
+        elif action == "resume":
+            state.resume(now)
+        elif action == "skip":
+            state.skip(now)
+        elif action == "reset":
+            state.reset()
+        else:
+            raise InvalidTransition(f"Unknown action: {action}")
+
+        try:
+            self._persist(db, state)
+        except Exception:
+            # Drop the unsaved state; the next access reloads the stored one
+            self._timers.pop(user_id, None)
+            raise
+        self._schedule(state)
+        self._publish(state, now)
+        return state
+
+    def _persist(self, db: Session, state: TimerState):
+        row = db.query(PomodoroTimer).filter(PomodoroTimer.user_id == state.user_id).first()
+        if row is None:
+            row = PomodoroTimer(user_id=state.user_id)
+            db.add(row)
+        row.status, row.phase, row.cycle = state.status, state.phase, state.cycle
+        row.remaining_seconds = int(state.remaining)
+        row.ends_at = datetime.utcfromtimestamp(state.ends_at) if state.ends_at else None
+        row.work_minutes, row.break_minutes = state.work_minutes, state.break_minutes
+        row.long_break_minutes = state.long_break_minutes
+        row.cycles_before_long_break = state.cycles_before_long_break
+        row.task_id = state.task_id
+        db.commit()
+
+    def _schedule(self, state: TimerState):
+        if state.status != RUNNING or state.ends_at is None:
+            return
+        heapq.heappush(self._deadlines, (state.ends_at, state.user_id, state.version))
+        if self._wakeup is not None and self._deadlines[0][1] == state.user_id:
+            self._wakeup.set()
+
+    def _publish(self, state: TimerState, now: float):
+        pubsub.publish(timer_topic(state.user_id), {"event": "timer", "data": state.to_dict(now)})
+
+    async def _run(self):
+        while True:
+            timeout = None
+            if self._deadlines:
+                timeout = max(0.0, self._deadlines[0][0] - self._clock())
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                continue
+            except asyncio.TimeoutError:
+                pass
+
+            now = self._clock()
+            while self._deadlines and self._deadlines[0][0] <= now:
+                _, user_id, version = heapq.heappop(self._deadlines)
+                state = self._timers.get(user_id)
+                if state is None or state.version != version:
+                    continue
+                if state.advance(now):
+                    self._schedule(state)
+                    self._publish(state, now)
+
+def _to_timestamp(value: Optional[datetime]) -> Optional[float]:
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+# Shared timer service
+timer_service = TimerService()
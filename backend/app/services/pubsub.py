@@ -0,0 +1,321 @@
+from collections import defaultdict
+from queue import Empty, Full, Queue
+from typing import AsyncIterator, Dict, Iterable, Optional, Set
+from urllib.parse import urlparse
+import asyncio
+import json
+import logging
+import socket
+import threading
+import os
+from dotenv import load_dotenv
+from app.services.metrics import registry
+
+load_dotenv()
+
+# Push channel configuration
+PUBSUB_QUEUE_SIZE = int(os.getenv("PUBSUB_QUEUE_SIZE", "100"))
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))
+# "local" keeps messages inside this process; "broker" shares them with other
+# workers through the broker at PUBSUB_BROKER_URL (see pubsub_broker.py)
+PUBSUB_BACKEND = os.getenv("PUBSUB_BACKEND", "local")
+PUBSUB_BROKER_URL = os.getenv("PUBSUB_BROKER_URL", "tcp://127.0.0.1:8765")
+# Messages waiting to be written to the broker; more are dropped
+PUBSUB_BROKER_QUEUE_SIZE = int(os.getenv("PUBSUB_BROKER_QUEUE_SIZE", "10000"))
+
+logger = logging.getLogger(__name__)
+
+messages_published = registry.counter("pubsub_messages_published_total", "Messages published", ["source"])
+messages_delivered = registry.counter("pubsub_messages_delivered_total", "Messages queued for local subscribers")
+messages_dropped = registry.counter("pubsub_messages_dropped_total", "Messages dropped for slow subscribers")
+broker_dropped = registry.counter("pubsub_broker_dropped_total", "Messages not forwarded to the broker", ["reason"])
+sse_connections = registry.gauge("sse_connections", "Open server-sent event streams", ["channel"])
+
+class Subscription:
+    """One subscriber's bounded queue, bound to the event loop that created it"""
+
+    def __init__(self, topic: str, maxsize: int = PUBSUB_QUEUE_SIZE, owner: Optional["PubSub"] = None):
+        self.topic = topic
+        self.owner = owner
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.loop = asyncio.get_running_loop()
+
+    def deliver(self, message: dict):
+        # Slow consumers lose their oldest messages rather than blocking publishers
+        if self.queue.full():
+            self.queue.get_nowait()
+            messages_dropped.inc()
+        self.queue.put_nowait(message)
+
+class PubSub:
+    """Topic fan-out to asyncio subscribers.
+
+    ``publish`` never blocks on subscribers and may be called from any
+    thread; delivery is handed to each subscriber's own event loop. With a
+    backend, messages are also forwarded to (and received from) other
+    workers for the topics this process has subscribers on.
+    """
+
+    def __init__(self, backend: Optional["BrokerBackend"] = None):
+        self._subscribers: Dict[str, Set[Subscription]] = defaultdict(set)
+        self._lock = threading.Lock()
+        self.backend = backend
+
+    def start(self):
+        if self.backend is not None:
+            self.backend.start(self)
+
+    def stop(self):
+        if self.backend is not None:
+            self.backend.stop()
+
+    def subscribe(self, topic: str) -> Subscription:
+        subscription = Subscription(topic, owner=self)
+        with self._lock:
+            first = topic not in self._subscribers
+            self._subscribers[topic].add(subscription)
+        if first and self.backend is not None:
+            self.backend.watch(topic)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.topic)
+            if subscribers is None:
+                return
+            subscribers.discard(subscription)
+            last = not subscribers
+            if last:
+                self._subscribers.pop(subscription.topic, None)
+        if last and self.backend is not None:
+            self.backend.unwatch(subscription.topic)
+
+    def publish(self, topic: str, message: dict) -> int:
+        """Deliver to local subscribers and forward to other workers"""
+        messages_published.inc(source="local")
+        delivered = self.deliver_local(topic, message)
+        if self.backend is not None:
+            self.backend.publish(topic, message)
+        return delivered
+
+    def deliver_local(self, topic: str, message: dict) -> int:
+        with self._lock:
+            subscribers = list(self._subscribers.get(topic, ()))
+        if not subscribers:
+            return 0
+        try:
+            current_loop: Optional[asyncio.AbstractEventLoop] = asyncio.get_running_loop()
+        except RuntimeError:
+            current_loop = None
+
+        for subscription in subscribers:
+            if subscription.loop is current_loop:
+                subscription.deliver(message)
+            else:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, message)
+        messages_delivered.inc(len(subscribers))
+        return len(subscribers)
+
+    def subscriber_count(self, topic: Optional[str] = None) -> int:
+        with self._lock:
+            if topic is not None:
+                return len(self._subscribers.get(topic, ()))
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+class BrokerBackend:
+    """Shares messages between workers through a broker over TCP.
+
+    The wire format is newline-delimited JSON: ``{"op": "sub"|"unsub",
+    "topic": ...}`` registers interest and ``{"op": "pub", "topic": ...,
+    "message": ...}`` publishes; the broker forwards each publish to the
+    other connections watching its topic. A reader thread reconnects with
+    backoff and re-registers every watched topic. Delivery across workers
+    is best-effort: messages published while disconnected are not replayed.
+
+    Publishing only queues the encoded message; a writer thread does the
+    socket writes, so callers on the event loop never block on the broker.
+    When the queue is full (the broker is slow or unreachable) new
+    messages are dropped.
+    """
+
+    def __init__(self, url: str = PUBSUB_BROKER_URL, queue_size: int = PUBSUB_BROKER_QUEUE_SIZE):
+        parsed = urlparse(url)
+        self.address = (parsed.hostname or "127.0.0.1", parsed.port or 8765)
+        self._topics: Set[str] = set()
+        self._topics_lock = threading.Lock()
+        self._sock: Optional[socket.socket] = None
+        self._send_lock = threading.Lock()  # held by the broker threads only
+        self._outbox: Queue = Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._writer: Optional[threading.Thread] = None
+        self._closed = threading.Event()
+        self._pubsub: Optional[PubSub] = None
+        self.connected = threading.Event()
+
+    def start(self, pubsub: PubSub):
+        if self._thread is None:
+            self._pubsub = pubsub
+            self._closed.clear()
+            self._thread = threading.Thread(target=self._run, name="pubsub-broker", daemon=True)
+            self._thread.start()
+            self._writer = threading.Thread(target=self._write, name="pubsub-broker-writer", daemon=True)
+            self._writer.start()
+
+    def stop(self):
+        self._closed.set()
+        with self._send_lock:
+            if self._sock is not None:
+                try:
+                    self._sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+        for thread in (self._thread, self._writer):
+            if thread is not None:
+                thread.join(timeout=5)
+        self._thread = self._writer = None
+
+    def watch(self, topic: str):
+        with self._topics_lock:
+            self._topics.add(topic)
+        self._send({"op": "sub", "topic": topic})
+
+    def unwatch(self, topic: str):
+        with self._topics_lock:
+            self._topics.discard(topic)
+        self._send({"op": "unsub", "topic": topic})
+
+    def publish(self, topic: str, message: dict):
+        self._send({"op": "pub", "topic": topic, "message": message})
+
+    def _send(self, payload: dict) -> bool:
+        """Queue a message for the writer thread; False if it was dropped"""
+        if not self.connected.is_set():
+            # Not replayed after reconnecting; subscriptions are re-sent by _connect
+            broker_dropped.inc(reason="disconnected")
+            return False
+        try:
+            self._outbox.put_nowait((json.dumps(payload, default=str) + "\n").encode())
+            return True
+        except Full:
+            broker_dropped.inc(reason="queue_full")
+            return False
+
+    def _write(self):
+        while not self._closed.is_set():
+            try:
+                data = self._outbox.get(timeout=0.5)
+            except Empty:
+                continue
+            with self._send_lock:
+                if self._sock is None:
+                    broker_dropped.inc(reason="disconnected")
+                    continue
+                try:
+                    self._sock.sendall(data)
+                except OSError:
+                    # The reader thread sees the closed socket and reconnects
+                    self._drop_connection()
+
+    def _drop_connection(self):
+        # Caller holds _send_lock
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+        self.connected.clear()
+
+    def _connect(self) -> socket.socket:
+        sock = socket.create_connection(self.address, timeout=5)
+        sock.settimeout(None)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self._send_lock:
+            self._sock = sock
+            with self._topics_lock:
+                topics = list(self._topics)
+            for topic in topics:
+                sock.sendall((json.dumps({"op": "sub", "topic": topic}) + "\n").encode())
+        self.connected.set()
+        return sock
+
+    def _run(self):
+        backoff = 0.5
+        while not self._closed.is_set():
+            try:
+                sock = self._connect()
+                backoff = 0.5
+                for line in sock.makefile("rb"):
+                    message = json.loads(line)
+                    messages_published.inc(source="broker")
+                    self._pubsub.deliver_local(message["topic"], message["message"])
+            except (OSError, ValueError) as e:
+                if not self._closed.is_set():
+                    logger.warning("Pub/sub broker connection failed: %s", e)
+            finally:
+                with self._send_lock:
+                    self._drop_connection()
+            if self._closed.wait(backoff):
+                break
+            backoff = min(backoff * 2, 10.0)
+
+def create_backend(name: str = PUBSUB_BACKEND) -> Optional[BrokerBackend]:
+    if name == "local":
+        return None
+    if name == "broker":
+        return BrokerBackend()
+    raise ValueError(f"Unknown PUBSUB_BACKEND: {name}")
+
+def format_sse(event: str, data: dict, id: Optional[object] = None) -> str:
+    prefix = f"id: {id}\n" if id is not None else ""
+    return f"{prefix}event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+async def event_stream(
+    subscription: Subscription,
+    initial: Optional[dict] = None,
+    keepalive: float = SSE_KEEPALIVE_SECONDS,
+    backlog: Iterable[dict] = (),
+) -> AsyncIterator[str]:
+    """Server-sent events for a subscription; messages are {"event": ..., "data": ..., "id": ...}.
+
+    ``backlog`` messages (e.g. missed since a client's Last-Event-ID) are
+    sent first; live messages repeating one of their ids are skipped.
+    """
+    queue = subscription.queue
+    loop = asyncio.get_running_loop()
+    timer = None
+
+    def ping():
+        # A None in the queue becomes a keepalive comment. One timer per
+        # stream is much cheaper than wrapping every get in wait_for, which
+        # creates a task per message.
+        nonlocal timer
+        if not queue.full():
+            queue.put_nowait(None)
+        timer = loop.call_later(keepalive, ping)
+
+    channel = subscription.topic.rsplit(":", 1)[-1]
+    sse_connections.inc(channel=channel)
+    try:
+        if initial is not None:
+            yield format_sse(initial["event"], initial["data"], initial.get("id"))
+        sent_ids = set()
+        for message in backlog:
+            sent_ids.add(message.get("id"))
+            yield format_sse(message["event"], message["data"], message.get("id"))
+        sent_ids.discard(None)
+        timer = loop.call_later(keepalive, ping)
+        while True:
+            message = await queue.get()
+            if message is None:
+                yield ": keepalive\n\n"
+            elif not (sent_ids and message.get("id") in sent_ids):
+                yield format_sse(message["event"], message["data"], message.get("id"))
+    finally:
+        if timer is not None:
+            timer.cancel()
+        sse_connections.dec(channel=channel)
+        (subscription.owner or pubsub).unsubscribe(subscription)
+
+# Shared pub/sub, started with the application
+pubsub = PubSub(create_backend())
@@ -0,0 +1,267 @@
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, Optional, Tuple
+import asyncio
+import threading
+import time
+import os
+from dotenv import load_dotenv
+from app.services.metrics import registry
+
+load_dotenv()
+
+# AI admission control configuration (tokens are LLM prompt + completion tokens)
+AI_USER_TOKENS_PER_MINUTE = float(os.getenv("AI_USER_TOKENS_PER_MINUTE", "20000"))
+AI_USER_TOKEN_BURST = float(os.getenv("AI_USER_TOKEN_BURST", "40000"))
+AI_GLOBAL_TOKENS_PER_MINUTE = float(os.getenv("AI_GLOBAL_TOKENS_PER_MINUTE", "90000"))
+AI_GLOBAL_TOKEN_BURST = float(os.getenv("AI_GLOBAL_TOKEN_BURST", "90000"))
+AI_MAX_QUEUE_WAIT_SECONDS = float(os.getenv("AI_MAX_QUEUE_WAIT_SECONDS", "5"))
+
+ai_admitted = registry.counter("ai_requests_admitted_total", "AI requests admitted", ["queued"])
+ai_rejected = registry.counter("ai_requests_rejected_total", "AI requests rejected with 429", ["reason"])
+ai_tokens = registry.counter("ai_tokens_total", "LLM tokens used", ["kind"])
+ai_queue_depth = registry.gauge("ai_queue_depth", "Requests waiting for global AI capacity")
+ai_global_tokens = registry.gauge("ai_global_tokens_available", "Tokens left in the global AI bucket")
+
+class RateLimited(Exception):
+    def __init__(self, retry_after: float, reason: str):
+        super().__init__(reason)
+        self.retry_after = retry_after
+        self.reason = reason
+
+class TokenBucket:
+    """Classic token bucket refilled lazily from a monotonic clock.
+
+    With ``allow_debt`` a request is admitted whenever the bucket is not
+    empty and may drive it negative, which then delays later requests.
+    """
+
+    def __init__(self, rate_per_second: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.tokens = capacity
+        self._clock = clock
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_consume(self, amount: float, allow_debt: bool = False) -> Tuple[bool, float]:
+        """Take ``amount`` tokens. Returns (admitted, seconds until it would be)."""
+        with self._lock:
+            self._refill(self._clock())
+            needed = min(amount, self.capacity)
+            if self.tokens >= needed or (allow_debt and self.tokens > 0):
+                self.tokens -= amount
+                return True, 0.0
+            shortfall = (0.0 if allow_debt else needed) - self.tokens
+            return False, max(shortfall, 1e-3) / self.rate
+
+    def adjust(self, amount: float):
+        """Return (positive) or charge (negative) tokens after the fact"""
+        with self._lock:
+            self._refill(self._clock())
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+    def available(self) -> float:
+        with self._lock:
+            self._refill(self._clock())
+            return self.tokens
+
+    def is_full(self) -> bool:
+        return self.available() >= self.capacity
+
+class UserUsage:
+    __slots__ = ("requests", "prompt_tokens", "completion_tokens", "rejected")
+
+    def __init__(self):
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.rejected = 0
+
+class AIAdmissionController:
+    """Per-user and global token buckets with fair queuing for /ai endpoints.
+
+    A request first has to fit the caller's own bucket; if it does not it is
+    rejected immediately. It then needs global capacity: when the global
+    bucket is empty, waiters are served round-robin across users so one heavy
+    user cannot starve others, and anyone whose expected wait exceeds
+    ``max_wait`` is rejected straight away instead of queueing.
+    """
+
+    def __init__(
+        self,
+        user_rate: float = AI_USER_TOKENS_PER_MINUTE / 60,
+        user_burst: float = AI_USER_TOKEN_BURST,
+        global_rate: float = AI_GLOBAL_TOKENS_PER_MINUTE / 60,
+        global_burst: float = AI_GLOBAL_TOKEN_BURST,
+        max_wait: float = AI_MAX_QUEUE_WAIT_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self._clock = clock
+        self.global_bucket = TokenBucket(global_rate, global_burst, clock)
+        self.max_wait = max_wait
+        self._user_buckets: Dict[int, TokenBucket] = {}
+        self._usage: Dict[int, UserUsage] = {}
+        self._waiters: "OrderedDict[int, Deque[Tuple[object, float]]]" = OrderedDict()
+        self._queued_tokens = 0.0
+        self._condition: Optional[asyncio.Condition] = None
+        self._usage_lock = threading.Lock()
+
+    def _user_bucket(self, user_id: int) -> TokenBucket:
+        bucket = self._user_buckets.get(user_id)
+        if bucket is None:
+            if len(self._user_buckets) > 10000:
+                self._prune_idle()
+            bucket = self._user_buckets[user_id] = TokenBucket(self.user_rate, self.user_burst, self._clock)
+        return bucket
+
+    def _prune_idle(self):
+        for user_id in [uid for uid, bucket in self._user_buckets.items() if bucket.is_full()]:
+            del self._user_buckets[user_id]
+
+    def usage(self, user_id: int) -> UserUsage:
+        with self._usage_lock:
+            usage = self._usage.get(user_id)
+            if usage is None:
+                usage = self._usage[user_id] = UserUsage()
+            return usage
+
+    def _reject(self, user_id: int, retry_after: float, reason: str):
+        self.usage(user_id).rejected += 1
+        ai_rejected.inc(reason=reason)
+        raise RateLimited(retry_after, reason)
+
+    async def admit(self, user_id: int, cost: float, allow_debt: bool = False):
+        """Wait (briefly) for capacity for ``cost`` tokens or raise RateLimited"""
+        user_bucket = self._user_bucket(user_id)
+        ok, retry_after = user_bucket.try_consume(cost, allow_debt)
+        if not ok:
+            self._reject(user_id, retry_after, "user")
+
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+
+        async with self._condition:
+            if not self._waiters:
+                ok, _ = self.global_bucket.try_consume(cost, allow_debt)
+                if ok:
+                    self._admitted(user_id, queued=False)
+                    return
+
+            needed = 0.0 if allow_debt else min(cost, self.global_bucket.capacity)
+            expected_wait = (self._queued_tokens + needed - self.global_bucket.available()) / self.global_bucket.rate
+            if expected_wait > self.max_wait:
+                user_bucket.adjust(cost)
+                self._reject(user_id, expected_wait, "global")
+
+            ticket = object()
+            self._waiters.setdefault(user_id, deque()).append((ticket, cost))
+            self._queued_tokens += cost
+            ai_queue_depth.inc()
+            deadline = self._clock() + self.max_wait
+            try:
+                while True:
+                    if self._is_next(user_id, ticket):
+                        ok, retry_after = self.global_bucket.try_consume(cost, allow_debt)
+                        if ok:
+                            self._dequeue(user_id, rotate=True)
+                            self._condition.notify_all()
+                            self._admitted(user_id, queued=True)
+                            return
+                    else:
+                        retry_after = self.max_wait
+                    remaining = deadline - self._clock()
+                    if remaining <= 0:
+                        break
+                    try:
+                        await asyncio.wait_for(self._condition.wait(), timeout=min(retry_after, remaining))
+                    except asyncio.TimeoutError:
+                        pass
+            except asyncio.CancelledError:
+                self._remove(user_id, ticket, cost)
+                user_bucket.adjust(cost)
+                raise
+
+            self._remove(user_id, ticket, cost)
+            self._condition.notify_all()
+            user_bucket.adjust(cost)
+            self._reject(user_id, retry_after, "timeout")
+
+    def _is_next(self, user_id: int, ticket: object) -> bool:
+        head_user = next(iter(self._waiters))
+        return head_user == user_id and self._waiters[user_id][0][0] is ticket
+
+    def _dequeue(self, user_id: int, rotate: bool):
+        queue = self._waiters[user_id]
+        _, cost = queue.popleft()
+        self._queued_tokens -= cost
+        ai_queue_depth.dec()
+        if not queue:
+            del self._waiters[user_id]
+        elif rotate:
+            self._waiters.move_to_end(user_id)
+
+    def _remove(self, user_id: int, ticket: object, cost: float):
+        queue = self._waiters.get(user_id)
+        if not queue:
+            return
+        for entry in list(queue):
+            if entry[0] is ticket:
+                queue.remove(entry)
+                self._queued_tokens -= cost
+                ai_queue_depth.dec()
+                break
+        if not queue:
+            del self._waiters[user_id]
+
+    def _admitted(self, user_id: int, queued: bool):
+        self.usage(user_id).requests += 1
+        ai_admitted.inc(queued=str(queued).lower())
+        ai_global_tokens.set(self.global_bucket.available())
+
+    def record_usage(self, user_id: int, prompt_tokens: int, completion_tokens: int, charged: Optional[float] = None):
+        """Account actual token usage and settle the difference from the estimate"""
+        usage = self.usage(user_id)
+        with self._usage_lock:
+            usage.prompt_tokens += prompt_tokens
+            usage.completion_tokens += completion_tokens
+        ai_tokens.inc(prompt_tokens, kind="prompt")
+        ai_tokens.inc(completion_tokens, kind="completion")
+
+        if charged is not None:
+            difference = charged - (prompt_tokens + completion_tokens)
+            self._user_bucket(user_id).adjust(difference)
+            self.global_bucket.adjust(difference)
+
+    def refund(self, user_id: int, charged: float):
+        """Return the admission charge of a request that used no tokens, e.g. a failed completion"""
+        self._user_bucket(user_id).adjust(charged)
+        self.global_bucket.adjust(charged)
+
+    def stats(self) -> dict:
+        return {
+            "global_tokens_available": self.global_bucket.available(),
+            "global_tokens_per_minute": self.global_bucket.rate * 60,
+            "queued_requests": sum(len(queue) for queue in self._waiters.values()),
+            "queued_tokens": self._queued_tokens,
+            "active_users": len(self._user_buckets),
+        }
+
+    def user_stats(self, user_id: int) -> dict:
+        usage = self.usage(user_id)
+        return {
+            "tokens_available": self._user_bucket(user_id).available(),
+            "tokens_per_minute": self.user_rate * 60,
+            "requests": usage.requests,
+            "rejected": usage.rejected,
+            "prompt_tokens": usage.prompt_tokens,
+            "completion_tokens": usage.completion_tokens,
+        }
+
+# Shared admission controller for /ai endpoints
+ai_limiter = AIAdmissionController()
@@ -0,0 +1,278 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import json
+import threading
+import os
+from dateutil import parser as date_parser
+from dateutil.rrule import rrulestr
+from dotenv import load_dotenv
+from sqlalchemy.orm import Session
+from app.models import CalendarEvent
+from app.services.pomodoro_stats import utc_naive
+
+load_dotenv()
+
+# Recurring event configuration
+RECURRENCE_CACHE_EVENTS = int(os.getenv("RECURRENCE_CACHE_EVENTS", "5000"))
+RECURRENCE_CACHE_WINDOWS = int(os.getenv("RECURRENCE_CACHE_WINDOWS", "8"))
+MAX_OCCURRENCES_PER_QUERY = int(os.getenv("MAX_OCCURRENCES_PER_QUERY", "5000"))
+
+# Finite series that would need expanding more occurrences than this to
+# find their end are treated as unbounded
+MAX_SERIES_SCAN = 10000
+_TOO_LONG = object()
+
+# Frequencies whose period is a fixed length of local wall-clock time
+FIXED_PERIODS = {
+    "WEEKLY": timedelta(weeks=1),
+    "DAILY": timedelta(days=1),
+    "HOURLY": timedelta(hours=1),
+    "MINUTELY": timedelta(minutes=1),
+    "SECONDLY": timedelta(seconds=1),
+}
+
+DST_PADDING = timedelta(hours=3)
+
+Occurrence = Tuple[datetime, datetime]
+
+class InvalidRecurrence(ValueError):
+    pass
+
+def parse_rule(rule: str) -> Dict[str, str]:
+    """Split an RRULE ("RRULE:" prefix optional) into its upper-cased parts"""
+    text = rule.strip()
+    if text.upper().startswith("RRULE:"):
+        text = text[6:]
+    parts = {}
+    for item in filter(None, text.split(";")):
+        name, sep, value = item.partition("=")
+        if not sep:
+            raise InvalidRecurrence(f"Malformed RRULE part: {item}")
+        parts[name.strip().upper()] = value.strip().upper()
+    if parts.get("FREQ") not in {"YEARLY", "MONTHLY", *FIXED_PERIODS}:
+        raise InvalidRecurrence("RRULE needs a valid FREQ")
+    if "COUNT" in parts and "UNTIL" in parts:
+        raise InvalidRecurrence("RRULE cannot have both COUNT and UNTIL")
+    return parts
+
+def format_rule(parts: Dict[str, str]) -> str:
+    return ";".join(f"{name}={value}" for name, value in parts.items())
+
+def parse_exdates(value: Optional[str]) -> List[datetime]:
+    return [datetime.fromisoformat(item) for item in json.loads(value)] if value else []
+
+def dump_exdates(values: Optional[List[datetime]]) -> Optional[str]:
+    if not values:
+        return None
+    return json.dumps(sorted({utc_naive(value).isoformat() for value in values}))
+
+class Recurrence:
+    """An event's RRULE expanded in its own time zone.
+
+    Expansion is lazy and windowed: for rules with a fixed-length period and
+    no COUNT, the rule's start is fast-forwarded by whole periods to just
+    before the window, so the work done is proportional to the occurrences
+    returned rather than to the age of the series.
+    """
+
+    def __init__(self, rule: str, start: datetime, end: datetime, exdates=(), tz_name: Optional[str] = None):
+        try:
+            self.tz = ZoneInfo(tz_name or "UTC")
+        except (ZoneInfoNotFoundError, ValueError):
+            raise InvalidRecurrence(f"Unknown timezone: {tz_name}")
+        self.parts = parse_rule(rule)
+        start, end = utc_naive(start), utc_naive(end)
+        self.duration = end - start
+        self.local_start = self.to_local(start)
+        self.exdates = {utc_naive(value) for value in exdates}
+
+        if "UNTIL" in self.parts:
+            try:
+                until = date_parser.parse(self.parts["UNTIL"])
+            except (ValueError, OverflowError):
+                raise InvalidRecurrence("Invalid RRULE UNTIL")
+            if until.tzinfo is not None:
+                until = until.astimezone(self.tz).replace(tzinfo=None)
+            self.parts["UNTIL"] = until.strftime("%Y%m%dT%H%M%S")
+        self.rule(self.local_start)  # validate the remaining parts
+
+    def to_local(self, value: datetime) -> datetime:
+        return value.replace(tzinfo=timezone.utc).astimezone(self.tz).replace(tzinfo=None)
+
+    def to_utc(self, value: datetime) -> datetime:
+        return value.replace(tzinfo=self.tz).astimezone(timezone.utc).replace(tzinfo=None)
+
+    def rule(self, dtstart: datetime):
+        try:
+            return rrulestr(format_rule(self.parts), dtstart=dtstart)
+        except (ValueError, TypeError) as e:
+            raise InvalidRecurrence(f"Invalid RRULE: {e}")
+
+    def _dtstart_before(self, local: datetime) -> datetime:
+        period = FIXED_PERIODS.get(self.parts["FREQ"])
+        if period is None or "COUNT" in self.parts or local <= self.local_start:
+            return self.local_start
+        period *= int(self.parts.get("INTERVAL", "1"))
+        return self.local_start + period * ((local - self.local_start) // period)
+
+    def iter_between(self, start: datetime, end: datetime) -> Iterator[Occurrence]:
+        """Occurrences (UTC start, end) overlapping [start, end), in order"""
+        start, end = utc_naive(start), utc_naive(end)
+        # Local bounds are padded so DST shifts cannot drop edge occurrences
+        lo = self.to_local(start - self.duration) - DST_PADDING
+        hi = self.to_local(end) + DST_PADDING
+        for local in self.rule(self._dtstart_before(lo)).xafter(lo, inc=True):
+            if local >= hi:
+                break
+            occurrence_start = self.to_utc(local)
+            if occurrence_start >= end:
+                break
+            occurrence_end = occurrence_start + self.duration
+            if occurrence_end > start and occurrence_start not in self.exdates:
+                yield occurrence_start, occurrence_end
+
+    def between(self, start: datetime, end: datetime, limit: int = MAX_OCCURRENCES_PER_QUERY) -> List[Occurrence]:
+        occurrences = []
+        for occurrence in self.iter_between(start, end):
+            occurrences.append(occurrence)
+            if len(occurrences) >= limit:
+                break
+        return occurrences
+
+    def series_end(self) -> Optional[datetime]:
+        """End of the last occurrence (UTC), or None for an unbounded series.
+
+        Fixed-period rules without BY* parts are computed directly. Other
+        rules with UNTIL are expanded from just before UNTIL where the period
+        allows; anything else is expanded from the start, up to
+        MAX_SERIES_SCAN occurrences.
+        """
+        if "COUNT" not in self.parts and "UNTIL" not in self.parts:
+            return None
+        period = FIXED_PERIODS.get(self.parts["FREQ"])
+        if period is not None:
+            period *= int(self.parts.get("INTERVAL", "1"))
+        plain = period is not None and not any(name.startswith("BY") for name in self.parts)
+
+        try:
+            if "COUNT" in self.parts:
+                if plain:
+                    last = self.local_start + period * max(int(self.parts["COUNT"]) - 1, 0)
+                else:
+                    last = self._last_from(self.local_start)
+            else:
+                until = datetime.strptime(self.parts["UNTIL"], "%Y%m%dT%H%M%S")
+                if plain:
+                    last = self.local_start + period * max((until - self.local_start) // period, 0)
+                else:
+                    last = None
+                    if period is not None and until - period > self.local_start:
+                        last = self._last_from(self._dtstart_before(until - period))
+                    if last is None:
+                        last = self._last_from(self.local_start)
+            if last is _TOO_LONG:
+                return None
+            return self.to_utc(last or self.local_start) + self.duration
+        except OverflowError:
+            # Ends past datetime.max
+            return None
+
+    def _last_from(self, dtstart: datetime):
+        """Last local occurrence of the rule started at ``dtstart``, None if
+        there are none, or _TOO_LONG past MAX_SERIES_SCAN occurrences"""
+        last = None
+        for i, local in enumerate(self.rule(dtstart)):
+            if i >= MAX_SERIES_SCAN:
+                return _TOO_LONG
+            last = local
+        return last
+
+def recurrence_for(event: CalendarEvent) -> Recurrence:
+    return Recurrence(event.rrule, event.start, event.end, parse_exdates(event.exdates), event.timezone)
+
+def apply_recurrence(event: CalendarEvent):
+    """Normalise an event's recurrence fields and compute ``recurrence_end``.
+
+    Raises InvalidRecurrence for a bad rule or time zone.
+    """
+    if not event.rrule:
+        event.rrule = None
+        event.recurrence_end = None
+        return
+    recurrence = recurrence_for(event)
+    event.rrule = format_rule(parse_rule(event.rrule))
+    event.recurrence_end = recurrence.series_end()
+
+class OccurrenceCache:
+    """Expanded occurrences per recurring event and queried window.
+
+    Entries are dropped when the event is edited (``invalidate``) and are
+    also keyed by the event's ``updated_at`` so edits made by another worker
+    are never served stale.
+    """
+
+    def __init__(self, max_events: int = RECURRENCE_CACHE_EVENTS, max_windows: int = RECURRENCE_CACHE_WINDOWS):
+        self._events: "OrderedDict[int, Tuple[object, OrderedDict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._max_events = max_events
+        self._max_windows = max_windows
+
+    def expand(self, event: CalendarEvent, start: datetime, end: datetime) -> List[Occurrence]:
+        version = (event.updated_at, event.rrule, event.exdates, event.timezone, event.start, event.end)
+        window = (utc_naive(start), utc_naive(end))
+        with self._lock:
+            entry = self._events.get(event.id)
+            if entry is not None and entry[0] == version:
+                self._events.move_to_end(event.id)
+                occurrences = entry[1].get(window)
+                if occurrences is not None:
+                    entry[1].move_to_end(window)
+                    return occurrences
+
+        occurrences = recurrence_for(event).between(*window)
+
+        with self._lock:
+            entry = self._events.get(event.id)
+            if entry is None or entry[0] != version:
+                entry = self._events[event.id] = (version, OrderedDict())
+            self._events.move_to_end(event.id)
+            entry[1][window] = occurrences
+            while len(entry[1]) > self._max_windows:
+                entry[1].popitem(last=False)
+            while len(self._events) > self._max_events:
+                self._events.popitem(last=False)
+        return occurrences
+
+    def invalidate(self, event_id: int):
+        with self._lock:
+            self._events.pop(event_id, None)
+
+def recurring_events(db: Session, user_id: int, start: datetime, end: datetime, *columns):
+    """Recurring masters whose series may overlap [start, end)"""
+    return db.query(*(columns or (CalendarEvent,))).filter(
+        CalendarEvent.user_id == user_id,
+        CalendarEvent.rrule.isnot(None),
+        CalendarEvent.start < end
+    ).filter(
+        (CalendarEvent.recurrence_end.is_(None)) | (CalendarEvent.recurrence_end > start)
+    )
+
+def expand_recurring(db: Session, user_id: int, start: datetime, end: datetime) -> List[Tuple[CalendarEvent, datetime, datetime]]:
+    """(master, occurrence start, occurrence end) for every occurrence in the window"""
+    occurrences = []
+    for event in recurring_events(db, user_id, start, end):
+        try:
+            expanded = occurrence_cache.expand(event, start, end)
+        except InvalidRecurrence:
+            # A rule we cannot expand still shows up as its first occurrence
+            first_start, first_end = utc_naive(event.start), utc_naive(event.end)
+            overlaps = first_start < utc_naive(end) and first_end > utc_naive(start)
+            expanded = [(first_start, first_end)] if overlaps else []
+        for occurrence_start, occurrence_end in expanded:
+            occurrences.append((event, occurrence_start, occurrence_end))
+    return occurrences
+
+# Shared occurrence cache
+occurrence_cache = OccurrenceCache()
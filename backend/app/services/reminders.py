@@ -0,0 +1,301 @@
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+import asyncio
+import heapq
+import logging
+import threading
+import os
+from dotenv import load_dotenv
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models import NotificationType, Task, TaskReminder, TaskStatus
+from app.services.metrics import registry
+from app.services.notify import create_notification
+from app.services.pomodoro_stats import utc_naive
+
+load_dotenv()
+
+# Deadline reminder configuration
+REMINDER_LEAD_MINUTES = sorted({int(value) for value in os.getenv("REMINDER_LEAD_MINUTES", "1440,60").split(",") if value.strip()}, reverse=True)
+REMINDER_WINDOW_MINUTES = int(os.getenv("REMINDER_WINDOW_MINUTES", "60"))
+REMINDER_MAX_LOADED = int(os.getenv("REMINDER_MAX_LOADED", "10000"))
+REMINDER_GRACE_MINUTES = int(os.getenv("REMINDER_GRACE_MINUTES", "60"))
+REMINDER_BATCH_SIZE = int(os.getenv("REMINDER_BATCH_SIZE", "500"))
+REMINDER_POLL_SECONDS = float(os.getenv("REMINDER_POLL_SECONDS", "60"))
+
+OPEN_STATUSES = (TaskStatus.pending, TaskStatus.in_progress)
+
+logger = logging.getLogger(__name__)
+
+reminders_sent = registry.counter("task_reminders_sent_total", "Deadline reminder notifications created")
+reminders_dropped = registry.counter("task_reminders_dropped_total", "Loaded reminders not sent", ["reason"])
+reminder_heap_size = registry.gauge("task_reminder_heap_size", "Reminders loaded and waiting to fire")
+
+# (fire at, task id, lead minutes, due date), all times naive UTC
+Reminder = Tuple[datetime, int, int, datetime]
+
+def lead_label(minutes: int) -> str:
+    if minutes <= 0:
+        return "now"
+    for size, unit in ((1440, "day"), (60, "hour"), (1, "minute")):
+        if minutes % size == 0:
+            count = minutes // size
+            return f"in {count} {unit}{'s' if count != 1 else ''}"
+    return f"in {minutes} minutes"
+
+def reminders_for(task_id: int, due_date: datetime, leads: Iterable[int] = REMINDER_LEAD_MINUTES) -> List[Reminder]:
+    due = utc_naive(due_date)
+    return [(due - timedelta(minutes=lead), task_id, lead, due) for lead in leads]
+
+def load_window(
+    db: Session,
+    start: datetime,
+    end: datetime,
+    leads: Iterable[int] = REMINDER_LEAD_MINUTES,
+    limit: int = REMINDER_MAX_LOADED,
+) -> Tuple[List[Reminder], datetime]:
+    """Reminders of open tasks firing in [start, end), at most ``limit`` per lead time.
+
+    Each lead time is one range scan of the (due_date, status) index. When a
+    scan hits the limit the window is cut short at its last fire time, and
+    the cut is returned so the caller resumes loading from there.
+    """
+    scans = []
+    covered = end
+    for lead in leads:
+        offset = timedelta(minutes=lead)
+        rows = db.query(Task.id, Task.due_date).filter(
+            Task.due_date >= start + offset,
+            Task.due_date < end + offset,
+            Task.status.in_(OPEN_STATUSES)
+        ).order_by(Task.due_date).limit(limit).all()
+        if len(rows) == limit:
+            last = utc_naive(rows[-1].due_date) - offset
+            if last > start:
+                covered = min(covered, last)
+            else:
+                # Everything in the scan fires at the same instant; take all of it
+                rows += db.query(Task.id, Task.due_date).filter(
+                    Task.due_date == rows[-1].due_date,
+                    Task.status.in_(OPEN_STATUSES),
+                    Task.id.notin_([row.id for row in rows])
+                ).all()
+                covered = min(covered, last + timedelta(microseconds=1))
+        scans.append((lead, rows))
+
+    reminders = []
+    for lead, rows in scans:
+        for task_id, due_date in rows:
+            reminder = reminders_for(task_id, due_date, (lead,))[0]
+            if reminder[0] < covered:
+                reminders.append(reminder)
+    return reminders, covered
+
+def _claim(db: Session, rows: List[dict]) -> List[Tuple[int, int]]:
+    """Insert reminder rows, returning the (task id, lead) pairs not sent before"""
+    if not rows:
+        return []
+    bind = db.get_bind()
+    dialect = bind.dialect.name
+    if dialect in ("postgresql", "sqlite") and bind.dialect.insert_returning:
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        statement = upsert(TaskReminder).values(rows).on_conflict_do_nothing(
+            index_elements=["task_id", "due_date", "lead_minutes"]
+        ).returning(TaskReminder.task_id, TaskReminder.lead_minutes)
+        return [tuple(row) for row in db.execute(statement)]
+
+    claimed = []
+    for row in rows:
+        try:
+            with db.begin_nested():
+                db.execute(insert(TaskReminder).values(**row))
+            claimed.append((row["task_id"], row["lead_minutes"]))
+        except IntegrityError:
+            pass
+    return claimed
+
+def send_reminders(db: Session, reminders: List[Reminder], now: Optional[datetime] = None, grace_minutes: int = REMINDER_GRACE_MINUTES) -> int:
+    """Create notifications for due reminders in one transaction.
+
+    Reminders are checked against the task's current state, so entries made
+    stale by edits are dropped. The task_reminders unique key lets only one
+    worker (or run) claim a given reminder; its notification is committed
+    in the same transaction, so each reminder is delivered exactly once.
+    Returns the number of notifications created.
+    """
+    now = now or datetime.utcnow()
+    latest = {}
+    for reminder in reminders:
+        latest[(reminder[1], reminder[2], reminder[3])] = reminder
+
+    tasks = {
+        task.id: task
+        for task in db.query(Task.id, Task.user_id, Task.title, Task.due_date).filter(
+            Task.id.in_({task_id for task_id, _, _ in latest}),
+            Task.status.in_(OPEN_STATUSES)
+        )
+    }
+    rows = []
+    for (task_id, lead, due), (fire_at, _, _, _) in latest.items():
+        task = tasks.get(task_id)
+        if task is None or task.due_date is None or utc_naive(task.due_date) != due:
+            reminders_dropped.inc(reason="stale")
+        elif now - fire_at > timedelta(minutes=grace_minutes):
+            reminders_dropped.inc(reason="late")
+        else:
+            rows.append({"task_id": task_id, "user_id": task.user_id, "due_date": due, "lead_minutes": lead})
+
+    try:
+        claimed = _claim(db, rows)
+        for task_id, lead in claimed:
+            task = tasks[task_id]
+            create_notification(
+                db,
+                task.user_id,
+                "Task due" if lead <= 0 else f"Task due {lead_label(lead)}",
+                f'"{task.title}" is due {lead_label(lead)} ({utc_naive(task.due_date):%Y-%m-%d %H:%M} UTC)',
+                type=NotificationType.warning,
+                task_id=task_id
+            )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    reminders_sent.inc(len(claimed))
+    reminders_dropped.inc(len(rows) - len(claimed), reason="already_sent")
+    return len(claimed)
+
+class ReminderService:
+    """Background engine turning task deadlines into reminder notifications.
+
+    Only reminders firing before ``watermark`` are held, in a min-heap
+    ordered by fire time; the heap is refilled one window at a time from
+    the (due_date, status) index, so the task table is never scanned per
+    tick. Routers call ``schedule`` after writing a task so changes inside
+    the loaded window are picked up without waiting for the next refill.
+    """
+
+    def __init__(
+        self,
+        leads: Iterable[int] = REMINDER_LEAD_MINUTES,
+        window_minutes: int = REMINDER_WINDOW_MINUTES,
+        poll_seconds: float = REMINDER_POLL_SECONDS,
+    ):
+        self.leads = list(leads)
+        self.window = timedelta(minutes=window_minutes)
+        self.poll_seconds = poll_seconds
+        self._heap: List[Reminder] = []
+        self._lock = threading.Lock()
+        self._watermark: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+
+    def start(self):
+        if self._task is None and self.leads and self.poll_seconds > 0:
+            self._loop = asyncio.get_running_loop()
+            self._wake = asyncio.Event()
+            self._task = self._loop.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        with self._lock:
+            self._heap = []
+            self._watermark = None
+
+    def _push(self, reminders: Iterable[Reminder]):
+        with self._lock:
+            for reminder in reminders:
+                heapq.heappush(self._heap, reminder)
+            reminder_heap_size.set(len(self._heap))
+
+    def schedule(self, task: Task):
+        """Queue a written task's reminders that fall inside the loaded window"""
+        if self._watermark is None or task.due_date is None or task.status not in OPEN_STATUSES:
+            return
+        earliest = datetime.utcnow() - timedelta(minutes=REMINDER_GRACE_MINUTES)
+        upcoming = [r for r in reminders_for(task.id, task.due_date, self.leads) if earliest <= r[0] < self._watermark]
+        if upcoming:
+            self._push(upcoming)
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def _pop_due(self, now: datetime, limit: int = REMINDER_BATCH_SIZE) -> List[Reminder]:
+        with self._lock:
+            due = []
+            while self._heap and self._heap[0][0] <= now and len(due) < limit:
+                due.append(heapq.heappop(self._heap))
+            reminder_heap_size.set(len(self._heap))
+            return due
+
+    @staticmethod
+    def _load(start: datetime, end: datetime, leads: List[int]) -> Tuple[List[Reminder], datetime]:
+        db = SessionLocal()
+        try:
+            return load_window(db, start, end, leads)
+        finally:
+            db.close()
+
+    @staticmethod
+    def _send(reminders: List[Reminder], now: datetime) -> int:
+        db = SessionLocal()
+        try:
+            return send_reminders(db, reminders, now)
+        finally:
+            db.close()
+
+    async def tick(self) -> float:
+        """Refill and fire what is due; returns seconds until the next wake-up"""
+        now = datetime.utcnow()
+        if self._watermark is None or self._watermark <= now + self.window / 2:
+            start = self._watermark or now - timedelta(minutes=REMINDER_GRACE_MINUTES)
+            reminders, covered = await asyncio.to_thread(self._load, start, max(start, now) + self.window, self.leads)
+            self._push(reminders)
+            self._watermark = covered
+
+        due = self._pop_due(now)
+        if due:
+            try:
+                sent = await asyncio.to_thread(self._send, due, now)
+                if sent:
+                    logger.info("Sent %d task reminders", sent)
+            except Exception:
+                self._push(due)  # retried on the next tick
+                raise
+            if len(due) == REMINDER_BATCH_SIZE:
+                return 0
+
+        with self._lock:
+            next_fire = self._heap[0][0] if self._heap else None
+        wake_at = self._watermark - self.window / 2
+        if next_fire is not None:
+            wake_at = min(wake_at, next_fire)
+        return min(max((wake_at - datetime.utcnow()).total_seconds(), 0), self.poll_seconds)
+
+    async def _run(self):
+        while True:
+            try:
+                delay = await self.tick()
+            except Exception:
+                logger.exception("Task reminder tick failed")
+                delay = self.poll_seconds
+            if delay <= 0:
+                continue
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+# Shared reminder engine started with the application
+reminder_service = ReminderService()
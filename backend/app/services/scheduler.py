@@ -0,0 +1,119 @@
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Iterable, List, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo
+import heapq
+from app.services.intervals import FreeIntervalIndex, merge_intervals, subtract_intervals
+
+EPOCH = datetime(1970, 1, 1)
+
+PRIORITY_RANK = {"high": 0, "medium": 1, "low": 2}
+
+DEFAULT_TASK_DURATION = 30  # in minutes
+
+@dataclass
+class SchedulableTask:
+    id: int
+    priority: str = "medium"
+    due_date: Optional[datetime] = None
+    estimated_duration: Optional[int] = None
+
+@dataclass
+class WorkingHours:
+    start_hour: int = 9
+    end_hour: int = 17
+    days: Tuple[int, ...] = (0, 1, 2, 3, 4)  # Monday=0
+    timezone: str = "UTC"
+
+@dataclass
+class Placement:
+    task_id: int
+    start: datetime
+    end: datetime
+    late: bool
+
+@dataclass
+class ScheduleResult:
+    scheduled: List[Placement]
+    unscheduled: List[int]
+
+def to_minutes(value: datetime) -> int:
+    """Convert a datetime to whole minutes since the epoch (naive values are UTC)"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return int((value - EPOCH).total_seconds() // 60)
+
+def from_minutes(minutes: int) -> datetime:
+    return EPOCH + timedelta(minutes=minutes)
+
+def working_windows(start: datetime, end: datetime, hours: WorkingHours) -> List[Tuple[int, int]]:
+    """Working-hour windows between ``start`` and ``end`` in epoch minutes"""
+    tz = ZoneInfo(hours.timezone)
+    lo, hi = to_minutes(start), to_minutes(end)
+    first = from_minutes(lo).replace(tzinfo=timezone.utc).astimezone(tz).date() - timedelta(days=1)
+    last = from_minutes(hi).replace(tzinfo=timezone.utc).astimezone(tz).date()
+
+    windows = []
+    day = first
+    while day <= last:
+        if day.weekday() in hours.days:
+            window_start = to_minutes(datetime.combine(day, time(hours.start_hour), tzinfo=tz))
+            window_end = to_minutes(_end_of_window(day, hours.end_hour, tz))
+            window_start, window_end = max(window_start, lo), min(window_end, hi)
+            if window_start < window_end:
+                windows.append((window_start, window_end))
+        day += timedelta(days=1)
+    return windows
+
+def _end_of_window(day: date, end_hour: int, tz: ZoneInfo) -> datetime:
+    if end_hour >= 24:
+        return datetime.combine(day + timedelta(days=1), time(0), tzinfo=tz)
+    return datetime.combine(day, time(end_hour), tzinfo=tz)
+
+def schedule_tasks(
+    tasks: Sequence[SchedulableTask],
+    busy: Iterable[Tuple[datetime, datetime]],
+    start: datetime,
+    end: datetime,
+    hours: Optional[WorkingHours] = None,
+    default_duration: int = DEFAULT_TASK_DURATION,
+) -> ScheduleResult:
+    """Place tasks into free working time between ``start`` and ``end``.
+
+    Tasks are taken from a heap ordered by due date (undated last), then
+    priority, then id, and each is given the earliest free slot long enough
+    to hold it. Output depends only on the inputs, so it is deterministic.
+    """
+    hours = hours or WorkingHours()
+    busy_minutes = merge_intervals([(to_minutes(s), to_minutes(e)) for s, e in busy])
+    free = subtract_intervals(working_windows(start, end, hours), busy_minutes)
+    index = FreeIntervalIndex(free)
+
+    heap = []
+    for task in tasks:
+        due = to_minutes(task.due_date) if task.due_date else None
+        heap.append((
+            due is None,
+            due or 0,
+            PRIORITY_RANK.get(task.priority, 1),
+            task.id,
+            task.estimated_duration or default_duration,
+        ))
+    heapq.heapify(heap)
+
+    scheduled: List[Placement] = []
+    unscheduled: List[int] = []
+    while heap:
+        undated, due, _, task_id, duration = heapq.heappop(heap)
+        slot = index.allocate(duration)
+        if slot == -1:
+            unscheduled.append(task_id)
+            continue
+        scheduled.append(Placement(
+            task_id=task_id,
+            start=from_minutes(slot),
+            end=from_minutes(slot + duration),
+            late=not undated and slot + duration > due,
+        ))
+
+    return ScheduleResult(scheduled=scheduled, unscheduled=unscheduled)
@@ -0,0 +1,100 @@
+from collections import defaultdict
+from typing import Dict, Iterable, Optional, Tuple
+from sqlalchemy import case, func, or_, select, update
+from sqlalchemy.orm import Session
+from app.models import PomodoroSession, PomodoroType, Task
+
+def counts_towards_task(session: PomodoroSession) -> bool:
+    """Ended, non-abandoned work sessions linked to a task count as time spent on it"""
+    return bool(
+        session.task_id
+        and session.end_time is not None
+        and session.type == PomodoroType.work
+        and not getattr(session, "abandoned", False)
+    )
+
+def task_deltas(sessions: Iterable[PomodoroSession], sign: int = 1) -> Dict[int, Tuple[int, int]]:
+    """Per task (pomodoro_count, actual_duration) increments for a batch of sessions"""
+    deltas: Dict[int, list] = defaultdict(lambda: [0, 0])
+    for session in sessions:
+        if counts_towards_task(session):
+            totals = deltas[session.task_id]
+            totals[0] += sign
+            totals[1] += sign * session.duration
+    return {task_id: tuple(values) for task_id, values in deltas.items() if any(values)}
+
+def merge_deltas(*deltas: Dict) -> Dict:
+    """Sum several delta maps (e.g. the negative old and positive new state of an edit)"""
+    merged: Dict = {}
+    for delta in deltas:
+        for key, values in delta.items():
+            current = merged.get(key)
+            merged[key] = values if current is None else tuple(a + b for a, b in zip(current, values))
+    return {key: values for key, values in merged.items() if any(values)}
+
+def apply_task_deltas(db: Session, user_id: int, deltas: Dict[int, Tuple[int, int]]):
+    """Increment the user's tasks' counters in the caller's transaction (does not commit)"""
+    for task_id, (count, minutes) in deltas.items():
+        db.execute(
+            update(Task).where(Task.id == task_id, Task.user_id == user_id).values(
+                pomodoro_count=Task.pomodoro_count + count,
+                actual_duration=func.coalesce(Task.actual_duration, 0) + minutes
+            ).execution_options(synchronize_session=False)
+        )
+
+def rebuild_task_durations(db, user_id: Optional[int] = None) -> int:
+    """Recompute task counters from sessions with one set-based UPDATE.
+
+    Tasks that never had a tracked session keep any manually entered
+    ``actual_duration``. Runs in the caller's transaction (``db`` may be a
+    Session or a Connection); returns the number of tasks updated.
+    """
+    counted = (
+        (PomodoroSession.task_id == Task.id)
+        & PomodoroSession.end_time.isnot(None)
+        & (PomodoroSession.type == PomodoroType.work)
+        & (PomodoroSession.abandoned == False)
+    )
+    count = select(func.count(PomodoroSession.id)).where(counted).scalar_subquery()
+    minutes = select(func.sum(PomodoroSession.duration)).where(counted).scalar_subquery()
+
+    statement = update(Task).where(or_(count > 0, Task.pomodoro_count > 0)).values(
+        pomodoro_count=count, actual_duration=func.coalesce(minutes, 0)
+    )
+    if user_id is not None:
+        statement = statement.where(Task.user_id == user_id)
+    return db.execute(statement.execution_options(synchronize_session=False)).rowcount
+
+def estimate_accuracy(db: Session, user_id: int) -> dict:
+    """Estimate-vs-actual summary over tasks with both an estimate and tracked time.
+
+    Computed in one aggregate query from the precomputed task counters.
+    """
+    estimated = Task.estimated_duration
+    actual = Task.actual_duration
+    error = func.abs(actual - estimated)
+    row = db.query(
+        func.count(Task.id),
+        func.coalesce(func.sum(estimated), 0),
+        func.coalesce(func.sum(actual), 0),
+        func.coalesce(func.sum(error), 0),
+        func.avg(error * 1.0 / estimated),
+        func.coalesce(func.sum(case((actual > estimated, 1), else_=0)), 0),
+        func.coalesce(func.sum(case((error * 5 <= estimated, 1), else_=0)), 0)
+    ).filter(
+        Task.user_id == user_id,
+        Task.estimated_duration > 0,
+        Task.pomodoro_count > 0
+    ).one()
+
+    tasks, total_estimated, total_actual, total_error, mean_relative_error, under, within = row
+    return {
+        "tasks": tasks,
+        "total_estimated_minutes": total_estimated,
+        "total_actual_minutes": total_actual,
+        "actual_to_estimate_ratio": total_actual / total_estimated if total_estimated else None,
+        "mean_absolute_error_minutes": total_error / tasks if tasks else None,
+        "mean_relative_error": float(mean_relative_error) if mean_relative_error is not None else None,
+        "underestimated_tasks": under,
+        "within_20_percent": within,
+    }
@@ -0,0 +1,213 @@
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Tuple
+import heapq
+import math
+import re
+import threading
+import os
+from dotenv import load_dotenv
+from sqlalchemy.orm import Session
+from app.models import Task
+from app.services.metrics import registry
+
+load_dotenv()
+
+# Similarity index configuration
+TASK_INDEX_CACHE_USERS = int(os.getenv("TASK_INDEX_CACHE_USERS", "500"))
+TASK_INDEX_MAX_DF = float(os.getenv("TASK_INDEX_MAX_DF", "0.5"))
+
+task_index_lookups = registry.counter("task_index_cache_lookups_total", "Task index cache lookups", ["result"])
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOP_WORDS = frozenset("""
+a an and are as at be by do for from has have i in is it its me my of on or
+our so that the their this to up was we will with you your
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    return [
+        token for token in TOKEN_PATTERN.findall(text.lower())
+        if len(token) > 1 and token not in STOP_WORDS
+    ]
+
+def term_weights(text: str) -> Dict[str, float]:
+    """Sublinear term-frequency weights for a piece of text"""
+    return {term: 1.0 + math.log(count) for term, count in Counter(tokenize(text)).items()}
+
+def text_similarity(a: str, b: str) -> float:
+    """Cosine similarity of two texts' term-frequency vectors (no idf)"""
+    wa, wb = term_weights(a), term_weights(b)
+    dot = sum(weight * wb[term] for term, weight in wa.items() if term in wb)
+    if not dot:
+        return 0.0
+    return dot / (math.sqrt(sum(w * w for w in wa.values())) * math.sqrt(sum(w * w for w in wb.values())))
+
+class UserTaskIndex:
+    """Incremental TF-IDF inverted index over one user's tasks.
+
+    Postings map each term to the documents containing it, so a query only
+    touches documents sharing a term with it. Document norms are cached and
+    recomputed in bulk only when the collection size drifts enough for the
+    idf values behind them to be noticeably stale.
+    """
+
+    def __init__(self, max_df: float = TASK_INDEX_MAX_DF):
+        self.docs: Dict[int, Dict[str, float]] = {}
+        self.postings: Dict[str, Dict[int, float]] = {}
+        self.norms: Dict[int, float] = {}
+        self.max_df = max_df
+        self._norms_size = 0
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def idf(self, term: str) -> float:
+        df = len(self.postings.get(term, ()))
+        return math.log((len(self.docs) + 1) / (df + 1)) + 1.0
+
+    def _norm(self, weights: Dict[str, float]) -> float:
+        return math.sqrt(sum((weight * self.idf(term)) ** 2 for term, weight in weights.items())) or 1.0
+
+    def add(self, task_id: int, text: str, refresh: bool = True):
+        self.remove(task_id)
+        weights = term_weights(text)
+        self.docs[task_id] = weights
+        for term, weight in weights.items():
+            self.postings.setdefault(term, {})[task_id] = weight
+        if refresh:
+            self.norms[task_id] = self._norm(weights)
+            self._maybe_refresh_norms()
+
+    def remove(self, task_id: int):
+        weights = self.docs.pop(task_id, None)
+        if weights is None:
+            return
+        for term in weights:
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(task_id, None)
+                if not posting:
+                    del self.postings[term]
+        self.norms.pop(task_id, None)
+
+    def _maybe_refresh_norms(self):
+        if abs(len(self.docs) - self._norms_size) > max(self._norms_size, 50) * 0.25:
+            self.refresh_norms()
+
+    def refresh_norms(self):
+        idf = {term: self.idf(term) for term in self.postings}
+        self.norms = {
+            task_id: math.sqrt(sum((weight * idf[term]) ** 2 for term, weight in weights.items())) or 1.0
+            for task_id, weights in self.docs.items()
+        }
+        self._norms_size = len(self.docs)
+
+    def search(self, text: str, limit: int = 10) -> List[Tuple[int, float]]:
+        """Top ``limit`` (task_id, cosine score) pairs for a free-text query"""
+        query = term_weights(text)
+        if not query or not self.docs:
+            return []
+
+        max_postings = max(len(self.docs) * self.max_df, 50)
+        scores: Dict[int, float] = {}
+        query_norm = 0.0
+        for term, weight in query.items():
+            posting = self.postings.get(term)
+            idf = self.idf(term)
+            query_weight = weight * idf
+            query_norm += query_weight * query_weight
+            if not posting or len(posting) > max_postings:
+                continue
+            for task_id, doc_weight in posting.items():
+                scores[task_id] = scores.get(task_id, 0.0) + query_weight * doc_weight * idf
+
+        if not scores:
+            return []
+        query_norm = math.sqrt(query_norm)
+        top = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1] / self.norms[item[0]], -item[0]))
+        return [(task_id, min(score / (self.norms[task_id] * query_norm), 1.0)) for task_id, score in top]
+
+class TaskIndexService:
+    """Per-user task indexes, built lazily from the database and kept up to
+    date by the task routers on every write.
+    """
+
+    def __init__(self, max_users: int = TASK_INDEX_CACHE_USERS):
+        self._indexes: "OrderedDict[int, UserTaskIndex]" = OrderedDict()
+        # Per-user count of writes missed while uncached and number of builds
+        # in flight; an index that missed a write during its build is not cached
+        self._generations: Dict[int, int] = {}
+        self._building: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._max_users = max_users
+
+    def get_index(self, db: Session, user_id: int) -> UserTaskIndex:
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is not None:
+                self._indexes.move_to_end(user_id)
+                task_index_lookups.inc(result="hit")
+                return index
+            generation = self._generations.get(user_id, 0)
+            self._building[user_id] = self._building.get(user_id, 0) + 1
+        task_index_lookups.inc(result="miss")
+
+        try:
+            index = self._build(db, user_id)
+        finally:
+            with self._lock:
+                stale = self._generations.get(user_id, 0) != generation
+                self._building[user_id] -= 1
+                if not self._building[user_id]:
+                    del self._building[user_id]
+                    self._generations.pop(user_id, None)
+
+        if stale:
+            return index
+        with self._lock:
+            self._indexes[user_id] = index
+            self._indexes.move_to_end(user_id)
+            while len(self._indexes) > self._max_users:
+                self._indexes.popitem(last=False)
+        return index
+
+    def _build(self, db: Session, user_id: int) -> UserTaskIndex:
+        index = UserTaskIndex()
+        rows = db.query(Task.id, Task.title, Task.description).filter(Task.user_id == user_id)
+        for task_id, title, description in rows.yield_per(5000):
+            index.add(task_id, task_text(title, description), refresh=False)
+        index.refresh_norms()
+        return index
+
+    def _missed_write(self, user_id: int):
+        """Called under the lock for a write to a user with no cached index"""
+        if user_id in self._building:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+    def upsert(self, user_id: int, task_id: int, title: str, description: Optional[str]):
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is not None:
+                index.add(task_id, task_text(title, description))
+            else:
+                self._missed_write(user_id)
+
+    def remove(self, user_id: int, task_id: int):
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is not None:
+                index.remove(task_id)
+            else:
+                self._missed_write(user_id)
+
+    def search(self, db: Session, user_id: int, text: str, limit: int = 10) -> List[Tuple[int, float]]:
+        index = self.get_index(db, user_id)
+        with self._lock:
+            return index.search(text, limit)
+
+def task_text(title: str, description: Optional[str]) -> str:
+    return f"{title} {description or ''}"
+
+# Shared task similarity index used by routers
+task_index_service = TaskIndexService()
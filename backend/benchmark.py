@@ -0,0 +1,628 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the scheduler backend hot paths
+
+Usage: python benchmark.py <name> [--size N] [--database-url URL]
+
+Database benchmarks default to a throwaway SQLite file; pass a PostgreSQL
+URL to measure against the production database engine. A URL must point
+at an empty scratch database: benchmarks refuse to run against one that
+already has tables, and leave their data behind.
+"""
+
+import argparse
+import atexit
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+def bench_scheduler(size: int):
+    """Schedule ``size`` tasks over a quarter around a busy calendar"""
+    from app.services.scheduler import SchedulableTask, WorkingHours, schedule_tasks
+
+    rng = random.Random(42)
+    start = datetime(2024, 1, 1, 8, 0)
+    end = start + timedelta(days=91)
+
+    tasks = [
+        SchedulableTask(
+            id=i,
+            priority=rng.choice(["low", "medium", "high"]),
+            due_date=start + timedelta(minutes=rng.randrange(91 * 24 * 60)) if rng.random() < 0.7 else None,
+            estimated_duration=rng.choice([5, 10]),
+        )
+        for i in range(size)
+    ]
+    busy = []
+    for _ in range(size // 50):
+        event_start = start + timedelta(minutes=rng.randrange(91 * 24 * 60))
+        busy.append((event_start, event_start + timedelta(minutes=rng.choice([30, 60, 90]))))
+    hours = WorkingHours(start_hour=7, end_hour=22, days=(0, 1, 2, 3, 4, 5, 6))
+
+    began = time.perf_counter()
+    result = schedule_tasks(tasks, busy, start, end, hours)
+    elapsed = time.perf_counter() - began
+
+    late = sum(1 for p in result.scheduled if p.late)
+    print(f"scheduler: {size} tasks, {len(busy)} busy events over 91 days")
+    print(f"  scheduled={len(result.scheduled)} unscheduled={len(result.unscheduled)} late={late}")
+    print(f"  elapsed={elapsed * 1000:.1f} ms")
+
+def _bench_db():
+    """Fresh schema and a benchmark user in the configured (empty) database"""
+    from sqlalchemy import inspect
+    from app.database import engine, SessionLocal
+    from app.models import Base, User
+
+    tables = inspect(engine).get_table_names()
+    if tables:
+        sys.exit(
+            f"Refusing to benchmark against {engine.url.render_as_string(hide_password=True)}: "
+            f"it already has {len(tables)} tables. Pass an empty scratch database."
+        )
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    user = User(email="bench@example.com", name="Bench", hashed_password="x")
+    db.add(user)
+    db.commit()
+    return db, user.id
+
+def _timed(label: str, func, repeat: int = 5):
+    func()
+    began = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    print(f"  {label}: {(time.perf_counter() - began) / repeat * 1000:.1f} ms")
+    return result
+
+def bench_pomodoro_stats(size: int):
+    """Compare Python-side and SQL-side aggregation of ``size`` sessions"""
+    from app.models import PomodoroSession, PomodoroType
+    from app.services.pomodoro_stats import aggregate_sessions
+
+    db, user_id = _bench_db()
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    db.bulk_insert_mappings(PomodoroSession, [
+        {
+            "user_id": user_id,
+            "start_time": now - timedelta(minutes=rng.randrange(365 * 24 * 60)),
+            "duration": rng.choice([5, 15, 25]),
+            "type": rng.choice([PomodoroType.work, PomodoroType.break_session]),
+            "completed": rng.random() < 0.8,
+        }
+        for _ in range(size)
+    ])
+    db.commit()
+    start = now - timedelta(days=365)
+
+    def python_side():
+        sessions = db.query(PomodoroSession).filter(
+            PomodoroSession.user_id == user_id,
+            PomodoroSession.start_time >= start
+        ).all()
+        db.expunge_all()
+        return len(sessions)
+
+    print(f"pomodoro-stats: {size} sessions over one year")
+    _timed("load ORM rows into Python", python_side)
+    _timed("grouped SQL aggregate", lambda: aggregate_sessions(db, user_id, start, now))
+    db.close()
+
+def bench_calendar_range(size: int):
+    """Week-long window queries against a user with ``size`` events"""
+    from app.models import CalendarEvent, is_long_event
+    from app.services.calendar_queries import events_overlapping
+
+    db, user_id = _bench_db()
+    rng = random.Random(42)
+    origin = datetime(2020, 1, 1)
+    rows = []
+    for _ in range(size):
+        start = origin + timedelta(minutes=rng.randrange(5 * 365 * 24 * 60))
+        if rng.random() < 0.01:
+            end = start + timedelta(days=rng.randint(2, 14))
+        else:
+            end = start + timedelta(minutes=rng.choice([15, 30, 60, 120]))
+        rows.append({
+            "title": "event", "start": start, "end": end,
+            "user_id": user_id, "is_long": is_long_event(start, end)
+        })
+    db.bulk_insert_mappings(CalendarEvent, rows)
+    db.commit()
+    windows = [origin + timedelta(days=rng.randrange(5 * 365)) for _ in range(50)]
+
+    def naive_overlap():
+        return sum(
+            db.query(CalendarEvent.id).filter(
+                CalendarEvent.user_id == user_id,
+                CalendarEvent.start < window + timedelta(days=7),
+                CalendarEvent.end > window
+            ).count()
+            for window in windows
+        )
+
+    def bounded_overlap():
+        return sum(
+            len(events_overlapping(db, user_id, window, window + timedelta(days=7), CalendarEvent.id).all())
+            for window in windows
+        )
+
+    print(f"calendar-range: {size} events, {len(windows)} week-long windows")
+    expected = _timed("start < end AND end > start", naive_overlap, repeat=3)
+    found = _timed("bounded-duration index range", bounded_overlap, repeat=3)
+    assert found == expected, (found, expected)
+
+    from app.services.calendar_queries import find_conflicts
+    probes = [(window, window + timedelta(hours=1)) for window in windows]
+    _timed(f"conflict checks for {len(probes)} hour-long events", lambda: sum(len(find_conflicts(db, user_id, [probe])) for probe in probes), repeat=3)
+    db.close()
+
+def bench_google_sync(size: int):
+    """Full then incremental sync of ``size`` events to fake_google_calendar.py"""
+    import threading
+    import uvicorn
+    import fake_google_calendar
+    from app.models import CalendarEvent
+    from app.services.google_calendar import GoogleCalendarClient
+    from app.services.google_sync import start_sync
+
+    server = uvicorn.Server(uvicorn.Config(fake_google_calendar.app, host="127.0.0.1", port=8299, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+
+    db, user_id = _bench_db()
+    origin = datetime(2025, 1, 1, 9)
+    db.add_all([
+        CalendarEvent(title=f"event {i}", start=origin + timedelta(hours=i), end=origin + timedelta(hours=i, minutes=30), user_id=user_id)
+        for i in range(size)
+    ])
+    db.commit()
+    client = GoogleCalendarClient("benchmark-token", base_url="http://127.0.0.1:8299")
+
+    def sync(label: str):
+        began = time.perf_counter()
+        job = start_sync(db, user_id, "benchmark-token", client=client)
+        while job.status not in ("completed", "failed"):
+            time.sleep(0.005)
+        elapsed = time.perf_counter() - began
+        print(f"  {label}: {job.total} operations, {job.failed} failed, {elapsed * 1000:.0f} ms")
+
+    print(f"google-sync: {size} events, {fake_google_calendar.LATENCY * 1000:.0f} ms simulated latency per HTTP request")
+    sync("initial sync")
+    sync("no-op resync")
+    for event in db.query(CalendarEvent).limit(10):
+        event.title += " (moved)"
+    db.commit()
+    sync("resync after 10 edits")
+    print(f"  fake server: {fake_google_calendar.stats}")
+    server.should_exit = True
+    db.close()
+
+def bench_ics_feed(size: int):
+    """Render and re-serve an ICS feed of ``size`` events and tasks"""
+    from app.models import CalendarEvent, Task, User
+    from app.services.ics_feed import FeedCache
+
+    db, user_id = _bench_db()
+    origin = datetime(2025, 1, 1, 9)
+    db.bulk_insert_mappings(CalendarEvent, [
+        {"title": f"event {i}", "start": origin + timedelta(hours=i), "end": origin + timedelta(hours=i, minutes=30), "user_id": user_id}
+        for i in range(size // 2)
+    ])
+    db.bulk_insert_mappings(Task, [
+        {"title": f"task {i}", "due_date": origin + timedelta(hours=i), "user_id": user_id}
+        for i in range(size - size // 2)
+    ])
+    db.commit()
+    user = db.get(User, user_id)
+    cache = FeedCache()
+
+    def render():
+        cache.invalidate(user_id)
+        return cache.render(db, user, "token")
+
+    print(f"ics-feed: {size} events and tasks")
+    feed = _timed("render", render, repeat=3)
+    print(f"  feed size: {len(feed.body) / 1024:.0f} KiB")
+    _timed("cached poll", lambda: cache.get("token").not_modified(feed.etag, None), repeat=1000)
+    db.close()
+
+def bench_ics_import(size: int):
+    """Import, then re-import, an .ics file of ``size`` events"""
+    import io
+    import tracemalloc
+    from app.services.ics_import import import_events
+
+    db, user_id = _bench_db()
+    origin = datetime(2025, 1, 1, 9)
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0"]
+    for i in range(size):
+        start = origin + timedelta(hours=i)
+        lines += [
+            "BEGIN:VEVENT", f"UID:bench-{i}@example.com",
+            f"DTSTART:{start:%Y%m%dT%H%M%SZ}", f"DTEND:{start + timedelta(minutes=30):%Y%m%dT%H%M%SZ}",
+            f"SUMMARY:Imported event {i}", "DESCRIPTION:" + "lorem ipsum " * 10,
+            "BEGIN:VALARM", "TRIGGER:-PT15M", "END:VALARM", "END:VEVENT",
+        ]
+    lines.append("END:VCALENDAR")
+    data = "\r\n".join(lines).encode()
+
+    print(f"ics-import: {size} events, {len(data) / 1024 / 1024:.1f} MiB file")
+    for label in ("initial import", "re-import"):
+        began = time.perf_counter()
+        summary = import_events(db, user_id, io.BytesIO(data))
+        elapsed = time.perf_counter() - began
+        print(f"  {label}: {elapsed * 1000:.0f} ms, {summary.to_dict()}")
+    tracemalloc.start()
+    import_events(db, user_id, io.BytesIO(data))
+    print(f"  peak memory allocated while importing: {tracemalloc.get_traced_memory()[1] / 1024 / 1024:.1f} MiB")
+    tracemalloc.stop()
+    db.close()
+
+def bench_reminders(size: int):
+    """Load and send one window of deadline reminders among ``size`` open tasks"""
+    from sqlalchemy import insert
+    from app.models import Task, TaskStatus
+    from app.services.reminders import REMINDER_LEAD_MINUTES, load_window, send_reminders
+
+    db, user_id = _bench_db()
+    rng = random.Random(42)
+    now = datetime(2025, 1, 1)
+    for offset in range(0, size, 50000):
+        db.execute(insert(Task), [
+            {"title": f"task {i}", "due_date": now + timedelta(minutes=rng.randrange(365 * 24 * 60)), "user_id": user_id, "status": TaskStatus.pending}
+            for i in range(offset, min(offset + 50000, size))
+        ])
+    db.commit()
+
+    def full_scan():
+        return sum(
+            1 for (due_date,) in db.query(Task.due_date).filter(Task.status.in_((TaskStatus.pending, TaskStatus.in_progress)))
+            for lead in REMINDER_LEAD_MINUTES
+            if now <= due_date - timedelta(minutes=lead) < now + timedelta(hours=1)
+        )
+
+    def window():
+        return load_window(db, now, now + timedelta(hours=1))[0]
+
+    print(f"reminders: {size} open tasks, lead times {REMINDER_LEAD_MINUTES} minutes, one-hour window")
+    expected = _timed("full table scan per tick", full_scan, repeat=1)
+    reminders = _timed("indexed window refill", window)
+    assert len(reminders) == expected, (len(reminders), expected)
+    began = time.perf_counter()
+    sent = send_reminders(db, reminders, now + timedelta(hours=1), grace_minutes=120)
+    print(f"  sent {sent} reminders in {(time.perf_counter() - began) * 1000:.1f} ms")
+    db.close()
+
+def bench_pubsub(size: int):
+    """Fan a notification out to ``size`` open streams, in one worker and across two via the broker"""
+    import asyncio
+    import socket
+    import threading
+    import tracemalloc
+    from app.services.pubsub import BrokerBackend, PubSub, event_stream
+    from pubsub_broker import Broker, serve
+
+    rounds = 20
+
+    def percentile(values, fraction):
+        return sorted(values)[min(int(len(values) * fraction), len(values) - 1)] * 1000
+
+    async def run(publisher: PubSub, receiver: PubSub, label: str, ready=None):
+        latencies = []
+        started = [0.0]
+        received = [0]
+        done = asyncio.Event()
+
+        async def consume(stream):
+            async for _ in stream:
+                latencies.append(time.perf_counter() - started[0])
+                received[0] += 1
+                if received[0] == size:
+                    done.set()
+
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        consumers = [
+            asyncio.create_task(consume(event_stream(receiver.subscribe(f"user:{i}:notifications"), keepalive=3600)))
+            for i in range(size)
+        ]
+        await asyncio.sleep(0)
+        per_connection = (tracemalloc.get_traced_memory()[0] - before) / size
+        tracemalloc.stop()
+        if ready is not None:
+            await ready()
+
+        for round in range(rounds):
+            received[0] = 0
+            done.clear()
+            started[0] = time.perf_counter()
+            for i in range(size):
+                publisher.publish(f"user:{i}:notifications", {"event": "notification", "id": round, "data": {"title": "Task due"}})
+            await asyncio.wait_for(done.wait(), timeout=60)
+
+        for consumer in consumers:
+            consumer.cancel()
+        await asyncio.gather(*consumers, return_exceptions=True)
+        print(f"  {label}: {receiver.subscriber_count()} streams left, {per_connection / 1024:.1f} KiB per stream, "
+              f"delivery p50 {percentile(latencies, 0.5):.1f} ms, p99 {percentile(latencies, 0.99):.1f} ms "
+              f"after the first publish of a {size}-stream round")
+
+    print(f"pubsub: {size} notification streams, {rounds} rounds of one message per stream")
+    local = PubSub()
+    asyncio.run(run(local, local, "single worker"))
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    broker = Broker()
+    threading.Thread(target=lambda: asyncio.run(serve("127.0.0.1", port, broker)), daemon=True).start()
+    workers = [PubSub(BrokerBackend(f"tcp://127.0.0.1:{port}")) for _ in range(2)]
+    for worker in workers:
+        worker.start()
+        assert worker.backend.connected.wait(10), "broker did not accept connections"
+
+    async def registered():
+        while sum(len(writers) for writers in broker.topics.values()) < size:
+            await asyncio.sleep(0.01)
+
+    asyncio.run(run(workers[0], workers[1], "two workers via broker", registered))
+    print(f"  broker forwarded {broker.forwarded} messages, dropped {broker.dropped}")
+    for worker in workers:
+        worker.stop()
+
+def bench_email_outbox(size: int):
+    """Drain ``size`` queued emails through a fake provider with 10 ms latency"""
+    import logging
+    from sqlalchemy import func, insert, update
+    from app.models import EmailOutbox, EmailStatus
+    from app.services.email_outbox import deliver_batch
+    from app.services.mail import FakeEmailProvider
+
+    db, user_id = _bench_db()
+    db.execute(insert(EmailOutbox), [
+        {"user_id": user_id, "subject": f"Task {i} due", "body": "Reminder", "next_attempt_at": datetime.utcnow()}
+        for i in range(size)
+    ])
+    db.commit()
+
+    print(f"email-outbox: {size} emails, fake provider with 10 ms per send")
+    for concurrency in (1, 8, 32):
+        db.execute(update(EmailOutbox).values(status=EmailStatus.pending, attempts=0, next_attempt_at=datetime.utcnow()))
+        db.commit()
+        provider = FakeEmailProvider(latency=0.01)
+        began = time.perf_counter()
+        while deliver_batch(db, provider, concurrency=concurrency):
+            pass
+        elapsed = time.perf_counter() - began
+        print(f"  concurrency {concurrency}: {elapsed:.2f} s, {len(provider.sent) / elapsed:.0f} emails/s")
+
+    db.execute(update(EmailOutbox).values(status=EmailStatus.pending, attempts=0, next_attempt_at=datetime.utcnow()))
+    db.commit()
+    provider = FakeEmailProvider(failure_rate=0.3, seed=42)
+    logging.getLogger("app.services.email_outbox").setLevel(logging.ERROR)
+    for attempt in range(3):
+        # Each attempt runs once every retry delay has passed
+        while deliver_batch(db, provider, now=datetime.utcnow() + timedelta(hours=2 * attempt), max_attempts=3):
+            pass
+    counts = dict(db.query(EmailOutbox.status, func.count()).group_by(EmailOutbox.status).all())
+    print(f"  30% transient failures, 3 attempts: {counts.get(EmailStatus.sent, 0)} sent, "
+          f"{counts.get(EmailStatus.dead, 0)} dead-lettered, {counts.get(EmailStatus.pending, 0)} pending")
+    db.close()
+
+def bench_unread_count(size: int):
+    """Unread badge for a user with ``size`` notifications: COUNT query vs the maintained counter"""
+    from sqlalchemy import insert
+    from app.models import Notification, User
+    from app.services.notify import create_notification, recount_unread
+
+    db, user_id = _bench_db()
+    rng = random.Random(42)
+    for offset in range(0, size, 50000):
+        db.execute(insert(Notification), [
+            {"title": f"n{i}", "message": "m", "user_id": user_id, "read": rng.random() < 0.8}
+            for i in range(offset, min(offset + 50000, size))
+        ])
+    db.commit()
+    recount_unread(db, [user_id])
+    db.commit()
+
+    def count_query():
+        return db.query(Notification).filter(Notification.user_id == user_id, Notification.read == False).count()
+
+    def counter():
+        db.expire_all()
+        return db.query(User).filter(User.id == user_id).first().unread_notifications
+
+    print(f"unread-count: {size} notifications for one user")
+    expected = _timed("COUNT of unread notifications", count_query)
+    assert _timed("user row counter (loaded by auth anyway)", counter) == expected
+
+    began = time.perf_counter()
+    for i in range(1000):
+        create_notification(db, user_id, "t", "m", email=False)
+        db.commit()
+    print(f"  1000 notifications created with counter upkeep: {(time.perf_counter() - began):.2f} s")
+    assert counter() == expected + 1000
+    db.close()
+
+def bench_notification_fanout(size: int):
+    """Notify ``size`` users: one create_notification per user vs batched multi-row inserts"""
+    from sqlalchemy import insert
+    from app.models import Notification, User
+    from app.services.notification_retention import purge_read_notifications
+    from app.services.notify import create_notification, fan_out_notifications
+
+    db, _ = _bench_db()
+    db.execute(insert(User), [{"email": f"user{i}@example.com", "name": f"User {i}", "hashed_password": "x"} for i in range(size)])
+    db.commit()
+    user_ids = db.query(User.id).all()
+
+    def per_user():
+        for (user_id,) in user_ids:
+            create_notification(db, user_id, "Maintenance", "Tonight at 22:00 UTC", email=False)
+        db.commit()
+
+    print(f"notification-fanout: {size} users")
+    _timed("ORM insert per user, one commit", per_user, repeat=1)
+    _timed("fan_out_notifications (multi-row inserts)", lambda: fan_out_notifications(db, None, "Maintenance", "Tonight", email=False), repeat=1)
+    assert db.query(User.unread_notifications).filter(User.id == user_ids[-1][0]).scalar() == 4
+
+    db.query(Notification).update({"read": True, "created_at": datetime.utcnow() - timedelta(days=365)})
+    db.commit()
+    total = db.query(Notification).count()
+    began = time.perf_counter()
+    purged = purge_read_notifications(db)
+    print(f"  purged {purged} of {total} read notifications in {(time.perf_counter() - began) * 1000:.1f} ms")
+    db.close()
+
+def bench_daily_digest(size: int):
+    """Daily digests for ``size`` users across timezones, each with tasks and yesterday's sessions"""
+    import tracemalloc
+    from sqlalchemy import delete, insert
+    from app.models import DailyDigest, EmailOutbox, Notification, PomodoroSession, PomodoroType, Task, TaskStatus, User
+    from app.services.digest import run_daily_digest
+
+    rng = random.Random(42)
+    zones = ["UTC", "Europe/London", "America/New_York", "Asia/Tokyo", "Australia/Sydney", None]
+    now = datetime(2024, 6, 3, 23, 30)
+    db, _ = _bench_db()
+    db.execute(insert(User), [
+        {"email": f"user{i}@example.com", "name": f"User {i}", "hashed_password": "x", "timezone": zones[i % len(zones)]}
+        for i in range(size)
+    ])
+    user_ids = [user_id for (user_id,) in db.query(User.id)]
+    statuses = [TaskStatus.pending, TaskStatus.in_progress, TaskStatus.completed]
+    for offset in range(0, len(user_ids), 10000):
+        chunk = user_ids[offset:offset + 10000]
+        db.execute(insert(Task), [
+            {
+                "title": "Task", "user_id": user_id, "status": rng.choice(statuses),
+                "due_date": now + timedelta(hours=rng.randint(-72, 72))
+            }
+            for user_id in chunk for _ in range(3)
+        ])
+        sessions = []
+        for user_id in chunk:
+            for _ in range(rng.randint(0, 4)):
+                started = now - timedelta(hours=rng.randint(12, 60))
+                sessions.append({
+                    "user_id": user_id, "type": PomodoroType.work, "duration": 25, "start_time": started,
+                    "end_time": started + timedelta(minutes=25), "completed": rng.random() < 0.8
+                })
+        if sessions:
+            db.execute(insert(PomodoroSession), sessions)
+    db.commit()
+
+    def reset():
+        for model in (EmailOutbox, Notification, DailyDigest):
+            db.execute(delete(model))
+        db.execute(User.__table__.update().values(unread_notifications=0))
+        db.commit()
+
+    print(f"daily-digest: {size} users in {len(zones)} timezone buckets, {len(user_ids) * 3} tasks")
+    summary = run_daily_digest(db, now=now, hour=0, email=True)
+    print(f"  {summary['users']} digests, {summary['notified']} notified in {summary['seconds']:.1f} s")
+    summary = run_daily_digest(db, now=now, hour=0, email=True)
+    print(f"  rerun skipped every user: {summary['users']} digests in {summary['seconds'] * 1000:.1f} ms")
+
+    for batch_size in (200, 1000, 5000):
+        reset()
+        tracemalloc.start()
+        run_daily_digest(db, now=now, hour=0, email=True, batch_size=batch_size)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        db.expunge_all()
+        print(f"  batch_size={batch_size}: peak memory allocated {peak / 1024 / 1024:.1f} MiB")
+    db.close()
+
+def bench_http_metrics(size: int):
+    """Per-request cost of MetricsMiddleware over ``size`` in-process ASGI requests, and scrape rendering"""
+    import asyncio
+    from fastapi import FastAPI
+    from app.services.http_metrics import MetricsMiddleware
+    from app.services.metrics import registry
+
+    def make_app(instrumented: bool) -> FastAPI:
+        app = FastAPI()
+
+        @app.get("/items/{item_id}")
+        async def get_item(item_id: int):
+            return {"id": item_id}
+
+        if instrumented:
+            app.add_middleware(MetricsMiddleware)
+        return app
+
+    async def drive(app, count: int):
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            pass
+
+        for i in range(count):
+            scope = {
+                "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+                "scheme": "http", "path": f"/items/{i % 100}", "raw_path": f"/items/{i % 100}".encode(),
+                "root_path": "", "query_string": b"", "headers": [], "client": ("127.0.0.1", 1), "server": ("localhost", 80),
+            }
+            await app(scope, receive, send)
+
+    print(f"http-metrics: {size} requests")
+    per_request = {}
+    for instrumented in (False, True):
+        app = make_app(instrumented)
+        asyncio.run(drive(app, 1000))  # warm up
+        began = time.perf_counter()
+        asyncio.run(drive(app, size))
+        per_request[instrumented] = (time.perf_counter() - began) / size * 1e6
+        print(f"  {'with' if instrumented else 'without'} MetricsMiddleware: {per_request[instrumented]:.1f} us/request")
+    print(f"  overhead: {per_request[True] - per_request[False]:.1f} us/request")
+
+    # A realistic scrape: every API route with a few methods and statuses
+    histogram = registry.histogram("bench_request_duration_seconds", "Benchmark histogram", ["method", "route"])
+    for route in range(60):
+        for method in ("GET", "POST", "PUT"):
+            histogram.observe(0.01, method=method, route=f"/api/v1/route{route}")
+    text = _timed("render /metrics", registry.render, repeat=20)
+    print(f"  {len(text.splitlines())} lines, {len(text) / 1024:.0f} KiB")
+
+BENCHMARKS = {
+    "scheduler": (bench_scheduler, 10000),
+    "pomodoro-stats": (bench_pomodoro_stats, 100000),
+    "calendar-range": (bench_calendar_range, 100000),
+    "google-sync": (bench_google_sync, 1000),
+    "ics-feed": (bench_ics_feed, 10000),
+    "ics-import": (bench_ics_import, 20000),
+    "reminders": (bench_reminders, 1000000),
+    "pubsub": (bench_pubsub, 10000),
+    "email-outbox": (bench_email_outbox, 1000),
+    "unread-count": (bench_unread_count, 500000),
+    "notification-fanout": (bench_notification_fanout, 10000),
+    "daily-digest": (bench_daily_digest, 100000),
+    "http-metrics": (bench_http_metrics, 20000),
+}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run backend benchmarks")
+    parser.add_argument("name", choices=sorted(BENCHMARKS))
+    parser.add_argument("--size", type=int, default=None)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        scratch = tempfile.mkdtemp(prefix="ai_scheduler_benchmark_")
+        atexit.register(shutil.rmtree, scratch, ignore_errors=True)
+        os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(scratch, "benchmark.db")
+
+    func, default_size = BENCHMARKS[args.name]
+    func(args.size or default_size)
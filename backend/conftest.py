@@ -0,0 +1,60 @@
+"""
+Shared test fixtures: an in-memory SQLite database seeded with two users, and an API client on it
+"""
+
+import os
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import pytest
+from fastapi import Depends
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+from starlette.testclient import TestClient
+from app.auth import get_current_active_user
+from app.database import Base, get_db
+from app.models import User
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def session_factory(engine):
+    return sessionmaker(bind=engine)
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    session.add_all([
+        User(id=1, email="a@example.com", name="A", hashed_password="x"),
+        User(id=2, email="b@example.com", name="B", hashed_password="x"),
+    ])
+    session.commit()
+    yield session
+    session.close()
+
+@pytest.fixture
+def api(session_factory, db):
+    """Client for the whole application on the test database, signed in as ``api.user_id`` (1)"""
+    from main import app
+
+    def get_test_db():
+        session = session_factory()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    def current_user(session: Session = Depends(get_db)):
+        return session.get(User, client.user_id)
+
+    app.dependency_overrides[get_db] = get_test_db
+    app.dependency_overrides[get_current_active_user] = current_user
+    client = TestClient(app, base_url="http://localhost")
+    client.user_id = 1
+    yield client
+    app.dependency_overrides.clear()
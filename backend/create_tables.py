@@ -1,10 +1,11 @@
 from app.database import engine
-from app.models import Base
+from app.migrations import migrate_schema
 
 def create_tables():
-    """Create all database tables"""
-    Base.metadata.create_all(bind=engine)
+    """Create all database tables and upgrade existing ones"""
+    for change in migrate_schema(engine):
+        print(f"  {change}")
     print("Database tables created successfully!")
 
 if __name__ == "__main__":
-    create_tables() 
\ No newline at end of file
+    create_tables()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Local fake of the Google Calendar v3 events API for testing and benchmarking sync
+
+Point the backend at it with:
+    GOOGLE_CALENDAR_API_URL=http://localhost:8200
+
+Supports event insert/get/update/delete/list and multipart batch requests.
+FAKE_GCAL_LATENCY adds a delay per HTTP request (seconds) and
+FAKE_GCAL_FAILURE_RATE makes that fraction of calls fail with 503.
+"""
+
+import asyncio
+import json
+import os
+import random
+import uuid
+from typing import Dict, Optional, Tuple
+from urllib.parse import unquote
+from fastapi import FastAPI, Request, Response
+import uvicorn
+
+from app.services.google_calendar import decode_batch, encode_batch, encode_http_message, parse_http_message
+
+LATENCY = float(os.getenv("FAKE_GCAL_LATENCY", "0.05"))
+FAILURE_RATE = float(os.getenv("FAKE_GCAL_FAILURE_RATE", "0"))
+
+REASONS = {200: "OK", 204: "No Content", 404: "Not Found", 409: "Conflict", 410: "Gone", 503: "Service Unavailable"}
+
+app = FastAPI(title="Fake Google Calendar API")
+calendars: Dict[str, Dict[str, dict]] = {}
+stats = {"http_requests": 0, "calls": 0}
+
+def _error(status: int, message: str) -> Tuple[int, dict]:
+    return status, {"error": {"code": status, "message": message}}
+
+def handle_call(method: str, path: str, body: Optional[dict]) -> Tuple[int, Optional[dict]]:
+    """Apply one Calendar API call to the in-memory store"""
+    stats["calls"] += 1
+    if FAILURE_RATE and random.random() < FAILURE_RATE:
+        return _error(503, "Backend Error")
+
+    parts = [unquote(part) for part in path.split("?")[0].strip("/").split("/")]
+    if parts[:3] != ["calendar", "v3", "calendars"] or len(parts) < 5 or parts[4] != "events":
+        return _error(404, "Not Found")
+    events = calendars.setdefault(parts[3], {})
+    event_id = parts[5] if len(parts) > 5 else None
+
+    if event_id is None:
+        if method == "GET":
+            items = [event for event in events.values() if event.get("status") != "cancelled"]
+            return 200, {"kind": "calendar#events", "items": items}
+        if method == "POST":
+            event = dict(body or {})
+            event_id = event.setdefault("id", uuid.uuid4().hex)
+            if event_id in events:
+                return _error(409, "The requested identifier already exists.")
+            event["status"] = "confirmed"
+            events[event_id] = event
+            return 200, event
+        return _error(405, "Method Not Allowed")
+
+    event = events.get(event_id)
+    if method == "GET":
+        return (200, event) if event else _error(404, "Not Found")
+    if method == "PUT":
+        if event is None:
+            return _error(404, "Not Found")
+        events[event_id] = dict(body or {}, id=event_id, status="confirmed")
+        return 200, events[event_id]
+    if method == "DELETE":
+        if event is None:
+            return _error(404, "Not Found")
+        if event.get("status") == "cancelled":
+            return _error(410, "Resource has been deleted")
+        event["status"] = "cancelled"
+        return 204, None
+    return _error(405, "Method Not Allowed")
+
+def _authorized(request: Request) -> bool:
+    return request.headers.get("authorization", "").startswith("Bearer ")
+
+@app.post("/batch/calendar/v3")
+async def batch(request: Request):
+    stats["http_requests"] += 1
+    if not _authorized(request):
+        return Response(status_code=401)
+    await asyncio.sleep(LATENCY)
+
+    parts = []
+    for content_id, payload in decode_batch(await request.body(), request.headers["content-type"]):
+        request_line, _, body = parse_http_message(payload)
+        method, path = request_line.split()[:2]
+        status, result = handle_call(method, path, json.loads(body) if body else None)
+        parts.append((f"response-{content_id}", encode_http_message(f"HTTP/1.1 {status} {REASONS.get(status, '')}", result)))
+
+    boundary = f"batch_{uuid.uuid4().hex}"
+    return Response(
+        content=encode_batch(parts, boundary),
+        media_type=f"multipart/mixed; boundary={boundary}"
+    )
+
+@app.api_route("/calendar/v3/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
+async def single_call(path: str, request: Request):
+    stats["http_requests"] += 1
+    if not _authorized(request):
+        return Response(status_code=401)
+    await asyncio.sleep(LATENCY)
+
+    raw = await request.body()
+    status, result = handle_call(request.method, f"/calendar/v3/{path}", json.loads(raw) if raw else None)
+    if result is None:
+        return Response(status_code=status)
+    return Response(content=json.dumps(result), status_code=status, media_type="application/json")
+
+@app.get("/_stats")
+async def get_stats():
+    return dict(stats, events=sum(len(events) for events in calendars.values()))
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="127.0.0.1", port=8200, log_level="warning")
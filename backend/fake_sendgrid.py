@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Local fake of the SendGrid v3 mail/send API for testing the email outbox
+
+Point the backend at it with:
+    EMAIL_PROVIDER=sendgrid SENDGRID_API_URL=http://localhost:8300 SENDGRID_API_KEY=fake
+
+Accepted messages are kept in memory and listed at GET /_messages.
+FAKE_SENDGRID_LATENCY adds a delay per request (seconds) and
+FAKE_SENDGRID_FAILURE_RATE makes that fraction of requests fail with 503.
+"""
+
+import asyncio
+import os
+import random
+import uuid
+from typing import List
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+import uvicorn
+
+LATENCY = float(os.getenv("FAKE_SENDGRID_LATENCY", "0.05"))
+FAILURE_RATE = float(os.getenv("FAKE_SENDGRID_FAILURE_RATE", "0"))
+
+app = FastAPI(title="Fake SendGrid API")
+messages: List[dict] = []
+stats = {"http_requests": 0, "accepted": 0, "failed": 0}
+
+def _error(status: int, message: str) -> JSONResponse:
+    return JSONResponse({"errors": [{"message": message}]}, status_code=status)
+
+@app.post("/v3/mail/send")
+async def mail_send(request: Request):
+    stats["http_requests"] += 1
+    if LATENCY:
+        await asyncio.sleep(LATENCY)
+    if not request.headers.get("authorization", "").startswith("Bearer "):
+        return _error(401, "The provided authorization grant is invalid")
+    if FAILURE_RATE and random.random() < FAILURE_RATE:
+        stats["failed"] += 1
+        return _error(503, "Service Unavailable")
+
+    body = await request.json()
+    recipients = [to["email"] for personalization in body.get("personalizations", []) for to in personalization.get("to", [])]
+    if not recipients or "@" not in recipients[0] or not body.get("subject"):
+        return _error(400, "Invalid personalizations or subject")
+
+    message_id = uuid.uuid4().hex
+    messages.append({"id": message_id, "to": recipients, "subject": body["subject"], "content": body.get("content")})
+    stats["accepted"] += 1
+    return Response(status_code=202, headers={"X-Message-Id": message_id})
+
+@app.get("/_messages")
+async def get_messages():
+    return messages
+
+@app.get("/_stats")
+async def get_stats():
+    return stats
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="127.0.0.1", port=8300, log_level="warning")
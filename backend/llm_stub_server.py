@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Local OpenAI-compatible stub server for load testing the /ai endpoints offline
+
+Point the backend at it with:
+    LLM_PROVIDER=openai OPENAI_BASE_URL=http://localhost:8100/v1 OPENAI_API_KEY=stub
+
+Latency is controlled by LLM_STUB_LATENCY (e.g. "lognormal:-0.5,0.4").
+"""
+
+import asyncio
+import time
+import uuid
+from fastapi import FastAPI
+import uvicorn
+
+from app.services.llm import StubProvider
+
+app = FastAPI(title="LLM Stub Server")
+provider = StubProvider()
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: dict):
+    prompt = "\n".join(message.get("content", "") for message in request.get("messages", []))
+    max_tokens = request.get("max_tokens") or 500
+
+    await asyncio.sleep(provider.sample_latency())
+    result = provider.render(prompt, max_tokens)
+
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.get("model", result.model),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": result.content},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": result.prompt_tokens,
+            "completion_tokens": result.completion_tokens,
+            "total_tokens": result.prompt_tokens + result.completion_tokens,
+        },
+    }
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="127.0.0.1", port=8100, log_level="warning")
@@ -1,19 +1,31 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
+from fastapi.responses import PlainTextResponse
+from typing import Optional
 import uvicorn
 from dotenv import load_dotenv
 import os
+import secrets
 
 from app.routers import auth, tasks, ai, pomodoro, calendar, notifications
 from app.database import engine
-from app.models import Base
+from app.migrations import migrate_schema
+from app.services.digest import digest_scheduler
+from app.services.email_outbox import email_worker
+from app.services.http_metrics import METRICS_TOKEN, PROMETHEUS_CONTENT_TYPE, MetricsMiddleware
+from app.services.metrics import registry
+from app.services.notification_retention import notification_purger
+from app.services.pomodoro_sweeper import pomodoro_sweeper
+from app.services.pomodoro_timer import timer_service
+from app.services.pubsub import pubsub
+from app.services.reminders import reminder_service
 
 # Load environment variables
 load_dotenv()
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+# Create database tables and add columns/indexes missing from older ones
+migrate_schema(engine)
 
 # Create FastAPI app
 app = FastAPI(
@@ -39,6 +51,9 @@ app.add_middleware(
     allowed_hosts=["localhost", "127.0.0.1"]
 )
 
+# Add request metrics middleware (outermost, so it times the whole stack)
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["Authentication"])
 app.include_router(tasks.router, prefix="/api/v1/tasks", tags=["Tasks"])
@@ -47,6 +62,26 @@ app.include_router(pomodoro.router, prefix="/api/v1/pomodoro", tags=["Pomodoro"]
 app.include_router(calendar.router, prefix="/api/v1/calendar", tags=["Calendar"])
 app.include_router(notifications.router, prefix="/api/v1/notifications", tags=["Notifications"])
 
+@app.on_event("startup")
+async def start_background_services():
+    pubsub.start()
+    timer_service.start()
+    pomodoro_sweeper.start()
+    reminder_service.start()
+    email_worker.start()
+    notification_purger.start()
+    digest_scheduler.start()
+
+@app.on_event("shutdown")
+async def stop_background_services():
+    await timer_service.stop()
+    await pomodoro_sweeper.stop()
+    await reminder_service.stop()
+    await email_worker.stop()
+    await notification_purger.stop()
+    await digest_scheduler.stop()
+    pubsub.stop()
+
 @app.get("/")
 async def root():
     return {"message": "AI Task Scheduler API", "version": "1.0.0"}
@@ -55,6 +90,13 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics(authorization: Optional[str] = Header(None)):
+    """Prometheus scrape endpoint for every metric in the shared registry"""
+    if METRICS_TOKEN and not secrets.compare_digest(authorization or "", f"Bearer {METRICS_TOKEN}"):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token")
+    return PlainTextResponse(registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
 if __name__ == "__main__":
     uvicorn.run(
         "main:app",
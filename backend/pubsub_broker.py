@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Local pub/sub broker letting several backend workers share push events
+
+Run it next to the workers and point each of them at it with:
+    PUBSUB_BACKEND=broker PUBSUB_BROKER_URL=tcp://127.0.0.1:8765
+
+It speaks the newline-delimited JSON protocol of app.services.pubsub.BrokerBackend
+and only forwards messages; nothing is persisted or replayed. It stands in
+for a production broker (e.g. Redis pub/sub) in development and load tests.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from typing import Dict, Set
+
+# A worker whose socket buffer grows past this is skipped rather than waited on
+MAX_BUFFERED_BYTES = 1 << 20
+
+logger = logging.getLogger("pubsub_broker")
+
+class Broker:
+    def __init__(self):
+        self.topics: Dict[str, Set[asyncio.StreamWriter]] = defaultdict(set)
+        self.forwarded = 0
+        self.dropped = 0
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        watched: Set[str] = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    op, topic = request["op"], request["topic"]
+                except (ValueError, KeyError, TypeError):
+                    logger.warning("Ignoring malformed broker request: %r", line[:200])
+                    continue
+
+                if op == "sub":
+                    self.topics[topic].add(writer)
+                    watched.add(topic)
+                elif op == "unsub":
+                    self._remove(topic, writer)
+                    watched.discard(topic)
+                elif op == "pub":
+                    self.forward(topic, request.get("message"), writer)
+        except (ConnectionError, ValueError):  # ValueError: line over the stream limit
+            pass
+        finally:
+            for topic in watched:
+                self._remove(topic, writer)
+            writer.close()
+
+    def forward(self, topic: str, message, sender: asyncio.StreamWriter):
+        # Publishers already delivered to their own subscribers
+        targets = [writer for writer in self.topics.get(topic, ()) if writer is not sender]
+        if not targets:
+            return
+        data = (json.dumps({"topic": topic, "message": message}) + "\n").encode()
+        for writer in targets:
+            if writer.transport.get_write_buffer_size() > MAX_BUFFERED_BYTES:
+                self.dropped += 1
+                continue
+            writer.write(data)
+            self.forwarded += 1
+
+    def _remove(self, topic: str, writer: asyncio.StreamWriter):
+        writers = self.topics.get(topic)
+        if writers is not None:
+            writers.discard(writer)
+            if not writers:
+                del self.topics[topic]
+
+async def serve(host: str, port: int, broker: Broker = None, ready: asyncio.Event = None):
+    broker = broker or Broker()
+    server = await asyncio.start_server(broker.handle, host, port)
+    logger.info("Pub/sub broker listening on %s:%d", host, port)
+    if ready is not None:
+        ready.set()
+    async with server:
+        await server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the local pub/sub broker for multi-worker push events.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+import argparse
+from app.database import SessionLocal
+from app.services.pomodoro_stats import rebuild_rollups
+
+def main():
+    """Rebuild the pomodoro daily rollup table from raw sessions"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--user-id", type=int, default=None, help="only rebuild this user's rollups")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        written = rebuild_rollups(db, args.user_id)
+        db.commit()
+    finally:
+        db.close()
+    print(f"Rebuilt pomodoro rollups: {written} rows written")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+import argparse
+from app.database import SessionLocal
+from app.services.task_durations import rebuild_task_durations
+
+def main():
+    """Rebuild tasks' actual_duration and pomodoro_count from pomodoro sessions"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--user-id", type=int, default=None, help="only rebuild this user's tasks")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        updated = rebuild_task_durations(db, args.user_id)
+        db.commit()
+    finally:
+        db.close()
+    print(f"Rebuilt task durations: {updated} tasks updated")
+
+if __name__ == "__main__":
+    main()
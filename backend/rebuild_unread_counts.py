@@ -0,0 +1,20 @@
+import argparse
+from app.database import SessionLocal
+from app.services.notify import recount_unread
+
+def main():
+    """Recount users' unread_notifications from the notifications table"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--user-id", type=int, default=None, help="only recount this user")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        updated = recount_unread(db, [args.user_id] if args.user_id is not None else None)
+        db.commit()
+    finally:
+        db.close()
+    print(f"Recounted unread notifications: {updated} users updated")
+
+if __name__ == "__main__":
+    main()
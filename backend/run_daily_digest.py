@@ -0,0 +1,34 @@
+import argparse
+from datetime import datetime
+from app.database import SessionLocal
+from app.services.digest import DIGEST_BATCH_SIZE, DIGEST_HOUR, run_daily_digest
+
+def main():
+    """Create today's daily summary digests for timezones past the digest hour"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--now", type=datetime.fromisoformat, default=None, help="current time as naive UTC ISO 8601 (default: now)")
+    parser.add_argument("--timezone", action="append", default=None, help="only this timezone bucket (repeatable)")
+    parser.add_argument("--batch-size", type=int, default=DIGEST_BATCH_SIZE, help="users per query batch and transaction")
+    parser.add_argument("--hour", type=int, default=DIGEST_HOUR, help="local hour from which a digest is due (0 for all timezones)")
+    parser.add_argument("--no-email", action="store_true", help="create notifications without queueing emails")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        summary = run_daily_digest(
+            db,
+            now=args.now,
+            timezones=args.timezone,
+            batch_size=args.batch_size,
+            hour=args.hour,
+            email=False if args.no_email else None
+        )
+    finally:
+        db.close()
+    print(
+        f"Daily digests: {summary['users']} users in {summary['timezones']} timezones, "
+        f"{summary['notified']} notified in {summary['seconds']:.1f}s"
+    )
+
+if __name__ == "__main__":
+    main()
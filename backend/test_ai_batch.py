@@ -0,0 +1,113 @@
+"""
+Tests for batched AI parsing: command packing and the background job store
+"""
+
+import pytest
+from app.services.ai_batch import BATCH_PROMPT_HEADER, format_command, make_batch_worker, pack_commands
+from app.services.jobs import JobStore
+from app.services.llm import LLMResult, estimate_tokens
+
+def packed_cost(commands, chunk, tokens_per_command):
+    return estimate_tokens(BATCH_PROMPT_HEADER) + sum(
+        estimate_tokens(format_command(i, commands[i])) + tokens_per_command for i in chunk
+    )
+
+def test_pack_commands_covers_every_command_in_order():
+    commands = [f"task number {i}" for i in range(100)]
+    chunks = pack_commands(commands, context_tokens=2000, tokens_per_command=50, max_per_call=25)
+    assert [i for chunk in chunks for i in chunk] == list(range(100))
+    assert all(packed_cost(commands, chunk, 50) <= 2000 for chunk in chunks)
+
+def test_pack_commands_respects_max_per_call():
+    chunks = pack_commands(["x"] * 10, context_tokens=100000, tokens_per_command=1, max_per_call=4)
+    assert [len(chunk) for chunk in chunks] == [4, 4, 2]
+
+def test_oversized_command_gets_its_own_call():
+    commands = ["short", "y" * 10000, "short"]
+    assert pack_commands(commands, context_tokens=1000, tokens_per_command=10) == [[0], [1], [2]]
+    assert pack_commands([]) == []
+
+def run(store, job, chunks, worker):
+    store.submit(job, chunks, worker)
+    store._executor.shutdown(wait=True)
+    return job.snapshot()
+
+def test_job_results_are_positional():
+    store = JobStore(max_workers=3)
+    job = store.create("test", user_id=1, total=6)
+
+    def worker(job, indexes):
+        for index in indexes:
+            job.set_result(index, index * 10)
+
+    snapshot = run(store, job, [[0, 1], [2, 3], [4, 5]], worker)
+    assert snapshot["status"] == "completed"
+    assert snapshot["results"] == [0, 10, 20, 30, 40, 50]
+    assert (snapshot["completed"], snapshot["failed"]) == (6, 0)
+    assert snapshot["finished_at"] is not None
+
+def test_failed_chunk_only_fails_unfinished_items():
+    store = JobStore(max_workers=1)
+    job = store.create("test", user_id=1, total=4)
+
+    def worker(job, indexes):
+        job.set_result(indexes[0], "ok")
+        if indexes[0] == 2:
+            raise RuntimeError("provider down")
+        job.set_result(indexes[1], "ok")
+
+    snapshot = run(store, job, [[0, 1], [2, 3]], worker)
+    assert snapshot["status"] == "completed"
+    assert snapshot["results"] == ["ok", "ok", "ok", None]
+    assert snapshot["failed"] == 1
+    assert snapshot["errors"] == ["item 3: provider down"]
+
+def test_job_fails_when_every_item_fails():
+    store = JobStore(max_workers=1)
+    job = store.create("test", user_id=1, total=2)
+
+    def worker(job, indexes):
+        raise RuntimeError("boom")
+
+    assert run(store, job, [[0, 1]], worker)["status"] == "failed"
+
+def test_jobs_are_private_to_their_user():
+    store = JobStore(max_workers=1)
+    job = store.create("test", user_id=1, total=0)
+    assert run(store, job, [], None)["status"] == "completed"
+    assert store.get(job.id, user_id=1) is job
+    assert store.get(job.id, user_id=2) is None
+    assert store.get("missing", user_id=1) is None
+
+def test_batch_worker_falls_back_for_unparsed_commands():
+    commands = ["call mom", "buy milk"]
+    content = '{"results": [{"index": 0, "tasks": [{"title": "Call mom"}], "message": "ok", "confidence": 0.9}]}'
+    worker = make_batch_worker(commands, lambda prompt, max_tokens: LLMResult(content, 10, 10, "stub"))
+    store = JobStore(max_workers=1)
+    job = store.create("ai_parse_batch", user_id=1, total=2)
+
+    results = run(store, job, [[0, 1]], worker)["results"]
+    assert results[0].tasks[0].title == "Call mom"
+    assert results[1].tasks[0].title == "Task from: buy milk"
+
+def test_failed_completion_refunds_its_admission_charge(monkeypatch):
+    import asyncio
+    from app.routers import ai
+    from app.services.llm import LLMProvider
+    from app.services.rate_limit import AIAdmissionController
+
+    class FailingProvider(LLMProvider):
+        name = "failing"
+
+        def complete(self, prompt, max_tokens, temperature=0.7):
+            raise RuntimeError("provider down")
+
+    limiter = AIAdmissionController(user_rate=1e-6, user_burst=1000, global_rate=1e-6, global_burst=1000)
+    monkeypatch.setattr(ai, "ai_limiter", limiter)
+    monkeypatch.setattr(ai, "get_llm_provider", lambda: FailingProvider())
+
+    asyncio.run(limiter.admit(1, ai._cost("prompt", 100)))
+    with pytest.raises(RuntimeError):
+        ai._complete(1, "prompt", 100)
+    assert limiter.user_stats(1)["tokens_available"] >= 999
+    assert limiter.stats()["global_tokens_available"] >= 999
@@ -0,0 +1,85 @@
+"""
+Tests for overlap-correct calendar range queries
+"""
+
+from datetime import datetime, timedelta
+import pytest
+from app.models import CalendarEvent
+from app.services.calendar_queries import conflicting_pairs, event_intervals, events_overlapping, find_conflicts
+
+START = datetime(2024, 1, 10, 9)
+END = datetime(2024, 1, 10, 17)
+
+def add_event(db, title, start, end, user_id=1, **fields):
+    event = CalendarEvent(title=title, start=start, end=end, user_id=user_id, **fields)
+    db.add(event)
+    db.commit()
+    return event
+
+def titles(db, start=START, end=END, user_id=1):
+    return [event.title for event in events_overlapping(db, user_id, start, end)]
+
+def test_inside_and_straddling_events(db):
+    add_event(db, "inside", START + timedelta(hours=1), START + timedelta(hours=2))
+    add_event(db, "straddles start", START - timedelta(hours=1), START + timedelta(minutes=30))
+    add_event(db, "straddles end", END - timedelta(minutes=30), END + timedelta(hours=1))
+    add_event(db, "covers window", START - timedelta(hours=2), END + timedelta(hours=2))
+    assert titles(db) == ["covers window", "straddles start", "inside", "straddles end"]
+
+def test_touching_boundaries_do_not_overlap(db):
+    add_event(db, "ends at start", START - timedelta(hours=1), START)
+    add_event(db, "starts at end", END, END + timedelta(hours=1))
+    add_event(db, "before", START - timedelta(hours=5), START - timedelta(hours=4))
+    add_event(db, "after", END + timedelta(hours=4), END + timedelta(hours=5))
+    assert titles(db) == []
+
+def test_long_events_starting_well_before_window(db):
+    add_event(db, "week off", START - timedelta(days=3), START + timedelta(days=4))
+    add_event(db, "long but over", START - timedelta(days=10), START - timedelta(days=2))
+    add_event(db, "just under threshold", START - timedelta(hours=23), START + timedelta(minutes=1))
+    assert titles(db) == ["week off", "just under threshold"]
+
+def test_is_long_follows_updates(db):
+    add_event(db, "meeting", START - timedelta(days=3), START - timedelta(days=3, hours=-1))
+    assert titles(db) == []
+    event = db.query(CalendarEvent).one()
+    event.end = START + timedelta(hours=1)
+    db.commit()
+    assert event.is_long
+    assert titles(db) == ["meeting"]
+
+def test_other_users_events_are_excluded(db):
+    add_event(db, "mine", START, END)
+    add_event(db, "theirs", START, END, user_id=2)
+    assert titles(db) == ["mine"]
+    assert titles(db, user_id=2) == ["theirs"]
+
+def test_selecting_columns(db):
+    add_event(db, "inside", START + timedelta(hours=1), START + timedelta(hours=2))
+    rows = events_overlapping(db, 1, START, END, CalendarEvent.start, CalendarEvent.end).all()
+    assert [tuple(row) for row in rows] == [(START + timedelta(hours=1), START + timedelta(hours=2))]
+
+def test_conflicts_for_a_single_event(db):
+    meeting = add_event(db, "meeting", START, START + timedelta(hours=1))
+    add_event(db, "overlaps", START + timedelta(minutes=30), START + timedelta(hours=2))
+    add_event(db, "touches", START + timedelta(hours=1), START + timedelta(hours=2))
+    add_event(db, "holiday", START.replace(hour=0), START.replace(hour=0) + timedelta(days=1), all_day=True)
+    add_event(db, "theirs", START, END, user_id=2)
+    conflicts = find_conflicts(db, 1, event_intervals(meeting), exclude_id=meeting.id)
+    assert [event.title for event, _, _ in conflicts] == ["overlaps"]
+
+def test_conflicts_include_recurring_occurrences(db):
+    standup = add_event(db, "standup", START - timedelta(days=7), START - timedelta(days=7, minutes=-15), rrule="FREQ=DAILY")
+    meeting = add_event(db, "meeting", START - timedelta(minutes=10), START + timedelta(minutes=10))
+    conflicts = find_conflicts(db, 1, event_intervals(meeting), exclude_id=meeting.id)
+    assert [(event.title, start) for event, start, _ in conflicts] == [("standup", START)]
+    series = find_conflicts(db, 1, event_intervals(standup, now=START - timedelta(days=1)), exclude_id=standup.id)
+    assert [event.title for event, _, _ in series] == ["meeting"]
+
+def test_conflicting_pairs_sweep(db):
+    add_event(db, "a", START, START + timedelta(hours=3))
+    add_event(db, "b", START + timedelta(hours=1), START + timedelta(hours=2))
+    add_event(db, "c", START + timedelta(hours=2), START + timedelta(hours=4))
+    add_event(db, "d", START + timedelta(hours=5), START + timedelta(hours=6))
+    pairs = conflicting_pairs(db, 1, START, END)
+    assert [(first[0].title, second[0].title) for first, second in pairs] == [("a", "b"), ("a", "c")]
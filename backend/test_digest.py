@@ -0,0 +1,95 @@
+"""
+Tests for the daily digest: per-timezone selection, one digest per user and day, unknown zones
+"""
+
+from datetime import date, datetime
+import sys
+import pytest
+import run_daily_digest as digest_script
+from app.models import DailyDigest, Notification, Task, User
+from app.services.digest import _user_batches, build_digests, digest_window, due_timezones, run_daily_digest, write_digests
+
+# Tokyo is at 15:00, UTC at 06:00 and New York at 01:00
+MORNING = datetime(2025, 1, 15, 6)
+
+@pytest.fixture
+def users(db):
+    db.get(User, 1).timezone = "Asia/Tokyo"
+    db.get(User, 2).timezone = "America/New_York"
+    db.add_all([
+        User(id=3, email="c@example.com", name="C", hashed_password="x"),  # no zone: UTC
+        User(id=4, email="d@example.com", name="D", hashed_password="x", timezone="Mars/Olympus"),
+    ])
+    # Something to report for everyone, or the digest is recorded without a notification
+    db.add_all([Task(title="report", due_date=datetime(2025, 1, 1), user_id=user_id) for user_id in range(1, 5)])
+    db.commit()
+    return db
+
+def digests(db):
+    db.expire_all()
+    return sorted((digest.user_id, digest.digest_date, digest.timezone) for digest in db.query(DailyDigest))
+
+def notified(db):
+    return sorted(user_id for user_id, in db.query(Notification.user_id))
+
+def run(db, now, **kwargs):
+    return run_daily_digest(db, now=now, email=False, **kwargs)
+
+def test_digest_window_is_the_local_day():
+    window = digest_window("Asia/Tokyo", MORNING)
+    assert (window.day, window.local_hour) == (date(2025, 1, 15), 15)
+    assert (window.yesterday_start, window.today_start, window.today_end) == (
+        datetime(2025, 1, 13, 15), datetime(2025, 1, 14, 15), datetime(2025, 1, 15, 15)
+    )
+    assert digest_window("America/New_York", MORNING).day == date(2025, 1, 15)
+
+def test_users_get_their_digest_once_their_local_morning_comes(users):
+    summary = run(users, MORNING)
+    assert (summary["timezones"], summary["users"], summary["notified"]) == (1, 1, 1)
+    assert digests(users) == [(1, date(2025, 1, 15), "Asia/Tokyo")]
+
+    run(users, datetime(2025, 1, 15, 8))
+    run(users, datetime(2025, 1, 15, 12))
+    assert digests(users) == [
+        (1, date(2025, 1, 15), "Asia/Tokyo"),
+        (2, date(2025, 1, 15), "America/New_York"),
+        (3, date(2025, 1, 15), "UTC"),
+    ]
+    assert notified(users) == [1, 2, 3]
+    notification = users.query(Notification).filter(Notification.user_id == 3).one()
+    assert (notification.title, notification.message) == ("Daily summary for Wednesday 15 January", "1 overdue.")
+
+def test_unknown_timezones_are_skipped(users):
+    assert set(due_timezones(users, datetime(2025, 1, 15, 23))) == {"Asia/Tokyo", "America/New_York", "UTC"}
+    assert run(users, datetime(2025, 1, 15, 23))["users"] == 3
+    assert 4 not in {user_id for user_id, _, _ in digests(users)}
+
+@pytest.mark.parametrize("returning", [True, False])
+def test_no_user_gets_two_digests_a_day(users, engine, monkeypatch, returning):
+    # Without RETURNING each digest is claimed with a savepoint insert
+    monkeypatch.setattr(engine.dialect, "insert_executemany_returning", returning)
+    evening = datetime(2025, 1, 15, 14, 59)  # 23:59 in Tokyo
+    # Two runs that both read the UTC bucket before either wrote
+    window = due_timezones(users, evening)["UTC"]
+    [batch] = _user_batches(users, "UTC", window.day, 10)
+    first, second = build_digests(users, batch, "UTC", window), build_digests(users, batch, "UTC", window)
+    assert write_digests(users, first, email=False) == 1
+    assert write_digests(users, second, email=False) == 0
+
+    assert run(users, evening, batch_size=1)["notified"] == 2
+    assert run(users, evening)["notified"] == 0
+    assert run(users, evening, hour=0)["users"] == 0
+    assert notified(users) == [1, 2, 3]
+
+    # Tokyo's next day starts at 15:00 UTC
+    assert run(users, datetime(2025, 1, 15, 15), timezones=["Asia/Tokyo"], hour=0)["notified"] == 1
+    assert [day for user_id, day, _ in digests(users) if user_id == 1] == [date(2025, 1, 15), date(2025, 1, 16)]
+
+def test_script_runs_the_requested_timezones(users, session_factory, monkeypatch, capsys):
+    monkeypatch.setattr(digest_script, "SessionLocal", session_factory)
+    monkeypatch.setattr(sys, "argv", [
+        "run_daily_digest.py", "--now", "2025-01-15T23:00:00", "--timezone", "UTC", "--timezone", "Mars/Olympus", "--no-email"
+    ])
+    digest_script.main()
+    assert capsys.readouterr().out.startswith("Daily digests: 1 users in 1 timezones, 1 notified in ")
+    assert digests(users) == [(3, date(2025, 1, 15), "UTC")]
@@ -0,0 +1,122 @@
+"""
+Tests for the email outbox worker against the local fake in fake_sendgrid.py
+"""
+
+import os
+os.environ.setdefault("FAKE_SENDGRID_LATENCY", "0")
+
+from datetime import datetime, timedelta
+import pytest
+from starlette.testclient import TestClient
+import fake_sendgrid
+from app.models import EmailOutbox, EmailStatus
+from app.services import email_outbox
+from app.services.email_outbox import claim_batch, deliver_batch, enqueue_email, retry_delay
+from app.services.mail import SendGridProvider
+
+@pytest.fixture
+def provider():
+    fake_sendgrid.messages.clear()
+    fake_sendgrid.stats.update(http_requests=0, accepted=0, failed=0)
+    return SendGridProvider("fake", base_url="http://testserver", http=TestClient(fake_sendgrid.app))
+
+@pytest.fixture
+def failing(monkeypatch):
+    """Make every request to the fake fail with a 503"""
+    monkeypatch.setattr(fake_sendgrid, "FAILURE_RATE", 1.0)
+
+def queue(db, subject="Hello", to_email=None, user_id=1):
+    email = enqueue_email(db, user_id, subject, "body", to_email=to_email)
+    db.commit()
+    return email.id
+
+def row(db, email_id):
+    db.expire_all()
+    return db.get(EmailOutbox, email_id)
+
+def deliver(db, provider, now=None, **kwargs):
+    return deliver_batch(db, provider, now=now or datetime.utcnow(), concurrency=1, **kwargs)
+
+def test_claimed_emails_are_sent_once(db, provider):
+    default = queue(db)
+    explicit = queue(db, subject="Digest", to_email="team@example.com")
+
+    assert deliver(db, provider) == 2
+    sent = [row(db, default), row(db, explicit)]
+    assert [(email.status, email.attempts, email.last_error) for email in sent] == [(EmailStatus.sent, 1, None)] * 2
+    assert all(email.sent_at is not None for email in sent)
+    assert sorted(email.provider_message_id for email in sent) == sorted(message["id"] for message in fake_sendgrid.messages)
+    assert sorted((message["to"][0], message["subject"]) for message in fake_sendgrid.messages) == [
+        ("a@example.com", "Hello"), ("team@example.com", "Digest")
+    ]
+
+    assert deliver(db, provider) == 0
+    assert fake_sendgrid.stats["http_requests"] == 2
+
+def test_claim_is_leased_until_it_expires(db):
+    email_id = queue(db)
+    now = datetime.utcnow()
+
+    [claimed] = claim_batch(db, now, lease_seconds=300)
+    assert claimed[0] == email_id and claimed[3] == "a@example.com" and claimed[6] == 1
+    email = row(db, email_id)
+    assert (email.status, email.attempts, email.next_attempt_at) == (EmailStatus.sending, 1, now + timedelta(seconds=300))
+
+    # Other workers skip the row while the lease lasts
+    assert claim_batch(db, now + timedelta(seconds=299), lease_seconds=300) == []
+    # A worker that died mid-send leaves it to be claimed again
+    [reclaimed] = claim_batch(db, now + timedelta(seconds=300), lease_seconds=300)
+    assert reclaimed[0] == email_id and reclaimed[6] == 2
+    assert row(db, email_id).next_attempt_at == now + timedelta(seconds=600)
+
+def test_retry_delay_backs_off_exponentially_up_to_the_cap(monkeypatch):
+    monkeypatch.setattr(email_outbox.random, "uniform", lambda low, high: high)
+    assert [retry_delay(attempts, base=60, cap=3600) for attempts in (1, 2, 3, 7, 20)] == [60, 120, 240, 3600, 3600]
+
+def test_transient_failures_are_retried_with_backoff(db, provider, failing, monkeypatch):
+    monkeypatch.setattr(email_outbox.random, "uniform", lambda low, high: high)
+    email_id = queue(db)
+
+    before = datetime.utcnow()
+    assert deliver(db, provider, now=before) == 1
+    after = datetime.utcnow()
+    email = row(db, email_id)
+    assert (email.status, email.attempts) == (EmailStatus.pending, 1)
+    assert "503" in email.last_error
+    retry_at = email.next_attempt_at
+    assert before + timedelta(seconds=60) <= retry_at <= after + timedelta(seconds=60)
+
+    # Not due before its backoff runs out
+    assert deliver(db, provider, now=retry_at - timedelta(seconds=1)) == 0
+    before = datetime.utcnow()
+    assert deliver(db, provider, now=retry_at) == 1
+    after = datetime.utcnow()
+    email = row(db, email_id)
+    assert (email.status, email.attempts) == (EmailStatus.pending, 2)
+    assert before + timedelta(seconds=120) <= email.next_attempt_at <= after + timedelta(seconds=120)
+
+    monkeypatch.setattr(fake_sendgrid, "FAILURE_RATE", 0.0)  # the provider recovers
+    assert deliver(db, provider, now=email.next_attempt_at) == 1
+    email = row(db, email_id)
+    assert (email.status, email.attempts, email.last_error) == (EmailStatus.sent, 3, None)
+    assert len(fake_sendgrid.messages) == 1
+
+def test_last_failed_attempt_is_dead_lettered(db, provider, failing):
+    email_id = queue(db)
+    now = datetime.utcnow()
+    for _ in range(2):
+        assert deliver(db, provider, now=now, max_attempts=2) == 1
+        now = row(db, email_id).next_attempt_at
+
+    email = row(db, email_id)
+    assert (email.status, email.attempts) == (EmailStatus.dead, 2)
+    assert "503" in email.last_error and email.sent_at is None
+    assert deliver(db, provider, now=now + timedelta(days=1), max_attempts=2) == 0
+
+def test_permanent_failures_are_dead_lettered_at_once(db, provider):
+    email_id = queue(db, to_email="not-an-address")
+    assert deliver(db, provider) == 1
+    email = row(db, email_id)
+    assert (email.status, email.attempts) == (EmailStatus.dead, 1)
+    assert "400" in email.last_error
+    assert fake_sendgrid.messages == []
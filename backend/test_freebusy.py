@@ -0,0 +1,84 @@
+"""
+Tests for the per-user free/busy index and its cache invalidation
+"""
+
+from datetime import datetime, timedelta
+import pytest
+from app.models import CalendarEvent
+from app.services.freebusy import BusyIndex, FreeBusyService, freebusy_service
+
+START = datetime(2024, 1, 10, 9)
+
+def add_event(db, start, minutes):
+    db.add(CalendarEvent(title="busy", start=start, end=start + timedelta(minutes=minutes), user_id=1))
+    db.commit()
+
+def test_busy_intervals_are_merged_and_clipped():
+    index = BusyIndex([(30, 60), (0, 10), (5, 20), (60, 70)])
+    assert len(index) == 2
+    assert index.busy_between(0, 100) == [(0, 20), (30, 70)]
+    assert index.busy_between(15, 40) == [(15, 20), (30, 40)]
+    assert index.busy_between(20, 30) == []
+
+def test_free_between_fills_the_gaps():
+    index = BusyIndex([(10, 20), (30, 40)])
+    assert index.free_between(0, 50) == [(0, 10), (20, 30), (40, 50)]
+    assert index.free_between(12, 35) == [(20, 30)]
+    assert BusyIndex([]).free_between(0, 5) == [(0, 5)]
+
+def test_find_slot():
+    index = BusyIndex([(10, 20), (25, 40), (60, 70)])
+    assert index.find_slot(10, 0, 100) == 0
+    assert index.find_slot(15, 0, 100) == 40
+    assert index.find_slot(5, 12, 100) == 20
+    assert index.find_slot(30, 0, 100) == 70
+    assert index.find_slot(30, 0, 90) is None
+    assert index.find_slot(5, 30, 33) is None
+    assert BusyIndex([]).find_slot(5, 7, 100) == 7
+
+def test_index_is_cached_until_invalidated(db):
+    service = FreeBusyService()
+    add_event(db, START, 60)
+    first = service.get_index(db, 1)
+    assert service.get_index(db, 1) is first
+
+    add_event(db, START + timedelta(hours=2), 30)
+    assert service.get_index(db, 1) is first
+    service.invalidate(1)
+    assert len(service.get_index(db, 1)) == 2
+
+def test_invalidate_during_build_is_not_overwritten(db):
+    service = FreeBusyService()
+    add_event(db, START, 60)
+    load_busy = service._load_busy
+
+    def racing_load(db, user_id):
+        busy = load_busy(db, user_id)
+        # A write lands and invalidates after this build read its rows
+        add_event(db, START + timedelta(hours=2), 30)
+        service.invalidate(user_id)
+        return busy
+
+    service._load_busy = racing_load
+    assert len(service.get_index(db, 1)) == 1
+    service._load_busy = load_busy
+    assert len(service.get_index(db, 1)) == 2
+    assert service._generations == {} and service._building == {}
+
+def test_least_recently_used_index_is_evicted(db):
+    service = FreeBusyService(max_users=1)
+    first = service.get_index(db, 1)
+    service.get_index(db, 2)
+    assert service.get_index(db, 1) is not first
+
+def test_find_slot_in_local_working_hours(api, db):
+    freebusy_service.invalidate(1)
+    add_event(db, datetime(2024, 1, 10, 8), 60)
+    params = {"duration": 30, "start": "2024-01-10T00:00:00", "work_start_hour": 9, "work_end_hour": 17}
+
+    response = api.get("/api/v1/calendar/find-slot", params={**params, "timezone": "Europe/Berlin"})
+    assert response.status_code == 200
+    assert response.json() == {"start": "2024-01-10T09:00:00", "end": "2024-01-10T09:30:00"}
+
+    response = api.get("/api/v1/calendar/find-slot", params={**params, "timezone": "Mars/Olympus"})
+    assert (response.status_code, response.json()["detail"]) == (400, "Unknown timezone")
@@ -0,0 +1,144 @@
+"""
+Tests for Google Calendar sync against the local fake in fake_google_calendar.py
+"""
+
+import os
+os.environ.setdefault("FAKE_GCAL_LATENCY", "0")
+
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import update
+from starlette.testclient import TestClient
+import fake_google_calendar
+from app.models import CalendarEvent, GoogleSyncState, Task, TaskStatus
+from app.services import google_sync
+from app.services.google_calendar import GoogleCalendarClient
+from app.services.google_sync import DELETE, INSERT, UPDATE, make_sync_worker, plan_sync
+from app.services.jobs import Job
+
+ORIGIN = datetime(2025, 3, 3, 9)
+TEAM_CALENDAR = "team#1@group.calendar.google.com"
+
+@pytest.fixture(autouse=True)
+def fake_calendar(session_factory, monkeypatch):
+    monkeypatch.setattr(google_sync, "SessionLocal", session_factory)
+    fake_google_calendar.calendars.clear()
+
+@pytest.fixture
+def client():
+    return GoogleCalendarClient("token", base_url="http://testserver", http=TestClient(fake_google_calendar.app))
+
+def add_rows(db):
+    events = [
+        CalendarEvent(title=f"event {i}", start=ORIGIN + timedelta(hours=i), end=ORIGIN + timedelta(hours=i, minutes=30), user_id=1)
+        for i in range(3)
+    ]
+    tasks = [
+        Task(title="due", due_date=ORIGIN + timedelta(days=1), estimated_duration=45, user_id=1),
+        Task(title="no due date", user_id=1),
+        Task(title="cancelled", due_date=ORIGIN, status=TaskStatus.cancelled, user_id=1),
+    ]
+    db.add_all(events + tasks)
+    db.commit()
+    # Written well before any sync, as rows usually are
+    an_hour_ago = datetime.utcnow() - timedelta(hours=1)
+    for model in (CalendarEvent, Task):
+        db.execute(update(model).values(created_at=an_hour_ago, updated_at=model.updated_at))
+    db.commit()
+    return events, tasks
+
+def sync(db, client, calendar_id="primary", **kwargs):
+    operations = plan_sync(db, 1, calendar_id, **kwargs)
+    job = Job("google_sync", 1, len(operations))
+    make_sync_worker(1, calendar_id, client, operations)(job, list(range(len(operations))))
+    db.expire_all()
+    return [(op.action, op.kind, op.local_id) for op in operations], job.snapshot()
+
+def remote(calendar_id="primary"):
+    return {
+        event["id"]: event
+        for event in fake_google_calendar.calendars.get(calendar_id, {}).values()
+        if event.get("status") != "cancelled"
+    }
+
+def count_bodies(monkeypatch):
+    loaded = []
+    for name in ("event_body", "task_body"):
+        build = getattr(google_sync, name)
+        monkeypatch.setattr(google_sync, name, lambda row, build=build: loaded.append(row.id) or build(row))
+    return loaded
+
+def test_events_path_quotes_ids():
+    assert GoogleCalendarClient.events_path(TEAM_CALENDAR) == "/calendar/v3/calendars/team%231%40group.calendar.google.com/events"
+    assert GoogleCalendarClient.events_path("primary", "a/b") == "/calendar/v3/calendars/primary/events/a%2Fb"
+
+def test_initial_sync_inserts_events_and_due_tasks(db, client):
+    events, tasks = add_rows(db)
+    operations, snapshot = sync(db, client)
+
+    assert sorted(operations) == sorted(
+        [(INSERT, "event", event.id) for event in events] + [(INSERT, "task", tasks[0].id)]
+    )
+    assert (snapshot["completed"], snapshot["failed"]) == (4, 0)
+    pushed = remote()
+    assert sorted(event["summary"] for event in pushed.values()) == ["due", "event 0", "event 1", "event 2"]
+    assert all(event.google_calendar_id in pushed for event in db.query(CalendarEvent))
+    assert db.query(GoogleSyncState).count() == 4
+
+def test_resync_only_loads_rows_written_since_the_last_push(db, client, monkeypatch):
+    events, tasks = add_rows(db)
+    sync(db, client)
+    loaded = count_bodies(monkeypatch)
+
+    assert sync(db, client)[0] == []
+    assert loaded == []
+
+    db.get(CalendarEvent, events[1].id).title = "moved"
+    db.commit()
+    operations, _ = sync(db, client)
+    assert operations == [(UPDATE, "event", events[1].id)]
+    assert loaded == [events[1].id]
+    assert remote()[db.get(CalendarEvent, events[1].id).google_calendar_id]["summary"] == "moved"
+
+def test_write_without_content_change_is_not_pushed(db, client):
+    events, _ = add_rows(db)
+    sync(db, client)
+    db.get(CalendarEvent, events[0].id).description = ""
+    db.commit()
+    assert sync(db, client)[0] == []
+
+def test_deleted_and_cancelled_rows_are_deleted_remotely(db, client):
+    events, tasks = add_rows(db)
+    sync(db, client)
+    google_id = db.get(CalendarEvent, events[0].id).google_calendar_id
+    db.delete(db.get(CalendarEvent, events[0].id))
+    db.get(Task, tasks[0].id).status = TaskStatus.cancelled
+    db.commit()
+
+    operations, snapshot = sync(db, client)
+    assert sorted(operations) == sorted([(DELETE, "event", events[0].id), (DELETE, "task", tasks[0].id)])
+    assert snapshot["failed"] == 0
+    assert google_id not in remote()
+    assert sorted(event["summary"] for event in remote().values()) == ["event 1", "event 2"]
+    assert db.query(GoogleSyncState).count() == 2
+
+def test_task_ids_limit_the_sync(db, client):
+    _, tasks = add_rows(db)
+    extra = Task(title="other", due_date=ORIGIN, user_id=1)
+    db.add(extra)
+    db.commit()
+
+    operations, _ = sync(db, client, task_ids=[tasks[0].id], include_events=False)
+    assert operations == [(INSERT, "task", tasks[0].id)]
+
+    db.delete(db.get(Task, tasks[0].id))
+    db.commit()
+    assert sync(db, client, task_ids=[extra.id], include_events=False)[0] == [(INSERT, "task", extra.id)]
+    assert sync(db, client, task_ids=[tasks[0].id], include_events=False)[0] == [(DELETE, "task", tasks[0].id)]
+
+def test_calendar_ids_with_reserved_characters(db, client):
+    add_rows(db)
+    operations, snapshot = sync(db, client, calendar_id=TEAM_CALENDAR)
+    assert len(operations) == 4 and snapshot["failed"] == 0
+    assert len(remote(TEAM_CALENDAR)) == 4
+    assert "primary" not in fake_google_calendar.calendars
@@ -0,0 +1,48 @@
+"""
+Tests for the request metrics middleware and the Prometheus scrape endpoint
+"""
+
+import main
+from app.services.http_metrics import PROMETHEUS_CONTENT_TYPE
+
+def scrape(api):
+    response = api.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == PROMETHEUS_CONTENT_TYPE
+    samples = {}
+    for line in response.text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return response.text, samples
+
+def test_requests_are_labelled_with_their_route_template(api, db, monkeypatch):
+    monkeypatch.setattr(main, "METRICS_TOKEN", None)
+    _, before = scrape(api)
+
+    api.get("/api/v1/tasks/123")
+    api.get("/api/v1/tasks/456")
+    api.get("/api/v1/tasks/estimate-accuracy")
+    api.get("/nowhere/789")
+    text, after = scrape(api)
+
+    def added(sample):
+        return after.get(sample, 0) - before.get(sample, 0)
+
+    assert "# TYPE http_requests_total counter" in text
+    assert "# TYPE http_request_duration_seconds histogram" in text
+    assert added('http_requests_total{method="GET",route="/api/v1/tasks/{task_id}",status="404"}') == 2
+    assert added('http_requests_total{method="GET",route="/api/v1/tasks/estimate-accuracy",status="200"}') == 1
+    assert added('http_requests_total{method="GET",route="unmatched",status="404"}') == 1
+    assert added('http_request_duration_seconds_count{method="GET",route="/api/v1/tasks/{task_id}"}') == 2
+    assert added('http_request_duration_seconds_bucket{method="GET",route="/api/v1/tasks/{task_id}",le="+Inf"}') == 2
+    # Raw paths never become label values
+    assert "123" not in text and "/nowhere" not in text
+    # The scrape in flight is counted as it is rendered
+    assert after['http_requests_in_flight{method="GET"}'] == 1
+
+def test_scrape_needs_the_token_when_one_is_set(api, monkeypatch):
+    monkeypatch.setattr(main, "METRICS_TOKEN", "secret")
+    assert api.get("/metrics").status_code == 401
+    assert api.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    assert api.get("/metrics", headers={"Authorization": "Bearer secret"}).status_code == 200
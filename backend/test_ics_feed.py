@@ -0,0 +1,110 @@
+"""
+Tests for the ICS feed endpoint: rendered-feed caching, conditional requests and invalidation on writes
+"""
+
+from datetime import datetime, timedelta, timezone
+import pytest
+from app.models import User
+from app.routers import calendar, tasks
+from app.services import ics_feed
+from app.services.ics_feed import FeedCache, RenderedFeed
+
+class FrozenDatetime(datetime):
+    frozen = datetime(2025, 1, 15, 10)
+
+    @classmethod
+    def utcnow(cls):
+        return cls.frozen
+
+@pytest.fixture
+def feed_cache(monkeypatch):
+    cache = FeedCache()
+    monkeypatch.setattr(calendar, "feed_cache", cache)
+    monkeypatch.setattr(tasks, "feed_cache", cache)
+    monkeypatch.setattr(ics_feed, "datetime", FrozenDatetime)
+    FrozenDatetime.frozen = datetime(2025, 1, 15, 10)
+    return cache
+
+@pytest.fixture
+def token(api, feed_cache):
+    return api.post("/api/v1/calendar/feed-token").json()["token"]
+
+def fetch(api, token, **headers):
+    return api.get("/api/v1/calendar/feed.ics", params={"token": token}, headers=headers)
+
+def test_not_modified_prefers_if_none_match():
+    feed = RenderedFeed(1, b"", '"abc"', datetime(2025, 1, 15, 10))
+    assert feed.last_modified_header == "Wed, 15 Jan 2025 10:00:00 GMT"
+    for if_none_match in ('"abc"', 'W/"abc"', '"old", "abc"', "*"):
+        assert feed.not_modified(if_none_match, None)
+    assert not feed.not_modified('"old"', None)
+    # A stale ETag wins over a matching date
+    assert not feed.not_modified('"old"', datetime(2025, 1, 16))
+
+    assert feed.not_modified(None, datetime(2025, 1, 15, 10))
+    assert feed.not_modified(None, datetime(2025, 1, 15, 11, tzinfo=timezone(timedelta(hours=1))))
+    assert not feed.not_modified(None, datetime(2025, 1, 15, 9, 59, 59))
+    assert not feed.not_modified(None, None)
+
+def test_conditional_polls_get_304(api, token):
+    response = fetch(api, token)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "text/calendar; charset=utf-8"
+    assert response.text.startswith("BEGIN:VCALENDAR\r\n") and "X-WR-CALNAME:A\r\n" in response.text
+    etag, last_modified = response.headers["etag"], response.headers["last-modified"]
+    assert last_modified == "Wed, 15 Jan 2025 10:00:00 GMT"
+
+    not_modified = fetch(api, token, **{"If-None-Match": etag})
+    assert (not_modified.status_code, not_modified.content) == (304, b"")
+    assert (not_modified.headers["etag"], not_modified.headers["last-modified"]) == (etag, last_modified)
+    assert fetch(api, token, **{"If-Modified-Since": last_modified}).status_code == 304
+    assert fetch(api, token, **{"If-Modified-Since": "Wed, 15 Jan 2025 09:59:59 GMT"}).status_code == 200
+    assert fetch(api, token, **{"If-Modified-Since": "yesterday"}).status_code == 200
+    assert fetch(api, token, **{"If-None-Match": '"old"', "If-Modified-Since": last_modified}).status_code == 200
+
+    assert fetch(api, "not-a-token").status_code == 404
+
+def test_writes_invalidate_the_cached_feed(api, db, token, feed_cache):
+    first = fetch(api, token)
+    # Served from the cache: a change made behind the routers is not seen
+    db.get(User, 1).name = "Renamed"
+    db.commit()
+    assert fetch(api, token).headers["etag"] == first.headers["etag"]
+
+    FrozenDatetime.frozen = datetime(2025, 1, 15, 10, 5)
+    event = api.post("/api/v1/calendar/events", json={
+        "title": "Standup", "start": "2025-01-16T09:00:00", "end": "2025-01-16T09:15:00"
+    }).json()
+    response = fetch(api, token, **{"If-None-Match": first.headers["etag"]})
+    assert response.status_code == 200
+    assert "SUMMARY:Standup\r\n" in response.text and "X-WR-CALNAME:Renamed\r\n" in response.text
+    assert response.headers["last-modified"] == "Wed, 15 Jan 2025 10:05:00 GMT"
+
+    FrozenDatetime.frozen = datetime(2025, 1, 15, 10, 10)
+    assert api.delete(f"/api/v1/calendar/events/{event['id']}").status_code == 200
+    response = fetch(api, token)
+    assert "Standup" not in response.text
+    assert response.headers["last-modified"] == "Wed, 15 Jan 2025 10:10:00 GMT"
+
+    # Rotating the token drops the feed cached under the old one
+    new_token = api.post("/api/v1/calendar/feed-token").json()["token"]
+    assert fetch(api, token).status_code == 404
+    assert fetch(api, new_token).status_code == 200
+
+def test_unchanged_rerender_keeps_last_modified(api, db, token, feed_cache):
+    first = fetch(api, token)
+
+    # An undated task is not in the feed, but creating it still invalidates
+    FrozenDatetime.frozen = datetime(2025, 1, 15, 11)
+    assert api.post("/api/v1/tasks/", json={"title": "Someday"}).status_code == 200
+    assert feed_cache.get(token) is None
+    response = fetch(api, token, **{"If-Modified-Since": first.headers["last-modified"]})
+    assert response.status_code == 304
+    assert (response.headers["etag"], response.headers["last-modified"]) == (first.headers["etag"], first.headers["last-modified"])
+
+    # Entries past their TTL are re-rendered the same way
+    expiring = FeedCache(ttl=-1)
+    rendered = expiring.render(db, db.get(User, 1), token)
+    assert expiring.get(token) is None
+    FrozenDatetime.frozen = datetime(2025, 1, 15, 12)
+    assert expiring.render(db, db.get(User, 1), token).last_modified == rendered.last_modified == datetime(2025, 1, 15, 11)
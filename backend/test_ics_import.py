@@ -0,0 +1,131 @@
+"""
+Tests for the streaming .ics import: parsing, modified instances and UID upserts
+"""
+
+import io
+from datetime import datetime, timedelta
+import pytest
+from app.models import CalendarEvent
+from app.services.ics_import import (
+    ICSError, import_events, iter_lines, iter_vevents, parse_content_line, parse_duration, parse_event, parse_time
+)
+from app.services.recurrence import parse_exdates
+
+class Unseekable(io.BytesIO):
+    """An upload that can only be read once, front to back"""
+
+    def seekable(self):
+        return False
+
+def calendar(*events: str) -> bytes:
+    body = "".join(f"BEGIN:VEVENT\r\n{event.strip()}\r\nEND:VEVENT\r\n" for event in events)
+    return f"BEGIN:VCALENDAR\r\nVERSION:2.0\r\n{body}END:VCALENDAR\r\n".encode()
+
+SERIES = """
+UID:standup@example.com
+SUMMARY:Standup
+DTSTART;TZID=Europe/Berlin:20250303T090000
+DTEND;TZID=Europe/Berlin:20250303T091500
+RRULE:FREQ=DAILY;COUNT=5
+"""
+
+MOVED = """
+UID:standup@example.com
+RECURRENCE-ID;TZID=Europe/Berlin:20250305T090000
+SUMMARY:Standup (moved)
+DTSTART;TZID=Europe/Berlin:20250305T110000
+DTEND;TZID=Europe/Berlin:20250305T111500
+"""
+
+def events(db):
+    db.expire_all()
+    return {event.ical_uid: event for event in db.query(CalendarEvent)}
+
+def test_lines_are_unfolded_across_read_chunks():
+    text = b"BEGIN:VCALENDAR\r\nDESCRIPTION:first part\r\n  and the rest\r\n\tcontinued\r\nEND:VCALENDAR"
+    for chunk_size in (1, 3, 7, 1024):
+        assert list(iter_lines(io.BytesIO(text), chunk_size)) == [
+            "BEGIN:VCALENDAR", "DESCRIPTION:first part and the restcontinued", "END:VCALENDAR"
+        ]
+
+def test_content_line_parameters():
+    assert parse_content_line("dtstart;tzid=Europe/Berlin:20250303T090000") == (
+        "DTSTART", {"TZID": "Europe/Berlin"}, "20250303T090000"
+    )
+    assert parse_content_line('ATTENDEE;CN="Doe; John: PhD":mailto:j@example.com') == (
+        "ATTENDEE", {"CN": "Doe; John: PhD"}, "mailto:j@example.com"
+    )
+
+def test_times_and_durations():
+    assert parse_time({}, "20250303T090000Z") == (datetime(2025, 3, 3, 9), False)
+    assert parse_time({"TZID": "Europe/Berlin"}, "20250303T090000") == (datetime(2025, 3, 3, 8), False)
+    assert parse_time({"TZID": "Nowhere/Special"}, "20250303T090000") == (datetime(2025, 3, 3, 9), False)
+    assert parse_time({"VALUE": "DATE"}, "20250303") == (datetime(2025, 3, 3), True)
+    with pytest.raises(ICSError):
+        parse_time({}, "2025-03-03")
+    assert parse_duration("P1DT2H30M") == timedelta(days=1, hours=2, minutes=30)
+    assert parse_duration("-PT15M") == timedelta(minutes=-15)
+    with pytest.raises(ICSError):
+        parse_duration("PT")
+
+def test_vevents_skip_nested_components():
+    text = calendar("UID:a\r\nDTSTART:20250303T090000Z\r\nBEGIN:VALARM\r\nTRIGGER:-PT5M\r\nSUMMARY:alarm\r\nEND:VALARM\r\nSUMMARY:event")
+    [props] = iter_vevents(iter_lines(io.BytesIO(text)))
+    assert [value for _, value in props["SUMMARY"]] == ["event"]
+    assert "TRIGGER" not in props
+    with pytest.raises(ICSError):
+        list(iter_vevents(iter("NOT A CALENDAR\r\n".splitlines())))
+
+def test_event_defaults_and_fallback_uid():
+    props = next(iter_vevents(iter_lines(io.BytesIO(calendar("DTSTART;VALUE=DATE:20250303\r\nSUMMARY:Holiday\\, off")))))
+    parsed = parse_event(props)
+    assert (parsed["start"], parsed["end"], parsed["all_day"]) == (datetime(2025, 3, 3), datetime(2025, 3, 4), True)
+    assert parsed["title"] == "Holiday, off"
+    assert parsed["ical_uid"].endswith("@import") and parse_event(props)["ical_uid"] == parsed["ical_uid"]
+
+@pytest.mark.parametrize("stream_type", [io.BytesIO, Unseekable])
+@pytest.mark.parametrize("order", [(SERIES, MOVED), (MOVED, SERIES)])
+def test_modified_instance_is_excluded_from_its_series(db, stream_type, order):
+    summary = import_events(db, 1, stream_type(calendar(*order)))
+    assert (summary.created, summary.skipped) == (2, 0)
+
+    imported = events(db)
+    master = imported["standup@example.com"]
+    moved = imported["standup@example.com#20250305T080000Z"]
+    assert master.rrule == "FREQ=DAILY;COUNT=5" and master.timezone == "Europe/Berlin"
+    assert parse_exdates(master.exdates) == [datetime(2025, 3, 5, 8)]
+    assert master.recurrence_end == datetime(2025, 3, 7, 8, 15)
+    assert (moved.title, moved.start, moved.rrule) == ("Standup (moved)", datetime(2025, 3, 5, 10), None)
+
+def test_reimport_upserts_by_uid(db):
+    original = calendar(SERIES, "UID:lunch\r\nSUMMARY:Lunch\r\nDTSTART:20250303T120000Z\r\nDURATION:PT1H")
+    assert import_events(db, 1, io.BytesIO(original), batch_size=1).created == 2
+
+    again = import_events(db, 1, io.BytesIO(original))
+    assert (again.created, again.updated, again.unchanged) == (0, 0, 2)
+
+    changed = calendar(SERIES, "UID:lunch\r\nSUMMARY:Long lunch\r\nDTSTART:20250303T120000Z\r\nDURATION:PT2H")
+    summary = import_events(db, 1, io.BytesIO(changed))
+    assert (summary.created, summary.updated, summary.unchanged) == (0, 1, 1)
+    lunch = events(db)["lunch"]
+    assert (lunch.title, lunch.end) == ("Long lunch", datetime(2025, 3, 3, 14))
+    assert summary.event_ids == [lunch.id]
+    assert db.query(CalendarEvent).count() == 2
+
+def test_duplicate_uid_in_one_file_keeps_the_last(db):
+    text = calendar(
+        "UID:dup\r\nSUMMARY:first\r\nDTSTART:20250303T090000Z",
+        "UID:dup\r\nSUMMARY:second\r\nDTSTART:20250303T100000Z",
+        "UID:gone\r\nSTATUS:CANCELLED\r\nDTSTART:20250303T090000Z",
+        "UID:broken\r\nSUMMARY:no start",
+    )
+    summary = import_events(db, 1, io.BytesIO(text))
+    assert (summary.created, summary.skipped) == (1, 3)
+    assert [event.title for event in events(db).values()] == ["second"]
+    assert summary.errors == ["dup: duplicate UID", "gone: cancelled", "broken: VEVENT has no DTSTART"]
+
+def test_uids_are_scoped_per_user(db):
+    text = calendar("UID:shared\r\nDTSTART:20250303T090000Z")
+    assert import_events(db, 1, io.BytesIO(text)).created == 1
+    assert import_events(db, 2, io.BytesIO(text)).created == 1
+    assert sorted(event.user_id for event in db.query(CalendarEvent)) == [1, 2]
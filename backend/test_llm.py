@@ -0,0 +1,98 @@
+"""
+Tests for the offline LLM providers: the seeded stub and fixture record/replay, timed on a fake clock
+"""
+
+import json
+import os
+import random
+import pytest
+from app.services.llm import LLMError, LLMProvider, LLMResult, RecordReplayProvider, StubProvider, create_llm_provider, parse_latency
+
+class FakeClock:
+    """Stands in for time.sleep: records each delay and advances instead of blocking"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+class CountingProvider(LLMProvider):
+    name = "counting"
+
+    def __init__(self):
+        self.calls = 0
+
+    def complete(self, prompt, max_tokens, temperature=0.7):
+        self.calls += 1
+        return LLMResult(content=f"reply {self.calls}", prompt_tokens=3, completion_tokens=2, model="counting", latency=1.25)
+
+def test_latency_specs():
+    rng = random.Random(7)
+    assert parse_latency("none", rng)() == 0.0
+    assert parse_latency("fixed:0.3", rng)() == 0.3
+    assert all(0.2 <= parse_latency("uniform:0.2,0.4", rng)() <= 0.4 for _ in range(100))
+    assert all(parse_latency("normal:0.1,5", rng)() >= 0.0 for _ in range(100))
+    with pytest.raises(LLMError):
+        parse_latency("poisson:3", rng)
+
+def test_stub_waits_the_sampled_latency():
+    clock = FakeClock()
+    stub = StubProvider(latency="uniform:0.1,0.5", seed="42", sleep=clock.sleep)
+    results = [stub.complete('Parse "book dentist"', max_tokens=500) for _ in range(3)]
+
+    assert [result.latency for result in results] == clock.sleeps
+    assert all(0.1 <= delay <= 0.5 for delay in clock.sleeps)
+    assert clock.now == pytest.approx(sum(clock.sleeps))
+    # The same seed replays the same delays
+    again = FakeClock()
+    replayed = StubProvider(latency="uniform:0.1,0.5", seed="42", sleep=again.sleep)
+    for _ in range(3):
+        replayed.complete("anything", max_tokens=500)
+    assert again.sleeps == clock.sleeps
+
+def test_stub_answers_single_and_batched_commands():
+    stub = StubProvider(latency="none", sleep=FakeClock().sleep)
+    result = stub.complete('Turn this into tasks: "Write quarterly report"', max_tokens=500)
+    response = json.loads(result.content)
+    assert response["tasks"][0]["title"] == "Write quarterly report"
+    assert (result.model, result.prompt_tokens) == ("stub", len('Turn this into tasks: "Write quarterly report"') // 4 + 1)
+
+    batch = stub.complete('Commands:\n1. "Book dentist"\n2. "Call \\"Mom\\""\n', max_tokens=1)
+    assert [(item["index"], item["tasks"][0]["title"]) for item in json.loads(batch.content)["results"]] == [
+        (1, "Book dentist"), (2, 'Call "Mom"')
+    ]
+    assert batch.completion_tokens == 1
+
+def test_recorded_responses_replay_with_their_latency(tmp_path):
+    inner = CountingProvider()
+    recorder = RecordReplayProvider("record", fixtures_dir=str(tmp_path), inner=inner)
+    recorded = recorder.complete("Plan my week", max_tokens=100, temperature=0.2)
+    [fixture] = os.listdir(tmp_path)
+    assert fixture == os.path.basename(recorder.fixture_path("Plan my week", 100, 0.2))
+    assert json.loads((tmp_path / fixture).read_text())["prompt"] == "Plan my week"
+
+    clock = FakeClock()
+    replay = RecordReplayProvider("replay", fixtures_dir=str(tmp_path), replay_latency="recorded", sleep=clock.sleep)
+    assert replay.complete("Plan my week", max_tokens=100, temperature=0.2) == recorded
+    assert (clock.sleeps, inner.calls) == ([1.25], 1)
+
+    fixed = RecordReplayProvider("replay", fixtures_dir=str(tmp_path), replay_latency="fixed:0.05", sleep=clock.sleep)
+    assert fixed.complete("Plan my week", max_tokens=100, temperature=0.2).content == "reply 1"
+    assert clock.sleeps == [1.25, 0.05]
+
+    # Every completion parameter is part of the fixture key
+    with pytest.raises(LLMError, match="No recorded response"):
+        replay.complete("Plan my week", max_tokens=100, temperature=0.7)
+    assert len(clock.sleeps) == 2
+
+def test_provider_configuration_errors(tmp_path):
+    with pytest.raises(LLMError):
+        RecordReplayProvider("rewind", fixtures_dir=str(tmp_path))
+    with pytest.raises(LLMError):
+        RecordReplayProvider("record", fixtures_dir=str(tmp_path))
+    with pytest.raises(LLMError):
+        create_llm_provider("mystery")
+    assert isinstance(create_llm_provider("stub"), StubProvider)
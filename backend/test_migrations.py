@@ -0,0 +1,122 @@
+"""
+Tests for the idempotent schema upgrades of existing databases
+"""
+
+from sqlalchemy import inspect
+from app.migrations import STEPS, migrate_schema
+
+def downgrade(engine):
+    """Drop every migrated table, column and index, like a database from before them"""
+    with engine.begin() as connection:
+        for step in reversed(STEPS):
+            inspector = inspect(connection)
+            dropped = set(step.indexes)
+            for table_name, column_name in step.columns:
+                dropped.update(
+                    index["name"] for index in inspector.get_indexes(table_name)
+                    if column_name in index["column_names"]
+                )
+            for name in dropped:
+                connection.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+            for table_name, column_name in step.columns:
+                connection.exec_driver_sql(f'ALTER TABLE {table_name} DROP COLUMN "{column_name}"')
+            for table_name in step.tables:
+                connection.exec_driver_sql(f"DROP TABLE {table_name}")
+
+def schema(engine):
+    inspector = inspect(engine)
+    return {
+        table: (
+            sorted(column["name"] for column in inspector.get_columns(table)),
+            sorted((index["name"], bool(index["unique"])) for index in inspector.get_indexes(table))
+        )
+        for table in inspector.get_table_names()
+    }
+
+def test_fresh_database_needs_no_changes(engine):
+    assert migrate_schema(engine) == []
+
+def test_upgrade_matches_a_fresh_schema_and_is_idempotent(engine):
+    fresh = schema(engine)
+    downgrade(engine)
+    assert schema(engine) != fresh
+
+    assert migrate_schema(engine)
+    assert schema(engine) == fresh
+    assert migrate_schema(engine) == []
+
+def legacy_rows(engine, *statements):
+    with engine.begin() as connection:
+        connection.exec_driver_sql("INSERT INTO users (id, email, name, hashed_password) VALUES (1, 'a@example.com', 'A', 'x')")
+        for statement in statements:
+            connection.exec_driver_sql(statement)
+
+def test_existing_sessions_are_not_abandoned(engine):
+    downgrade(engine)
+    legacy_rows(engine, "INSERT INTO pomodoro_sessions (user_id, start_time, duration, type, completed) "
+                        "VALUES (1, '2024-01-01 09:00:00', 25, 'work', 1)")
+    migrate_schema(engine)
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("SELECT abandoned FROM pomodoro_sessions").scalar() == 0
+
+def test_task_pomodoro_counts_are_backfilled(engine):
+    downgrade(engine)
+    legacy_rows(
+        engine,
+        "INSERT INTO tasks (id, title, priority, status, user_id) VALUES (1, 'tracked', 'medium', 'pending', 1)",
+        "INSERT INTO tasks (id, title, priority, status, user_id, actual_duration) VALUES (2, 'manual', 'medium', 'pending', 1, 90)",
+        "INSERT INTO pomodoro_sessions (user_id, task_id, start_time, end_time, duration, type, completed) "
+        "VALUES (1, 1, '2024-01-01 09:00:00', '2024-01-01 09:25:00', 25, 'work', 1)",
+        "INSERT INTO pomodoro_sessions (user_id, task_id, start_time, duration, type, completed) "
+        "VALUES (1, 1, '2024-01-01 10:00:00', 25, 'work', 0)",
+    )
+    migrate_schema(engine)
+    with engine.connect() as connection:
+        rows = connection.exec_driver_sql("SELECT id, pomodoro_count, actual_duration FROM tasks ORDER BY id").all()
+    assert [tuple(row) for row in rows] == [(1, 1, 25), (2, 0, 90)]
+
+def test_pomodoro_rollups_are_rebuilt_when_created(engine):
+    downgrade(engine)
+    legacy_rows(
+        engine,
+        "INSERT INTO pomodoro_sessions (user_id, task_id, start_time, end_time, duration, type, completed) "
+        "VALUES (1, NULL, '2024-01-01 09:00:00', '2024-01-01 09:25:00', 25, 'work', 1)",
+        "INSERT INTO pomodoro_sessions (user_id, task_id, start_time, end_time, duration, type, completed) "
+        "VALUES (1, NULL, '2024-01-01 09:30:00', '2024-01-01 09:35:00', 5, 'break_session', 1)",
+        "INSERT INTO pomodoro_sessions (user_id, task_id, start_time, duration, type, completed) "
+        "VALUES (1, NULL, '2024-01-02 09:00:00', 25, 'work', 0)",
+    )
+    assert "backfilled pomodoro_daily_rollups" in migrate_schema(engine)
+    with engine.connect() as connection:
+        rows = connection.exec_driver_sql(
+            "SELECT user_id, day, task_id, sessions, work_minutes, break_minutes FROM pomodoro_daily_rollups"
+        ).all()
+    assert [tuple(row) for row in rows] == [(1, "2024-01-01", 0, 2, 25, 5)]
+
+def test_long_events_are_backfilled(engine):
+    downgrade(engine)
+    legacy_rows(
+        engine,
+        "INSERT INTO calendar_events (id, title, start, \"end\", user_id) VALUES (1, 'hour', '2024-01-01 09:00:00', '2024-01-01 10:00:00', 1)",
+        "INSERT INTO calendar_events (id, title, start, \"end\", user_id) VALUES (2, 'day', '2024-01-01 09:00:00', '2024-01-02 09:00:00', 1)",
+        "INSERT INTO calendar_events (id, title, start, \"end\", user_id) VALUES (3, 'trip', '2024-01-01 09:00:00', '2024-01-05 09:00:00', 1)",
+    )
+    migrate_schema(engine)
+    with engine.connect() as connection:
+        rows = connection.exec_driver_sql("SELECT id, is_long FROM calendar_events ORDER BY id").all()
+    assert [tuple(row) for row in rows] == [(1, 0), (2, 0), (3, 1)]
+
+def test_unread_counters_are_backfilled(engine):
+    downgrade(engine)
+    legacy_rows(
+        engine,
+        "INSERT INTO users (id, email, name, hashed_password) VALUES (2, 'b@example.com', 'B', 'x')",
+        "INSERT INTO notifications (title, message, type, read, user_id) VALUES ('a', 'm', 'info', 0, 1)",
+        "INSERT INTO notifications (title, message, type, read, user_id) VALUES ('b', 'm', 'info', 0, 1)",
+        "INSERT INTO notifications (title, message, type, read, user_id) VALUES ('c', 'm', 'info', 1, 1)",
+        "INSERT INTO notifications (title, message, type, read, user_id) VALUES ('d', 'm', 'info', 1, 2)",
+    )
+    migrate_schema(engine)
+    with engine.connect() as connection:
+        rows = connection.exec_driver_sql("SELECT id, unread_notifications FROM users ORDER BY id").all()
+    assert [tuple(row) for row in rows] == [(1, 2), (2, 0)]
@@ -0,0 +1,100 @@
+"""
+Tests for bulk notification actions, the retention purger and fan-out to every user
+"""
+
+from datetime import datetime, timedelta
+import pytest
+from app import auth
+from app.models import Notification, NotificationType, User
+from app.services import notify
+from app.services.jobs import job_store
+from app.services.notification_retention import purge_read_notifications
+from app.services.notify import create_notification
+
+NOW = datetime(2025, 3, 3, 9)
+
+def add(db, user_id=1, count=1, read=False, type=NotificationType.info, created_at=None):
+    notifications = [create_notification(db, user_id, f"n{i}", "message", type=type) for i in range(count)]
+    for notification in notifications:
+        notification.read = read
+        if created_at is not None:
+            notification.created_at = created_at
+    db.commit()
+    return [notification.id for notification in notifications]
+
+def state(db):
+    """(unread counter, notification ids) per user"""
+    db.expire_all()
+    return {
+        user.id: (user.unread_notifications, sorted(id for id, in db.query(Notification.id).filter(Notification.user_id == user.id)))
+        for user in db.query(User).order_by(User.id)
+    }
+
+@pytest.fixture
+def admin(monkeypatch):
+    monkeypatch.setattr(auth, "ADMIN_EMAILS", {"a@example.com"})
+
+def test_bulk_read_only_touches_the_callers_notifications(api, db):
+    infos = add(db, count=3)
+    [warning] = add(db, type=NotificationType.warning)
+    theirs = add(db, user_id=2, count=2)
+
+    response = api.put("/api/v1/notifications/bulk/read", json={"type": "warning"})
+    assert response.json() == {"affected": 1}
+    response = api.put("/api/v1/notifications/bulk/read", json={"ids": [infos[0], warning, theirs[0]]})
+    assert response.json() == {"affected": 1}
+    assert api.get("/api/v1/notifications/unread-count").json() == {"unread": 2}
+    assert api.get("/api/v1/notifications/", params={"read": False}).json()["total"] == 2
+    assert state(db)[2][0] == 2
+
+def test_bulk_delete_by_filter(api, db):
+    add(db, read=True, created_at=NOW - timedelta(days=10))
+    unread = add(db, count=2, created_at=NOW)
+    theirs = add(db, user_id=2, read=True, created_at=NOW - timedelta(days=10))
+
+    assert api.post("/api/v1/notifications/bulk/delete", json={}).status_code == 400
+    response = api.post("/api/v1/notifications/bulk/delete", json={"read": True, "before": (NOW - timedelta(days=1)).isoformat()})
+    assert response.json() == {"affected": 1}
+    response = api.post("/api/v1/notifications/bulk/delete", json={"ids": unread[:1] + theirs})
+    assert response.json() == {"affected": 1}
+    assert state(db) == {1: (1, unread[1:]), 2: (0, theirs)}
+
+def test_retention_purges_old_read_notifications_in_batches(db):
+    add(db, count=3, read=True, created_at=NOW - timedelta(days=91))
+    old_unread = add(db, created_at=NOW - timedelta(days=91))
+    recent = add(db, read=True, created_at=NOW - timedelta(days=89))
+    add(db, user_id=2, read=True, created_at=NOW - timedelta(days=200))
+
+    assert purge_read_notifications(db, now=NOW, retention_days=0) == 0
+    assert purge_read_notifications(db, now=NOW, retention_days=90, batch_size=2) == 4
+    assert state(db) == {1: (1, sorted(old_unread + recent)), 2: (0, [])}
+    assert purge_read_notifications(db, now=NOW, retention_days=90) == 0
+
+class InlineExecutor:
+    """Runs job chunks in the request: every session shares the test's one connection"""
+
+    def submit(self, fn, *args):
+        fn(*args)
+
+def test_fan_out_to_every_user_runs_as_a_job(api, db, session_factory, admin, monkeypatch):
+    monkeypatch.setattr(notify, "SessionLocal", session_factory)
+    monkeypatch.setattr(job_store, "_executor", InlineExecutor())
+    response = api.post("/api/v1/notifications/fan-out", json={"title": "Maintenance", "message": "Tonight at 22:00"})
+    assert response.status_code == 202
+
+    job = api.get(f"/api/v1/notifications/fan-out/{response.json()['job_id']}").json()
+    assert (job["status"], job["results"], job["errors"]) == ("completed", [{"recipients": 2}], [])
+    assert {user_id: unread for user_id, (unread, _) in state(db).items()} == {1: 1, 2: 1}
+    assert {notification.title for notification in db.query(Notification)} == {"Maintenance"}
+    # Nobody else can read an admin's job
+    api.user_id = 2
+    auth.ADMIN_EMAILS.add("b@example.com")
+    assert api.get(f"/api/v1/notifications/fan-out/{job['job_id']}").status_code == 404
+
+def test_fan_out_to_listed_users(api, db, admin):
+    response = api.post("/api/v1/notifications/fan-out", json={"title": "Hi", "message": "m", "user_ids": [2, 2, 99]})
+    assert (response.status_code, response.json()) == (200, {"recipients": 1})
+    assert {user_id: unread for user_id, (unread, _) in state(db).items()} == {1: 0, 2: 1}
+
+def test_fan_out_needs_an_admin(api):
+    assert api.post("/api/v1/notifications/fan-out", json={"title": "Hi", "message": "m"}).status_code == 403
@@ -0,0 +1,100 @@
+"""
+Tests for pomodoro statistics over the daily rollups and raw sessions
+"""
+
+from datetime import datetime, timedelta
+import pytest
+from app.models import PomodoroDailyRollup, PomodoroSession, PomodoroType, Task
+from app.services.pomodoro_stats import aggregate_sessions, focus_heatmap, range_stats, rebuild_rollups, timeseries
+from app.services.pomodoro_sweeper import sweep_batch
+from app.services.task_durations import rebuild_task_durations
+
+DAY = datetime(2024, 3, 4)
+
+def add_session(db, start, minutes=25, type=PomodoroType.work, completed=True, ended=True, task_id=None):
+    db.add(PomodoroSession(
+        user_id=1, start_time=start, duration=minutes, type=type, completed=completed,
+        end_time=start + timedelta(minutes=minutes) if ended else None, task_id=task_id
+    ))
+
+def rollup_rows(db):
+    return sorted(
+        (row.day, row.task_id, row.sessions, row.completed, row.work_minutes, row.break_minutes)
+        for row in db.query(PomodoroDailyRollup)
+    )
+
+def totals(stats):
+    return (stats.sessions, stats.completed, stats.work_minutes, stats.break_minutes)
+
+@pytest.fixture
+def sessions(db):
+    for day in range(5):
+        start = DAY + timedelta(days=day, hours=9)
+        add_session(db, start)
+        add_session(db, start + timedelta(minutes=25), minutes=5, type=PomodoroType.break_session)
+        add_session(db, start + timedelta(hours=8), minutes=15, completed=False)
+        add_session(db, start + timedelta(hours=10), ended=False)
+    db.commit()
+    rebuild_rollups(db)
+    return db
+
+def test_rollup_backed_range_matches_raw_sessions(sessions):
+    start, end = DAY + timedelta(hours=12), DAY + timedelta(days=4, hours=12)
+    with_rollups = range_stats(sessions, 1, start, end, now=DAY + timedelta(days=30))
+    raw = range_stats(sessions, 1, start, end, now=start)
+    assert totals(with_rollups) == totals(raw) == totals(aggregate_sessions(sessions, 1, start, end))
+    # First day's afternoon session, 3 whole days of 3 ended sessions, last day's morning two
+    assert totals(raw) == (1 + 9 + 2, 6 + 2, 15 + 3 * 40 + 25, 3 * 5 + 5)
+
+def test_open_sessions_are_not_counted(db):
+    add_session(db, DAY + timedelta(hours=9), ended=False)
+    db.commit()
+    assert totals(range_stats(db, 1, DAY, DAY + timedelta(days=1), now=DAY)) == (0, 0, 0, 0)
+
+@pytest.mark.parametrize("returning", [True, False])
+def test_swept_sessions_count_towards_neither_rollups_nor_tasks(db, engine, monkeypatch, returning):
+    monkeypatch.setattr(engine.dialect, "update_returning", returning)
+    task = Task(title="report", user_id=1)
+    db.add(task)
+    db.commit()
+    add_session(db, DAY + timedelta(hours=9), task_id=task.id)
+    add_session(db, DAY + timedelta(hours=10), completed=False, ended=False, task_id=task.id)
+    db.commit()
+    rebuild_rollups(db)
+    rebuild_task_durations(db)
+    db.commit()
+    before = rollup_rows(db)
+
+    assert sweep_batch(db, DAY + timedelta(days=1), batch_size=10) == 1
+    assert db.query(PomodoroSession).filter(PomodoroSession.abandoned == True).count() == 1
+    assert rollup_rows(db) == before == [(DAY.date(), 0, 1, 1, 25, 0), (DAY.date(), task.id, 1, 1, 25, 0)]
+    db.refresh(task)
+    assert (task.pomodoro_count, task.actual_duration) == (1, 25)
+
+    # The stored counters match a rebuild from the raw sessions
+    rebuild_rollups(db)
+    assert rebuild_task_durations(db) == 1
+    db.commit()
+    db.refresh(task)
+    assert rollup_rows(db) == before and (task.pomodoro_count, task.actual_duration) == (1, 25)
+    stats = range_stats(db, 1, DAY, DAY + timedelta(days=1), now=DAY + timedelta(days=30))
+    assert totals(stats) == totals(aggregate_sessions(db, 1, DAY, DAY + timedelta(days=1))) == (1, 1, 25, 0)
+
+def test_local_buckets_follow_daylight_saving_changes(db):
+    # 08:00 in Berlin on both sides of the switch to summer time on 2024-03-31
+    add_session(db, datetime(2024, 3, 30, 7))
+    add_session(db, datetime(2024, 4, 1, 6))
+    add_session(db, datetime(2024, 4, 1, 6, 30), minutes=5, type=PomodoroType.break_session)
+    db.commit()
+    start, end = datetime(2024, 3, 29), datetime(2024, 4, 3)
+
+    hours = timeseries(db, 1, start, end, "hour", "Europe/Berlin")
+    busy = [(point["start"].strftime("%m-%d %H:%M"), point["sessions"]) for point in hours if point["sessions"]]
+    assert busy == [("03-30 08:00", 1), ("04-01 08:00", 2)]
+
+    days = timeseries(db, 1, start, end, "day", "Asia/Kolkata")
+    assert [point["work_minutes"] for point in days] == [0, 25, 0, 25, 0, 0]
+
+    grid = focus_heatmap(db, 1, start, end, "Europe/Berlin")
+    assert grid[5][8] == 25 and grid[0][8] == 25
+    assert sum(map(sum, grid)) == 50
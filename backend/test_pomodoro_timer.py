@@ -0,0 +1,132 @@
+"""
+Tests for the server-side pomodoro timer: start/pause/resume transitions and phases expiring on the clock
+"""
+
+from datetime import datetime
+import asyncio
+import pytest
+from app.routers import pomodoro
+from app.services.pomodoro_timer import IDLE, LONG_BREAK, PAUSED, RUNNING, SHORT_BREAK, WORK, InvalidTransition, TimerService, TimerState, timer_topic
+from app.services.pubsub import pubsub
+
+T0 = 1_736_935_200.0  # 2025-01-15 10:00 UTC
+
+class FakeClock:
+    def __init__(self, now=T0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(pomodoro, "timer_service", TimerService(clock=clock))
+    return clock
+
+def start(state, now=T0, work=25, rest=5, long_rest=15, cycles=2):
+    state.start(now, task_id=None, work=work, rest=rest, long_rest=long_rest, cycles=cycles)
+
+def test_start_pause_resume():
+    state = TimerState(1)
+    start(state)
+    assert (state.status, state.phase, state.ends_at, state.remaining_seconds(T0 + 600)) == (RUNNING, WORK, T0 + 1500, 900)
+    with pytest.raises(InvalidTransition):
+        start(state)
+
+    state.pause(T0 + 600)
+    assert (state.status, state.ends_at, state.remaining) == (PAUSED, None, 900)
+    # Paused timers do not expire
+    assert state.advance(T0 + 10_000) is False
+    assert state.remaining_seconds(T0 + 10_000) == 900
+    with pytest.raises(InvalidTransition):
+        state.pause(T0 + 10_000)
+
+    state.resume(T0 + 10_000)
+    assert (state.status, state.ends_at) == (RUNNING, T0 + 10_900)
+    with pytest.raises(InvalidTransition):
+        state.resume(T0 + 10_000)
+
+    state.reset()
+    assert (state.status, state.phase, state.cycle, state.ends_at) == (IDLE, WORK, 0, None)
+    for transition in (state.pause, state.resume, state.skip):
+        with pytest.raises(InvalidTransition):
+            transition(T0)
+
+def test_expired_phases_roll_over_from_their_deadline():
+    state = TimerState(1)
+    start(state)
+    version = state.version
+    assert state.advance(T0 + 1499) is False
+    assert state.advance(T0 + 1500) is True
+    assert (state.phase, state.cycle, state.ends_at, state.version) == (SHORT_BREAK, 1, T0 + 1800, version + 1)
+
+    # A late check catches up on every phase that ended meanwhile
+    assert state.advance(T0 + 1800 + 1500 + 60) is True
+    assert (state.phase, state.cycle, state.ends_at) == (LONG_BREAK, 2, T0 + 3300 + 900)
+    assert state.remaining_seconds(T0 + 3360) == 840
+    assert state.version == version + 2
+
+def test_skip_keeps_a_paused_timer_paused():
+    state = TimerState(1)
+    start(state)
+    state.pause(T0 + 60)
+    state.skip(T0 + 120)
+    assert (state.status, state.phase, state.cycle, state.remaining) == (PAUSED, SHORT_BREAK, 1, 300)
+    state.resume(T0 + 180)
+    state.skip(T0 + 200)
+    assert (state.status, state.phase, state.ends_at) == (RUNNING, WORK, T0 + 1700)
+
+def test_timer_endpoints_follow_the_clock(api, db, clock, monkeypatch):
+    settings = {"work_minutes": 25, "break_minutes": 5, "long_break_minutes": 15, "cycles_before_long_break": 2}
+    timer = api.post("/api/v1/pomodoro/timer/start", json=settings).json()
+    assert (timer["status"], timer["phase"], timer["remaining_seconds"]) == (RUNNING, WORK, 1500)
+    assert timer["ends_at"] == datetime.utcfromtimestamp(T0 + 1500).isoformat()
+    assert api.post("/api/v1/pomodoro/timer/start", json=settings).status_code == 409
+
+    clock.advance(600)
+    assert api.get("/api/v1/pomodoro/timer").json()["remaining_seconds"] == 900
+    timer = api.post("/api/v1/pomodoro/timer/pause").json()
+    assert (timer["status"], timer["remaining_seconds"], timer["ends_at"]) == (PAUSED, 900, None)
+    clock.advance(3600)
+    assert api.get("/api/v1/pomodoro/timer").json()["remaining_seconds"] == 900
+    assert api.post("/api/v1/pomodoro/timer/pause").status_code == 409
+
+    assert api.post("/api/v1/pomodoro/timer/resume").json()["status"] == RUNNING
+    clock.advance(1000)
+    timer = api.get("/api/v1/pomodoro/timer").json()
+    assert (timer["phase"], timer["cycle"], timer["remaining_seconds"]) == (SHORT_BREAK, 1, 200)
+
+    # A restarted worker reloads the stored deadline and catches up
+    monkeypatch.setattr(pomodoro, "timer_service", TimerService(clock=clock))
+    clock.advance(200 + 1500 + 100)
+    timer = api.get("/api/v1/pomodoro/timer").json()
+    assert (timer["status"], timer["phase"], timer["cycle"], timer["remaining_seconds"]) == (RUNNING, LONG_BREAK, 2, 800)
+
+    assert api.post("/api/v1/pomodoro/timer/reset").json()["status"] == IDLE
+    assert api.post("/api/v1/pomodoro/timer/resume").status_code == 409
+    assert api.post("/api/v1/pomodoro/timer/rewind").status_code == 404
+
+def test_expired_timer_is_published_by_the_deadline_loop(db):
+    clock = FakeClock()
+    service = TimerService(clock=clock)
+
+    async def run():
+        subscription = pubsub.subscribe(timer_topic(1))
+        try:
+            service.start()
+            service.transition(db, 1, "start", task_id=None, work=1, rest=1, long_rest=1, cycles=4)
+            # The phase is over by the time the loop first looks at its deadline
+            clock.advance(61)
+            started = await asyncio.wait_for(subscription.queue.get(), 10)
+            assert (started["data"]["phase"], started["data"]["remaining_seconds"]) == (WORK, 60)
+            expired = await asyncio.wait_for(subscription.queue.get(), 10)
+            assert (expired["data"]["phase"], expired["data"]["cycle"], expired["data"]["remaining_seconds"]) == (SHORT_BREAK, 1, 59)
+        finally:
+            pubsub.unsubscribe(subscription)
+            await service.stop()
+
+    asyncio.run(run())
@@ -0,0 +1,122 @@
+"""
+Tests for push fan-out across workers through the local broker in pubsub_broker.py
+"""
+
+import asyncio
+import socket
+import threading
+import time
+import pytest
+from pubsub_broker import Broker, serve
+from app.services.notify import notification_message, notification_topic
+from app.services.pubsub import BrokerBackend, PubSub, format_sse
+
+TOPIC = notification_topic(1)
+
+@pytest.fixture
+def broker():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    broker = Broker()
+    broker.url = f"tcp://127.0.0.1:{port}"
+    threading.Thread(target=lambda: asyncio.run(serve("127.0.0.1", port, broker)), daemon=True).start()
+    return broker
+
+@pytest.fixture
+def workers(broker):
+    workers = [PubSub(BrokerBackend(broker.url)) for _ in range(2)]
+    for worker in workers:
+        worker.start()
+        assert worker.backend.connected.wait(10), "broker did not accept connections"
+    yield workers
+    for worker in workers:
+        worker.stop()
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+async def receive(subscription, count, timeout=10):
+    return [await asyncio.wait_for(subscription.queue.get(), timeout) for _ in range(count)]
+
+def watchers(broker, topic=TOPIC):
+    return len(broker.topics.get(topic, ()))
+
+def message(id):
+    return notification_message({"id": id, "user_id": 1, "title": "Task due", "message": "report", "type": "info"})
+
+def test_notification_reaches_subscribers_on_every_worker(broker, workers):
+    publisher, receiver = workers
+
+    async def run():
+        remote = receiver.subscribe(TOPIC)
+        local = publisher.subscribe(TOPIC)
+        await asyncio.to_thread(wait_for, lambda: watchers(broker) == 2)
+
+        assert publisher.publish(TOPIC, message(1)) == 1
+        [received] = await receive(remote, 1)
+        assert received == message(1)
+        assert format_sse(received["event"], received["data"], received["id"]).startswith("id: 1\nevent: notification\n")
+        # The broker does not echo a publish back to its sender
+        assert await receive(local, 1) == [message(1)]
+        await asyncio.sleep(0.1)
+        assert local.queue.empty() and remote.queue.empty()
+
+        # Other users' topics are not forwarded to this worker
+        publisher.publish(notification_topic(2), message(2))
+        await asyncio.sleep(0.1)
+        assert remote.queue.empty()
+
+    asyncio.run(run())
+
+def test_writer_thread_keeps_publish_order(broker, workers):
+    publisher, receiver = workers
+
+    async def run():
+        subscription = receiver.subscribe(TOPIC)
+        await asyncio.to_thread(wait_for, lambda: watchers(broker) == 1)
+        for i in range(50):
+            publisher.publish(TOPIC, message(i))
+        assert [received["id"] for received in await receive(subscription, 50)] == list(range(50))
+
+    asyncio.run(run())
+
+def test_lost_connection_reconnects_and_watches_again(broker, workers):
+    publisher, receiver = workers
+
+    async def run():
+        subscription = receiver.subscribe(TOPIC)
+        await asyncio.to_thread(wait_for, lambda: watchers(broker) == 1)
+        lost = receiver.backend._sock
+        lost.shutdown(socket.SHUT_RDWR)
+
+        # The reader thread notices, backs off and re-registers its topics
+        await asyncio.to_thread(wait_for, lambda: receiver.backend._sock not in (None, lost) and receiver.backend.connected.is_set())
+        # Publish until the broker has processed the new subscription
+        for i in range(100):
+            publisher.publish(TOPIC, message(i))
+            try:
+                [received] = await receive(subscription, 1, timeout=0.1)
+                break
+            except asyncio.TimeoutError:
+                continue
+        else:
+            pytest.fail("nothing was received after reconnecting")
+        assert received == message(i)
+        await asyncio.to_thread(wait_for, lambda: watchers(broker) == 1)
+
+    asyncio.run(run())
+
+def test_messages_are_dropped_rather_than_blocking_publishers():
+    backend = BrokerBackend("tcp://127.0.0.1:9", queue_size=1)
+    # Never connected: nothing is queued for later
+    assert backend._send({"op": "pub", "topic": TOPIC, "message": message(1)}) is False
+    assert backend._outbox.empty()
+
+    backend.connected.set()
+    assert backend._send({"op": "pub", "topic": TOPIC, "message": message(1)}) is True
+    assert backend._send({"op": "pub", "topic": TOPIC, "message": message(2)}) is False
+    assert backend._outbox.qsize() == 1
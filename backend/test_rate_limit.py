@@ -0,0 +1,139 @@
+"""
+Tests for AI admission control: token-bucket refill and fair queueing for global capacity, on a fake clock
+"""
+
+import asyncio
+import pytest
+from app.services.rate_limit import AIAdmissionController, RateLimited, TokenBucket
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+def limiter(clock, **kwargs):
+    options = dict(user_rate=100, user_burst=1000, global_rate=10, global_burst=10, max_wait=3, clock=clock)
+    options.update(kwargs)
+    return AIAdmissionController(**options)
+
+async def settle():
+    """Let every ready task run until it blocks"""
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+async def release(controller, clock, seconds):
+    """Let ``seconds`` pass and wake the queue as an admission would"""
+    clock.advance(seconds)
+    async with controller._condition:
+        controller._condition.notify_all()
+    await settle()
+
+def test_bucket_refills_lazily_up_to_capacity(clock):
+    bucket = TokenBucket(rate_per_second=2, capacity=10, clock=clock)
+    assert bucket.try_consume(8) == (True, 0.0)
+    assert bucket.try_consume(5) == (False, pytest.approx(1.5))
+
+    clock.advance(1.5)
+    assert bucket.available() == pytest.approx(5)
+    assert bucket.try_consume(5) == (True, 0.0)
+    clock.advance(60)
+    assert bucket.is_full() and bucket.available() == 10
+
+    # Requests larger than the bucket only wait for it to fill
+    bucket.try_consume(10)
+    assert bucket.try_consume(25) == (False, pytest.approx(5))
+
+def test_debt_admits_while_tokens_remain(clock):
+    bucket = TokenBucket(rate_per_second=2, capacity=10, clock=clock)
+    assert bucket.try_consume(9) == (True, 0.0)
+    assert bucket.try_consume(30, allow_debt=True) == (True, 0.0)
+    assert bucket.available() == -29
+    ok, retry_after = bucket.try_consume(1, allow_debt=True)
+    assert not ok and retry_after == pytest.approx(14.5)
+
+    clock.advance(15)
+    assert bucket.try_consume(1, allow_debt=True) == (True, 0.0)
+    bucket.adjust(100)
+    assert bucket.available() == 10
+
+def test_user_bucket_rejects_without_queueing(clock):
+    controller = limiter(clock, user_rate=5, user_burst=20, global_burst=1000)
+
+    async def run():
+        await controller.admit(1, 15)
+        with pytest.raises(RateLimited) as rejected:
+            await controller.admit(1, 10)
+        assert (rejected.value.reason, rejected.value.retry_after) == ("user", pytest.approx(1.0))
+        # Other users have their own buckets
+        await controller.admit(2, 20)
+        clock.advance(1)
+        await controller.admit(1, 10)
+
+    asyncio.run(run())
+    assert (controller.usage(1).requests, controller.usage(1).rejected) == (2, 1)
+
+def test_global_queue_is_served_round_robin_across_users(clock):
+    controller = limiter(clock)
+    admitted = []
+
+    async def request(name, user_id, cost=10):
+        await controller.admit(user_id, cost)
+        admitted.append(name)
+
+    async def run():
+        await request("first", 3)  # empties the global bucket
+        waiters = [asyncio.create_task(request(name, user_id)) for name, user_id in (("a1", 1), ("a2", 1), ("b1", 2))]
+        await settle()
+        assert controller.stats()["queued_requests"] == 3
+
+        # The queue already holds 30 tokens of 10/s with a 3 s limit
+        with pytest.raises(RateLimited) as rejected:
+            await controller.admit(4, 10)
+        assert (rejected.value.reason, rejected.value.retry_after) == ("global", pytest.approx(4.0))
+        assert controller.user_stats(4)["tokens_available"] == 1000
+
+        for _ in range(3):
+            await release(controller, clock, 1)
+        await asyncio.gather(*waiters)
+
+    asyncio.run(run())
+    # user 1 queued twice but user 2 is served before user 1's second request
+    assert admitted == ["first", "a1", "b1", "a2"]
+    assert controller.stats()["queued_requests"] == 0 and controller.stats()["queued_tokens"] == 0
+
+def test_waiter_times_out_on_the_clock(clock):
+    controller = limiter(clock)
+
+    async def run():
+        await controller.admit(1, 10)
+        waiter = asyncio.create_task(controller.admit(2, 10))
+        await settle()
+        # Usage settled above the estimate leaves the global bucket in debt
+        controller.record_usage(1, prompt_tokens=60, completion_tokens=10, charged=10)
+        await release(controller, clock, 3)
+        with pytest.raises(RateLimited) as rejected:
+            await waiter
+        assert rejected.value.reason == "timeout"
+
+    asyncio.run(run())
+    assert controller.stats()["queued_requests"] == 0
+    # The timed-out request's charge went back to its user
+    assert controller.user_stats(2)["tokens_available"] == 1000
+    assert controller.user_stats(1)["prompt_tokens"] == 60
+
+def test_refund_returns_the_charge(clock):
+    controller = limiter(clock)
+    asyncio.run(controller.admit(1, 10))
+    assert controller.global_bucket.available() == 0
+    controller.refund(1, 10)
+    assert controller.global_bucket.available() == 10
+    assert controller.user_stats(1)["tokens_available"] == 1000
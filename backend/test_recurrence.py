@@ -0,0 +1,83 @@
+"""
+Tests for recurring event expansion and series ends
+"""
+
+from datetime import datetime, timedelta, timezone
+import time
+import pytest
+from app.models import CalendarEvent
+from app.services import recurrence as recurrence_module
+from app.services.recurrence import InvalidRecurrence, Recurrence, expand_recurring
+
+START = datetime(2024, 3, 4, 9)  # a Monday, UTC
+
+def brute_force_end(recurrence):
+    occurrences = list(recurrence.rule(recurrence.local_start))
+    last = occurrences[-1] if occurrences else recurrence.local_start
+    return recurrence.to_utc(last) + recurrence.duration
+
+@pytest.mark.parametrize("rule, tz_name", [
+    ("FREQ=DAILY;COUNT=10", None),
+    ("FREQ=WEEKLY;INTERVAL=2;COUNT=7", "Europe/Berlin"),
+    ("FREQ=HOURLY;INTERVAL=5;COUNT=300", "America/New_York"),
+    ("FREQ=WEEKLY;BYDAY=MO,WE;COUNT=5", None),
+    ("FREQ=MONTHLY;BYMONTHDAY=31;COUNT=6", None),
+    ("FREQ=DAILY;UNTIL=20240405T090000", "Europe/Berlin"),
+    ("FREQ=DAILY;UNTIL=20240405T085959", "Europe/Berlin"),
+    ("FREQ=WEEKLY;BYDAY=MO;UNTIL=20240512T000000", None),
+    ("FREQ=WEEKLY;BYDAY=TU,TH;INTERVAL=3;UNTIL=20250101T000000Z", "Asia/Kolkata"),
+    ("FREQ=DAILY;BYMONTH=1;UNTIL=20260601T000000", None),
+    ("FREQ=YEARLY;UNTIL=20300101T000000", None),
+    ("FREQ=DAILY;UNTIL=20240101T000000", None),
+])
+def test_series_end_matches_full_expansion(rule, tz_name):
+    recurrence = Recurrence(rule, START, START + timedelta(minutes=45), tz_name=tz_name)
+    assert recurrence.series_end() == brute_force_end(recurrence)
+
+def test_series_end_of_long_finite_series_is_cheap():
+    began = time.perf_counter()
+    minutely = Recurrence("FREQ=MINUTELY;COUNT=50000000", START, START + timedelta(minutes=1))
+    assert minutely.series_end() == START + timedelta(minutes=50000000)
+    twice_a_minute = Recurrence("FREQ=MINUTELY;BYSECOND=0,30;UNTIL=21000101T000000", START, START + timedelta(seconds=10))
+    assert twice_a_minute.series_end() == datetime(2100, 1, 1, 0, 0, 10)
+    assert time.perf_counter() - began < 1
+
+def test_series_longer_than_the_scan_limit_is_unbounded(monkeypatch):
+    monkeypatch.setattr(recurrence_module, "MAX_SERIES_SCAN", 100)
+    assert Recurrence("FREQ=DAILY;BYHOUR=9,17;COUNT=500", START, START + timedelta(hours=1)).series_end() is None
+    assert Recurrence("FREQ=DAILY;BYHOUR=9,17;COUNT=50", START, START + timedelta(hours=1)).series_end() is not None
+    assert Recurrence("FREQ=WEEKLY;COUNT=999999999", START, START + timedelta(hours=1)).series_end() is None
+    assert Recurrence("FREQ=DAILY", START, START + timedelta(hours=1)).series_end() is None
+
+def test_occurrences_keep_local_time_across_dst():
+    recurrence = Recurrence("FREQ=WEEKLY", START, START + timedelta(hours=1), tz_name="Europe/Berlin")
+    starts = [start for start, _ in recurrence.between(datetime(2024, 3, 20), datetime(2024, 4, 10))]
+    # 10:00 in Berlin: UTC+1 before the switch on 2024-03-31, UTC+2 after
+    assert starts == [datetime(2024, 3, 25, 9), datetime(2024, 4, 1, 8), datetime(2024, 4, 8, 8)]
+
+def test_window_and_exdates():
+    exdate = START + timedelta(days=2)
+    recurrence = Recurrence("FREQ=DAILY", START, START + timedelta(hours=2), exdates=[exdate])
+    occurrences = recurrence.between(START + timedelta(days=1, hours=1), START + timedelta(days=4))
+    assert [start for start, _ in occurrences] == [START + timedelta(days=1), START + timedelta(days=3)]
+    assert recurrence.between(START, START + timedelta(days=100), limit=3)[-1][0] == START + timedelta(days=3)
+
+def test_invalid_rules_are_rejected():
+    for rule in ("FREQ=SOMETIMES", "FREQ=DAILY;COUNT=2;UNTIL=20250101", "FREQ=DAILY;BYDAY=XX", "nonsense"):
+        with pytest.raises(InvalidRecurrence):
+            Recurrence(rule, START, START + timedelta(hours=1))
+    with pytest.raises(InvalidRecurrence):
+        Recurrence("FREQ=DAILY", START, START + timedelta(hours=1), tz_name="Mars/Olympus")
+
+def test_unexpandable_rule_falls_back_to_first_occurrence(db):
+    db.add(CalendarEvent(title="broken", start=START, end=START + timedelta(hours=1), user_id=1, rrule="FREQ=DAILY;BYDAY=XX"))
+    db.add(CalendarEvent(title="daily", start=START, end=START + timedelta(hours=1), user_id=1, rrule="FREQ=DAILY"))
+    db.commit()
+    # Aware window bounds against naive stored times
+    window_start = datetime(2024, 3, 4, tzinfo=timezone.utc)
+    occurrences = expand_recurring(db, 1, window_start, window_start + timedelta(days=2))
+    assert sorted((event.title, start) for event, start, _ in occurrences) == [
+        ("broken", START), ("daily", START), ("daily", START + timedelta(days=1))
+    ]
+    later = expand_recurring(db, 1, window_start + timedelta(days=1), window_start + timedelta(days=2))
+    assert [event.title for event, _, _ in later] == ["daily"]
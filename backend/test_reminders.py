@@ -0,0 +1,91 @@
+"""
+Tests for deadline reminders: exactly-once claims, stale and late drops, windowed loading
+"""
+
+from datetime import datetime, timedelta
+import pytest
+from app.models import Notification, Task, TaskReminder, TaskStatus
+from app.services.reminders import load_window, reminders_for, send_reminders
+
+NOW = datetime(2025, 3, 3, 9)
+
+def add_task(db, due_date, status=TaskStatus.pending, title="report"):
+    task = Task(title=title, due_date=due_date, status=status, user_id=1)
+    db.add(task)
+    db.commit()
+    return task
+
+def notifications(db):
+    return [notification.title for notification in db.query(Notification).order_by(Notification.id)]
+
+@pytest.mark.parametrize("returning", [True, False])
+def test_a_reminder_is_sent_once(db, engine, monkeypatch, returning):
+    # Without RETURNING each claim falls back to a savepoint insert
+    monkeypatch.setattr(engine.dialect, "insert_returning", returning)
+    task = add_task(db, NOW + timedelta(hours=1))
+    reminders = reminders_for(task.id, task.due_date, (60,))
+
+    assert send_reminders(db, reminders, NOW) == 1
+    assert send_reminders(db, reminders + reminders, NOW) == 0
+    assert notifications(db) == ["Task due in 1 hour"]
+    assert db.query(TaskReminder).count() == 1
+
+def test_duplicates_in_one_batch_are_sent_once(db):
+    task = add_task(db, NOW + timedelta(days=1))
+    reminders = reminders_for(task.id, task.due_date, (1440, 60))
+    assert send_reminders(db, reminders + reminders[:1], NOW + timedelta(hours=23), grace_minutes=24 * 60) == 2
+    assert notifications(db) == ["Task due in 1 day", "Task due in 1 hour"]
+
+def test_stale_reminders_are_dropped(db):
+    moved = add_task(db, NOW + timedelta(hours=1))
+    done = add_task(db, NOW + timedelta(hours=1), title="done")
+    reminders = reminders_for(moved.id, moved.due_date, (60,)) + reminders_for(done.id, done.due_date, (60,))
+    moved.due_date = NOW + timedelta(hours=5)
+    done.status = TaskStatus.completed
+    db.commit()
+
+    assert send_reminders(db, reminders, NOW) == 0
+    assert notifications(db) == []
+
+    # The rescheduled deadline gets its own reminder
+    assert send_reminders(db, reminders_for(moved.id, moved.due_date, (60,)), NOW + timedelta(hours=4)) == 1
+
+def test_reminders_past_the_grace_window_are_dropped(db):
+    task = add_task(db, NOW + timedelta(hours=1))
+    reminders = reminders_for(task.id, task.due_date, (60,))
+    assert send_reminders(db, reminders, NOW + timedelta(minutes=31), grace_minutes=30) == 0
+    assert send_reminders(db, reminders, NOW + timedelta(minutes=30), grace_minutes=30) == 1
+
+def test_load_window_cuts_at_the_limit_and_resumes(db):
+    tasks = [add_task(db, NOW + timedelta(hours=1, minutes=i)) for i in range(10)]
+    add_task(db, NOW + timedelta(hours=1, minutes=3), status=TaskStatus.cancelled)
+    end = NOW + timedelta(minutes=30)
+
+    loaded, covered = load_window(db, NOW, end, leads=(60,), limit=4)
+    assert covered == NOW + timedelta(minutes=3)
+    assert [task_id for _, task_id, _, _ in loaded] == [task.id for task in tasks[:3]]
+
+    seen = list(loaded)
+    while covered < end:
+        loaded, covered = load_window(db, covered, end, leads=(60,), limit=4)
+        seen.extend(loaded)
+    assert [task_id for _, task_id, _, _ in seen] == [task.id for task in tasks]
+    assert covered == end
+
+def test_load_window_takes_every_reminder_at_one_instant(db):
+    tasks = [add_task(db, NOW + timedelta(hours=1)) for _ in range(5)]
+    loaded, covered = load_window(db, NOW, NOW + timedelta(minutes=30), leads=(60,), limit=2)
+    assert sorted(task_id for _, task_id, _, _ in loaded) == [task.id for task in tasks]
+    assert covered == NOW + timedelta(microseconds=1)
+
+def test_load_window_cut_applies_to_every_lead(db):
+    # Ten one-hour reminders fill the scan; the day-ahead one past the cut waits
+    for i in range(10):
+        add_task(db, NOW + timedelta(hours=1, minutes=i))
+    late = add_task(db, NOW + timedelta(days=1, minutes=20))
+    loaded, covered = load_window(db, NOW, NOW + timedelta(minutes=30), leads=(1440, 60), limit=5)
+    assert covered == NOW + timedelta(minutes=4)
+    assert late.id not in {task_id for _, task_id, _, _ in loaded}
+
+    loaded, _ = load_window(db, covered, NOW + timedelta(minutes=30), leads=(1440, 60), limit=50)
+    assert (NOW + timedelta(minutes=20), late.id, 1440, NOW + timedelta(days=1, minutes=20)) in loaded
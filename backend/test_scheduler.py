@@ -0,0 +1,68 @@
+"""
+Tests for the local scheduling engine behind /ai/optimize
+"""
+
+from datetime import datetime, timedelta
+from app.services.intervals import FreeIntervalIndex, merge_intervals, subtract_intervals
+from app.services.scheduler import SchedulableTask, WorkingHours, schedule_tasks
+
+MONDAY = datetime(2024, 1, 1)
+
+def test_merge_and_subtract_intervals():
+    assert merge_intervals([(5, 8), (1, 3), (2, 4), (8, 9), (7, 7)]) == [(1, 4), (5, 9)]
+    assert subtract_intervals([(0, 10), (20, 30)], [(2, 4), (8, 22)]) == [(0, 2), (4, 8), (22, 30)]
+
+def test_free_interval_index_first_fit():
+    index = FreeIntervalIndex([(0, 10), (20, 50), (60, 70)])
+    assert index.allocate(15) == 20
+    assert index.allocate(10) == 0
+    assert index.allocate(15) == 35
+    assert index.allocate(15) == -1
+    assert index.allocate(10) == 60
+
+def test_schedule_respects_working_hours_and_busy_events():
+    tasks = [SchedulableTask(id=i, estimated_duration=60) for i in range(10)]
+    busy = [(MONDAY.replace(hour=10), MONDAY.replace(hour=12))]
+    result = schedule_tasks(tasks, busy, MONDAY, MONDAY + timedelta(days=2), WorkingHours())
+
+    assert not result.unscheduled
+    slots = sorted((p.start, p.end) for p in result.scheduled)
+    for (start, end), (next_start, _) in zip(slots, slots[1:]):
+        assert end <= next_start
+    for start, end in slots:
+        assert 9 <= start.hour and (end.hour < 17 or (end.hour == 17 and end.minute == 0))
+        assert end <= busy[0][0] or start >= busy[0][1]
+
+def test_schedule_orders_by_due_date_then_priority():
+    tasks = [
+        SchedulableTask(id=1, priority="low", estimated_duration=60),
+        SchedulableTask(id=2, priority="high", estimated_duration=60),
+        SchedulableTask(id=3, priority="low", due_date=MONDAY.replace(hour=11), estimated_duration=60),
+    ]
+    result = schedule_tasks(tasks, [], MONDAY, MONDAY + timedelta(days=1))
+
+    assert [p.task_id for p in result.scheduled] == [3, 2, 1]
+    assert not result.scheduled[0].late
+
+def test_schedule_reports_late_and_unscheduled_tasks():
+    tasks = [
+        SchedulableTask(id=1, due_date=MONDAY.replace(hour=9, minute=30), estimated_duration=60),
+        SchedulableTask(id=2, estimated_duration=10 * 60),
+    ]
+    result = schedule_tasks(tasks, [], MONDAY, MONDAY + timedelta(days=1))
+
+    assert result.scheduled[0].late
+    assert result.unscheduled == [2]
+
+def test_schedule_is_deterministic():
+    tasks = [SchedulableTask(id=i, priority=["low", "medium", "high"][i % 3], estimated_duration=15 + i % 4 * 10) for i in range(200)]
+    first = schedule_tasks(tasks, [], MONDAY, MONDAY + timedelta(days=14))
+    second = schedule_tasks(list(reversed(tasks)), [], MONDAY, MONDAY + timedelta(days=14))
+    assert first == second
+
+def test_optimize_timezone_validation():
+    from app.schemas import is_known_timezone
+    assert is_known_timezone("Europe/Berlin")
+    assert is_known_timezone("UTC")
+    assert not is_known_timezone("Mars/Olympus")
+    assert not is_known_timezone("../etc/passwd")
@@ -0,0 +1,49 @@
+"""
+Tests for the task time counters kept by the pomodoro session endpoints
+"""
+
+from app.models import PomodoroSession, Task
+from app.services.task_durations import apply_task_deltas
+
+def add_task(db, user_id=1, title="report"):
+    task = Task(title=title, user_id=user_id)
+    db.add(task)
+    db.commit()
+    return task
+
+def counters(db, task):
+    db.expire_all()
+    task = db.get(Task, task.id)
+    return (task.pomodoro_count, task.actual_duration)
+
+def test_ending_a_session_counts_towards_its_task(api, db):
+    task = add_task(db)
+    session = api.post("/api/v1/pomodoro/start", json={"task_id": task.id, "duration": 25}).json()
+    assert api.put(f"/api/v1/pomodoro/{session['id']}/end").status_code == 200
+    assert counters(db, task) == (1, 25)
+
+    assert api.put(f"/api/v1/pomodoro/{session['id']}", json={"duration": 40}).status_code == 200
+    assert counters(db, task) == (1, 40)
+    assert api.delete(f"/api/v1/pomodoro/{session['id']}").status_code == 200
+    assert counters(db, task) == (0, 0)
+
+def test_sessions_cannot_link_another_users_task(api, db):
+    theirs = add_task(db, user_id=2)
+    api.user_id = 1
+
+    response = api.post("/api/v1/pomodoro/start", json={"task_id": theirs.id, "duration": 25})
+    assert response.status_code == 404
+    assert db.query(PomodoroSession).count() == 0
+    assert api.post("/api/v1/pomodoro/timer/start", json={"task_id": theirs.id}).status_code == 404
+
+    session = api.post("/api/v1/pomodoro/start", json={"duration": 25}).json()
+    api.put(f"/api/v1/pomodoro/{session['id']}/end")
+    assert api.put(f"/api/v1/pomodoro/{session['id']}", json={"task_id": theirs.id}).status_code == 404
+    assert counters(db, theirs) == (0, None)
+
+def test_deltas_only_touch_the_users_own_tasks(db):
+    mine, theirs = add_task(db), add_task(db, user_id=2)
+    apply_task_deltas(db, 1, {mine.id: (1, 25), theirs.id: (1, 25)})
+    db.commit()
+    assert counters(db, mine) == (1, 25)
+    assert counters(db, theirs) == (0, None)
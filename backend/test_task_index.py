@@ -0,0 +1,104 @@
+"""
+Tests for the per-user task similarity index and the duplicate filter of /ai/suggest
+"""
+
+import json
+import pytest
+from app.models import Task
+from app.routers import ai
+from app.services.llm import LLMProvider, LLMResult
+from app.services.task_index import TaskIndexService, UserTaskIndex, text_similarity
+
+def add_task(db, title, description=None, user_id=1):
+    task = Task(title=title, description=description, user_id=user_id)
+    db.add(task)
+    db.commit()
+    return task
+
+class CannedProvider(LLMProvider):
+    """Returns the same suggestions for every prompt and keeps the prompts"""
+
+    name = "canned"
+
+    def __init__(self, titles):
+        self.content = json.dumps([{"title": title, "priority": "medium"} for title in titles])
+        self.prompts = []
+
+    def complete(self, prompt, max_tokens, temperature=0.7):
+        self.prompts.append(prompt)
+        return LLMResult(content=self.content, prompt_tokens=1, completion_tokens=1, model="canned")
+
+def test_search_ranks_by_shared_rare_terms():
+    index = UserTaskIndex()
+    index.add(1, "Write quarterly report for finance")
+    index.add(2, "Write blog post")
+    index.add(3, "Review quarterly budget")
+    index.refresh_norms()
+
+    results = index.search("quarterly report")
+    assert [task_id for task_id, _ in results] == [1, 3]
+    assert 0 < results[1][1] < results[0][1] <= 1.0
+    assert index.search("the and of") == [] and index.search("holiday") == []
+
+    index.remove(1)
+    assert [task_id for task_id, _ in index.search("quarterly report")] == [3]
+    assert "report" not in index.postings
+
+def test_text_similarity_ignores_case_and_stop_words():
+    assert text_similarity("Write the Quarterly report", "write quarterly REPORT") == pytest.approx(1.0)
+    assert text_similarity("Write report", "Book dentist") == 0.0
+
+def test_writes_update_the_cached_index(db):
+    service = TaskIndexService()
+    task = add_task(db, "Write quarterly report")
+    add_task(db, "Write quarterly report", user_id=2)
+    assert [task_id for task_id, _ in service.search(db, 1, "quarterly report")] == [task.id]
+
+    service.upsert(1, task.id, "Book dentist appointment", None)
+    assert service.search(db, 1, "quarterly report") == []
+    assert [task_id for task_id, _ in service.search(db, 1, "dentist")] == [task.id]
+    service.remove(1, task.id)
+    assert service.search(db, 1, "dentist") == []
+
+def test_write_during_build_is_not_lost(db):
+    service = TaskIndexService()
+    add_task(db, "Write quarterly report")
+    build = service._build
+
+    def racing_build(db, user_id):
+        index = build(db, user_id)
+        # A task is created after this build read its rows
+        task = add_task(db, "Book dentist appointment")
+        service.upsert(user_id, task.id, task.title, task.description)
+        return index
+
+    service._build = racing_build
+    assert service.search(db, 1, "dentist") == []
+    service._build = build
+    assert len(service.search(db, 1, "dentist")) == 1
+    assert service._generations == {} and service._building == {}
+
+def test_least_recently_used_index_is_evicted(db):
+    service = TaskIndexService(max_users=1)
+    first = service.get_index(db, 1)
+    assert service.get_index(db, 1) is first
+    service.get_index(db, 2)
+    assert service.get_index(db, 1) is not first
+
+def test_suggestions_skip_existing_and_repeated_tasks(api, db, monkeypatch):
+    monkeypatch.setattr(ai, "task_index_service", TaskIndexService())
+    add_task(db, "Write quarterly report", "Numbers for the board")
+    add_task(db, "Book dentist appointment")
+    add_task(db, "Plan team offsite", user_id=2)
+    provider = CannedProvider([
+        "Write the quarterly report", "Review budget", "review BUDGET", "Plan team offsite"
+    ])
+    monkeypatch.setattr(ai, "get_llm_provider", lambda: provider)
+
+    response = api.post("/api/v1/ai/suggest", json={"context": "quarterly report for the board"})
+    assert response.status_code == 200
+    assert [task["title"] for task in response.json()] == ["Review budget", "Plan team offsite"]
+    # Only the caller's related tasks ground the prompt
+    [prompt] = provider.prompts
+    assert "- Write quarterly report (pending)" in prompt
+    assert "dentist" not in prompt and "offsite" not in prompt
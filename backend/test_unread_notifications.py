@@ -0,0 +1,109 @@
+"""
+Tests for the users.unread_notifications counter kept by the notification flush hook
+"""
+
+import pytest
+from sqlalchemy import false, func, select
+from sqlalchemy.orm import load_only
+from app.models import Notification, User
+from app.services.notify import create_notification, delete_notifications, mark_notifications_read
+
+def counters(db):
+    """(stored counter, actual COUNT) of unread notifications per user"""
+    stored = dict(db.execute(select(User.id, User.unread_notifications)).all())
+    actual = dict(db.execute(
+        select(Notification.user_id, func.count(Notification.id))
+        .where(Notification.read == false())
+        .group_by(Notification.user_id)
+    ).all())
+    return {user_id: (count, actual.get(user_id, 0)) for user_id, count in stored.items()}
+
+def unread(db):
+    result = counters(db)
+    assert all(stored == actual for stored, actual in result.values()), result
+    return {user_id: stored for user_id, (stored, _) in result.items()}
+
+def notify(db, user_id=1, count=1, read=False):
+    notifications = [create_notification(db, user_id, f"n{i}", "message") for i in range(count)]
+    for notification in notifications:
+        notification.read = read
+    db.commit()
+    return notifications
+
+def test_created_notifications_are_counted(db):
+    notify(db, count=3)
+    notify(db, user_id=2)
+    notify(db, read=True)
+    assert unread(db) == {1: 3, 2: 1}
+
+def test_reading_and_unreading_loaded_notifications(db):
+    first, second = notify(db, count=2)
+    first.read = True
+    db.commit()
+    assert unread(db) == {1: 1, 2: 0}
+
+    first.read = True  # no change
+    second.read = False
+    db.commit()
+    assert unread(db) == {1: 1, 2: 0}
+
+    first.read = False
+    db.commit()
+    assert unread(db) == {1: 2, 2: 0}
+
+def test_reading_with_unloaded_read_attribute_recounts(db):
+    notify(db, count=2)
+    notify(db, user_id=2)
+    db.expunge_all()
+
+    # The old value of read was never loaded, so no delta can be computed
+    notification = db.query(Notification).options(load_only(Notification.id, Notification.user_id)).filter(
+        Notification.user_id == 1
+    ).first()
+    assert "read" not in notification.__dict__
+    notification.read = True
+    db.commit()
+    assert unread(db) == {1: 1, 2: 1}
+
+    # Expired attributes are unloaded too
+    db.expire(notification)
+    notification.read = False
+    db.commit()
+    assert unread(db) == {1: 2, 2: 1}
+
+def test_deleting_notifications(db):
+    kept, deleted = notify(db, count=2)
+    [read] = notify(db, read=True)
+    db.delete(deleted)
+    db.delete(read)
+    db.commit()
+    assert unread(db) == {1: 1, 2: 0}
+
+    db.expunge_all()
+    partial = db.query(Notification).options(load_only(Notification.id, Notification.user_id)).one()
+    db.delete(partial)
+    db.commit()
+    assert unread(db) == {1: 0, 2: 0}
+
+def test_rolled_back_changes_leave_the_counter(db):
+    [notification] = notify(db)
+    create_notification(db, 1, "discarded", "message")
+    notification.read = True
+    db.flush()
+    db.rollback()
+    assert unread(db) == {1: 1, 2: 0}
+
+@pytest.mark.parametrize("returning", [True, False])
+def test_bulk_read_and_delete_keep_the_counter(db, engine, monkeypatch, returning):
+    monkeypatch.setattr(engine.dialect, "delete_returning", returning)
+    notify(db, count=4)
+    notify(db, count=2, read=True)
+    notify(db, user_id=2, count=2)
+
+    assert mark_notifications_read(db, 1, [Notification.user_id == 1, Notification.title == "n0"]) == 1
+    db.commit()
+    assert unread(db) == {1: 3, 2: 2}
+
+    assert delete_notifications(db, 1, [Notification.user_id == 1, Notification.title.in_(["n1", "n2"])]) == 3
+    db.commit()
+    assert unread(db) == {1: 1, 2: 2}